@@ -0,0 +1,268 @@
+"""
+WhatsApp Android to iOS Migration Tool
+
+Runner de benchmarks de migración.
+
+Genera bases de datos sintéticas, ejecuta cada motor de migración en un
+subproceso aislado (para medir el pico de memoria sin contaminación) y
+compara mensajes/seg, pico de memoria y tamaño de salida contra un baseline
+JSON. Termina con código 1 si algún resultado empeora más que el umbral.
+
+Usage:
+    python benchmarks/run_benchmarks.py --scale 10k
+    python benchmarks/run_benchmarks.py --scale 1m --engine modern --update-baseline
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+# Agregar raíz del proyecto al path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.synthetic import generate_android_db, generate_ios_db, parse_scale
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_WORKDIR = os.path.join('tmp', 'benchmarks')
+DEFAULT_THRESHOLD = 0.20
+
+# Motores de migración: layout Android a generar y opciones del migrador
+ENGINES: Dict[str, Dict[str, Any]] = {
+    'modern': {'layout': 'modern', 'options': {}},
+    'modern-merge': {'layout': 'modern', 'options': {'merge': True}},
+    'modern-interleave': {'layout': 'modern', 'options': {'interleave': True}},
+    'modern-external-sort': {'layout': 'modern', 'options': {'external_sort': True}},
+    'legacy': {'layout': 'legacy', 'options': {}},
+}
+
+# Métricas comparadas: nombre → True si "mayor es mejor"
+METRICS = {
+    'messages_per_sec': True,
+    'peak_rss': False,
+    'output_size': False,
+}
+
+
+def case_key(engine: str, scale: str) -> str:
+    """Clave de un caso de benchmark en el baseline."""
+    return f"{engine}/{scale}"
+
+
+def prepare_inputs(workdir: str, engine: str, messages: int, chats: int,
+                   media_ratio: float, text_size: int, ios_messages: int) -> Dict[str, str]:
+    """
+    Genera (o reutiliza) las bases sintéticas de un caso.
+    
+    Returns:
+        Diccionario con rutas 'android_db', 'ios_db' y 'output_db'
+    """
+    layout = ENGINES[engine]['layout']
+    os.makedirs(workdir, exist_ok=True)
+    
+    tag = f"{layout}_{messages}_{chats}_{media_ratio}_{text_size}"
+    android_db = os.path.join(workdir, f"android_{tag}.db")
+    ios_db = os.path.join(workdir, f"ios_{ios_messages}_{chats}.db")
+    
+    if not os.path.exists(android_db):
+        print(f"[INFO] Generating Android DB ({layout}, {messages:,} messages)...")
+        generate_android_db(android_db, messages, chats, media_ratio, text_size, layout)
+    
+    if not os.path.exists(ios_db):
+        print(f"[INFO] Generating iOS DB ({ios_messages:,} messages)...")
+        generate_ios_db(ios_db, ios_messages, chats, media_ratio, text_size)
+    
+    return {
+        'android_db': android_db,
+        'ios_db': ios_db,
+        'output_db': os.path.join(workdir, f"out_{engine}_{messages}.db"),
+    }
+
+
+def run_case(engine: str, android_db: str, ios_db: str, output_db: str) -> Dict[str, Any]:
+    """
+    Ejecuta un motor de migración en el proceso actual.
+    
+    Returns:
+        Resultado con métricas del caso
+    """
+    from src.migrate import WhatsAppMigrator
+    
+    migrator = WhatsAppMigrator(android_db, ios_db, '573000000000', **ENGINES[engine]['options'])
+    
+    try:
+        stats = migrator.run_migration(output_db)
+    except NotImplementedError as e:
+        return {'engine': engine, 'status': 'unsupported', 'reason': str(e)}
+    
+    migrate_phase = stats['phases']['migrate']
+    peak_rss = max((p['peak_rss'] or 0) for p in stats['phases'].values()) or None
+    
+    return {
+        'engine': engine,
+        'status': 'ok',
+        'messages': stats['migrated'],
+        'migrate_seconds': migrate_phase['wall_time'],
+        'messages_per_sec': migrate_phase['rows_per_sec'],
+        'peak_rss': peak_rss,
+        'output_size': stats['size_after'],
+    }
+
+
+def run_case_isolated(engine: str, paths: Dict[str, str]) -> Dict[str, Any]:
+    """Ejecuta run_case en un subproceso y devuelve su resultado JSON."""
+    command = [
+        sys.executable, os.path.abspath(__file__), '--worker', engine,
+        paths['android_db'], paths['ios_db'], paths['output_db'],
+    ]
+    result = subprocess.run(command, capture_output=True, text=True)
+    
+    if result.returncode != 0:
+        return {'engine': engine, 'status': 'error', 'reason': result.stderr.strip()[-2000:]}
+    
+    # La última línea de stdout contiene el resultado JSON
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def compare_to_baseline(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+                        threshold: float) -> List[str]:
+    """
+    Compara resultados contra el baseline.
+    
+    Args:
+        results: Resultados actuales por caso
+        baseline: Resultados de referencia por caso
+        threshold: Empeoramiento relativo tolerado (0.20 = 20%)
+    
+    Returns:
+        Lista de regresiones detectadas (vacía si no hay)
+    """
+    regressions = []
+    
+    for key, current in results.items():
+        reference = baseline.get(key)
+        if not reference or current.get('status') != 'ok' or reference.get('status') != 'ok':
+            continue
+        
+        for metric, higher_is_better in METRICS.items():
+            new_value = current.get(metric)
+            old_value = reference.get(metric)
+            if not new_value or not old_value:
+                continue
+            
+            if higher_is_better:
+                change = (old_value - new_value) / old_value
+            else:
+                change = (new_value - old_value) / old_value
+            
+            if change > threshold:
+                regressions.append(
+                    f"{key}: {metric} regressed {change * 100:.1f}% "
+                    f"(baseline {old_value:,.0f}, now {new_value:,.0f})"
+                )
+    
+    return regressions
+
+
+def load_baseline(path: str) -> Dict[str, Dict[str, Any]]:
+    """Carga el baseline JSON (vacío si no existe)."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, baseline: Dict[str, Dict[str, Any]]) -> None:
+    """Guarda el baseline JSON."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Función principal para ejecución desde CLI."""
+    parser = argparse.ArgumentParser(description='Run WhatsApp migration benchmarks')
+    parser.add_argument('--scale', action='append',
+                        help="Scale: 10k, 1m, 10m or a message count (repeatable, default: 10k)")
+    parser.add_argument('--engine', action='append', choices=sorted(ENGINES),
+                        help='Engine to benchmark (repeatable, default: all)')
+    parser.add_argument('--chats', type=int, default=50, help='Number of chats (default: 50)')
+    parser.add_argument('--media-ratio', type=float, default=0.1,
+                        help='Fraction of media messages (default: 0.1)')
+    parser.add_argument('--text-size', type=int, default=80,
+                        help='Mean text length in characters (default: 80)')
+    parser.add_argument('--ios-messages', type=int, default=0,
+                        help='Pre-existing messages in the iOS DB (default: 0)')
+    parser.add_argument('--workdir', default=DEFAULT_WORKDIR,
+                        help=f'Directory for generated databases (default: {DEFAULT_WORKDIR})')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help='Baseline JSON path (default: benchmarks/baseline.json)')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Tolerated relative regression (default: 0.20)')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Store current results as the new baseline')
+    parser.add_argument('--worker', nargs=4, metavar=('ENGINE', 'ANDROID_DB', 'IOS_DB', 'OUTPUT_DB'),
+                        help=argparse.SUPPRESS)
+    
+    args = parser.parse_args(argv)
+    
+    if args.worker:
+        engine, android_db, ios_db, output_db = args.worker
+        import io
+        from contextlib import redirect_stdout
+        with redirect_stdout(io.StringIO()):
+            result = run_case(engine, android_db, ios_db, output_db)
+        print(json.dumps(result))
+        return 0
+    
+    scales = args.scale or ['10k']
+    engines = args.engine or sorted(ENGINES)
+    
+    results: Dict[str, Dict[str, Any]] = {}
+    for scale in scales:
+        messages = parse_scale(scale)
+        for engine in engines:
+            paths = prepare_inputs(args.workdir, engine, messages, args.chats,
+                                   args.media_ratio, args.text_size, args.ios_messages)
+            print(f"[INFO] Running {engine} @ {scale}...")
+            started = time.perf_counter()
+            result = run_case_isolated(engine, paths)
+            result['scale'] = scale
+            result['total_seconds'] = round(time.perf_counter() - started, 3)
+            results[case_key(engine, scale)] = result
+            
+            if result['status'] == 'ok':
+                peak_mb = (result['peak_rss'] or 0) / (1024 * 1024)
+                print(f"  {result['messages_per_sec'] or 0:>12,.0f} msg/s  "
+                      f"peak {peak_mb:8.1f} MB  "
+                      f"output {result['output_size'] / (1024 * 1024):8.1f} MB")
+            else:
+                print(f"  {result['status']}: {result.get('reason', '')[:200]}")
+    
+    baseline = load_baseline(args.baseline)
+    
+    if args.update_baseline:
+        baseline.update(results)
+        save_baseline(args.baseline, baseline)
+        print(f"\n[OK] Baseline updated: {args.baseline}")
+        return 0
+    
+    if not baseline:
+        print(f"\n[INFO] No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+    
+    regressions = compare_to_baseline(results, baseline, args.threshold)
+    if regressions:
+        print("\n[ERROR] Performance regressions detected:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    
+    print(f"\n[OK] No regressions beyond {args.threshold * 100:.0f}%")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""
+WhatsApp Android to iOS Migration Tool
+
+Generadores de bases de datos sintéticas para benchmarks:
+msgstore.db de Android (esquemas legacy y moderno) y ChatStorage.sqlite de iOS.
+"""
+
+import os
+import random
+import sqlite3
+from typing import Iterator, Tuple
+
+# Escalas predefinidas (número de mensajes)
+SCALES = {
+    '10k': 10_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000,
+}
+
+# Filas por lote de inserción
+BATCH_SIZE = 10_000
+
+# Timestamp base (2020-01-01 UTC en ms) y separación media entre mensajes
+BASE_TIMESTAMP_MS = 1577836800000
+MEAN_GAP_MS = 45_000
+
+# Tipos de media Android usados al generar mensajes multimedia
+ANDROID_MEDIA_TYPES = (1, 2, 3, 9)
+
+ANDROID_MODERN_EXTRA_TABLES = (
+    "CREATE TABLE message_quoted (message_row_id INTEGER PRIMARY KEY, key_id TEXT, from_me INTEGER, key_remote_jid TEXT)",
+    "CREATE TABLE message_ephemeral (message_row_id INTEGER PRIMARY KEY, duration INTEGER, expire_timestamp INTEGER)",
+    "CREATE TABLE message_poll (message_row_id INTEGER PRIMARY KEY, selectable_options_count INTEGER)",
+    "CREATE TABLE message_view_once (message_row_id INTEGER PRIMARY KEY, state INTEGER)",
+)
+
+
+def parse_scale(scale: str) -> int:
+    """
+    Convierte un nombre de escala ('10k', '1m', '10m') o un entero en mensajes.
+    
+    Args:
+        scale: Nombre de escala o número de mensajes
+    
+    Returns:
+        Número de mensajes
+    
+    Raises:
+        ValueError: Si la escala no es reconocida
+    """
+    key = str(scale).lower()
+    if key in SCALES:
+        return SCALES[key]
+    try:
+        return int(key)
+    except ValueError:
+        raise ValueError(f"Unknown scale: {scale} (expected one of {', '.join(SCALES)} or an integer)")
+
+
+def chat_jid(index: int) -> str:
+    """Genera el JID del chat sintético número `index` (cada 10 chats, un grupo)."""
+    if index % 10 == 9:
+        return f"120363{index:012d}@g.us"
+    return f"57300{index:07d}@s.whatsapp.net"
+
+
+def _random_text(rng: random.Random, text_size: int) -> str:
+    """Genera texto pseudoaleatorio de longitud cercana a text_size."""
+    length = max(1, int(rng.gauss(text_size, text_size / 4)))
+    words = []
+    total = 0
+    while total < length:
+        word = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 9)))
+        words.append(word)
+        total += len(word) + 1
+    return ' '.join(words)[:length]
+
+
+def iter_synthetic_messages(messages: int, chats: int, media_ratio: float,
+                            text_size: int, seed: int = 0) -> Iterator[Tuple]:
+    """
+    Genera mensajes sintéticos en orden cronológico.
+    
+    Args:
+        messages: Número de mensajes
+        chats: Número de chats distintos
+        media_ratio: Fracción de mensajes multimedia (0.0-1.0)
+        text_size: Longitud media del texto
+        seed: Semilla del generador
+    
+    Yields:
+        Tuplas (key_remote_jid, key_from_me, key_id, status, data, timestamp,
+                media_wa_type, starred)
+    """
+    rng = random.Random(seed)
+    timestamp = BASE_TIMESTAMP_MS
+    
+    for i in range(messages):
+        timestamp += rng.randint(1, 2 * MEAN_GAP_MS)
+        jid = chat_jid(rng.randrange(chats))
+        from_me = 1 if rng.random() < 0.5 else 0
+        key_id = f"{i:08X}{rng.getrandbits(48):012X}"
+        
+        if rng.random() < media_ratio:
+            media_type = rng.choice(ANDROID_MEDIA_TYPES)
+            data = _random_text(rng, text_size // 4) if rng.random() < 0.3 else None
+        else:
+            media_type = 0
+            data = _random_text(rng, text_size)
+        
+        status = 13 if from_me else 0
+        starred = 1 if rng.random() < 0.01 else 0
+        
+        yield (jid, from_me, key_id, status, data, timestamp, media_type, starred)
+
+
+def _insert_batches(conn: sqlite3.Connection, sql: str, rows: Iterator[Tuple]) -> None:
+    """Inserta filas en lotes para no materializar el conjunto completo."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            conn.executemany(sql, batch)
+            batch = []
+    if batch:
+        conn.executemany(sql, batch)
+
+
+def generate_android_db(path: str, messages: int, chats: int = 50,
+                        media_ratio: float = 0.1, text_size: int = 80,
+                        layout: str = 'modern', seed: int = 0) -> str:
+    """
+    Genera un msgstore.db sintético.
+    
+    Args:
+        path: Ruta del archivo a crear (se sobrescribe)
+        messages: Número de mensajes
+        chats: Número de chats distintos
+        media_ratio: Fracción de mensajes multimedia
+        text_size: Longitud media del texto
+        layout: 'modern' (WhatsApp 2.20.x+) o 'legacy' (2.11.x)
+        seed: Semilla del generador
+    
+    Returns:
+        Ruta del archivo generado
+    
+    Raises:
+        ValueError: Si el layout no es reconocido
+    """
+    if layout not in ('modern', 'legacy'):
+        raise ValueError(f"Unknown Android layout: {layout}")
+    
+    if os.path.exists(path):
+        os.remove(path)
+    
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("""
+            CREATE TABLE messages (
+                _id INTEGER PRIMARY KEY AUTOINCREMENT,
+                key_remote_jid TEXT NOT NULL,
+                key_from_me INTEGER,
+                key_id TEXT NOT NULL,
+                status INTEGER,
+                needs_push INTEGER,
+                data TEXT,
+                timestamp INTEGER,
+                media_url TEXT,
+                media_mime_type TEXT,
+                media_wa_type TEXT,
+                media_size INTEGER,
+                media_name TEXT,
+                latitude REAL,
+                longitude REAL,
+                received_timestamp INTEGER,
+                send_timestamp INTEGER,
+                receipt_server_timestamp INTEGER,
+                starred INTEGER
+            )
+        """)
+        
+        if layout == 'modern':
+            conn.execute("CREATE TABLE chat (_id INTEGER PRIMARY KEY AUTOINCREMENT, jid TEXT UNIQUE, subject TEXT)")
+            for statement in ANDROID_MODERN_EXTRA_TABLES:
+                conn.execute(statement)
+        else:
+            conn.execute("CREATE TABLE chat_list (_id INTEGER PRIMARY KEY AUTOINCREMENT, key_remote_jid TEXT UNIQUE, subject TEXT)")
+            # validate_database() exige la tabla 'chat'
+            conn.execute("CREATE TABLE chat (_id INTEGER PRIMARY KEY AUTOINCREMENT, jid TEXT UNIQUE, subject TEXT)")
+        
+        conn.executemany(
+            "INSERT INTO chat (jid) VALUES (?)",
+            [(chat_jid(i),) for i in range(chats)]
+        )
+        
+        _insert_batches(conn, """
+            INSERT INTO messages (
+                key_remote_jid, key_from_me, key_id, status, data, timestamp,
+                media_wa_type, starred, received_timestamp
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            row + (row[5],)
+            for row in iter_synthetic_messages(messages, chats, media_ratio, text_size, seed)
+        ))
+        
+        conn.execute("CREATE INDEX messages_key_index ON messages (key_remote_jid, key_from_me, key_id)")
+        conn.commit()
+    finally:
+        conn.close()
+    
+    return path
+
+
+def generate_ios_db(path: str, messages: int = 0, chats: int = 50,
+                    media_ratio: float = 0.1, text_size: int = 80,
+                    seed: int = 1) -> str:
+    """
+    Genera un ChatStorage.sqlite sintético, opcionalmente con historial previo.
+    
+    Args:
+        path: Ruta del archivo a crear (se sobrescribe)
+        messages: Número de mensajes iOS preexistentes
+        chats: Número de chats (ZWACHATSESSION)
+        media_ratio: Fracción de mensajes multimedia
+        text_size: Longitud media del texto
+        seed: Semilla del generador
+    
+    Returns:
+        Ruta del archivo generado
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("""
+            CREATE TABLE ZWACHATSESSION (
+                Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER,
+                ZMESSAGECOUNTER INTEGER, ZSESSIONTYPE INTEGER,
+                ZLASTMESSAGEDATE TIMESTAMP, ZCONTACTJID VARCHAR, ZPARTNERNAME VARCHAR
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE ZWAMESSAGE (
+                Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER,
+                ZFLAGS INTEGER, ZGROUPEVENTTYPE INTEGER, ZISFROMME INTEGER,
+                ZMESSAGEERRORSTATUS INTEGER, ZMESSAGESTATUS INTEGER,
+                ZMESSAGETYPE INTEGER, ZSORT INTEGER, ZISSTARRED INTEGER,
+                ZCHATSESSION INTEGER, ZGROUPMEMBER INTEGER, ZMEDIAITEM INTEGER,
+                ZMESSAGEINFO INTEGER, ZPARENTMESSAGE INTEGER,
+                ZMESSAGEDATE TIMESTAMP, ZSENTDATE TIMESTAMP, ZRECEIVEDDATE TIMESTAMP,
+                ZFROMJID VARCHAR, ZPUSHNAME VARCHAR, ZSTANZAID VARCHAR,
+                ZTEXT VARCHAR, ZTOJID VARCHAR
+            )
+        """)
+        conn.execute("CREATE INDEX Z_WAMESSAGE_ZCHATSESSION ON ZWAMESSAGE (ZCHATSESSION)")
+        conn.execute("CREATE INDEX Z_WAMESSAGE_ZSTANZAID ON ZWAMESSAGE (ZSTANZAID)")
+        conn.execute("CREATE TABLE Z_PRIMARYKEY (Z_ENT INTEGER PRIMARY KEY, Z_NAME VARCHAR, Z_SUPER INTEGER, Z_MAX INTEGER)")
+        
+        conn.executemany(
+            "INSERT INTO ZWACHATSESSION (Z_PK, Z_ENT, Z_OPT, ZSESSIONTYPE, ZCONTACTJID) VALUES (?, 4, 1, ?, ?)",
+            [(i + 1, 1 if chat_jid(i).endswith('@g.us') else 0, chat_jid(i)) for i in range(chats)]
+        )
+        
+        session_by_jid = {chat_jid(i): i + 1 for i in range(chats)}
+        apple_offset_ms = 978307200000
+        
+        def ios_rows():
+            for pk, row in enumerate(
+                iter_synthetic_messages(messages, chats, media_ratio, text_size, seed), 1
+            ):
+                jid, from_me, key_id, _, data, timestamp, media_type, starred = row
+                date = (timestamp - apple_offset_ms) / 1000.0
+                yield (
+                    pk, from_me, 1 if from_me else 0, 1 if media_type else 0,
+                    pk, starred, session_by_jid[jid], date, date, date,
+                    None if from_me else jid, key_id, data,
+                    jid if from_me else None
+                )
+        
+        _insert_batches(conn, """
+            INSERT INTO ZWAMESSAGE (
+                Z_PK, Z_ENT, Z_OPT, ZISFROMME, ZMESSAGESTATUS, ZMESSAGETYPE,
+                ZSORT, ZISSTARRED, ZCHATSESSION, ZMESSAGEDATE, ZSENTDATE,
+                ZRECEIVEDDATE, ZFROMJID, ZSTANZAID, ZTEXT, ZTOJID
+            ) VALUES (?, 9, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, ios_rows())
+        
+        conn.execute("INSERT INTO Z_PRIMARYKEY VALUES (9, 'WAMessage', 0, ?)", (messages,))
+        conn.commit()
+    finally:
+        conn.close()
+    
+    return path
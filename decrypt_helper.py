@@ -11,6 +11,9 @@ import sys
 import subprocess
 from pathlib import Path
 
+from src.progress import console_progress_bar
+from src.whatsapp_crypt import decrypt_database
+
 def print_header(text):
     """Imprime encabezado formateado."""
     print("\n" + "=" * 80)
@@ -55,7 +58,7 @@ def main():
     print_header("WhatsApp Database Decryption Helper")
     
     print("This script will guide you through decrypting your WhatsApp database.")
-    print("Prerequisites: Python 3.8+, git, pip")
+    print("Prerequisites: Python 3.8+ (git only if the key must be extracted)")
     
     # Verificar archivos necesarios
     print_step(1, "Verify Files")
@@ -117,62 +120,29 @@ def main():
             print(f"Destination: {key_file.absolute()}")
             sys.exit(1)
     
-    # Verificar e instalar dependencias de desencriptación
-    print_step(3, "Install Decryption Tool")
-    
-    print("[INFO] Installing pycryptodome...")
-    if not run_command([
-        sys.executable, '-m', 'pip', 'install', 'pycryptodome'
-    ], "Installing cryptography library"):
-        print("⚠️  Warning: pycryptodome installation failed")
-        print("You may need to install it manually: pip install pycryptodome")
-    
-    decrypter_dir = Path('WhatsApp-Crypt14-Decrypter')
-    
-    if not decrypter_dir.exists():
-        print("\n[INFO] Cloning WhatsApp Crypt14 Decrypter from GitHub...")
-        if not run_command([
-            'git', 'clone',
-            'https://github.com/EliteAndroidApps/WhatsApp-Crypt14-Decrypter.git'
-        ], "Downloading decryption tool"):
-            print("\n❌ Failed to download decryption tool.")
-            print("Please download manually from:")
-            print("https://github.com/EliteAndroidApps/WhatsApp-Crypt14-Decrypter")
-            sys.exit(1)
-    else:
-        print("✅ Decryption tool already downloaded")
-    
-    # Desencriptar base de datos
-    print_step(4, "Decrypt Database")
+    # Desencriptar base de datos (desencriptador nativo, sin herramientas externas)
+    print_step(3, "Decrypt Database")
     
     output_file = Path('out/android.db')
     output_file.parent.mkdir(exist_ok=True)
     
-    # Determinar script de desencriptación según versión
-    if '.crypt15' in encrypted_file.name:
-        decrypt_script = decrypter_dir / 'decrypt15.py'
-    elif '.crypt14' in encrypted_file.name:
-        decrypt_script = decrypter_dir / 'decrypt14.py'
-    else:
-        decrypt_script = decrypter_dir / 'decrypt14.py'  # Default
-    
-    print(f"[INFO] Using decryption script: {decrypt_script}")
     print(f"[INFO] Input:  {encrypted_file}")
     print(f"[INFO] Key:    {key_file}")
     print(f"[INFO] Output: {output_file}")
     
-    if run_command([
-        sys.executable,
-        str(decrypt_script),
-        str(key_file),
-        str(encrypted_file),
-        str(output_file)
-    ], "Decrypting database"):
-        print("\n✅ DATABASE DECRYPTED SUCCESSFULLY!")
+    try:
+        result = decrypt_database(str(encrypted_file), str(key_file), str(output_file),
+                                  progress=console_progress_bar(unit='bytes'))
+    except (OSError, ValueError) as e:
+        print(f"\n[ERROR] {e}")
+        result = None
+    
+    if result:
+        print(f"\n✅ DATABASE DECRYPTED SUCCESSFULLY! (crypt{result.version}, {result.backend} backend)")
         
         # Verificar archivo de salida
         if check_file_exists(output_file, "Decrypted database"):
-            print_step(5, "Continue Migration")
+            print_step(4, "Continue Migration")
             print("✅ Decrypted database is ready!")
             print(f"   Location: {output_file.absolute()}")
             print("\n📍 Next steps:")
@@ -187,7 +157,7 @@ def main():
         print("\nPossible causes:")
         print("  - Key doesn't match this database")
         print("  - Corrupted encrypted file")
-        print("  - Wrong decryption script version")
+        print("  - Unsupported backup format (only crypt12/crypt14/crypt15)")
         print("\nTry:")
         print("  - Re-extract key from device")
         print("  - Use different backup file")
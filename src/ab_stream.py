@@ -0,0 +1,213 @@
+"""
+WhatsApp Android to iOS Migration Tool
+
+Módulo de lectura en streaming de backups de Android (.ab).
+
+Un .ab es un encabezado de texto (magic, versión, compresión, cifrado)
+seguido de un tar, normalmente comprimido con zlib. Aquí el cuerpo se
+infla con zlib.decompressobj y se recorre con tarfile en modo 'r|', de
+modo que solo los miembros pedidos se escriben en disco y la lectura se
+detiene en cuanto se encontraron todos.
+"""
+
+import io
+import logging
+import os
+import tarfile
+import zlib
+from typing import BinaryIO, Dict, NamedTuple
+
+AB_MAGIC = b'ANDROID BACKUP'
+AB_CHUNK_SIZE = 256 * 1024
+
+# Límite de una línea del encabezado (evita leer un archivo que no es .ab)
+_MAX_HEADER_LINE = 128
+
+
+class AbHeader(NamedTuple):
+    """Encabezado de un backup .ab."""
+    
+    version: int
+    compressed: bool
+    encryption: str
+
+
+def _read_header_line(stream: BinaryIO) -> bytes:
+    """Lee una línea del encabezado sin consumir bytes del cuerpo."""
+    line = bytearray()
+    while len(line) < _MAX_HEADER_LINE:
+        byte = stream.read(1)
+        if not byte:
+            raise ValueError("Truncated Android backup header")
+        if byte == b'\n':
+            return bytes(line)
+        line += byte
+    raise ValueError("Invalid Android backup header")
+
+
+def read_ab_header(stream: BinaryIO) -> AbHeader:
+    """
+    Lee y valida el encabezado de un .ab.
+    
+    Args:
+        stream: Flujo posicionado al inicio del backup
+    
+    Returns:
+        AbHeader con versión, compresión y cifrado
+    
+    Raises:
+        ValueError: Si no es un backup válido o está cifrado
+    """
+    if _read_header_line(stream) != AB_MAGIC:
+        raise ValueError("Not an Android backup file (bad magic)")
+    try:
+        version = int(_read_header_line(stream))
+        compressed = int(_read_header_line(stream)) == 1
+    except ValueError:
+        raise ValueError("Invalid Android backup header")
+    encryption = _read_header_line(stream).decode('ascii', errors='replace')
+    
+    if encryption != 'none':
+        raise ValueError(f"Encrypted Android backups are not supported ({encryption}); "
+                         "create the backup without a password")
+    return AbHeader(version, compressed, encryption)
+
+
+class AbPayloadReader(io.RawIOBase):
+    """
+    Flujo de solo lectura con el tar contenido en un .ab.
+    
+    Infla el cuerpo zlib bajo demanda en bloques acotados; si el backup
+    no está comprimido, entrega los bytes tal cual.
+    """
+    
+    def __init__(self, source: BinaryIO, compressed: bool = True,
+                 chunk_size: int = AB_CHUNK_SIZE):
+        """
+        Inicializa el lector.
+        
+        Args:
+            source: Flujo posicionado tras el encabezado
+            compressed: Si el cuerpo está comprimido con zlib
+            chunk_size: Bytes leídos de source por iteración
+        """
+        super().__init__()
+        self.source = source
+        self.chunk_size = chunk_size
+        self.compressed_bytes = 0
+        self._inflater = zlib.decompressobj() if compressed else None
+        self._pending = b''
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        """Llena buffer con bytes del tar; 0 indica fin del flujo."""
+        size = len(buffer)
+        if self._inflater is None:
+            data = self.source.read(size)
+            self.compressed_bytes += len(data)
+        else:
+            data = b''
+            while size and not data and not self._inflater.eof:
+                if not self._pending:
+                    self._pending = self.source.read(self.chunk_size)
+                    self.compressed_bytes += len(self._pending)
+                    if not self._pending:
+                        # Fin de la entrada: vaciar la salida retenida por zlib
+                        data = self._inflater.decompress(b'', size)
+                        if not data and not self._inflater.eof:
+                            raise ValueError("Truncated Android backup data")
+                        break
+                data = self._inflater.decompress(self._pending, size)
+                self._pending = self._inflater.unconsumed_tail
+        
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def open_ab_payload(source: BinaryIO, chunk_size: int = AB_CHUNK_SIZE) -> io.BufferedReader:
+    """
+    Lee el encabezado de un .ab y retorna el flujo del tar interno.
+    
+    Args:
+        source: Flujo binario del backup (archivo o stdout de adb)
+        chunk_size: Bytes leídos de source por iteración
+    
+    Returns:
+        Flujo binario del tar
+    
+    Raises:
+        ValueError: Si el encabezado no es válido o el backup está cifrado
+    """
+    header = read_ab_header(source)
+    return io.BufferedReader(AbPayloadReader(source, header.compressed, chunk_size), chunk_size)
+
+
+def tar_member_name(name: str) -> str:
+    """
+    Normaliza un nombre de miembro tar quitando los prefijos './' literales.
+    
+    A diferencia de lstrip('./'), conserva los nombres que empiezan por
+    punto ('.nomedia', '.Statuses/...').
+    
+    Args:
+        name: Nombre tal como aparece en el tar o en la petición
+    
+    Returns:
+        Nombre sin './' inicial
+    """
+    while name.startswith('./'):
+        name = name[2:]
+    return name
+
+
+def extract_tar_members(fileobj: BinaryIO, targets: Dict[str, str],
+                        chunk_size: int = AB_CHUNK_SIZE) -> Dict[str, int]:
+    """
+    Extrae solo los miembros indicados de un tar leído en streaming.
+    
+    El tar se recorre en modo 'r|' (sin seek); cada miembro pedido se
+    escribe en `<destino>.part` y se renombra al completarse. La lectura se
+    detiene en cuanto se extrajeron todos los miembros.
+    
+    Args:
+        fileobj: Flujo del tar
+        targets: Nombre del miembro en el tar → ruta de destino
+        chunk_size: Bytes copiados por iteración
+    
+    Returns:
+        Nombre del miembro → bytes escritos, solo para los encontrados
+    """
+    logger = logging.getLogger('whatsapp_migration.ab_stream')
+    wanted = {tar_member_name(name): path for name, path in targets.items()}
+    extracted: Dict[str, int] = {}
+    
+    with tarfile.open(fileobj=fileobj, mode='r|') as tar:
+        for member in tar:
+            name = tar_member_name(member.name)
+            if name not in wanted or not member.isfile():
+                continue
+            
+            output_path = wanted.pop(name)
+            partial_path = output_path + '.part'
+            source = tar.extractfile(member)
+            try:
+                with open(partial_path, 'wb') as out:
+                    while True:
+                        chunk = source.read(chunk_size)
+                        if not chunk:
+                            break
+                        out.write(chunk)
+            except BaseException:
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+                raise
+            os.replace(partial_path, output_path)
+            
+            extracted[name] = member.size
+            logger.info(f"Extracted {name} ({member.size:,} bytes) -> {output_path}")
+            if not wanted:
+                break
+    
+    return extracted
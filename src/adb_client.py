@@ -0,0 +1,446 @@
+"""
+WhatsApp Android to iOS Migration Tool
+
+Cliente del servidor ADB local (tcp:5037) mediante el protocolo host.
+
+En lugar de lanzar un proceso `adb` por operación, se habla directamente
+con el servidor que ya corre en la máquina:
+
+- Peticiones: longitud en 4 dígitos hex + servicio ('host:devices', ...).
+- Respuestas: 'OKAY' o 'FAIL' + longitud hex + mensaje.
+- 'host:transport:<serial>' vincula la conexión a un dispositivo; luego
+  'shell:'/'exec:' devuelven un flujo crudo y 'sync:' abre el protocolo
+  de archivos (STAT/RECV/QUIT con enteros little-endian de 32 bits).
+
+Las conexiones sync se reutilizan por dispositivo entre transferencias.
+"""
+
+import logging
+import socket
+import struct
+import subprocess
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from .adb_transfer import TransferResult, chunks_to_file
+from .progress import ProgressCallback
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 5037
+DEFAULT_TIMEOUT = 30.0
+
+# Tamaño máximo de un bloque DATA del protocolo sync
+SYNC_DATA_MAX = 64 * 1024
+SYNC_PATH_MAX = 1024
+
+_SYNC_HEADER = struct.Struct('<4sI')
+_SYNC_STAT = struct.Struct('<III')
+_READ_SIZE = 64 * 1024
+
+
+class AdbError(RuntimeError):
+    """Error reportado por el servidor ADB o por el protocolo."""
+
+
+class RemoteFileError(AdbError):
+    """El dispositivo rechazó una operación sync (la sesión sigue utilizable)."""
+
+
+class AdbDevice(NamedTuple):
+    """Dispositivo listado por host:devices."""
+    
+    serial: str
+    state: str
+
+
+class SyncStat(NamedTuple):
+    """Resultado de STAT en el protocolo sync."""
+    
+    mode: int
+    size: int
+    mtime: int
+    
+    @property
+    def exists(self) -> bool:
+        """True si el archivo remoto existe."""
+        return self.mode != 0
+
+
+def parse_device_list(listing: str) -> List[AdbDevice]:
+    """
+    Interpreta un listado de dispositivos 'serial<TAB>estado'.
+    
+    Sirve tanto para la respuesta de host:devices como para la salida de
+    `adb devices` (la cabecera "List of devices attached" se ignora).
+    
+    Args:
+        listing: Texto del listado
+    
+    Returns:
+        Lista de AdbDevice en el orden del listado
+    """
+    devices = []
+    for line in listing.splitlines():
+        parts = line.strip().split('\t')
+        if len(parts) >= 2:
+            devices.append(AdbDevice(parts[0], parts[1]))
+    return devices
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    """Lee exactamente size bytes o lanza AdbError si se cierra la conexión."""
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise AdbError("Connection closed by adb server")
+        data += chunk
+    return bytes(data)
+
+
+def _send_request(sock: socket.socket, service: str) -> None:
+    """Envía una petición host (longitud hex + servicio)."""
+    payload = service.encode('utf-8')
+    sock.sendall(b'%04x' % len(payload) + payload)
+
+
+def _read_hex_payload(sock: socket.socket) -> bytes:
+    """Lee una respuesta con longitud en 4 dígitos hex."""
+    length = int(_recv_exact(sock, 4), 16)
+    return _recv_exact(sock, length)
+
+
+def _read_status(sock: socket.socket) -> None:
+    """
+    Lee OKAY/FAIL.
+    
+    Raises:
+        AdbError: Si el servidor respondió FAIL o algo inesperado
+    """
+    status = _recv_exact(sock, 4)
+    if status == b'OKAY':
+        return
+    if status == b'FAIL':
+        raise AdbError(_read_hex_payload(sock).decode('utf-8', errors='replace'))
+    raise AdbError(f"Unexpected adb response: {status!r}")
+
+
+def _read_until_close(sock: socket.socket) -> Iterator[bytes]:
+    """Itera un flujo crudo hasta que el servidor cierra la conexión."""
+    while True:
+        chunk = sock.recv(_READ_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+class SyncConnection:
+    """Sesión del protocolo sync: varias operaciones sobre una conexión."""
+    
+    def __init__(self, sock: socket.socket):
+        """
+        Inicializa la sesión sobre un socket ya en modo sync.
+        
+        Args:
+            sock: Conexión tras 'host:transport' + 'sync:'
+        """
+        self.sock = sock
+        self.lock = threading.Lock()
+    
+    def _request(self, command: bytes, path: str) -> None:
+        encoded = path.encode('utf-8')
+        if len(encoded) > SYNC_PATH_MAX:
+            raise AdbError(f"Remote path too long: {path}")
+        self.sock.sendall(_SYNC_HEADER.pack(command, len(encoded)) + encoded)
+    
+    def stat(self, path: str) -> SyncStat:
+        """
+        Consulta modo, tamaño y mtime de un archivo remoto.
+        
+        Args:
+            path: Ruta remota
+        
+        Returns:
+            SyncStat (mode 0 si no existe)
+        """
+        with self.lock:
+            self._request(b'STAT', path)
+            reply = _recv_exact(self.sock, 4 + _SYNC_STAT.size)
+        if reply[:4] != b'STAT':
+            raise AdbError(f"Unexpected sync response: {reply[:4]!r}")
+        return SyncStat(*_SYNC_STAT.unpack(reply[4:]))
+    
+    def iter_recv(self, path: str) -> Iterator[bytes]:
+        """
+        Descarga un archivo remoto como fragmentos DATA.
+        
+        La sesión queda bloqueada hasta consumir el iterador completo.
+        
+        Args:
+            path: Ruta remota
+        
+        Yields:
+            Fragmentos de hasta 64 KB
+        
+        Raises:
+            AdbError: Si el dispositivo responde FAIL
+        """
+        with self.lock:
+            self._request(b'RECV', path)
+            while True:
+                command, length = _SYNC_HEADER.unpack(_recv_exact(self.sock, _SYNC_HEADER.size))
+                if command == b'DATA':
+                    if length > SYNC_DATA_MAX:
+                        raise AdbError(f"Sync DATA block too large: {length}")
+                    yield _recv_exact(self.sock, length)
+                elif command == b'DONE':
+                    return
+                elif command == b'FAIL':
+                    message = _recv_exact(self.sock, length).decode('utf-8', errors='replace')
+                    raise RemoteFileError(f"Pull failed for {path}: {message}")
+                else:
+                    raise AdbError(f"Unexpected sync response: {command!r}")
+    
+    def close(self) -> None:
+        """Cierra la sesión enviando QUIT."""
+        try:
+            self.sock.sendall(_SYNC_HEADER.pack(b'QUIT', 0))
+        except OSError:
+            pass
+        finally:
+            self.sock.close()
+
+
+class AdbClient:
+    """
+    Cliente del servidor ADB que reutiliza conexiones.
+    
+    Cada servicio de shell abre un socket (barato frente a un proceso);
+    las sesiones sync se mantienen abiertas por dispositivo y se reutilizan
+    para todas las transferencias.
+    """
+    
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 timeout: float = DEFAULT_TIMEOUT):
+        """
+        Inicializa el cliente (no abre conexiones todavía).
+        
+        Args:
+            host: Host del servidor ADB
+            port: Puerto del servidor ADB
+            timeout: Timeout de socket en segundos
+        """
+        self.logger = logging.getLogger('whatsapp_migration.adb_client')
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._sync: Dict[str, SyncConnection] = {}
+        self._lock = threading.Lock()
+    
+    def __enter__(self) -> 'AdbClient':
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
+    
+    def _connect(self) -> socket.socket:
+        """Abre un socket nuevo al servidor."""
+        return socket.create_connection((self.host, self.port), timeout=self.timeout)
+    
+    def _host_query(self, service: str) -> bytes:
+        """Ejecuta un servicio host: con respuesta de longitud hex."""
+        with self._connect() as sock:
+            _send_request(sock, service)
+            _read_status(sock)
+            return _read_hex_payload(sock)
+    
+    def _open_service(self, service: str, serial: Optional[str] = None) -> socket.socket:
+        """Selecciona el dispositivo y abre un servicio sobre la conexión."""
+        sock = self._connect()
+        try:
+            _send_request(sock, f"host:transport:{serial}" if serial else 'host:transport-any')
+            _read_status(sock)
+            _send_request(sock, service)
+            _read_status(sock)
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+    
+    def ensure_server(self, adb_cmd: Optional[str] = None) -> int:
+        """
+        Verifica que el servidor responda; si no, lo inicia una sola vez.
+        
+        Args:
+            adb_cmd: Comando ADB para `start-server` (None = no iniciar)
+        
+        Returns:
+            Versión del protocolo del servidor
+        
+        Raises:
+            OSError: Si el servidor no está disponible
+        """
+        try:
+            return self.version()
+        except ConnectionRefusedError:
+            if not adb_cmd:
+                raise
+            self.logger.info("ADB server not running, starting it...")
+            subprocess.run([adb_cmd, 'start-server'], capture_output=True, timeout=30)
+            return self.version()
+    
+    def version(self) -> int:
+        """Versión del protocolo del servidor (host:version)."""
+        return int(self._host_query('host:version'), 16)
+    
+    def devices(self) -> List[AdbDevice]:
+        """
+        Lista los dispositivos conectados (host:devices).
+        
+        Returns:
+            Lista de AdbDevice con serial y estado ('device', 'unauthorized', ...)
+        """
+        return parse_device_list(self._host_query('host:devices').decode('utf-8', errors='replace'))
+    
+    def open_track_devices(self) -> socket.socket:
+        """
+        Abre host:track-devices.
+        
+        El servidor envía el listado completo (longitud hex + texto) al
+        conectar y de nuevo en cada cambio; la conexión queda sin timeout
+        y se cierra para dejar de recibir.
+        
+        Returns:
+            Socket posicionado tras el OKAY
+        """
+        sock = self._connect()
+        try:
+            _send_request(sock, 'host:track-devices')
+            _read_status(sock)
+        except BaseException:
+            sock.close()
+            raise
+        sock.settimeout(None)
+        return sock
+    
+    def kill_server(self) -> None:
+        """Detiene el servidor ADB (host:kill)."""
+        self.close()
+        with self._connect() as sock:
+            _send_request(sock, 'host:kill')
+            try:
+                _read_status(sock)
+            except AdbError:
+                pass
+    
+    def shell(self, command: str, serial: Optional[str] = None) -> str:
+        """
+        Ejecuta un comando de shell y retorna su salida.
+        
+        Args:
+            command: Comando de shell
+            serial: Dispositivo (None = único conectado)
+        
+        Returns:
+            stdout del comando (texto)
+        """
+        with self._open_service(f"shell:{command}", serial) as sock:
+            output = b''.join(_read_until_close(sock))
+        return output.decode('utf-8', errors='replace')
+    
+    def iter_exec(self, command: str, serial: Optional[str] = None) -> Iterator[bytes]:
+        """
+        Ejecuta un comando con salida binaria cruda (servicio exec:).
+        
+        Args:
+            command: Comando a ejecutar en el dispositivo
+            serial: Dispositivo (None = único conectado)
+        
+        Yields:
+            Fragmentos de stdout
+        """
+        with self._open_service(f"exec:{command}", serial) as sock:
+            yield from _read_until_close(sock)
+    
+    def sync(self, serial: Optional[str] = None) -> SyncConnection:
+        """
+        Retorna la sesión sync del dispositivo, abriéndola si no existe.
+        
+        Args:
+            serial: Dispositivo (None = único conectado)
+        
+        Returns:
+            SyncConnection reutilizable
+        """
+        key = serial or ''
+        with self._lock:
+            connection = self._sync.get(key)
+            if connection is None:
+                connection = SyncConnection(self._open_service('sync:', serial))
+                self._sync[key] = connection
+            return connection
+    
+    def _drop_sync(self, serial: Optional[str]) -> None:
+        """Descarta una sesión sync rota."""
+        with self._lock:
+            connection = self._sync.pop(serial or '', None)
+        if connection:
+            connection.sock.close()
+    
+    def stat(self, path: str, serial: Optional[str] = None) -> SyncStat:
+        """STAT de un archivo remoto sobre la sesión sync reutilizada."""
+        try:
+            return self.sync(serial).stat(path)
+        except (OSError, AdbError):
+            self._drop_sync(serial)
+            raise
+    
+    def iter_pull(self, path: str, serial: Optional[str] = None) -> Iterator[bytes]:
+        """
+        Descarga un archivo remoto en fragmentos sobre la sesión sync.
+        
+        Args:
+            path: Ruta remota
+            serial: Dispositivo (None = único conectado)
+        
+        Yields:
+            Fragmentos del archivo
+        
+        Raises:
+            RemoteFileError: Si el archivo no existe o no se puede leer
+        """
+        completed = False
+        try:
+            yield from self.sync(serial).iter_recv(path)
+            completed = True
+        finally:
+            # Un FAIL, un error de red o un RECV abandonado dejan la sesión
+            # inservible: adbd cierra el servicio sync tras responder FAIL
+            if not completed:
+                self._drop_sync(serial)
+    
+    def pull(self, path: str, output_path: str, serial: Optional[str] = None,
+             expected_size: Optional[int] = None,
+             progress: Optional[ProgressCallback] = None) -> TransferResult:
+        """
+        Descarga un archivo remoto a disco con SHA-256 en vuelo.
+        
+        Args:
+            path: Ruta remota
+            output_path: Ruta local
+            serial: Dispositivo (None = único conectado)
+            expected_size: Tamaño esperado (valida la transferencia)
+            progress: Callback de progreso
+        
+        Returns:
+            TransferResult de la transferencia
+        """
+        return chunks_to_file(self.iter_pull(path, serial), output_path, expected_size, progress)
+    
+    def close(self) -> None:
+        """Cierra todas las sesiones sync abiertas."""
+        with self._lock:
+            connections = list(self._sync.values())
+            self._sync.clear()
+        for connection in connections:
+            connection.close()
@@ -0,0 +1,371 @@
+"""
+WhatsApp Android to iOS Migration Tool
+
+Módulo de transferencia de archivos desde el dispositivo vía `adb exec-out`.
+
+El contenido remoto se lee como flujo de bytes y se escribe directamente en
+el destino final, calculando SHA-256 y conteo de bytes en la misma pasada.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import subprocess
+import threading
+import time
+from typing import BinaryIO, Callable, Iterable, Iterator, List, NamedTuple, Optional
+
+from .progress import ProgressCallback, ProgressTracker
+
+# Tamaño de bloque leído del flujo de adb
+TRANSFER_CHUNK_SIZE = 1024 * 1024
+
+
+class TransferResult(NamedTuple):
+    """Resultado de una transferencia."""
+    
+    path: str
+    size: int
+    sha256: str
+    seconds: float
+    
+    @property
+    def bytes_per_sec(self) -> float:
+        """Throughput promedio de la transferencia."""
+        return self.size / self.seconds if self.seconds > 0 else 0.0
+
+
+class ChunkReader(io.RawIOBase):
+    """Adapta un iterador de fragmentos (ej: AdbClient.iter_exec) a un flujo legible."""
+    
+    def __init__(self, chunks: Iterable[bytes]):
+        """
+        Args:
+            chunks: Fragmentos de bytes en orden
+        """
+        self._chunks = iter(chunks)
+        self._buffer = b''
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        while not self._buffer:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._buffer = chunk
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def quote_remote_path(path: str) -> str:
+    """
+    Cita una ruta para el shell del dispositivo.
+    
+    Args:
+        path: Ruta remota (puede contener espacios o comillas)
+    
+    Returns:
+        Ruta entre comillas simples
+    """
+    return "'" + path.replace("'", "'\\''") + "'"
+
+
+def adb_base_command(adb_cmd: str, serial: Optional[str] = None) -> List[str]:
+    """
+    Prefijo de un comando adb, dirigido a un dispositivo si se indica.
+    
+    Args:
+        adb_cmd: Comando ADB
+        serial: Serial del dispositivo (None = único conectado)
+    
+    Returns:
+        [adb_cmd] o [adb_cmd, '-s', serial]
+    """
+    return [adb_cmd, '-s', serial] if serial else [adb_cmd]
+
+
+def open_exec_command(adb_cmd: str, command: str, serial: Optional[str] = None) -> subprocess.Popen:
+    """
+    Lanza `adb exec-out <command>` con stdout binario.
+    
+    stderr debe vaciarse con drain_stderr() mientras se lee stdout.
+    
+    Args:
+        adb_cmd: Comando ADB
+        command: Comando de shell remoto (ya citado)
+        serial: Serial del dispositivo (None = único conectado)
+    
+    Returns:
+        Proceso con stdout/stderr en PIPE
+    """
+    logger = logging.getLogger('whatsapp_migration.adb_transfer')
+    args = adb_base_command(adb_cmd, serial) + ['exec-out', command]
+    logger.debug(f"Streaming: {' '.join(args[:-1])} {command[:200]}")
+    return subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def drain_stderr(process: subprocess.Popen) -> Callable[[], str]:
+    """
+    Lee stderr del proceso en un hilo mientras el llamador consume stdout.
+    
+    Con ambos flujos en PIPE, si adb escribe en stderr más de lo que cabe
+    en el buffer del pipe se bloquea, y el lector de stdout espera para
+    siempre. El hilo vacía stderr en paralelo y lo cierra al llegar a EOF.
+    
+    Args:
+        process: Proceso lanzado con stderr=PIPE
+    
+    Returns:
+        Función que espera al hilo y retorna stderr decodificado
+    """
+    chunks: List[bytes] = []
+    
+    def read() -> None:
+        with process.stderr:
+            for chunk in iter(lambda: process.stderr.read(65536), b''):
+                chunks.append(chunk)
+    
+    thread = threading.Thread(target=read, name='adb-stderr', daemon=True)
+    thread.start()
+    
+    def result() -> str:
+        thread.join()
+        return b''.join(chunks).decode('utf-8', errors='replace').strip()
+    
+    return result
+
+
+def exec_out_failed(returncode: int, size: int, stderr: str) -> bool:
+    """
+    Indica si una lectura vía `adb exec-out cat` falló.
+    
+    exec-out no propaga el código de salida del comando remoto: un `cat`
+    de un archivo inexistente termina con adb en 0, sin datos y con el
+    error en stderr.
+    
+    Args:
+        returncode: Código de salida de adb
+        size: Bytes recibidos por stdout
+        stderr: stderr de adb
+    
+    Returns:
+        True si adb falló o no hubo salida pero sí mensajes de error
+    """
+    return returncode != 0 or (size == 0 and bool(stderr))
+
+
+def open_exec_out(adb_cmd: str, remote_path: str, serial: Optional[str] = None) -> subprocess.Popen:
+    """
+    Lanza `adb exec-out cat <remote_path>` con stdout binario.
+    
+    Args:
+        adb_cmd: Comando ADB
+        remote_path: Ruta del archivo en el dispositivo
+        serial: Serial del dispositivo (None = único conectado)
+    
+    Returns:
+        Proceso con stdout/stderr en PIPE
+    """
+    return open_exec_command(adb_cmd, f"cat {quote_remote_path(remote_path)}", serial)
+
+
+def open_backup_stream(adb_cmd: str, package: str, serial: Optional[str] = None) -> subprocess.Popen:
+    """
+    Lanza `adb exec-out bu backup <package>`: el .ab sale por stdout.
+    
+    Es el mismo servicio que usa `adb backup`, pero sin escribir el
+    archivo en disco. Requiere el servicio exec: (Android 5.0+).
+    
+    Args:
+        adb_cmd: Comando ADB
+        package: Paquete a respaldar
+        serial: Serial del dispositivo (None = único conectado)
+    
+    Returns:
+        Proceso con stdout/stderr en PIPE
+    """
+    return open_exec_command(adb_cmd, f"bu backup {quote_remote_path(package)}", serial)
+
+
+def iter_exec_out(adb_cmd: str, remote_path: str, expected_size: Optional[int] = None,
+                  progress: Optional[ProgressCallback] = None,
+                  chunk_size: int = TRANSFER_CHUNK_SIZE,
+                  serial: Optional[str] = None) -> Iterator[bytes]:
+    """
+    Itera el contenido de un archivo remoto en fragmentos vía `adb exec-out`.
+    
+    Pensado como fuente de un pipeline: no escribe en disco. Al agotarse
+    valida el código de salida de adb y el tamaño recibido; si el
+    consumidor cierra el generador antes, el proceso adb se termina.
+    
+    Args:
+        adb_cmd: Comando ADB
+        remote_path: Ruta del archivo en el dispositivo
+        expected_size: Tamaño remoto conocido (valida la transferencia)
+        progress: Callback de progreso (bytes recibidos)
+        chunk_size: Bytes leídos por iteración
+        serial: Serial del dispositivo (None = único conectado)
+    
+    Yields:
+        Fragmentos de hasta chunk_size bytes
+    
+    Raises:
+        RuntimeError: Si adb falla o la transferencia queda incompleta
+    """
+    tracker = ProgressTracker(progress, expected_size or 0)
+    process = open_exec_out(adb_cmd, remote_path, serial)
+    read_stderr = drain_stderr(process)
+    size = 0
+    completed = False
+    
+    try:
+        while True:
+            chunk = process.stdout.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            tracker.update(size)
+            yield chunk
+        completed = True
+    finally:
+        if not completed:
+            process.kill()
+        process.stdout.close()
+        returncode = process.wait()
+        stderr = read_stderr()
+    
+    if exec_out_failed(returncode, size, stderr):
+        raise RuntimeError(f"adb exec-out failed (exit {returncode}): {stderr}")
+    if expected_size is not None and size != expected_size:
+        raise RuntimeError(f"Transfer size mismatch: expected {expected_size} bytes, got {size}")
+    tracker.finish(size)
+
+
+def chunks_to_file(chunks: Iterable[bytes], output_path: str, expected_size: Optional[int] = None,
+                   progress: Optional[ProgressCallback] = None) -> TransferResult:
+    """
+    Escribe fragmentos a un archivo calculando SHA-256 al vuelo.
+    
+    Si la copia falla, el archivo parcial se elimina.
+    
+    Args:
+        chunks: Fragmentos de entrada (ej: respuestas DATA de sync)
+        output_path: Ruta final del archivo
+        expected_size: Tamaño esperado en bytes (None si se desconoce)
+        progress: Callback de progreso (recibe bytes transferidos)
+    
+    Returns:
+        TransferResult con tamaño, hash y duración
+    
+    Raises:
+        RuntimeError: Si el tamaño recibido no coincide con expected_size
+    """
+    digest = hashlib.sha256()
+    tracker = ProgressTracker(progress, expected_size or 0)
+    size = 0
+    started = time.perf_counter()
+    
+    try:
+        with open(output_path, 'wb') as out:
+            for chunk in chunks:
+                out.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+                tracker.update(size)
+        
+        if expected_size is not None and size != expected_size:
+            raise RuntimeError(f"Transfer size mismatch: expected {expected_size} bytes, got {size}")
+    except BaseException:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    
+    tracker.finish(size)
+    return TransferResult(output_path, size, digest.hexdigest(), time.perf_counter() - started)
+
+
+def stream_to_file(source: BinaryIO, output_path: str, expected_size: Optional[int] = None,
+                   progress: Optional[ProgressCallback] = None,
+                   chunk_size: int = TRANSFER_CHUNK_SIZE) -> TransferResult:
+    """
+    Copia un flujo de bytes a un archivo calculando SHA-256 al vuelo.
+    
+    Args:
+        source: Flujo binario de entrada
+        output_path: Ruta final del archivo
+        expected_size: Tamaño esperado en bytes (None si se desconoce)
+        progress: Callback de progreso (recibe bytes transferidos)
+        chunk_size: Bytes leídos por iteración
+    
+    Returns:
+        TransferResult con tamaño, hash y duración
+    
+    Raises:
+        RuntimeError: Si el tamaño recibido no coincide con expected_size
+    """
+    return chunks_to_file(iter(lambda: source.read(chunk_size), b''), output_path,
+                          expected_size, progress)
+
+
+def exec_out_pull(adb_cmd: str, remote_path: str, output_path: str,
+                  expected_size: Optional[int] = None,
+                  progress: Optional[ProgressCallback] = None,
+                  chunk_size: int = TRANSFER_CHUNK_SIZE,
+                  serial: Optional[str] = None) -> TransferResult:
+    """
+    Transfiere un archivo remoto con `adb exec-out cat` directo al destino.
+    
+    A diferencia de `adb pull`, no hay copia intermedia: los bytes llegan
+    por stdout y se escriben, cuentan y hashean en una sola pasada. Se
+    escribe en `<output_path>.part` y se renombra solo si la transferencia
+    está completa.
+    
+    Args:
+        adb_cmd: Comando ADB
+        remote_path: Ruta del archivo en el dispositivo
+        output_path: Ruta local final
+        expected_size: Tamaño remoto conocido (valida la transferencia)
+        progress: Callback de progreso
+        chunk_size: Bytes leídos por iteración
+        serial: Serial del dispositivo (None = único conectado)
+    
+    Returns:
+        TransferResult de la transferencia
+    
+    Raises:
+        RuntimeError: Si adb falla o la transferencia queda incompleta
+    """
+    logger = logging.getLogger('whatsapp_migration.adb_transfer')
+    partial_path = output_path + '.part'
+    process = open_exec_out(adb_cmd, remote_path, serial)
+    read_stderr = drain_stderr(process)
+    try:
+        result = stream_to_file(process.stdout, partial_path, expected_size, progress, chunk_size)
+    except BaseException:
+        process.kill()
+        process.wait()
+        read_stderr()
+        raise
+    finally:
+        process.stdout.close()
+    
+    returncode = process.wait()
+    stderr = read_stderr()
+    
+    if exec_out_failed(returncode, result.size, stderr):
+        os.remove(partial_path)
+        raise RuntimeError(f"adb exec-out failed (exit {returncode}): {stderr}")
+    
+    os.replace(partial_path, output_path)
+    result = result._replace(path=output_path)
+    
+    logger.info(
+        f"Transferred {remote_path}: {result.size:,} bytes in {result.seconds:.2f}s "
+        f"({result.bytes_per_sec / (1024 * 1024):.2f} MB/s), sha256={result.sha256}"
+    )
+    return result
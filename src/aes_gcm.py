@@ -0,0 +1,341 @@
+"""
+WhatsApp Android to iOS Migration Tool
+
+Implementación de AES-GCM en Python puro (solo biblioteca estándar).
+
+Se usa como respaldo cuando no están instalados `cryptography` ni
+`pycryptodome`. Solo implementa el cifrado de bloque (GCM usa AES en modo
+CTR, por lo que no hace falta el descifrado de bloque) y GHASH con tablas
+de 8 bits precalculadas.
+"""
+
+import hmac
+from typing import List, Tuple
+
+BLOCK_SIZE = 16
+
+# Polinomio de reducción de GHASH (x^128 + x^7 + x^2 + x + 1, bit-reflejado)
+_GHASH_R = 0xE1 << 120
+_MASK_128 = (1 << 128) - 1
+
+
+def _build_sbox() -> List[int]:
+    """Calcula la S-box de AES (inverso en GF(2^8) + transformación afín)."""
+    sbox = [0] * 256
+    p = q = 1
+    while True:
+        # p recorre el grupo multiplicativo con generador 3; q = p^-1
+        p = p ^ ((p << 1) & 0xFF) ^ (0x1B if p & 0x80 else 0)
+        q ^= q << 1
+        q ^= q << 2
+        q ^= q << 4
+        q &= 0xFF
+        if q & 0x80:
+            q ^= 0x09
+        x = q ^ (q << 1 | q >> 7) ^ (q << 2 | q >> 6) ^ (q << 3 | q >> 5) ^ (q << 4 | q >> 4)
+        sbox[p] = (x ^ 0x63) & 0xFF
+        if p == 1:
+            break
+    sbox[0] = 0x63
+    return sbox
+
+
+def _xtime(value: int) -> int:
+    """Multiplica por x en GF(2^8)."""
+    value <<= 1
+    return (value ^ 0x11B) if value & 0x100 else value
+
+
+_SBOX = _build_sbox()
+
+# Tablas T de cifrado: SubBytes + ShiftRows + MixColumns por byte
+_TE0 = []
+for _s in _SBOX:
+    _s2 = _xtime(_s)
+    _TE0.append((_s2 << 24) | (_s << 16) | (_s << 8) | (_s2 ^ _s))
+_TE1 = [((t >> 8) | (t << 24)) & 0xFFFFFFFF for t in _TE0]
+_TE2 = [((t >> 16) | (t << 16)) & 0xFFFFFFFF for t in _TE0]
+_TE3 = [((t >> 24) | (t << 8)) & 0xFFFFFFFF for t in _TE0]
+
+
+class AES:
+    """Cifrador de bloque AES (solo dirección de cifrado)."""
+    
+    def __init__(self, key: bytes):
+        """
+        Expande la clave.
+        
+        Args:
+            key: Clave de 16, 24 o 32 bytes
+        
+        Raises:
+            ValueError: Si la longitud de la clave no es válida
+        """
+        if len(key) not in (16, 24, 32):
+            raise ValueError(f"Invalid AES key length: {len(key)} bytes")
+        
+        nk = len(key) // 4
+        self.rounds = nk + 6
+        words = [int.from_bytes(key[i:i + 4], 'big') for i in range(0, len(key), 4)]
+        rcon = 1
+        sbox = _SBOX
+        
+        for i in range(nk, 4 * (self.rounds + 1)):
+            temp = words[i - 1]
+            if i % nk == 0:
+                temp = ((temp << 8) | (temp >> 24)) & 0xFFFFFFFF
+                temp = ((sbox[temp >> 24] << 24) | (sbox[(temp >> 16) & 0xFF] << 16)
+                        | (sbox[(temp >> 8) & 0xFF] << 8) | sbox[temp & 0xFF])
+                temp ^= rcon << 24
+                rcon = _xtime(rcon)
+            elif nk > 6 and i % nk == 4:
+                temp = ((sbox[temp >> 24] << 24) | (sbox[(temp >> 16) & 0xFF] << 16)
+                        | (sbox[(temp >> 8) & 0xFF] << 8) | sbox[temp & 0xFF])
+            words.append(words[i - nk] ^ temp)
+        
+        self._round_keys = [tuple(words[4 * r:4 * r + 4]) for r in range(self.rounds + 1)]
+    
+    def encrypt_block(self, block: bytes) -> bytes:
+        """
+        Cifra un bloque de 16 bytes.
+        
+        Args:
+            block: Bloque en claro
+        
+        Returns:
+            Bloque cifrado
+        """
+        return self.encrypt_int(int.from_bytes(block, 'big')).to_bytes(BLOCK_SIZE, 'big')
+    
+    def encrypt_int(self, block: int) -> int:
+        """Cifra un bloque representado como entero de 128 bits (big-endian)."""
+        te0, te1, te2, te3, sbox = _TE0, _TE1, _TE2, _TE3, _SBOX
+        keys = self._round_keys
+        k = keys[0]
+        s0 = (block >> 96) ^ k[0]
+        s1 = ((block >> 64) & 0xFFFFFFFF) ^ k[1]
+        s2 = ((block >> 32) & 0xFFFFFFFF) ^ k[2]
+        s3 = (block & 0xFFFFFFFF) ^ k[3]
+        
+        for r in range(1, self.rounds):
+            k = keys[r]
+            t0 = te0[s0 >> 24] ^ te1[(s1 >> 16) & 0xFF] ^ te2[(s2 >> 8) & 0xFF] ^ te3[s3 & 0xFF] ^ k[0]
+            t1 = te0[s1 >> 24] ^ te1[(s2 >> 16) & 0xFF] ^ te2[(s3 >> 8) & 0xFF] ^ te3[s0 & 0xFF] ^ k[1]
+            t2 = te0[s2 >> 24] ^ te1[(s3 >> 16) & 0xFF] ^ te2[(s0 >> 8) & 0xFF] ^ te3[s1 & 0xFF] ^ k[2]
+            t3 = te0[s3 >> 24] ^ te1[(s0 >> 16) & 0xFF] ^ te2[(s1 >> 8) & 0xFF] ^ te3[s2 & 0xFF] ^ k[3]
+            s0, s1, s2, s3 = t0, t1, t2, t3
+        
+        k = keys[self.rounds]
+        o0 = ((sbox[s0 >> 24] << 24) | (sbox[(s1 >> 16) & 0xFF] << 16)
+              | (sbox[(s2 >> 8) & 0xFF] << 8) | sbox[s3 & 0xFF]) ^ k[0]
+        o1 = ((sbox[s1 >> 24] << 24) | (sbox[(s2 >> 16) & 0xFF] << 16)
+              | (sbox[(s3 >> 8) & 0xFF] << 8) | sbox[s0 & 0xFF]) ^ k[1]
+        o2 = ((sbox[s2 >> 24] << 24) | (sbox[(s3 >> 16) & 0xFF] << 16)
+              | (sbox[(s0 >> 8) & 0xFF] << 8) | sbox[s1 & 0xFF]) ^ k[2]
+        o3 = ((sbox[s3 >> 24] << 24) | (sbox[(s0 >> 16) & 0xFF] << 16)
+              | (sbox[(s1 >> 8) & 0xFF] << 8) | sbox[s2 & 0xFF]) ^ k[3]
+        return (o0 << 96) | (o1 << 64) | (o2 << 32) | o3
+
+
+class GHash:
+    """Función GHASH de GCM con tablas de multiplicación de 8 bits."""
+    
+    def __init__(self, h: int):
+        """
+        Precalcula las tablas para la subclave H.
+        
+        Args:
+            h: Subclave de hash (AES_K(0^128)) como entero de 128 bits
+        """
+        # powers[j] = H · x^j (el bit más significativo del bloque es x^0)
+        powers = [h]
+        for _ in range(127):
+            v = powers[-1]
+            powers.append((v >> 1) ^ _GHASH_R if v & 1 else v >> 1)
+        
+        self._tables = []
+        for i in range(BLOCK_SIZE):
+            table = [0] * 256
+            for bit in range(8):
+                value = powers[8 * i + bit]
+                step = 0x80 >> bit
+                for b in range(step, 256, 2 * step):
+                    for j in range(b, b + step):
+                        table[j] ^= value
+            # El byte i del bloque ocupa los bits 8*(15-i).. del entero
+            self._tables.append(table)
+        self._tables.reverse()
+        self.state = 0
+    
+    def multiply(self, x: int) -> int:
+        """Calcula x · H en GF(2^128)."""
+        result = 0
+        for table in self._tables:
+            result ^= table[x & 0xFF]
+            x >>= 8
+        return result
+    
+    def update_block(self, block: int) -> None:
+        """Absorbe un bloque de 128 bits."""
+        self.state = self.multiply(self.state ^ block)
+    
+    def update(self, data: bytes) -> None:
+        """Absorbe datos completando con ceros el último bloque."""
+        for offset in range(0, len(data), BLOCK_SIZE):
+            block = data[offset:offset + BLOCK_SIZE]
+            self.update_block(int.from_bytes(block.ljust(BLOCK_SIZE, b'\x00'), 'big'))
+
+
+def _initial_counter(aes: AES, ghash_key: int, iv: bytes) -> int:
+    """Calcula J0 a partir del IV (96 bits directo; otro tamaño vía GHASH)."""
+    if len(iv) == 12:
+        return (int.from_bytes(iv, 'big') << 32) | 1
+    ghash = GHash(ghash_key)
+    ghash.update(iv)
+    ghash.update_block(len(iv) * 8)
+    return ghash.state
+
+
+def _inc32(counter: int) -> int:
+    """Incrementa los 32 bits bajos del contador."""
+    return (counter & ~0xFFFFFFFF & _MASK_128) | ((counter + 1) & 0xFFFFFFFF)
+
+
+class _GCMBase:
+    """Estado común de cifrado/descifrado GCM en streaming."""
+    
+    def __init__(self, key: bytes, iv: bytes, aad: bytes = b''):
+        if not iv:
+            raise ValueError("GCM IV must not be empty")
+        self._aes = AES(key)
+        h = self._aes.encrypt_int(0)
+        self._ghash = GHash(h)
+        self._j0 = _initial_counter(self._aes, h, iv)
+        self._counter = _inc32(self._j0)
+        self._keystream = b''
+        self._pending = b''
+        self._aad_len = len(aad)
+        self._data_len = 0
+        self._ghash.update(aad)
+    
+    def _xor_keystream(self, data: bytes) -> bytes:
+        """Aplica el keystream CTR a data."""
+        needed = len(data) - len(self._keystream)
+        if needed > 0:
+            blocks = (needed + BLOCK_SIZE - 1) // BLOCK_SIZE
+            encrypt = self._aes.encrypt_int
+            counter = self._counter
+            stream = []
+            for _ in range(blocks):
+                stream.append(encrypt(counter).to_bytes(BLOCK_SIZE, 'big'))
+                counter = _inc32(counter)
+            self._counter = counter
+            self._keystream += b''.join(stream)
+        
+        keystream = self._keystream[:len(data)]
+        self._keystream = self._keystream[len(data):]
+        n = len(data)
+        return (int.from_bytes(data, 'big') ^ int.from_bytes(keystream, 'big')).to_bytes(n, 'big')
+    
+    def _absorb_ciphertext(self, data: bytes) -> None:
+        """Pasa el ciphertext por GHASH en bloques completos."""
+        self._data_len += len(data)
+        data = self._pending + data
+        full = len(data) - len(data) % BLOCK_SIZE
+        self._ghash.update(data[:full])
+        self._pending = data[full:]
+    
+    def _compute_tag(self) -> bytes:
+        """Cierra GHASH y calcula el tag de autenticación."""
+        self._ghash.update(self._pending)
+        self._pending = b''
+        self._ghash.update_block(((self._aad_len * 8) << 64) | (self._data_len * 8))
+        return (self._aes.encrypt_int(self._j0) ^ self._ghash.state).to_bytes(BLOCK_SIZE, 'big')
+
+
+class GCMDecryptor(_GCMBase):
+    """Descifrado AES-GCM incremental."""
+    
+    def update(self, data: bytes) -> bytes:
+        """
+        Descifra un fragmento de ciphertext.
+        
+        Args:
+            data: Ciphertext (cualquier longitud)
+        
+        Returns:
+            Texto en claro del mismo tamaño
+        """
+        self._absorb_ciphertext(data)
+        return self._xor_keystream(data)
+    
+    def finalize(self, tag: bytes) -> None:
+        """
+        Verifica el tag de autenticación.
+        
+        Args:
+            tag: Tag de 16 bytes
+        
+        Raises:
+            ValueError: Si el tag no coincide
+        """
+        if not hmac.compare_digest(self._compute_tag()[:len(tag)], tag):
+            raise ValueError("GCM authentication tag mismatch")
+
+
+class GCMEncryptor(_GCMBase):
+    """Cifrado AES-GCM incremental."""
+    
+    def update(self, data: bytes) -> bytes:
+        """Cifra un fragmento de texto en claro."""
+        ciphertext = self._xor_keystream(data)
+        self._absorb_ciphertext(ciphertext)
+        return ciphertext
+    
+    def finalize(self) -> bytes:
+        """Retorna el tag de autenticación de 16 bytes."""
+        return self._compute_tag()
+
+
+def gcm_first_keystream_block(key: bytes, iv: bytes) -> bytes:
+    """
+    Calcula el keystream del primer bloque de datos (contador inc32(J0)).
+    
+    Permite descifrar los primeros 16 bytes sin autenticar, por ejemplo
+    para validar un IV candidato antes de procesar el archivo completo.
+    
+    Args:
+        key: Clave AES
+        iv: IV de GCM
+    
+    Returns:
+        16 bytes de keystream
+    """
+    aes = AES(key)
+    j0 = _initial_counter(aes, aes.encrypt_int(0), iv)
+    return aes.encrypt_int(_inc32(j0)).to_bytes(BLOCK_SIZE, 'big')
+
+
+def aes_gcm_encrypt(key: bytes, iv: bytes, plaintext: bytes, aad: bytes = b'') -> Tuple[bytes, bytes]:
+    """
+    Cifra en una sola llamada.
+    
+    Returns:
+        Tupla (ciphertext, tag)
+    """
+    encryptor = GCMEncryptor(key, iv, aad)
+    ciphertext = encryptor.update(plaintext)
+    return ciphertext, encryptor.finalize()
+
+
+def aes_gcm_decrypt(key: bytes, iv: bytes, ciphertext: bytes, tag: bytes, aad: bytes = b'') -> bytes:
+    """
+    Descifra y verifica en una sola llamada.
+    
+    Raises:
+        ValueError: Si el tag no coincide
+    """
+    decryptor = GCMDecryptor(key, iv, aad)
+    plaintext = decryptor.update(ciphertext)
+    decryptor.finalize(tag)
+    return plaintext
@@ -6,10 +6,101 @@ Módulo para gestión de backups de Android via ADB.
 
 import logging
 import os
+import re
 import tarfile
-from typing import Optional
+import zlib
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Sequence, Union
 
+from .ab_stream import extract_tar_members, open_ab_payload
+from .adb_client import AdbClient, AdbError
+from .adb_transfer import (
+    ChunkReader, adb_base_command, drain_stderr, exec_out_pull, iter_exec_out, open_backup_stream,
+    open_exec_command, quote_remote_path
+)
+from .device_watcher import DETACHED, DeviceEvent, DeviceWatcher
+from .media_sync import DEFAULT_STREAMS, MediaSyncResult, sync_media
+from .progress import console_progress_bar
 from .utils import run_adb_command, ensure_directory, clean_directory, print_step, get_adb_command
+from .whatsapp_crypt import decrypt_chunks, decrypt_database, detect_crypt_version, load_key
+
+# Nombres de base de datos aceptados en el dispositivo
+DATABASE_FILENAMES = (
+    'msgstore.db.crypt15',
+    'msgstore.db.crypt14',
+    'msgstore.db.crypt12',
+    'msgstore.db',
+)
+
+# Primer SDK con el servicio exec: (necesario para `adb exec-out bu backup`)
+EXEC_OUT_MIN_SDK = 21
+
+# Línea de `stat -c '%Y %s %n'`: mtime (epoch), tamaño y ruta (puede tener espacios)
+_STAT_LINE = re.compile(r'^(\d+) (\d+) (/.+)$')
+
+
+class RemoteFile(NamedTuple):
+    """Archivo remoto listado en el dispositivo."""
+    
+    path: str
+    size: int
+    mtime: int
+    
+    @property
+    def name(self) -> str:
+        """Nombre del archivo sin directorio."""
+        return self.path.rsplit('/', 1)[-1]
+
+
+def build_stat_command(directories: Sequence[str]) -> str:
+    """
+    Construye un único comando de shell que lista los msgstore.db* de varios directorios.
+    
+    Args:
+        directories: Directorios remotos candidatos (pueden contener espacios)
+    
+    Returns:
+        Comando para `adb shell`
+    """
+    patterns = ' '.join(f"{quote_remote_path(directory)}/msgstore.db*" for directory in directories)
+    return f"stat -c '%Y %s %n' {patterns} 2>/dev/null"
+
+
+def parse_stat_listing(output: str) -> List[RemoteFile]:
+    """
+    Interpreta la salida de build_stat_command().
+    
+    Las líneas que no tienen el formato esperado (errores, globs sin
+    coincidencias) se ignoran.
+    
+    Args:
+        output: stdout de `adb shell stat ...`
+    
+    Returns:
+        Lista de archivos remotos
+    """
+    files = []
+    for line in output.splitlines():
+        match = _STAT_LINE.match(line.strip())
+        if match:
+            files.append(RemoteFile(match.group(3), int(match.group(2)), int(match.group(1))))
+    return files
+
+
+def select_database_file(files: Sequence[RemoteFile]) -> Optional[RemoteFile]:
+    """
+    Elige la base de datos más reciente y no vacía.
+    
+    Args:
+        files: Archivos listados en el dispositivo
+    
+    Returns:
+        Archivo con mayor (mtime, tamaño) entre los nombres válidos, None si no hay
+    """
+    valid = [f for f in files if f.name in DATABASE_FILENAMES and f.size > 0]
+    if not valid:
+        return None
+    return max(valid, key=lambda f: (f.mtime, f.size))
 
 
 class AndroidBackupManager:
@@ -19,21 +110,38 @@ class AndroidBackupManager:
     WHATSAPP_STANDARD = {
         'package': 'com.whatsapp',
         'apk': 'LegacyWhatsApp.apk',
-        'db_path': 'tmp/apps/com.whatsapp/db/msgstore.db'
+        'media_dirs': (
+            '/sdcard/Android/media/com.whatsapp/WhatsApp/Media',
+            '/sdcard/WhatsApp/Media',
+        ),
     }
     
     WHATSAPP_BUSINESS = {
         'package': 'com.whatsapp.w4b',
         'apk': 'LegacyWhatsAppBusiness.apk',
-        'db_path': 'tmp/apps/com.whatsapp.w4b/db/msgstore.db'
+        'media_dirs': (
+            '/sdcard/Android/media/com.whatsapp.w4b/WhatsApp Business/Media',
+            '/sdcard/WhatsApp Business/Media',
+        ),
     }
     
-    def __init__(self, whatsapp_type: str = 'standard'):
+    def __init__(self, whatsapp_type: str = 'standard', pipeline: bool = False,
+                 client: Optional[AdbClient] = None, serial: Optional[str] = None,
+                 tmp_dir: str = 'tmp', out_dir: str = 'out', show_progress: bool = True):
         """
         Inicializa el gestor de backups de Android.
         
         Args:
             whatsapp_type: 'standard' o 'business'
+            pipeline: Si True, las bases encriptadas se transfieren, descifran
+                y descomprimen en una sola pasada (requiere la clave por root)
+            client: Cliente del servidor ADB por socket; si se indica, shell,
+                listados y transferencias no lanzan un proceso adb por operación
+            serial: Serial del dispositivo (None = único conectado); todos los
+                comandos se dirigen a él con `adb -s`
+            tmp_dir: Directorio de archivos temporales
+            out_dir: Directorio de salida (android.db)
+            show_progress: Dibujar barras de progreso en consola
         """
         self.logger = logging.getLogger('whatsapp_migration.android_backup')
         
@@ -42,12 +150,29 @@ class AndroidBackupManager:
         else:
             self.config = self.WHATSAPP_STANDARD
         
+        self.pipeline = pipeline
+        self.client = client
+        self.serial = serial
+        self.tmp_dir = tmp_dir
+        self.out_dir = out_dir
+        self.show_progress = show_progress
+        
         # Detectar comando ADB disponible
         self.adb_cmd = get_adb_command()
         
         self.logger.info(f"Initialized for {whatsapp_type} WhatsApp")
         self.logger.info(f"Package: {self.config['package']}")
         self.logger.info(f"Using ADB: {self.adb_cmd}")
+        if serial:
+            self.logger.info(f"Device serial: {serial}")
+    
+    def _adb(self, *args: str) -> List[str]:
+        """Construye un comando adb dirigido al dispositivo de este gestor."""
+        return adb_base_command(self.adb_cmd, self.serial) + list(args)
+    
+    def _progress(self):
+        """Callback de progreso en bytes (None si está desactivado)."""
+        return console_progress_bar(unit='bytes') if self.show_progress else None
     
     def start_adb_server(self) -> bool:
         """
@@ -57,6 +182,11 @@ class AndroidBackupManager:
             True si el servidor inició correctamente
         """
         try:
+            if self.client:
+                version = self.client.ensure_server(self.adb_cmd)
+                self.logger.info(f"Using ADB server socket (protocol {version})")
+                return True
+            
             self.logger.info("Stopping ADB server...")
             run_adb_command([self.adb_cmd, 'kill-server'], check=False)
             
@@ -72,6 +202,9 @@ class AndroidBackupManager:
         """
         Espera a que un dispositivo Android se conecte.
         
+        Reacciona a los eventos de `host:track-devices` en lugar de sondear:
+        retorna en cuanto el dispositivo queda en estado 'device'.
+        
         Args:
             timeout: Tiempo máximo de espera en segundos
         
@@ -83,19 +216,84 @@ class AndroidBackupManager:
             print("\nPlease connect your Android device via USB...")
             print("Make sure USB debugging is enabled.")
             
-            run_adb_command([self.adb_cmd, 'wait-for-device'], timeout=timeout)
-            
-            # Verificar dispositivo
-            result = run_adb_command([self.adb_cmd, 'devices'])
-            self.logger.info(f"ADB devices output:\n{result.stdout}")
+            with DeviceWatcher(self.client, self.adb_cmd) as watcher:
+                device = watcher.wait_for_device(self.serial, timeout, on_event=self._report_device_event)
             
-            print("\n[OK] Android device connected!")
+            self.logger.info(f"Device ready: {device.serial}")
+            print(f"\n[OK] Android device connected! ({device.serial})")
             return True
             
         except Exception as e:
             self.logger.error(f"Device connection failed: {e}")
             return False
     
+    def _report_device_event(self, event: DeviceEvent) -> None:
+        """Informa al usuario los cambios de estado relevantes mientras espera."""
+        if self.serial and event.serial != self.serial:
+            return
+        if event.state == 'unauthorized':
+            print(f"\n[INFO] {event.serial} is unauthorized: accept the USB debugging prompt on the phone")
+        elif event.state == 'offline':
+            print(f"\n[INFO] {event.serial} is offline: reconnect the USB cable")
+        elif event.kind == DETACHED:
+            print(f"\n[INFO] {event.serial} disconnected")
+    
+    def _shell(self, command: str, timeout: int = 30) -> str:
+        """
+        Ejecuta un comando de shell en el dispositivo.
+        
+        Args:
+            command: Comando de shell
+            timeout: Timeout en segundos (solo modo subproceso)
+        
+        Returns:
+            stdout del comando ('' si falla)
+        """
+        if self.client:
+            try:
+                return self.client.shell(command, self.serial)
+            except (OSError, AdbError) as e:
+                self.logger.error(f"ADB shell failed: {e}")
+                return ''
+        
+        result = run_adb_command(self._adb('shell', command), check=False, timeout=timeout)
+        return result.stdout or ''
+    
+    @contextmanager
+    def _exec_stream(self, command: str) -> Iterator[BinaryIO]:
+        """
+        Abre `exec-out <command>` como flujo binario.
+        
+        Al salir se termina el proceso si quedó sin consumir (el lector pudo
+        detenerse antes del final) y se registra su stderr.
+        
+        Args:
+            command: Comando de shell remoto
+        
+        Yields:
+            stdout del comando
+        """
+        if self.client:
+            chunks = self.client.iter_exec(command, self.serial)
+            try:
+                yield ChunkReader(chunks)
+            finally:
+                chunks.close()
+            return
+        
+        process = open_exec_command(self.adb_cmd, command, self.serial)
+        read_stderr = drain_stderr(process)
+        try:
+            yield process.stdout
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            process.wait()
+            stderr = read_stderr()
+            if stderr:
+                self.logger.warning(f"adb exec-out stderr: {stderr[:500]}")
+    
     def uninstall_whatsapp(self, keep_data: bool = True) -> bool:
         """
         Desinstala WhatsApp del dispositivo.
@@ -109,7 +307,7 @@ class AndroidBackupManager:
         try:
             self.logger.info(f"Uninstalling {self.config['package']}...")
             
-            cmd = [self.adb_cmd, 'shell', 'pm', 'uninstall']
+            cmd = self._adb('shell', 'pm', 'uninstall')
             if keep_data:
                 cmd.append('-k')
             cmd.append(self.config['package'])
@@ -147,9 +345,7 @@ class AndroidBackupManager:
             print(f"\nInstalling legacy WhatsApp APK...")
             
             # -r: replace existing, -d: allow downgrade
-            result = run_adb_command([
-                self.adb_cmd, 'install', '-r', '-d', apk_path
-            ], timeout=120)
+            result = run_adb_command(self._adb('install', '-r', '-d', apk_path), timeout=120)
             
             if 'Success' in result.stdout:
                 self.logger.info("Legacy APK installed successfully")
@@ -175,18 +371,19 @@ class AndroidBackupManager:
             self.logger.error(f"Failed to install legacy APK: {e}")
             return False
     
-    def create_backup(self, output_file: str = 'tmp/whatsapp.ab') -> bool:
+    def create_backup(self, output_file: Optional[str] = None) -> bool:
         """
         Crea backup de WhatsApp sin cifrar.
         
         Args:
-            output_file: Ruta del archivo de backup
+            output_file: Ruta del archivo de backup (por defecto <tmp_dir>/whatsapp.ab)
         
         Returns:
             True si el backup se creó exitosamente
         """
+        output_file = output_file or os.path.join(self.tmp_dir, 'whatsapp.ab')
         try:
-            ensure_directory('tmp')
+            ensure_directory(os.path.dirname(output_file) or '.')
             
             self.logger.info(f"Creating Android backup: {output_file}")
             print("\n" + "="*80)
@@ -199,9 +396,9 @@ class AndroidBackupManager:
             print("4. Wait for the backup to complete (may take several minutes)")
             print("\nStarting backup...")
             
-            result = run_adb_command([
-                self.adb_cmd, 'backup', '-f', output_file, self.config['package']
-            ], timeout=600)  # 10 minutos de timeout
+            result = run_adb_command(
+                self._adb('backup', '-f', output_file, self.config['package']), timeout=600
+            )  # 10 minutos de timeout
             
             # Validar que el archivo se creó
             if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
@@ -218,98 +415,192 @@ class AndroidBackupManager:
             self.logger.error(f"Failed to create backup: {e}")
             return False
     
-    def extract_ab_to_tar(self, ab_file: str, tar_file: str) -> bool:
+    def device_sdk_version(self) -> Optional[int]:
+        """
+        Consulta el nivel de API del dispositivo.
+        
+        Returns:
+            SDK (ej: 30), None si no se pudo determinar
+        """
+        try:
+            return int(self._shell('getprop ro.build.version.sdk', timeout=10).strip())
+        except ValueError:
+            return None
+    
+    def stream_backup(self, output_dir: Optional[str] = None, include_wa_db: bool = False,
+                      include_key: bool = False) -> Optional[str]:
         """
-        Convierte archivo .ab (Android Backup) a .tar.
+        Crea el backup y extrae msgstore.db sin artefactos intermedios.
         
-        El formato .ab tiene un header de 24 bytes seguido de datos zlib.
-        Los reemplazamos con un header gzip para crear un .tar válido.
+        La salida de `adb exec-out bu backup` se conecta directamente al
+        lector .ab y al extractor tar; al encontrar los miembros pedidos se
+        corta la transferencia. En dispositivos sin exec-out se recurre a
+        `adb backup -f` y el .ab temporal se elimina al terminar.
         
         Args:
-            ab_file: Ruta del archivo .ab
-            tar_file: Ruta del archivo .tar de salida
+            output_dir: Directorio de salida (por defecto out_dir)
+            include_wa_db: Extraer también wa.db
+            include_key: Extraer también la clave de encriptación
         
         Returns:
-            True si la conversión fue exitosa
+            Ruta de android.db extraído, None si falla
         """
+        output_dir = output_dir or self.out_dir
+        sdk = self.device_sdk_version()
+        if sdk is None or sdk < EXEC_OUT_MIN_SDK:
+            self.logger.info(f"exec-out backup not supported (SDK {sdk}), using adb backup -f")
+            ab_file = os.path.join(self.tmp_dir, 'whatsapp.ab')
+            if not self.create_backup(ab_file):
+                return None
+            try:
+                return self.extract_from_ab(ab_file, output_dir, include_wa_db, include_key)
+            finally:
+                if os.path.exists(ab_file):
+                    os.remove(ab_file)
+        
+        print("\n" + "="*80)
+        print("CREATING ANDROID BACKUP (STREAMING)")
+        print("="*80)
+        print("\nIMPORTANT:")
+        print("1. A backup prompt will appear on your Android device")
+        print("2. DO NOT set a password - leave it empty")
+        print("3. Tap 'BACK UP MY DATA'")
+        print("\nWaiting for backup data...")
+        
+        self.logger.info(f"Streaming backup of {self.config['package']} (SDK {sdk})")
+        process = open_backup_stream(self.adb_cmd, self.config['package'], self.serial)
+        read_stderr = drain_stderr(process)
         try:
-            self.logger.info(f"Converting .ab to .tar: {ab_file} → {tar_file}")
-            
-            with open(ab_file, 'rb') as inp:
-                with open(tar_file, 'wb') as out:
-                    # Escribir header gzip
-                    out.write(b'\x1f\x8b\x08\x00\x00\x00\x00\x00')
-                    
-                    # Saltar header .ab (24 bytes)
-                    inp.read(24)
-                    
-                    # Copiar datos zlib
-                    while True:
-                        chunk = inp.read(4096)
-                        if not chunk:
-                            break
-                        out.write(chunk)
-            
-            self.logger.info("Conversion successful")
-            return True
-            
-        except Exception as e:
-            self.logger.error(f"Failed to convert .ab to .tar: {e}")
-            return False
+            android_db = self.extract_from_ab(process.stdout, output_dir, include_wa_db, include_key)
+        finally:
+            # Si ya se extrajo todo lo pedido, el resto del backup no se necesita
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            process.wait()
+            stderr = read_stderr()
+            
+        if not android_db and stderr:
+            self.logger.error(f"adb backup stream failed: {stderr}")
+        return android_db
     
-    def extract_msgstore_db(self, tar_file: str, output_dir: str = 'out') -> Optional[str]:
+    def backup_members(self, output_dir: Optional[str] = None, include_wa_db: bool = False,
+                       include_key: bool = False) -> Dict[str, str]:
         """
-        Extrae msgstore.db del archivo tar.
+        Miembros del tar del backup a extraer y su destino.
         
         Args:
-            tar_file: Ruta del archivo .tar
-            output_dir: Directorio de salida
+            output_dir: Directorio de salida (por defecto out_dir)
+            include_wa_db: Extraer también wa.db (contactos)
+            include_key: Extraer también la clave de encriptación
         
         Returns:
-            Ruta del archivo msgstore.db extraído, None si falla
+            Nombre del miembro en el tar → ruta de destino
         """
+        output_dir = output_dir or self.out_dir
+        app_dir = f"apps/{self.config['package']}"
+        members = {f"{app_dir}/db/msgstore.db": f"{output_dir}/android.db"}
+        if include_wa_db:
+            members[f"{app_dir}/db/wa.db"] = f"{output_dir}/wa.db"
+        if include_key:
+            members[f"{app_dir}/f/key"] = f"{output_dir}/key"
+        return members
+    
+    def extract_from_ab(self, source: Union[str, BinaryIO], output_dir: Optional[str] = None,
+                        include_wa_db: bool = False, include_key: bool = False) -> Optional[str]:
+        """
+        Extrae msgstore.db de un backup .ab en una sola pasada.
+        
+        El cuerpo zlib se infla en streaming y el tar se recorre en modo
+        'r|': solo se escriben los miembros pedidos y la lectura se detiene
+        al encontrarlos, sin .tar intermedio ni extracción completa.
+        
+        Args:
+            source: Ruta del .ab o flujo binario del backup
+            output_dir: Directorio de salida (por defecto out_dir)
+            include_wa_db: Extraer también wa.db
+            include_key: Extraer también la clave de encriptación
+        
+        Returns:
+            Ruta de android.db extraído, None si falla
+        """
+        output_dir = output_dir or self.out_dir
+        members = self.backup_members(output_dir, include_wa_db, include_key)
+        db_member = next(iter(members))
+        
         try:
-            self.logger.info(f"Extracting tar file: {tar_file}")
-            ensure_directory('tmp')
             ensure_directory(output_dir)
+            self.logger.info(f"Streaming Android backup: {source if isinstance(source, str) else '<stream>'}")
             
-            # Extraer tar completo a tmp/
-            with tarfile.open(tar_file) as tar:
-                tar.extractall(path='tmp')
-            
-            self.logger.info("Tar extracted successfully")
-            
-            # Buscar msgstore.db
-            db_path = self.config['db_path']
-            
-            if os.path.exists(db_path):
-                output_path = f"{output_dir}/android.db"
-                
-                import shutil
-                shutil.copy2(db_path, output_path)
-                
-                size_mb = os.path.getsize(output_path) / (1024 * 1024)
-                self.logger.info(f"msgstore.db extracted: {size_mb:.2f} MB")
-                print(f"\n[OK] Android database extracted ({size_mb:.2f} MB)")
-                
-                return output_path
+            if isinstance(source, str):
+                with open(source, 'rb') as f:
+                    extracted = extract_tar_members(open_ab_payload(f), members)
             else:
-                self.logger.error(f"msgstore.db not found at expected path: {db_path}")
-                print(f"\n[ERROR] Database not found in backup at: {db_path}")
-                print("The backup may be incomplete or corrupted.")
-                return None
+                extracted = extract_tar_members(open_ab_payload(source), members)
                 
-        except Exception as e:
+        except (OSError, ValueError, tarfile.TarError, zlib.error) as e:
             self.logger.error(f"Failed to extract msgstore.db: {e}")
-            return False
+            print(f"\n[ERROR] Could not read Android backup: {e}")
+            return None
+        
+        for name in members:
+            if name not in extracted:
+                self.logger.warning(f"Not found in backup: {name}")
+        
+        if db_member not in extracted:
+            self.logger.error(f"msgstore.db not found in backup at: {db_member}")
+            print(f"\n[ERROR] Database not found in backup at: {db_member}")
+            print("The backup may be incomplete or corrupted.")
+            return None
+        
+        output_path = members[db_member]
+        size_mb = extracted[db_member] / (1024 * 1024)
+        self.logger.info(f"msgstore.db extracted: {size_mb:.2f} MB")
+        print(f"\n[OK] Android database extracted ({size_mb:.2f} MB)")
+        return output_path
+    
+    def sync_media(self, local_dir: Optional[str] = None,
+                   streams: int = DEFAULT_STREAMS) -> Optional[MediaSyncResult]:
+        """
+        Sincroniza la carpeta Media de WhatsApp de forma incremental.
+        
+        Solo se transfieren archivos nuevos o modificados desde la última
+        sincronización, como tar por `adb exec-out` en varios flujos paralelos.
+        
+        Args:
+            local_dir: Directorio local (por defecto <out_dir>/media)
+            streams: Transferencias tar simultáneas
+        
+        Returns:
+            MediaSyncResult, None si falla
+        """
+        local_dir = local_dir or os.path.join(self.out_dir, 'media')
+        print(f"\n[INFO] Syncing WhatsApp media to {local_dir}...")
+        
+        try:
+            result = sync_media(
+                self._shell, self._exec_stream, self.config['media_dirs'], local_dir,
+                streams=streams, progress=self._progress(),
+            )
+        except (OSError, RuntimeError) as e:
+            self.logger.error(f"Media sync failed: {e}")
+            print(f"\n[ERROR] Media sync failed: {e}")
+            return None
+        
+        print(f"[OK] Media: {result.remote_files:,} files on device, {result.changed_files:,} new or changed, "
+              f"{result.transferred_files:,} transferred ({result.transferred_bytes / (1024 * 1024):.1f} MB "
+              f"at {result.bytes_per_sec / (1024 * 1024):.2f} MB/s)")
+        if result.failed_batches or result.transferred_files < result.changed_files:
+            print("[WARNING] Some media files were not transferred; run the sync again to retry them")
+        return result
     
     def cleanup(self) -> None:
         """Limpia archivos temporales y detiene ADB."""
         try:
             self.logger.info("Cleaning up Android backup process...")
             
-            if os.path.exists('tmp'):
-                clean_directory('tmp', self.logger)
+            if os.path.exists(self.tmp_dir):
+                clean_directory(self.tmp_dir, self.logger)
             
             # Detener servidor ADB
             run_adb_command([self.adb_cmd, 'kill-server'], check=False)
@@ -328,8 +619,8 @@ class AndroidBackupManager:
         """
         try:
             self.logger.info("Attempting direct database extraction...")
-            ensure_directory('out')
-            ensure_directory('tmp')
+            ensure_directory(self.out_dir)
+            ensure_directory(self.tmp_dir)
             
             # Rutas base según tipo de WhatsApp
             if self.config['package'] == 'com.whatsapp.w4b':
@@ -341,61 +632,65 @@ class AndroidBackupManager:
                 alt_db_dir = '/sdcard/WhatsApp/Databases'
                 key_path = f"/data/data/{self.config['package']}/files/key"
             
-            # Intentar diferentes versiones de archivos
-            db_files_to_try = [
-                # Archivos encriptados (más común)
-                ('msgstore.db.crypt14', f"{db_dir}/msgstore.db.crypt14"),
-                ('msgstore.db.crypt15', f"{db_dir}/msgstore.db.crypt15"),
-                ('msgstore.db.crypt12', f"{db_dir}/msgstore.db.crypt12"),
-                # Archivo plano (legacy)
-                ('msgstore.db', f"{db_dir}/msgstore.db"),
-                # Alternativas
-                ('msgstore.db.crypt14', f"{alt_db_dir}/msgstore.db.crypt14"),
-                ('msgstore.db', f"{alt_db_dir}/msgstore.db"),
-            ]
-            
-            extracted_file = None
-            is_encrypted = False
-            
             print(f"\n[INFO] Searching for WhatsApp database on device...")
             
-            # Intentar extraer cada archivo
-            for filename, remote_path in db_files_to_try:
-                self.logger.debug(f"Trying: {remote_path}")
-                local_temp = f'tmp/{filename}'
-                
-                result = run_adb_command([
-                    self.adb_cmd, 'pull', remote_path, local_temp
-                ], check=False, timeout=60)
-                
-                if result.returncode == 0 and os.path.exists(local_temp) and os.path.getsize(local_temp) > 0:
-                    extracted_file = local_temp
-                    is_encrypted = '.crypt' in filename
-                    size_mb = os.path.getsize(local_temp) / (1024 * 1024)
-                    print(f"[OK] Found: {filename} ({size_mb:.2f} MB)")
-                    self.logger.info(f"Extracted: {remote_path} ({size_mb:.2f} MB)")
-                    break
-            
-            if not extracted_file:
+            # Un solo listado remoto de todos los directorios candidatos
+            remote_file = self.find_remote_database([db_dir, alt_db_dir])
+            
+            if not remote_file:
                 self.logger.error("No database file found on device")
                 print("\n[ERROR] Could not find WhatsApp database on device.")
                 self._print_manual_extraction_help()
                 return None
             
+            # Una sola transferencia; la DB plana va directo a su destino final
+            is_encrypted = '.crypt' in remote_file.name
+            if is_encrypted:
+                local_path = os.path.join(self.tmp_dir, remote_file.name)
+            else:
+                local_path = os.path.join(self.out_dir, 'android.db')
+            print(f"[OK] Found: {remote_file.name} ({remote_file.size / (1024 * 1024):.2f} MB)")
+            
+            # Modo pipeline: transferencia, descifrado y descompresión en una pasada
+            if is_encrypted and self.pipeline:
+                local_key = self._extract_key(key_path)
+                if local_key:
+                    decrypted_db = self.stream_decrypt_database(remote_file, local_key)
+                    if decrypted_db:
+                        return decrypted_db
+                    print("[WARNING] Pipelined decryption failed, falling back to separate steps")
+            
+            try:
+                if self.client:
+                    transfer = self.client.pull(
+                        remote_file.path, local_path, self.serial,
+                        expected_size=remote_file.size, progress=self._progress(),
+                    )
+                else:
+                    transfer = exec_out_pull(
+                        self.adb_cmd, remote_file.path, local_path,
+                        expected_size=remote_file.size, progress=self._progress(),
+                        serial=self.serial,
+                    )
+            except (OSError, RuntimeError) as e:
+                self.logger.error(f"Failed to transfer {remote_file.path}: {e}")
+                print(f"\n[ERROR] Could not transfer {remote_file.path}")
+                self._print_manual_extraction_help()
+                return None
+            
+            print(f"[OK] Transferred {transfer.size / (1024 * 1024):.2f} MB "
+                  f"at {transfer.bytes_per_sec / (1024 * 1024):.2f} MB/s (sha256 {transfer.sha256[:16]}...)")
+            
             # Si está encriptado, desencriptar
             if is_encrypted:
                 print(f"\n[INFO] Database is encrypted, attempting decryption...")
-                decrypted_db = self._decrypt_database(extracted_file, key_path)
+                decrypted_db = self._decrypt_database(transfer.path, key_path)
                 if not decrypted_db:
                     return None
                 return decrypted_db
             else:
-                # Mover archivo plano a ubicación final
-                final_path = 'out/android.db'
-                import shutil
-                shutil.move(extracted_file, final_path)
                 print(f"\n[OK] Database extracted successfully (unencrypted)")
-                return final_path
+                return transfer.path
                 
         except Exception as e:
             self.logger.error(f"Direct extraction failed: {e}")
@@ -403,6 +698,25 @@ class AndroidBackupManager:
             self._print_manual_extraction_help()
             return None
     
+    def find_remote_database(self, directories: Sequence[str]) -> Optional[RemoteFile]:
+        """
+        Localiza la base de datos en el dispositivo con un único `adb shell stat`.
+        
+        Args:
+            directories: Directorios remotos candidatos
+        
+        Returns:
+            Archivo más reciente y no vacío, None si no hay ninguno
+        """
+        files = parse_stat_listing(self._shell(build_stat_command(directories)))
+        for remote in files:
+            self.logger.debug(f"Remote file: {remote.path} ({remote.size} bytes, mtime {remote.mtime})")
+        
+        selected = select_database_file(files)
+        if selected:
+            self.logger.info(f"Selected remote database: {selected.path}")
+        return selected
+    
     def _print_manual_extraction_help(self) -> None:
         """Imprime instrucciones para extracción manual."""
         print("\nPossible causes:")
@@ -418,6 +732,79 @@ class AndroidBackupManager:
         print("  5. For encrypted files (.crypt14), see docs/ENCRYPTED_DATABASES.md")
         print("\n📖 Complete guide: docs/ENCRYPTED_DATABASES.md")
     
+    def _extract_key(self, key_path: str, local_key: Optional[str] = None) -> Optional[str]:
+        """
+        Extrae la clave de encriptación del dispositivo (requiere adb root).
+        
+        Args:
+            key_path: Ruta de la clave en el dispositivo
+            local_key: Ruta local donde guardarla (por defecto <tmp_dir>/key)
+        
+        Returns:
+            Ruta local de la clave, None si no se pudo extraer
+        """
+        local_key = local_key or os.path.join(self.tmp_dir, 'key')
+        print(f"[INFO] Extracting encryption key...")
+        
+        # Requiere root o adb root
+        result = run_adb_command(self._adb('root'), check=False, timeout=10)
+        
+        if result.returncode == 0:
+            # Dispositivo con root habilitado
+            result = run_adb_command(self._adb('pull', key_path, local_key), check=False, timeout=30)
+            
+            if result.returncode == 0 and os.path.exists(local_key):
+                print(f"[OK] Encryption key extracted")
+                self.logger.info("Encryption key extracted successfully")
+                return local_key
+        
+        self.logger.warning("Could not extract encryption key - device may not have root")
+        return None
+    
+    def stream_decrypt_database(self, remote_file: RemoteFile, key_file: str,
+                                output_path: Optional[str] = None) -> Optional[str]:
+        """
+        Transfiere, descifra, descomprime y escribe la base en una sola pasada.
+        
+        Conecta el flujo de `adb exec-out` con AES-GCM y zlib mediante un
+        pipeline de hilos con colas acotadas: el descifrado se solapa con
+        la transferencia USB y el archivo encriptado nunca toca el disco.
+        
+        Args:
+            remote_file: Base de datos encriptada en el dispositivo
+            key_file: Archivo de clave local
+            output_path: Ruta del SQLite de salida (por defecto <out_dir>/android.db)
+        
+        Returns:
+            output_path si tuvo éxito, None si falla
+        """
+        output_path = output_path or os.path.join(self.out_dir, 'android.db')
+        try:
+            version = detect_crypt_version(remote_file.name)
+            with open(key_file, 'rb') as f:
+                key = load_key(f.read(), version)
+            
+            print(f"[INFO] Streaming crypt{version} database through decryption pipeline...")
+            if self.client:
+                chunks = self.client.iter_pull(remote_file.path, self.serial)
+            else:
+                chunks = iter_exec_out(self.adb_cmd, remote_file.path, expected_size=remote_file.size,
+                                       progress=self._progress(), serial=self.serial)
+            result, stats = decrypt_chunks(chunks, key, version, output_path,
+                                           expected_size=remote_file.size)
+        
+        except (OSError, RuntimeError, ValueError) as e:
+            self.logger.error(f"Pipelined decryption failed: {e}")
+            print(f"\n[ERROR] {e}")
+            return None
+        
+        busy = {name: stage['busy_time'] for name, stage in stats['stages'].items()}
+        self.logger.info(f"Pipeline stage busy times: {busy}")
+        print(f"[OK] Database decrypted in {stats['wall_time']:.2f}s "
+              f"({result.encrypted_size / (1024 * 1024):.2f} MB -> {result.size / (1024 * 1024):.2f} MB, "
+              f"{result.backend} backend)")
+        return output_path
+    
     def _decrypt_database(self, encrypted_file: str, key_path: str) -> Optional[str]:
         """Desencripta base de datos de WhatsApp.
         
@@ -430,34 +817,17 @@ class AndroidBackupManager:
         """
         try:
             # Intentar extraer clave de encriptación
-            print(f"[INFO] Extracting encryption key...")
-            local_key = 'tmp/key'
-            
-            # Requiere root o adb root
-            result = run_adb_command([
-                self.adb_cmd, 'root'
-            ], check=False, timeout=10)
-            
-            if result.returncode == 0:
-                # Dispositivo con root habilitado
-                result = run_adb_command([
-                    self.adb_cmd, 'pull', key_path, local_key
-                ], check=False, timeout=30)
-                
-                if result.returncode == 0 and os.path.exists(local_key):
-                    print(f"[OK] Encryption key extracted")
-                    self.logger.info("Encryption key extracted successfully")
-                    
-                    # Desencriptar usando la clave
-                    decrypted_path = 'out/android.db'
-                    if self._decrypt_with_key(encrypted_file, local_key, decrypted_path):
-                        print(f"[OK] Database decrypted successfully")
-                        return decrypted_path
-                    else:
-                        print(f"[ERROR] Decryption failed")
-                        return None
+            local_key = self._extract_key(key_path)
+            
+            if local_key:
+                # Desencriptar usando la clave
+                decrypted_path = os.path.join(self.out_dir, 'android.db')
+                if self._decrypt_with_key(encrypted_file, local_key, decrypted_path):
+                    print(f"[OK] Database decrypted successfully")
+                    return decrypted_path
                 else:
-                    self.logger.warning("Could not extract encryption key - device may not have root")
+                    print(f"[ERROR] Decryption failed")
+                    return None
             
             # Fallback: intentar sin root (archivos más antiguos)
             print(f"\n[INFO] Database is encrypted and device doesn't have root access.")
@@ -472,12 +842,9 @@ class AndroidBackupManager:
             print(f"   cd WhatsApp-Key-Database-Extractor")
             print(f"   python wa_kdbe.py")
             print(f"   (Follow on-screen instructions - it will extract the 'key' file)")
-            print(f"\n2️⃣  INSTALL Decryption Tool:")
-            print(f"   pip install pycryptodome")
-            print(f"   git clone https://github.com/EliteAndroidApps/WhatsApp-Crypt14-Decrypter.git")
-            print(f"\n3️⃣  DECRYPT Database:")
-            print(f"   cd WhatsApp-Crypt14-Decrypter")
-            print(f"   python decrypt14.py ..\\extracted\\key ..\\{encrypted_file} ..\\out\\android.db")
+            print(f"\n2️⃣  COPY the extracted key file to: tmp/key")
+            print(f"\n3️⃣  DECRYPT Database (built-in, no extra tools needed):")
+            print(f"   python decrypt_helper.py")
             print(f"\n4️⃣  CONTINUE Migration:")
             print(f"   python main.py")
             print(f"   (Script will detect out/android.db and continue automatically)")
@@ -508,53 +875,28 @@ class AndroidBackupManager:
         """
         try:
             # Determinar versión de encriptación
-            if '.crypt14' in encrypted_file:
-                crypt_version = 14
-            elif '.crypt15' in encrypted_file:
-                crypt_version = 15
-            elif '.crypt12' in encrypted_file:
-                crypt_version = 12
-            else:
+            try:
+                crypt_version = detect_crypt_version(encrypted_file)
+            except ValueError:
                 crypt_version = 14  # Default
             
             self.logger.info(f"Decrypting using crypt version {crypt_version}")
             print(f"[INFO] Using decryption method for crypt{crypt_version}...")
             
-            # Leer clave
-            with open(key_file, 'rb') as f:
-                key_data = f.read()
-            
-            # Verificar tamaño de clave
-            if len(key_data) != 158:  # Tamaño esperado para crypt14/15
-                self.logger.warning(f"Unexpected key size: {len(key_data)} bytes")
-            
-            # Leer archivo encriptado
-            with open(encrypted_file, 'rb') as f:
-                encrypted_data = f.read()
+            result = decrypt_database(
+                encrypted_file, key_file, output_file, version=crypt_version,
+                progress=self._progress(),
+            )
             
-            # Desencriptar (implementación básica para crypt14)
-            # Nota: La desencriptación completa requiere AES-GCM con parámetros específicos
-            # Para versión completa, se recomienda usar herramientas especializadas
+            print(f"[INFO] Decrypted {result.encrypted_size / (1024 * 1024):.2f} MB -> "
+                  f"{result.size / (1024 * 1024):.2f} MB ({result.backend} backend)")
+            return True
             
-            # Por ahora, informar al usuario que use herramienta externa
-            print(f"\n[INFO] Encryption key and database extracted.")
-            print(f"\nFor decryption, please use WhatsApp Viewer or similar tool:")
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Decryption error: {e}")
+            print(f"\n[ERROR] {e}")
             print(f"  - Encrypted file: {encrypted_file}")
             print(f"  - Key file: {key_file}")
-            print(f"  - Output should be: {output_file}")
-            print(f"\nRecommended tools:")
-            print(f"  - WhatsApp Viewer (GitHub)")
-            print(f"  - wa-crypt-tools (GitHub)")
-            print(f"  - Online: https://github.com/EliteAndroidApps/WhatsApp-Crypt14-Decrypter")
-            
-            # TODO: Implementar desencriptación nativa
-            # Requiere: pycryptodome o cryptography library
-            # Por ahora retornamos False para que usuario use herramienta externa
-            
-            return False
-            
-        except Exception as e:
-            self.logger.error(f"Decryption error: {e}")
             return False
     
     def validate_database(self, db_path: str) -> bool:
@@ -706,20 +1048,8 @@ class AndroidBackupManager:
                 self.logger.error("Failed to install legacy APK")
                 return None
             
-            # Crear backup
-            if not self.create_backup():
-                self.logger.error("Failed to create backup")
-                return None
-            
-            input("\nPress Enter once the backup is complete...")
-            
-            # Convertir .ab a .tar
-            if not self.extract_ab_to_tar('tmp/whatsapp.ab', 'tmp/whatsapp.tar'):
-                self.logger.error("Failed to convert .ab to .tar")
-                return None
-            
-            # Extraer msgstore.db
-            android_db = self.extract_msgstore_db('tmp/whatsapp.tar')
+            # Crear backup y extraer msgstore.db en streaming
+            android_db = self.stream_backup()
             if not android_db:
                 self.logger.error("Failed to extract msgstore.db")
                 return None
@@ -0,0 +1,301 @@
+"""
+WhatsApp Android to iOS Migration Tool
+
+Módulo de caché columnar de mensajes Android normalizados.
+
+Permite ejecutar la misma msgstore.db contra varios destinos iOS (o con
+distintas opciones del motor) sin volver a consultar SQLite: los mensajes se
+exportan una vez a un archivo columnar y las siguientes ejecuciones lo
+abren con mmap.
+
+Formato del archivo (little-endian):
+    - Preámbulo: magic b'WAMC', versión (uint32), offset del header (uint64)
+    - Columnas numéricas como arrays contiguos alineados a 8 bytes
+    - Bloques zlib con key_id y texto de TEXT_BLOCK_ROWS filas cada uno
+    - Header JSON: diccionario de JIDs, segmentos por chat, offsets y firma
+      de la fuente
+
+Las filas se guardan ordenadas por (chat, fecha): el orden por chat se lee
+secuencialmente y el orden por fecha se obtiene mezclando los segmentos de
+cada chat con heapq.merge.
+"""
+
+import heapq
+import json
+import logging
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+CACHE_MAGIC = b'WAMC'
+CACHE_VERSION = 2
+PREAMBLE = struct.Struct('<4sIQ')
+
+# Filas por bloque comprimido de key_id/texto
+TEXT_BLOCK_ROWS = 256
+
+# Columnas numéricas: (nombre, typecode, posición en MODERN_MESSAGE_COLUMNS).
+# Los NULL se guardan como 0 (el motor los trata igual).
+NUMERIC_COLUMNS = [
+    ('_id', 'q', 0),
+    ('from_me', 'b', 2),
+    ('timestamp', 'q', 5),
+    ('status', 'i', 6),
+    ('media_type', 'i', 7),
+    ('starred', 'b', 8),
+    ('media_size', 'q', 9),
+]
+
+# Columnas auxiliares: índice de JID y longitudes de cadenas (-1 = NULL)
+AUX_COLUMNS = [
+    ('jid', 'i'),
+    ('key_len', 'i'),
+    ('text_len', 'i'),
+]
+
+
+def _encode(value: Optional[str]) -> Tuple[bytes, int]:
+    """Codifica una cadena opcional como (bytes, longitud o -1)."""
+    if value is None:
+        return b'', -1
+    data = value.encode('utf-8')
+    return data, len(data)
+
+
+def _decode(payload: bytes, offset: int, length: int) -> Tuple[Optional[str], int]:
+    """Decodifica una cadena opcional desde un bloque; retorna (valor, nuevo offset)."""
+    if length < 0:
+        return None, offset
+    return payload[offset:offset + length].decode('utf-8'), offset + length
+
+
+def write_message_cache(path: str, rows: Iterable[tuple], signature: Dict[str, Any]) -> int:
+    """
+    Escribe la caché columnar a partir de filas MODERN_MESSAGE_COLUMNS.
+    
+    Args:
+        path: Ruta del archivo de caché
+        rows: Filas ordenadas por (key_remote_jid, timestamp)
+        signature: Firma de la fuente (DB, filtros, snapshots) para validar reusos
+    
+    Returns:
+        Número de filas escritas
+    
+    Raises:
+        ValueError: Si las filas no llegan agrupadas por chat
+    """
+    logger = logging.getLogger('whatsapp_migration.columnar_cache')
+    
+    columns = {name: array(typecode) for name, typecode, _ in NUMERIC_COLUMNS}
+    columns.update({name: array(typecode) for name, typecode in AUX_COLUMNS})
+    
+    jids: List[Optional[str]] = []
+    jid_index: Dict[Optional[str], int] = {}
+    chats: List[List[int]] = []
+    blocks: List[bytes] = []
+    keys_buffer: List[bytes] = []
+    texts_buffer: List[bytes] = []
+    count = 0
+    
+    def flush_block() -> None:
+        blocks.append(zlib.compress(b''.join(keys_buffer) + b''.join(texts_buffer)))
+        keys_buffer.clear()
+        texts_buffer.clear()
+    
+    for row in rows:
+        jid = row[1]
+        if jid not in jid_index:
+            jid_index[jid] = len(jids)
+            jids.append(jid)
+            chats.append([jid_index[jid], count, count])
+        elif chats[-1][0] != jid_index[jid]:
+            raise ValueError(f"Rows are not grouped by chat (JID seen twice: {jid})")
+        
+        for name, _, position in NUMERIC_COLUMNS:
+            columns[name].append(row[position] or 0)
+        columns['jid'].append(jid_index[jid])
+        
+        key_data, key_len = _encode(row[3])
+        text_data, text_len = _encode(row[4])
+        columns['key_len'].append(key_len)
+        columns['text_len'].append(text_len)
+        keys_buffer.append(key_data)
+        texts_buffer.append(text_data)
+        
+        count += 1
+        chats[-1][2] = count
+        if count % TEXT_BLOCK_ROWS == 0:
+            flush_block()
+    
+    if keys_buffer:
+        flush_block()
+    
+    header: Dict[str, Any] = {
+        'version': CACHE_VERSION,
+        'rows': count,
+        'block_rows': TEXT_BLOCK_ROWS,
+        'signature': signature,
+        'jids': jids,
+        'chats': chats,
+        'columns': {},
+        'blocks': [],
+    }
+    
+    with open(path, 'wb') as f:
+        f.write(PREAMBLE.pack(CACHE_MAGIC, CACHE_VERSION, 0))
+        
+        for name, values in columns.items():
+            f.write(b'\0' * (-f.tell() % 8))
+            if sys.byteorder != 'little':
+                values.byteswap()
+            header['columns'][name] = [values.typecode, f.tell(), len(values) * values.itemsize]
+            values.tofile(f)
+        
+        for block in blocks:
+            header['blocks'].append([f.tell(), len(block)])
+            f.write(block)
+        
+        header_offset = f.tell()
+        f.write(json.dumps(header).encode('utf-8'))
+        f.seek(0)
+        f.write(PREAMBLE.pack(CACHE_MAGIC, CACHE_VERSION, header_offset))
+    
+    logger.info(f"Message cache written: {count:,} rows, {len(jids):,} chats, {len(blocks)} text blocks")
+    return count
+
+
+class ColumnarMessageCache:
+    """Lectura de la caché columnar mediante mmap (columnas sin copia)."""
+    
+    def __init__(self, path: str):
+        """
+        Abre y valida la caché.
+        
+        Args:
+            path: Ruta del archivo de caché
+        
+        Raises:
+            ValueError: Si el archivo no es una caché válida o de otra versión
+        """
+        self.path = path
+        self.logger = logging.getLogger('whatsapp_migration.columnar_cache')
+        self._file = open(path, 'rb')
+        
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Not a message cache: {path}")
+        
+        try:
+            magic, version, header_offset = PREAMBLE.unpack_from(self._mmap, 0)
+            if magic != CACHE_MAGIC:
+                raise ValueError(f"Not a message cache: {path}")
+            if version != CACHE_VERSION:
+                raise ValueError(f"Unsupported message cache version {version}: {path}")
+            self.header = json.loads(self._mmap[header_offset:].decode('utf-8'))
+        except (struct.error, ValueError):
+            self._mmap.close()
+            self._file.close()
+            raise
+        
+        self.jids: List[Optional[str]] = self.header['jids']
+        self.columns: Dict[str, Any] = {}
+        view = memoryview(self._mmap)
+        for name, (typecode, offset, length) in self.header['columns'].items():
+            column = view[offset:offset + length].cast(typecode)
+            if sys.byteorder != 'little':
+                column = array(typecode, column.tobytes())
+                column.byteswap()
+            self.columns[name] = column
+        view.release()
+    
+    @property
+    def signature(self) -> Dict[str, Any]:
+        """Firma de la fuente con la que se exportó la caché."""
+        return self.header['signature']
+    
+    def __len__(self) -> int:
+        return self.header['rows']
+    
+    def close(self) -> None:
+        """Libera las vistas y cierra el mmap."""
+        for column in self.columns.values():
+            if isinstance(column, memoryview):
+                column.release()
+        self.columns = {}
+        self._mmap.close()
+        self._file.close()
+    
+    def __enter__(self) -> 'ColumnarMessageCache':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+    
+    def _iter_range(self, start: int, stop: int) -> Iterator[tuple]:
+        """
+        Recorre filas consecutivas descomprimiendo un bloque a la vez.
+        
+        Yields:
+            Filas con el orden de MODERN_MESSAGE_COLUMNS
+        """
+        block_rows = self.header['block_rows']
+        c = self.columns
+        ids, jid_idx, from_me, key_len, text_len = (
+            c['_id'], c['jid'], c['from_me'], c['key_len'], c['text_len']
+        )
+        timestamps, status, media_type, starred, media_size = (
+            c['timestamp'], c['status'], c['media_type'], c['starred'], c['media_size']
+        )
+        
+        index = start
+        while index < stop:
+            block = index // block_rows
+            block_start = block * block_rows
+            block_stop = min(block_start + block_rows, len(self))
+            offset, length = self.header['blocks'][block]
+            payload = zlib.decompress(self._mmap[offset:offset + length])
+            
+            # Claves primero y textos después dentro de cada bloque
+            key_offsets = []
+            position = 0
+            for i in range(block_start, block_stop):
+                key_offsets.append(position)
+                position += max(key_len[i], 0)
+            text_position = position
+            
+            for i in range(block_start, block_stop):
+                key_id, _ = _decode(payload, key_offsets[i - block_start], key_len[i])
+                text, text_position = _decode(payload, text_position, text_len[i])
+                if i < index or i >= stop:
+                    continue
+                yield (
+                    ids[i], self.jids[jid_idx[i]], from_me[i], key_id, text,
+                    timestamps[i], status[i], media_type[i], starred[i], media_size[i]
+                )
+            index = block_stop
+    
+    def iter_rows(self, order_by: str = 'timestamp') -> Iterator[tuple]:
+        """
+        Recorre los mensajes en el orden pedido por el motor.
+        
+        Args:
+            order_by: 'chat' (lectura secuencial) o 'timestamp' (mezcla de
+                los segmentos por chat, un bloque en memoria por chat)
+        
+        Yields:
+            Filas con el orden de MODERN_MESSAGE_COLUMNS
+        
+        Raises:
+            ValueError: Si el orden no está soportado
+        """
+        if order_by == 'chat':
+            return self._iter_range(0, len(self))
+        if order_by == 'timestamp':
+            segments = [self._iter_range(start, stop) for _, start, stop in self.header['chats']]
+            return heapq.merge(*segments, key=lambda row: row[5])
+        raise ValueError(f"Unsupported cache order: {order_by}")
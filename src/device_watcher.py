@@ -0,0 +1,250 @@
+"""
+WhatsApp Android to iOS Migration Tool
+
+Seguimiento de dispositivos por eventos mediante `host:track-devices`.
+
+El servidor ADB envía el listado completo de dispositivos al conectar y
+cada vez que algo cambia, así que no hace falta sondear `adb devices` ni
+esperar con timeouts fijos: cada listado se compara con el anterior y se
+emiten eventos de conexión, desconexión y cambio de estado (por ejemplo
+'unauthorized' → 'device' al aceptar el diálogo de depuración USB).
+
+La fuente puede ser el socket del servidor (AdbClient) o la salida de
+`adb track-devices`, que usa el mismo formato.
+"""
+
+import logging
+import queue
+import socket
+import subprocess
+import threading
+import time
+from typing import BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from .adb_client import AdbClient, AdbDevice, AdbError, parse_device_list
+
+# Tipos de evento
+ATTACHED = 'attached'
+DETACHED = 'detached'
+STATE_CHANGED = 'state'
+
+# Estado de un dispositivo listo para usarse
+READY_STATE = 'device'
+
+
+class DeviceEvent(NamedTuple):
+    """Cambio observado en la lista de dispositivos."""
+    
+    kind: str
+    serial: str
+    state: Optional[str]
+    previous_state: Optional[str] = None
+    
+    @property
+    def ready(self) -> bool:
+        """True si el dispositivo quedó disponible para comandos adb."""
+        return self.state == READY_STATE
+
+
+def diff_devices(previous: Dict[str, str], current: Dict[str, str]) -> List[DeviceEvent]:
+    """
+    Compara dos listados serial → estado.
+    
+    Args:
+        previous: Listado anterior
+        current: Listado nuevo
+    
+    Returns:
+        Eventos de conexión, cambio de estado y desconexión
+    """
+    events = []
+    for serial, state in current.items():
+        if serial not in previous:
+            events.append(DeviceEvent(ATTACHED, serial, state))
+        elif previous[serial] != state:
+            events.append(DeviceEvent(STATE_CHANGED, serial, state, previous[serial]))
+    for serial, state in previous.items():
+        if serial not in current:
+            events.append(DeviceEvent(DETACHED, serial, None, state))
+    return events
+
+
+def read_device_lists(stream: BinaryIO) -> Iterator[List[AdbDevice]]:
+    """
+    Itera los listados de track-devices (longitud hex + texto) hasta EOF.
+    
+    Args:
+        stream: Flujo binario (socket.makefile o stdout de `adb track-devices`)
+    
+    Yields:
+        Listado completo de dispositivos en cada cambio
+    
+    Raises:
+        AdbError: Si el flujo se corta a mitad de un listado
+    """
+    while True:
+        header = stream.read(4)
+        if not header:
+            return
+        if len(header) < 4:
+            raise AdbError("Truncated track-devices header")
+        length = int(header, 16)
+        payload = stream.read(length) if length else b''
+        if len(payload) < length:
+            raise AdbError("Truncated track-devices listing")
+        yield parse_device_list(payload.decode('utf-8', errors='replace'))
+
+
+class DeviceWatcher:
+    """
+    Observa conexiones de dispositivos y las entrega como eventos.
+    
+    Un hilo lector recibe los listados y los encola; events() los compara
+    con el estado conocido. stop() cierra la fuente y termina la iteración.
+    """
+    
+    def __init__(self, client: Optional[AdbClient] = None, adb_cmd: Optional[str] = None):
+        """
+        Inicializa el observador (no se conecta todavía).
+        
+        Args:
+            client: Cliente ADB por socket (tiene prioridad)
+            adb_cmd: Comando ADB para `adb track-devices` si no hay cliente
+        """
+        if client is None and adb_cmd is None:
+            raise ValueError("DeviceWatcher needs an AdbClient or an adb command")
+        
+        self.logger = logging.getLogger('whatsapp_migration.device_watcher')
+        self.client = client
+        self.adb_cmd = adb_cmd
+        self.devices: Dict[str, str] = {}
+        self._queue: queue.Queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._sock = None
+        self._process = None
+        self._thread = None
+    
+    def __enter__(self) -> 'DeviceWatcher':
+        return self.start()
+    
+    def __exit__(self, *exc) -> None:
+        self.stop()
+    
+    def start(self) -> 'DeviceWatcher':
+        """Abre la fuente de listados y lanza el hilo lector."""
+        if self._thread:
+            return self
+        
+        if self.client:
+            self._sock = self.client.open_track_devices()
+            stream = self._sock.makefile('rb')
+        else:
+            self._process = subprocess.Popen(
+                [self.adb_cmd, 'track-devices'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+            stream = self._process.stdout
+        
+        self._thread = threading.Thread(
+            target=self._read, args=(stream,), name='device-watcher', daemon=True
+        )
+        self._thread.start()
+        return self
+    
+    def _read(self, stream: BinaryIO) -> None:
+        """Hilo lector: encola cada listado; None al terminar, o la excepción."""
+        try:
+            with stream:
+                for devices in read_device_lists(stream):
+                    self._queue.put(devices)
+        except (OSError, ValueError, AdbError) as e:
+            if not self._stopped.is_set():
+                self._queue.put(e)
+        self._queue.put(None)
+    
+    def stop(self) -> None:
+        """Cierra la fuente; events() termina sin error."""
+        self._stopped.set()
+        if self._sock:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock.close()
+        if self._process:
+            if self._process.poll() is None:
+                self._process.kill()
+            self._process.wait()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._queue.put(None)
+    
+    def events(self, timeout: Optional[float] = None) -> Iterator[DeviceEvent]:
+        """
+        Itera los eventos a medida que el servidor informa cambios.
+        
+        Los dispositivos ya conectados al iniciar llegan como ATTACHED.
+        
+        Args:
+            timeout: Segundos máximos de espera en total (None = sin límite)
+        
+        Yields:
+            DeviceEvent por cada cambio
+        
+        Raises:
+            TimeoutError: Si vence el timeout
+            AdbError: Si el servidor cierra la conexión inesperadamente
+        """
+        self.start()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        
+        while True:
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No matching device event after {timeout}s")
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                raise TimeoutError(f"No matching device event after {timeout}s") from None
+            
+            if item is None:
+                if self._stopped.is_set():
+                    return
+                raise AdbError("ADB server closed the device tracking connection")
+            if isinstance(item, Exception):
+                raise item
+            
+            current = {device.serial: device.state for device in item}
+            events = diff_devices(self.devices, current)
+            self.devices = current
+            for event in events:
+                self.logger.info(f"Device {event.kind}: {event.serial} ({event.previous_state} -> {event.state})")
+                yield event
+    
+    def wait_for_device(self, serial: Optional[str] = None, timeout: Optional[float] = None,
+                        on_event: Optional[Callable[[DeviceEvent], None]] = None) -> AdbDevice:
+        """
+        Espera a que un dispositivo quede listo ('device').
+        
+        Args:
+            serial: Dispositivo esperado (None = el primero que quede listo)
+            timeout: Segundos máximos de espera (None = sin límite)
+            on_event: Callback invocado con cada evento recibido
+        
+        Returns:
+            AdbDevice listo
+        
+        Raises:
+            TimeoutError: Si ningún dispositivo queda listo a tiempo
+        """
+        for known_serial, state in self.devices.items():
+            if state == READY_STATE and (serial is None or known_serial == serial):
+                return AdbDevice(known_serial, state)
+        
+        for event in self.events(timeout):
+            if on_event:
+                on_event(event)
+            if event.ready and (serial is None or event.serial == serial):
+                return AdbDevice(event.serial, event.state)
+        raise AdbError("Device watcher stopped")
@@ -0,0 +1,136 @@
+"""
+WhatsApp Android to iOS Migration Tool
+
+Módulo de ordenamiento externo (merge sort con runs en disco).
+
+Sirve para obtener los mensajes en orden de timestamp cuando la tabla
+messages no tiene un índice que lo soporte: en lugar de que SQLite arme un
+B-tree temporal gigante (a veces en un /tmp pequeño), se leen bloques de
+tamaño acotado, se ordenan en memoria, se vuelcan como runs a un directorio
+de trabajo configurable y se mezclan con heapq.merge.
+"""
+
+import heapq
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+# Filas por bloque serializado dentro de un run (memoria por run al mezclar)
+RUN_BLOCK_ROWS = 1024
+
+
+def _write_run(rows: List[tuple], directory: str, index: int) -> str:
+    """
+    Escribe un run ordenado en disco como bloques pickle consecutivos.
+    
+    Las filas se serializan como tuplas (sqlite3.Row no es serializable).
+    
+    Args:
+        rows: Filas ya ordenadas
+        directory: Directorio de trabajo
+        index: Número de run
+    
+    Returns:
+        Ruta del archivo del run
+    """
+    path = os.path.join(directory, f"run_{index:05d}.pkl")
+    with open(path, 'wb') as f:
+        for start in range(0, len(rows), RUN_BLOCK_ROWS):
+            block = [tuple(row) for row in rows[start:start + RUN_BLOCK_ROWS]]
+            pickle.dump(block, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _read_run(path: str) -> Iterator[tuple]:
+    """Lee un run bloque a bloque."""
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                block = pickle.load(f)
+            except EOFError:
+                return
+            yield from block
+
+
+class ExternalSorter:
+    """Ordena un flujo de filas con memoria acotada usando runs en disco."""
+    
+    def __init__(self, key: Callable[[tuple], Any], chunk_rows: int = 100000,
+                 scratch_dir: Optional[str] = None):
+        """
+        Inicializa el sorter.
+        
+        Args:
+            key: Función de ordenamiento aplicada a cada fila
+            chunk_rows: Filas máximas en memoria por run
+            scratch_dir: Directorio donde crear los runs (None = temporal del sistema)
+        
+        Raises:
+            ValueError: Si chunk_rows no es positivo
+        """
+        if chunk_rows <= 0:
+            raise ValueError(f"chunk_rows must be positive, got {chunk_rows}")
+        
+        self.key = key
+        self.chunk_rows = chunk_rows
+        self.scratch_dir = scratch_dir
+        self.runs = 0
+        self.spilled_bytes = 0
+        self.logger = logging.getLogger('whatsapp_migration.external_sort')
+    
+    def sort(self, rows: Iterable[tuple]) -> Iterator[tuple]:
+        """
+        Ordena las filas; el resultado se consume como iterador.
+        
+        Si todo cabe en un solo bloque no se escribe nada a disco. Los runs
+        se eliminan al agotar (o cerrar) el iterador. A igualdad de clave
+        se conserva el orden de entrada.
+        
+        Args:
+            rows: Filas de entrada en cualquier orden
+        
+        Yields:
+            Filas ordenadas por key
+        """
+        iterator = iter(rows)
+        chunk = self._next_chunk(iterator)
+        chunk.sort(key=self.key)
+        
+        if len(chunk) < self.chunk_rows:
+            self.runs = 1 if chunk else 0
+            yield from chunk
+            return
+        
+        if self.scratch_dir:
+            os.makedirs(self.scratch_dir, exist_ok=True)
+        directory = tempfile.mkdtemp(prefix='wa_sort_', dir=self.scratch_dir)
+        
+        try:
+            paths = []
+            while chunk:
+                paths.append(_write_run(chunk, directory, len(paths)))
+                self.spilled_bytes += os.path.getsize(paths[-1])
+                chunk = self._next_chunk(iterator)
+                chunk.sort(key=self.key)
+            
+            self.runs = len(paths)
+            self.logger.info(
+                f"External sort: {self.runs} runs, "
+                f"{self.spilled_bytes / (1024 * 1024):.1f} MB spilled to {directory}"
+            )
+            
+            yield from heapq.merge(*(_read_run(path) for path in paths), key=self.key)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    
+    def _next_chunk(self, iterator: Iterator[tuple]) -> List[tuple]:
+        """Toma hasta chunk_rows filas del iterador."""
+        chunk = []
+        for row in iterator:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_rows:
+                break
+        return chunk
@@ -0,0 +1,105 @@
+"""
+WhatsApp Android to iOS Migration Tool
+
+Módulo de registro de JIDs (internado y normalización).
+
+Cada JID distinto se normaliza una sola vez y recibe un ID entero pequeño;
+los bucles de conversión trabajan con esos IDs y con la misma instancia de
+str por JID, en lugar de reconstruir y hashear cadenas en cada fila.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+USER_SERVER = 's.whatsapp.net'
+
+# Servidores antiguos equivalentes a s.whatsapp.net
+LEGACY_USER_SERVERS = {'c.us', 'whatsapp.net'}
+
+# ID usado para JIDs nulos o vacíos
+NO_JID = -1
+
+_NON_DIGITS = re.compile(r'[\s+\-().]')
+
+
+def normalize_jid(raw: str) -> str:
+    """
+    Normaliza un JID o número de teléfono a su forma canónica.
+    
+    - '+57 300 123 4567' → '573001234567@s.whatsapp.net'
+    - '573001234567@c.us' → '573001234567@s.whatsapp.net'
+    - '573001234567:12@s.whatsapp.net' (sufijo de dispositivo) → sin sufijo
+    - '120363...@g.us' y otros servidores se conservan (servidor en minúsculas)
+    
+    Args:
+        raw: JID o número tal como aparece en la DB o en la línea de comandos
+    
+    Returns:
+        JID normalizado
+    """
+    jid = raw.strip()
+    if '@' not in jid:
+        return f"{_NON_DIGITS.sub('', jid)}@{USER_SERVER}"
+    
+    user, server = jid.rsplit('@', 1)
+    server = server.lower()
+    if server in LEGACY_USER_SERVERS:
+        server = USER_SERVER
+    if server == USER_SERVER:
+        user = user.split(':', 1)[0]
+    return f"{user}@{server}"
+
+
+class JIDRegistry:
+    """Interna JIDs normalizados y les asigna IDs enteros consecutivos."""
+    
+    def __init__(self):
+        """Inicializa el registro vacío."""
+        # JID crudo (o ya normalizado) → ID
+        self._ids: Dict[str, int] = {}
+        # ID → JID normalizado (una única instancia de str por JID)
+        self.jids: List[str] = []
+    
+    def __len__(self) -> int:
+        return len(self.jids)
+    
+    def intern(self, raw: Optional[str]) -> int:
+        """
+        Obtiene el ID de un JID, normalizándolo solo la primera vez.
+        
+        Args:
+            raw: JID crudo (None o vacío para "sin JID")
+        
+        Returns:
+            ID entero del JID normalizado, NO_JID si raw es vacío
+        """
+        if not raw:
+            return NO_JID
+        
+        jid_id = self._ids.get(raw)
+        if jid_id is not None:
+            return jid_id
+        
+        normalized = normalize_jid(raw)
+        jid_id = self._ids.get(normalized)
+        if jid_id is None:
+            jid_id = len(self.jids)
+            self.jids.append(normalized)
+            self._ids[normalized] = jid_id
+        
+        self._ids[raw] = jid_id
+        return jid_id
+    
+    def jid(self, jid_id: int) -> Optional[str]:
+        """
+        Retorna el JID normalizado de un ID.
+        
+        Args:
+            jid_id: ID retornado por intern()
+        
+        Returns:
+            JID normalizado, None para NO_JID
+        """
+        if jid_id == NO_JID:
+            return None
+        return self.jids[jid_id]
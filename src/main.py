@@ -22,6 +22,7 @@ from src.utils import (
 from src.android_backup import AndroidBackupManager
 from src.ios_backup import IOSBackupManager
 from src.migrate import WhatsAppMigrator
+from src.progress import console_progress_bar
 
 
 def validate_dependencies(logger):
@@ -113,8 +114,9 @@ def android_backup_process(whatsapp_type, logger):
         else:
             logger.info("User chose to create new backup")
     
-    # Crear gestor de backup
-    android_mgr = AndroidBackupManager(whatsapp_type)
+    # Crear gestor de backup (las bases encriptadas se descifran en pipeline;
+    # si falla, se repite en pasos separados)
+    android_mgr = AndroidBackupManager(whatsapp_type, pipeline=True)
     
     try:
         # Iniciar ADB
@@ -187,6 +189,19 @@ def android_backup_process(whatsapp_type, logger):
                 # No se encontró ningún archivo
                 logger.warning("Direct extraction failed - no database found")
                 print("\n[WARNING] Could not find WhatsApp database on device.")
+                
+                # Método 3: backup ADB en streaming (solo si la app instalada permite backups)
+                print("\nAn adb backup can still work if the installed WhatsApp allows backups")
+                print("(older versions). It must be confirmed on the device, without a password.")
+                if confirm_action("Try an adb backup now?", default=False):
+                    logger.info("Attempting streamed adb backup...")
+                    android_db = android_mgr.stream_backup()
+                    if android_db and android_mgr.validate_database(android_db):
+                        print("\nYou can now safely disconnect your Android device.")
+                        return android_db
+                    android_db = None
+                    print("\n[WARNING] The adb backup did not provide a usable database.")
+                
                 print("\nThis can happen if:")
                 print("  - WhatsApp doesn't have storage permissions")
                 print("  - Database file is in non-standard location")
@@ -279,9 +294,19 @@ def migration_process(android_db, ios_db, logger):
     
     logger.info(f"Phone number provided: {uid}")
     
+    # Merge es opcional: solo tiene sentido si el iPhone ya tiene parte del historial
+    print("\nDoes the iPhone already have part of this WhatsApp history?")
+    print("If so, messages already present will be skipped instead of duplicated.")
+    merge = input("Merge with existing iPhone messages? (y/N): ").strip().lower() in ('y', 'yes')
+    logger.info(f"Merge with existing messages: {merge}")
+    
     try:
         # Crear migrador
-        migrator = WhatsAppMigrator(android_db, ios_db, uid)
+        migrator = WhatsAppMigrator(
+            android_db, ios_db, uid,
+            progress_callback=console_progress_bar(),
+            merge=merge
+        )
         
         # Ejecutar migración
         output_db = 'out/out.db'
@@ -290,7 +315,8 @@ def migration_process(android_db, ios_db, logger):
         print("\n[INFO] Starting database migration...")
         print("[INFO] This may take several minutes depending on chat history size...")
         
-        stats = migrator.run_migration(output_db)
+        # Compactar la salida reduce el tiempo de copia al backup y de restauración
+        stats = migrator.run_migration(output_db, compact=True)
         
         print("\n" + "="*80)
         print("MIGRATION STATISTICS")
@@ -298,9 +324,12 @@ def migration_process(android_db, ios_db, logger):
         print(f"Android messages:      {stats['android_messages']:,}")
         print(f"iOS messages (before): {stats['ios_messages_before']:,}")
         print(f"Messages migrated:     {stats['migrated']:,}")
+        print(f"Already present:       {stats['duplicates']:,}")
         print(f"Contacts migrated:     {stats['contacts']:,}")
         print(f"Groups migrated:       {stats['groups']:,}")
         print(f"iOS messages (after):  {stats['ios_messages_after']:,}")
+        print(f"Output size:           {stats['size_before'] / (1024 * 1024):.2f} MB → "
+              f"{stats['size_after'] / (1024 * 1024):.2f} MB")
         print("="*80)
         
         return output_db
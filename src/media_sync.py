@@ -0,0 +1,349 @@
+"""
+WhatsApp Android to iOS Migration Tool
+
+Sincronización incremental de la carpeta Media de WhatsApp.
+
+El árbol Media suele pesar decenas de GB y tener decenas de miles de
+archivos, así que copiarlo archivo por archivo es lento. En su lugar:
+
+1. Un único `adb shell` lista ruta, tamaño y mtime de todo el árbol.
+2. El listado se compara con el manifiesto local de la última sincronización.
+3. Solo los archivos nuevos o modificados se piden en lotes como un tar
+   por `adb exec-out`; varios lotes se transfieren en paralelo y cada tar se
+   extrae en streaming, sin archivo intermedio.
+
+El manifiesto se guarda tras cada lote: una sincronización interrumpida
+continúa donde quedó.
+"""
+
+import json
+import logging
+import os
+import re
+import tarfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import BinaryIO, Callable, ContextManager, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .ab_stream import extract_tar_members, tar_member_name
+from .adb_transfer import quote_remote_path
+from .progress import ProgressCallback, ProgressTracker
+
+MEDIA_MANIFEST = '.media_manifest.json'
+DEFAULT_STREAMS = 4
+
+# Tope de bytes por lote: lotes acotados reparten mejor el trabajo entre streams
+BATCH_BYTES = 256 * 1024 * 1024
+
+# Tope de longitud del comando remoto (adb antiguo limita el servicio a 4 KB;
+# los actuales a 1 MB)
+MAX_COMMAND_LENGTH = 32 * 1024
+
+# Línea del listado: mtime, tamaño y ruta relativa ('./WhatsApp Images/...')
+_MANIFEST_LINE = re.compile(r'^(\d+) (\d+) \./(.+)$')
+
+
+class MediaFile(NamedTuple):
+    """Archivo de media con ruta relativa a la raíz Media."""
+    
+    path: str
+    size: int
+    mtime: int
+
+
+class MediaSyncResult(NamedTuple):
+    """Resumen de una sincronización."""
+    
+    root: str
+    remote_files: int
+    changed_files: int
+    transferred_files: int
+    transferred_bytes: int
+    seconds: float
+    failed_batches: int = 0
+    
+    @property
+    def bytes_per_sec(self) -> float:
+        """Throughput agregado de la transferencia."""
+        return self.transferred_bytes / self.seconds if self.seconds > 0 else 0.0
+
+
+def build_manifest_command(roots: Sequence[str]) -> str:
+    """
+    Construye el comando que lista el primer directorio Media existente.
+    
+    Imprime '#<raíz>' y luego una línea 'mtime tamaño ./ruta' por archivo.
+    
+    Args:
+        roots: Directorios Media candidatos, en orden de preferencia
+    
+    Returns:
+        Comando de shell para el dispositivo
+    """
+    quoted = ' '.join(quote_remote_path(root) for root in roots)
+    return (
+        f'for d in {quoted}; do if [ -d "$d" ]; then echo "#$d"; '
+        f"cd \"$d\" && find . -type f -exec stat -c '%Y %s %n' {{}} +; break; fi; done"
+    )
+
+
+def parse_manifest_listing(output: str) -> Tuple[Optional[str], Dict[str, MediaFile]]:
+    """
+    Interpreta la salida de build_manifest_command.
+    
+    Args:
+        output: stdout del comando
+    
+    Returns:
+        (raíz encontrada o None, ruta relativa → MediaFile)
+    """
+    root = None
+    files: Dict[str, MediaFile] = {}
+    for line in output.splitlines():
+        line = line.rstrip('\r')
+        if line.startswith('#') and root is None:
+            root = line[1:]
+            continue
+        match = _MANIFEST_LINE.match(line)
+        if match:
+            path = match.group(3)
+            # Nunca escribir fuera del directorio local
+            if path.startswith('/') or '..' in path.split('/'):
+                continue
+            files[path] = MediaFile(path, int(match.group(2)), int(match.group(1)))
+    return root, files
+
+
+def load_manifest(path: str) -> Dict[str, MediaFile]:
+    """
+    Carga el manifiesto local (vacío si no existe o está dañado).
+    
+    Args:
+        path: Ruta del manifiesto JSON
+    
+    Returns:
+        Ruta relativa → MediaFile sincronizado
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return {name: MediaFile(name, size, mtime) for name, (size, mtime) in data['files'].items()}
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logging.getLogger('whatsapp_migration.media_sync').warning(
+            f"Ignoring unreadable media manifest {path}: {e}"
+        )
+        return {}
+
+
+def save_manifest(path: str, root: str, files: Dict[str, MediaFile]) -> None:
+    """
+    Guarda el manifiesto de forma atómica (.part + rename).
+    
+    Args:
+        path: Ruta del manifiesto JSON
+        root: Directorio Media remoto sincronizado
+        files: Archivos sincronizados
+    """
+    partial_path = path + '.part'
+    with open(partial_path, 'w', encoding='utf-8') as f:
+        json.dump({'root': root, 'files': {name: [m.size, m.mtime] for name, m in files.items()}}, f)
+    os.replace(partial_path, path)
+
+
+def diff_manifest(remote: Dict[str, MediaFile], local: Dict[str, MediaFile],
+                  local_dir: str) -> List[MediaFile]:
+    """
+    Archivos remotos nuevos o modificados respecto del manifiesto local.
+    
+    Un archivo del manifiesto que falta en disco (o cambió de tamaño) se
+    vuelve a pedir.
+    
+    Args:
+        remote: Listado remoto actual
+        local: Manifiesto de la última sincronización
+        local_dir: Directorio local de media
+    
+    Returns:
+        Archivos a transferir, de mayor a menor tamaño
+    """
+    changed = []
+    for name, entry in remote.items():
+        known = local.get(name)
+        if known and (known.size, known.mtime) == (entry.size, entry.mtime):
+            local_path = os.path.join(local_dir, name)
+            if os.path.isfile(local_path) and os.path.getsize(local_path) == entry.size:
+                continue
+        changed.append(entry)
+    changed.sort(key=lambda entry: entry.size, reverse=True)
+    return changed
+
+
+def build_tar_command(root: str, files: Sequence[MediaFile]) -> str:
+    """
+    Comando remoto que emite un tar de los archivos por stdout.
+    
+    Args:
+        root: Directorio Media remoto
+        files: Archivos del lote
+    
+    Returns:
+        Comando de shell para `adb exec-out`
+    """
+    paths = ' '.join(quote_remote_path('./' + entry.path) for entry in files)
+    return f"cd {quote_remote_path(root)} && tar -cf - {paths}"
+
+
+def plan_batches(root: str, files: Sequence[MediaFile], max_bytes: int = BATCH_BYTES,
+                 max_command: int = MAX_COMMAND_LENGTH) -> List[List[MediaFile]]:
+    """
+    Agrupa archivos en lotes acotados por bytes y por longitud del comando.
+    
+    Args:
+        root: Directorio Media remoto
+        files: Archivos a transferir (de mayor a menor tamaño)
+        max_bytes: Bytes máximos por lote (un archivo mayor va solo)
+        max_command: Longitud máxima del comando tar
+    
+    Returns:
+        Lista de lotes
+    """
+    base_length = len(build_tar_command(root, []))
+    batches: List[List[MediaFile]] = []
+    batch: List[MediaFile] = []
+    batch_bytes = 0
+    command_length = base_length
+    
+    for entry in files:
+        entry_length = len(quote_remote_path('./' + entry.path)) + 1
+        if batch and (batch_bytes + entry.size > max_bytes or command_length + entry_length > max_command):
+            batches.append(batch)
+            batch, batch_bytes, command_length = [], 0, base_length
+        batch.append(entry)
+        batch_bytes += entry.size
+        command_length += entry_length
+    
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def extract_batch(stream: BinaryIO, files: Sequence[MediaFile], local_dir: str) -> List[MediaFile]:
+    """
+    Extrae el tar de un lote y restaura el mtime remoto.
+    
+    Args:
+        stream: Flujo del tar
+        files: Archivos pedidos en el lote
+        local_dir: Directorio local de media
+    
+    Returns:
+        Archivos extraídos con el tamaño esperado
+    """
+    targets = {}
+    for entry in files:
+        local_path = os.path.join(local_dir, entry.path)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        targets[entry.path] = local_path
+    
+    extracted = extract_tar_members(stream, targets)
+    
+    completed = []
+    for entry in files:
+        # extract_tar_members normaliza los nombres sin './' inicial
+        if extracted.get(tar_member_name(entry.path)) == entry.size:
+            os.utime(targets[entry.path], (entry.mtime, entry.mtime))
+            completed.append(entry)
+    return completed
+
+
+def sync_media(shell: Callable[[str], str], open_stream: Callable[[str], ContextManager[BinaryIO]],
+               roots: Sequence[str], local_dir: str, streams: int = DEFAULT_STREAMS,
+               progress: Optional[ProgressCallback] = None,
+               batch_bytes: int = BATCH_BYTES) -> MediaSyncResult:
+    """
+    Sincroniza incrementalmente el árbol Media del dispositivo.
+    
+    Args:
+        shell: Ejecuta un comando de shell remoto y retorna su stdout
+        open_stream: Abre `exec-out <comando>` como flujo (context manager)
+        roots: Directorios Media candidatos
+        local_dir: Directorio local de destino
+        streams: Lotes transferidos en paralelo
+        progress: Callback de progreso (bytes transferidos)
+        batch_bytes: Bytes máximos por lote tar
+    
+    Returns:
+        MediaSyncResult de la sincronización
+    
+    Raises:
+        FileNotFoundError: Si no existe ningún directorio Media en el dispositivo
+    """
+    logger = logging.getLogger('whatsapp_migration.media_sync')
+    started = time.perf_counter()
+    
+    root, remote = parse_manifest_listing(shell(build_manifest_command(roots)))
+    if root is None:
+        raise FileNotFoundError(f"No WhatsApp media directory on device (tried: {', '.join(roots)})")
+    
+    os.makedirs(local_dir, exist_ok=True)
+    manifest_path = os.path.join(local_dir, MEDIA_MANIFEST)
+    synced = load_manifest(manifest_path)
+    
+    # Archivos borrados en el dispositivo: salen del manifiesto (la copia local se conserva)
+    removed = [name for name in synced if name not in remote]
+    for name in removed:
+        del synced[name]
+    if removed:
+        logger.info(f"{len(removed):,} files no longer on device, dropped from manifest")
+        save_manifest(manifest_path, root, synced)
+    
+    changed = diff_manifest(remote, synced, local_dir)
+    batches = plan_batches(root, changed, batch_bytes)
+    
+    total_bytes = sum(entry.size for entry in changed)
+    logger.info(
+        f"Media at {root}: {len(remote):,} files, {len(changed):,} to transfer "
+        f"({total_bytes / (1024 * 1024):.1f} MB in {len(batches)} batches)"
+    )
+    
+    tracker = ProgressTracker(progress, total_bytes)
+    lock = threading.Lock()
+    transferred: List[MediaFile] = []
+    transferred_bytes = 0
+    failed_batches = 0
+    
+    def transfer(batch: List[MediaFile]) -> List[MediaFile]:
+        nonlocal transferred_bytes
+        with open_stream(build_tar_command(root, batch)) as stream:
+            completed = extract_batch(stream, batch, local_dir)
+        with lock:
+            transferred.extend(completed)
+            transferred_bytes += sum(entry.size for entry in completed)
+            for entry in completed:
+                synced[entry.path] = entry
+            save_manifest(manifest_path, root, synced)
+            tracker.update(transferred_bytes)
+        return completed
+    
+    with ThreadPoolExecutor(max_workers=max(1, streams), thread_name_prefix='media') as pool:
+        futures = {pool.submit(transfer, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                completed = future.result()
+            except (OSError, RuntimeError, ValueError, tarfile.TarError) as e:
+                failed_batches += 1
+                logger.error(f"Media batch of {len(batch)} files failed: {e}")
+                continue
+            if len(completed) < len(batch):
+                logger.warning(f"{len(batch) - len(completed)} files of a batch were not received")
+    
+    tracker.finish(transferred_bytes)
+    
+    return MediaSyncResult(
+        root, len(remote), len(changed), len(transferred), transferred_bytes,
+        time.perf_counter() - started, failed_batches,
+    )
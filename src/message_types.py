@@ -0,0 +1,229 @@
+"""
+WhatsApp Android to iOS Migration Tool
+
+Módulo de traducción de tipos y estados de mensaje Android → iOS.
+
+Las traducciones se definen una sola vez como diccionarios código → código
+y se materializan como tablas indexadas por el código Android (tuplas), de
+modo que la conversión por fila es un acceso por índice. Las mismas
+definiciones generan expresiones SQL CASE para traducir dentro de SQLite.
+
+Los códigos iOS corresponden a los observados en ChatStorage.sqlite; un
+código Android desconocido se traduce al valor por defecto de cada tabla.
+"""
+
+from typing import Dict, Optional, Sequence, Tuple
+
+# --- Android: messages.media_wa_type ---
+ANDROID_MEDIA_TEXT = 0
+ANDROID_MEDIA_IMAGE = 1
+ANDROID_MEDIA_AUDIO = 2
+ANDROID_MEDIA_VIDEO = 3
+ANDROID_MEDIA_CONTACT = 4
+ANDROID_MEDIA_LOCATION = 5
+ANDROID_MEDIA_URL = 7
+ANDROID_MEDIA_DOCUMENT = 9
+ANDROID_MEDIA_GIF = 13
+ANDROID_MEDIA_CONTACT_ARRAY = 14
+ANDROID_MEDIA_REVOKED = 15
+ANDROID_MEDIA_LIVE_LOCATION = 16
+ANDROID_MEDIA_STICKER = 20
+ANDROID_MEDIA_VIEW_ONCE_IMAGE = 42
+ANDROID_MEDIA_VIEW_ONCE_VIDEO = 43
+
+# --- Android: messages.status ---
+ANDROID_STATUS_RECEIVED = 0
+ANDROID_STATUS_WAITING_ON_SERVER = 4
+ANDROID_STATUS_RECEIVED_AT_SERVER = 5
+ANDROID_STATUS_CONTROL = 6  # Mensaje de sistema; media_size indica el subtipo
+ANDROID_STATUS_PLAYED = 8
+ANDROID_STATUS_READ = 13
+
+# --- Android: subtipo de mensaje de sistema (messages.media_size con status 6) ---
+ANDROID_ACTION_SUBJECT_CHANGED = 1
+ANDROID_ACTION_PARTICIPANT_JOINED = 4
+ANDROID_ACTION_PARTICIPANT_LEFT = 5
+ANDROID_ACTION_PICTURE_CHANGED = 6
+ANDROID_ACTION_PARTICIPANT_REMOVED = 7
+ANDROID_ACTION_GROUP_CREATED = 11
+ANDROID_ACTION_PARTICIPANT_ADDED = 12
+ANDROID_ACTION_PICTURE_REMOVED = 14
+
+# --- iOS: ZWAMESSAGE.ZMESSAGETYPE ---
+IOS_TYPE_TEXT = 0
+IOS_TYPE_IMAGE = 1
+IOS_TYPE_VIDEO = 2
+IOS_TYPE_AUDIO = 3
+IOS_TYPE_CONTACT = 4
+IOS_TYPE_LOCATION = 5
+IOS_TYPE_GROUP_EVENT = 6
+IOS_TYPE_URL = 7
+IOS_TYPE_DOCUMENT = 8
+IOS_TYPE_GIF = 11
+IOS_TYPE_REVOKED = 14
+IOS_TYPE_STICKER = 15
+
+# --- iOS: ZWAMESSAGE.ZMESSAGESTATUS ---
+IOS_STATUS_PENDING = 0
+IOS_STATUS_SENT = 1
+IOS_STATUS_DELIVERED = 2
+IOS_STATUS_READ = 3
+IOS_STATUS_PLAYED = 4
+IOS_STATUS_RECEIVED = 5
+
+# --- iOS: ZWAMESSAGE.ZGROUPEVENTTYPE ---
+IOS_EVENT_NONE = 0
+IOS_EVENT_SUBJECT_CHANGED = 1
+IOS_EVENT_MEMBER_JOINED = 2
+IOS_EVENT_MEMBER_LEFT = 3
+IOS_EVENT_PICTURE_CHANGED = 4
+IOS_EVENT_PICTURE_REMOVED = 5
+IOS_EVENT_MEMBER_REMOVED = 6
+IOS_EVENT_MEMBER_ADDED = 7
+IOS_EVENT_GROUP_CREATED = 11
+
+MEDIA_TYPE_MAP: Dict[int, int] = {
+    ANDROID_MEDIA_TEXT: IOS_TYPE_TEXT,
+    ANDROID_MEDIA_IMAGE: IOS_TYPE_IMAGE,
+    ANDROID_MEDIA_AUDIO: IOS_TYPE_AUDIO,
+    ANDROID_MEDIA_VIDEO: IOS_TYPE_VIDEO,
+    ANDROID_MEDIA_CONTACT: IOS_TYPE_CONTACT,
+    ANDROID_MEDIA_LOCATION: IOS_TYPE_LOCATION,
+    ANDROID_MEDIA_URL: IOS_TYPE_URL,
+    ANDROID_MEDIA_DOCUMENT: IOS_TYPE_DOCUMENT,
+    ANDROID_MEDIA_GIF: IOS_TYPE_GIF,
+    ANDROID_MEDIA_CONTACT_ARRAY: IOS_TYPE_CONTACT,
+    ANDROID_MEDIA_REVOKED: IOS_TYPE_REVOKED,
+    ANDROID_MEDIA_LIVE_LOCATION: IOS_TYPE_LOCATION,
+    ANDROID_MEDIA_STICKER: IOS_TYPE_STICKER,
+    ANDROID_MEDIA_VIEW_ONCE_IMAGE: IOS_TYPE_IMAGE,
+    ANDROID_MEDIA_VIEW_ONCE_VIDEO: IOS_TYPE_VIDEO,
+}
+
+STATUS_MAP: Dict[int, int] = {
+    ANDROID_STATUS_RECEIVED: IOS_STATUS_RECEIVED,
+    ANDROID_STATUS_WAITING_ON_SERVER: IOS_STATUS_PENDING,
+    ANDROID_STATUS_RECEIVED_AT_SERVER: IOS_STATUS_SENT,
+    ANDROID_STATUS_CONTROL: IOS_STATUS_RECEIVED,
+    ANDROID_STATUS_PLAYED: IOS_STATUS_PLAYED,
+    ANDROID_STATUS_READ: IOS_STATUS_READ,
+}
+
+GROUP_EVENT_MAP: Dict[int, int] = {
+    ANDROID_ACTION_SUBJECT_CHANGED: IOS_EVENT_SUBJECT_CHANGED,
+    ANDROID_ACTION_PARTICIPANT_JOINED: IOS_EVENT_MEMBER_JOINED,
+    ANDROID_ACTION_PARTICIPANT_LEFT: IOS_EVENT_MEMBER_LEFT,
+    ANDROID_ACTION_PICTURE_CHANGED: IOS_EVENT_PICTURE_CHANGED,
+    ANDROID_ACTION_PARTICIPANT_REMOVED: IOS_EVENT_MEMBER_REMOVED,
+    ANDROID_ACTION_GROUP_CREATED: IOS_EVENT_GROUP_CREATED,
+    ANDROID_ACTION_PARTICIPANT_ADDED: IOS_EVENT_MEMBER_ADDED,
+    ANDROID_ACTION_PICTURE_REMOVED: IOS_EVENT_PICTURE_REMOVED,
+}
+
+# Valores por defecto para códigos desconocidos
+MEDIA_TYPE_DEFAULT = IOS_TYPE_TEXT
+STATUS_DEFAULT = IOS_STATUS_PENDING
+GROUP_EVENT_DEFAULT = IOS_EVENT_NONE
+
+
+def build_table(mapping: Dict[int, int], default: int) -> Tuple[int, ...]:
+    """
+    Materializa un mapeo como tabla indexada por el código Android.
+    
+    Args:
+        mapping: Código Android → código iOS
+        default: Valor de las posiciones sin mapeo
+    
+    Returns:
+        Tupla de largo max(código) + 1
+    """
+    table = [default] * (max(mapping) + 1)
+    for android_code, ios_code in mapping.items():
+        table[android_code] = ios_code
+    return tuple(table)
+
+
+MEDIA_TYPE_TABLE = build_table(MEDIA_TYPE_MAP, MEDIA_TYPE_DEFAULT)
+STATUS_TABLE = build_table(STATUS_MAP, STATUS_DEFAULT)
+GROUP_EVENT_TABLE = build_table(GROUP_EVENT_MAP, GROUP_EVENT_DEFAULT)
+
+
+def lookup(table: Sequence[int], code: Optional[int], default: int) -> int:
+    """
+    Traduce un código con una tabla indexada.
+    
+    Args:
+        table: Tabla creada con build_table()
+        code: Código Android (None o fuera de rango → default)
+        default: Valor por defecto de la tabla
+    
+    Returns:
+        Código iOS
+    """
+    if code is None or not 0 <= code < len(table):
+        return default
+    return table[code]
+
+
+def translate_message(media_type: Optional[int], status: Optional[int],
+                      action: Optional[int] = None) -> Tuple[int, int, int]:
+    """
+    Traduce tipo, estado y subtipo de sistema de una fila Android.
+    
+    Los mensajes de control (status 6) son eventos de grupo: su tipo iOS
+    es IOS_TYPE_GROUP_EVENT y el subtipo sale de media_size (action).
+    
+    Args:
+        media_type: messages.media_wa_type
+        status: messages.status
+        action: messages.media_size (solo relevante en mensajes de control)
+    
+    Returns:
+        Tupla (ZMESSAGETYPE, ZMESSAGESTATUS, ZGROUPEVENTTYPE)
+    """
+    ios_status = lookup(STATUS_TABLE, status, STATUS_DEFAULT)
+    if status == ANDROID_STATUS_CONTROL:
+        return IOS_TYPE_GROUP_EVENT, ios_status, lookup(GROUP_EVENT_TABLE, action, GROUP_EVENT_DEFAULT)
+    return lookup(MEDIA_TYPE_TABLE, media_type, MEDIA_TYPE_DEFAULT), ios_status, IOS_EVENT_NONE
+
+
+def sql_case(mapping: Dict[int, int], expression: str, default: int) -> str:
+    """
+    Genera una expresión SQL CASE equivalente a un mapeo.
+    
+    Args:
+        mapping: Código Android → código iOS
+        expression: Expresión SQL con el código Android (ej: 'm.media_wa_type')
+        default: Valor para códigos sin mapeo (incluido NULL)
+    
+    Returns:
+        Expresión CASE lista para usar en un SELECT
+    """
+    branches = ' '.join(
+        f"WHEN {android_code} THEN {ios_code}"
+        for android_code, ios_code in sorted(mapping.items())
+    )
+    return f"(CASE {expression} {branches} ELSE {default} END)"
+
+
+def message_type_sql(media_type: str = 'CAST(m.media_wa_type AS INTEGER)',
+                     status: str = 'm.status') -> str:
+    """Expresión SQL de ZMESSAGETYPE (ver translate_message); media_wa_type es TEXT en msgstore.db."""
+    return (
+        f"(CASE WHEN {status} = {ANDROID_STATUS_CONTROL} THEN {IOS_TYPE_GROUP_EVENT} "
+        f"ELSE {sql_case(MEDIA_TYPE_MAP, media_type, MEDIA_TYPE_DEFAULT)} END)"
+    )
+
+
+def message_status_sql(status: str = 'm.status') -> str:
+    """Expresión SQL de ZMESSAGESTATUS (ver translate_message)."""
+    return sql_case(STATUS_MAP, status, STATUS_DEFAULT)
+
+
+def group_event_sql(status: str = 'm.status', action: str = 'm.media_size') -> str:
+    """Expresión SQL de ZGROUPEVENTTYPE (ver translate_message)."""
+    return (
+        f"(CASE WHEN {status} = {ANDROID_STATUS_CONTROL} "
+        f"THEN {sql_case(GROUP_EVENT_MAP, action, GROUP_EVENT_DEFAULT)} "
+        f"ELSE {IOS_EVENT_NONE} END)"
+    )
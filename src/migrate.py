@@ -6,21 +6,137 @@ Convierte esquema Android (msgstore.db) a esquema iOS (ChatStorage.sqlite).
 """
 
 import argparse
+import heapq
 import logging
 import os
 import sqlite3
 import sys
-from typing import Dict, List, Tuple, Optional
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterator, List, Tuple, Optional
+
+try:
+    from .profiling import PhaseProfiler, get_peak_rss
+    from .progress import ProgressCallback, ProgressTracker, console_progress_bar
+    from .snapshots import SnapshotMerger
+    from .external_sort import ExternalSorter
+    from .columnar_cache import ColumnarMessageCache, write_message_cache
+    from .jid_registry import NO_JID, JIDRegistry, normalize_jid
+    from .message_types import IOS_STATUS_PLAYED, IOS_STATUS_READ, translate_message
+except ImportError:
+    # Ejecución directa como script (python src/migrate.py)
+    from profiling import PhaseProfiler, get_peak_rss
+    from progress import ProgressCallback, ProgressTracker, console_progress_bar
+    from snapshots import SnapshotMerger
+    from external_sort import ExternalSorter
+    from columnar_cache import ColumnarMessageCache, write_message_cache
+    from jid_registry import NO_JID, JIDRegistry, normalize_jid
+    from message_types import IOS_STATUS_PLAYED, IOS_STATUS_READ, translate_message
 
 # Constante de conversión de timestamps
 # Unix Epoch (1970-01-01) a Apple Epoch (2001-01-01)
 TIMESTAMP_OFFSET = 978307200  # segundos entre 1970 y 2001
 
+# Tamaño de página usado al compactar la base de datos de salida.
+# 4096 coincide con el tamaño de página por defecto de SQLite en iOS.
+DEFAULT_PAGE_SIZE = 4096
+
+# Columnas Android leídas por el motor moderno (orden de _convert_modern_row)
+MODERN_MESSAGE_COLUMNS = """
+                m._id,
+                m.key_remote_jid,
+                m.key_from_me,
+                m.key_id,
+                m.data,
+                m.timestamp,
+                m.status,
+                CAST(COALESCE(m.media_wa_type, 0) AS INTEGER) as media_type,
+                COALESCE(m.starred, 0) as starred,
+                COALESCE(m.media_size, 0) as media_size"""
+
+# Inserción de un mensaje en ZWAMESSAGE (parámetros de _convert_modern_row)
+INSERT_MESSAGE_SQL = """
+    INSERT INTO ZWAMESSAGE (
+        Z_PK, Z_ENT, Z_OPT,
+        ZISFROMME, ZMESSAGESTATUS, ZMESSAGETYPE, ZGROUPEVENTTYPE, ZISSTARRED,
+        ZTEXT, ZMESSAGEDATE, ZSENTDATE, ZRECEIVEDDATE,
+        ZTOJID, ZFROMJID, ZSTANZAID, ZCHATSESSION, ZSORT
+    ) VALUES (?, 1, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Orden de lectura de mensajes Android soportado por _modern_messages_query
+MESSAGE_ORDERS = {
+    'timestamp': "m.timestamp ASC",
+    'chat': "m.key_remote_jid ASC, m.timestamp ASC",
+    # normalize_jid se registra como función SQL en connect_databases: las
+    # variantes de un mismo JID (@c.us, sufijo de dispositivo) quedan juntas
+    'normalized_chat': "normalize_jid(m.key_remote_jid) ASC, m.timestamp ASC",
+    'rowid': "m._id ASC",
+}
+
+# Claves Python equivalentes a MESSAGE_ORDERS para el ordenamiento externo
+MESSAGE_SORT_KEYS = {
+    'timestamp': lambda row: row[5] or 0,
+    'chat': lambda row: (row[1] or '', row[5] or 0),
+    'normalized_chat': lambda row: (normalize_jid(row[1]) if row[1] else '', row[5] or 0),
+}
+
+# Filas por bloque leído en orden de rowid y por run del ordenamiento externo
+DEFAULT_SORT_CHUNK_ROWS = 100000
+
+# Filas acumuladas antes de aplicar un lote de UPDATE de ZSORT
+SORT_UPDATE_BATCH = 1000
+
+# Filas acumuladas antes de aplicar un lote de UPDATE de tablas relacionadas
+RELATED_UPDATE_BATCH = 1000
+
+# Índice temporal creado en la DB Android para los filtros de chat/fecha
+FILTER_INDEX_NAME = 'migration_tmp_jid_timestamp'
+
+# Identidad de un mensaje: (ID del chat en jid_registry, enviado por mí, key_id).
+# El key_id lo genera el emisor y solo es único dentro de un chat y dirección.
+MessageKey = Tuple[int, int, str]
+
+
+def to_android_timestamp(value: Any) -> Optional[int]:
+    """
+    Convierte una fecha a timestamp Android (ms desde Unix epoch, UTC).
+    
+    Args:
+        value: None, int (ms), datetime, date o cadena ISO (YYYY-MM-DD[THH:MM[:SS]])
+    
+    Returns:
+        Timestamp en milisegundos, None si value es None
+    
+    Raises:
+        ValueError: Si la cadena no es una fecha válida
+    """
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
 
 class WhatsAppMigrator:
     """Migrador de bases de datos WhatsApp Android → iOS."""
     
-    def __init__(self, android_db_path: str, ios_db_path: str, phone_number: str):
+    def __init__(self, android_db_path: str, ios_db_path: str, phone_number: str,
+                 progress_callback: Optional[ProgressCallback] = None,
+                 progress_interval: float = 0.5, merge: bool = False,
+                 interleave: bool = False, chats: Optional[List[str]] = None,
+                 exclude_chats: Optional[List[str]] = None,
+                 since: Any = None, until: Any = None,
+                 snapshots: Optional[List[str]] = None,
+                 external_sort: bool = False,
+                 sort_chunk_rows: int = DEFAULT_SORT_CHUNK_ROWS,
+                 scratch_dir: Optional[str] = None,
+                 message_cache: Optional[str] = None):
         """
         Inicializa el migrador.
         
@@ -28,6 +144,24 @@ class WhatsAppMigrator:
             android_db_path: Ruta a msgstore.db (Android)
             ios_db_path: Ruta a ChatStorage.sqlite (iOS)
             phone_number: Número de teléfono con código de país
+            progress_callback: Callback opcional que recibe ProgressInfo
+            progress_interval: Segundos mínimos entre llamadas al callback
+            merge: Si True, omite mensajes cuyo (chat, dirección, key_id) ya
+                existe en la salida como ZSTANZAID
+            interleave: Si True, intercala el historial Android con los chats
+                iOS existentes asignando ZSORT por (chat, fecha)
+            chats: Solo migrar estos chats (números o JIDs)
+            exclude_chats: No migrar estos chats (números o JIDs)
+            since: Solo mensajes desde esta fecha (inclusive, ver to_android_timestamp)
+            until: Solo mensajes anteriores a esta fecha (exclusive)
+            snapshots: Snapshots msgstore.db antiguos (descifrados) a mezclar
+                con android_db_path, que tiene prioridad ante duplicados
+            external_sort: Si True, lee messages en orden de rowid por bloques
+                y ordena con runs en disco en vez de ORDER BY en SQLite
+            sort_chunk_rows: Filas por bloque/run del ordenamiento externo
+            scratch_dir: Directorio para los runs (None = temporal del sistema)
+            message_cache: Caché columnar creada con export_message_cache() a
+                usar en lugar de consultar msgstore.db
         """
         self.android_db_path = android_db_path
         self.ios_db_path = ios_db_path
@@ -38,6 +172,71 @@ class WhatsAppMigrator:
         self.ios_conn: Optional[sqlite3.Connection] = None
         self.output_conn: Optional[sqlite3.Connection] = None
         self.schema_version: Optional[str] = None
+        
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+        self.merge = merge
+        self.interleave = interleave
+        
+        # Filtros empujados a la consulta SQL de Android
+        self.chats = [normalize_jid(c) for c in chats] if chats else None
+        self.exclude_chats = [normalize_jid(c) for c in exclude_chats] if exclude_chats else None
+        self.since = to_android_timestamp(since)
+        self.until = to_android_timestamp(until)
+        self._filter_index_created = False
+        self._raw_chat_jids: Optional[Dict[str, List[str]]] = None
+        
+        # Snapshots adicionales mezclados con SnapshotMerger
+        self.snapshots = list(snapshots) if snapshots else []
+        self.snapshot_duplicates = 0
+        
+        # Ordenamiento externo para tablas sin índice de timestamp
+        self.external_sort = external_sort
+        self.sort_chunk_rows = sort_chunk_rows
+        self.scratch_dir = scratch_dir
+        
+        # Caché columnar de mensajes Android ya normalizados
+        self.message_cache = message_cache
+        
+        # JIDs internados: cada JID distinto se normaliza una sola vez
+        self.jid_registry = JIDRegistry()
+        
+        # JID propio (ZFROMJID de los mensajes enviados), normalizado una vez
+        self.own_jid = self._normalized_jid(phone_number)
+        
+        # Chats iOS existentes: ID de JID → Z_PK de ZWACHATSESSION
+        self._chat_sessions: Dict[int, int] = {}
+        
+        # Último chat resuelto: (JID crudo, ID, JID normalizado, Z_PK del chat).
+        # Las filas llegan en rachas del mismo chat, que se resuelven una vez
+        self._chat_run: Tuple[Optional[str], int, Optional[str], Optional[int]] = (
+            None, NO_JID, None, None
+        )
+        
+        # Recibos precargados: MessageKey → (enviado, recibido, leído) en ms Android
+        self._receipt_dates: Dict[MessageKey, Tuple[Optional[int], Optional[int], Optional[int]]] = {}
+        
+        # Mensajes migrados: MessageKey → Z_PK iOS (tablas relacionadas)
+        self._message_ids: Optional[Dict[MessageKey, int]] = None
+    
+    def set_progress_callback(self, callback: Optional[ProgressCallback],
+                              interval: float = 0.5) -> None:
+        """
+        Registra el callback de progreso de la migración.
+        
+        El callback recibe ProgressInfo (filas hechas, total, tasa y ETA) y
+        se invoca como máximo una vez cada `interval` segundos.
+        
+        Args:
+            callback: Función a invocar, None para desactivar reportes
+            interval: Segundos mínimos entre llamadas
+        """
+        self.progress_callback = callback
+        self.progress_interval = interval
+    
+    def _create_progress_tracker(self, total: int) -> ProgressTracker:
+        """Crea un ProgressTracker con la configuración del migrador."""
+        return ProgressTracker(self.progress_callback, total, self.progress_interval)
     
     def detect_schema_version(self) -> str:
         """
@@ -83,12 +282,35 @@ class WhatsAppMigrator:
             self.ios_conn = sqlite3.connect(self.ios_db_path)
             self.ios_conn.row_factory = sqlite3.Row
             
+            # normalize_jid() en SQL para ordenar por chat normalizado (interleave)
+            for conn in (self.android_conn, self.ios_conn):
+                conn.create_function('normalize_jid', 1, self._normalized_jid, deterministic=True)
+            
             self.logger.info("Database connections successful")
             
         except sqlite3.Error as e:
             self.logger.error(f"Database connection error: {e}")
             raise RuntimeError(f"Failed to connect to databases: {e}")
     
+    def _normalized_jid(self, raw: Optional[str]) -> str:
+        """JID normalizado vía jid_registry ('' si raw es vacío)."""
+        return self.jid_registry.jid(self.jid_registry.intern(raw)) or ''
+    
+    def _resolve_chat(self, raw: Optional[str]) -> Tuple[Optional[str], int, Optional[str], Optional[int]]:
+        """
+        Resuelve el JID de una fila, reutilizando el resultado mientras no cambie el chat.
+        
+        Args:
+            raw: key_remote_jid tal como viene de Android
+        
+        Returns:
+            Tupla (JID crudo, ID de JID, JID normalizado, Z_PK del chat iOS o None)
+        """
+        if raw != self._chat_run[0]:
+            jid_id = self.jid_registry.intern(raw)
+            self._chat_run = (raw, jid_id, self.jid_registry.jid(jid_id), self._chat_sessions.get(jid_id))
+        return self._chat_run
+    
     def analyze_android_schema(self) -> Dict[str, List[str]]:
         """
         Analiza el esquema de la base de datos Android.
@@ -237,6 +459,475 @@ class WhatsAppMigrator:
             self.logger.error(f"Error copying iOS schema: {e}")
             raise
     
+    def compact_output(self, output_path: str, page_size: int = DEFAULT_PAGE_SIZE) -> Dict[str, int]:
+        """
+        Compacta la base de datos de salida con VACUUM INTO.
+        
+        Tras inserciones masivas el archivo queda fragmentado y con páginas
+        libres. Se escribe una copia compacta con el page_size indicado y
+        luego reemplaza al original.
+        
+        Args:
+            output_path: Ruta de la base de datos de salida (cerrada)
+            page_size: Tamaño de página de la copia (potencia de 2, 512-65536)
+        
+        Returns:
+            Diccionario con 'size_before', 'size_after' y 'page_size'
+        
+        Raises:
+            ValueError: Si page_size no es válido
+        """
+        if page_size < 512 or page_size > 65536 or page_size & (page_size - 1):
+            raise ValueError(f"Invalid page size: {page_size} (must be a power of 2 between 512 and 65536)")
+        
+        compact_path = f"{output_path}.compact"
+        if os.path.exists(compact_path):
+            os.remove(compact_path)
+        
+        conn = sqlite3.connect(output_path)
+        try:
+            # Volcar WAL pendiente para medir el tamaño real del archivo
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            size_before = os.path.getsize(output_path)
+            
+            self.logger.info(f"Compacting output database (page_size={page_size})...")
+            conn.execute(f"PRAGMA page_size = {page_size}")
+            conn.execute("VACUUM INTO ?", (compact_path,))
+        except sqlite3.Error as e:
+            self.logger.error(f"Error compacting output database: {e}")
+            if os.path.exists(compact_path):
+                os.remove(compact_path)
+            raise
+        finally:
+            conn.close()
+        
+        os.replace(compact_path, output_path)
+        size_after = os.path.getsize(output_path)
+        
+        self.logger.info(
+            f"Output compacted: {size_before / (1024 * 1024):.2f} MB → "
+            f"{size_after / (1024 * 1024):.2f} MB"
+        )
+        
+        return {
+            'size_before': size_before,
+            'size_after': size_after,
+            'page_size': page_size
+        }
+    
+    def _has_filters(self) -> bool:
+        """Indica si hay filtros de chat o fecha configurados."""
+        return any(f is not None for f in (self.chats, self.exclude_chats, self.since, self.until))
+    
+    def _message_filters(self) -> Tuple[List[str], List[Any]]:
+        """
+        Construye los predicados WHERE de la consulta de mensajes Android.
+        
+        Los filtros de chat y fecha se expresan sobre (key_remote_jid,
+        timestamp) para que SQLite los resuelva con el índice, de modo que
+        las filas descartadas nunca se leen ni se convierten.
+        
+        Returns:
+            Tupla (condiciones, parámetros)
+        """
+        conditions = ["m.data IS NOT NULL"]
+        params: List[Any] = []
+        
+        if self.chats:
+            chats = self._raw_jid_variants(self.chats)
+            conditions.append(f"m.key_remote_jid IN ({', '.join('?' * len(chats))})")
+            params.extend(chats)
+        if self.exclude_chats:
+            exclude_chats = self._raw_jid_variants(self.exclude_chats)
+            conditions.append(f"m.key_remote_jid NOT IN ({', '.join('?' * len(exclude_chats))})")
+            params.extend(exclude_chats)
+        if self.since is not None:
+            conditions.append("m.timestamp >= ?")
+            params.append(self.since)
+        if self.until is not None:
+            conditions.append("m.timestamp < ?")
+            params.append(self.until)
+        
+        return conditions, params
+    
+    def _raw_jid_variants(self, jids: List[str]) -> List[str]:
+        """
+        Expande JIDs normalizados a las formas crudas guardadas en key_remote_jid.
+        
+        Android guarda algunos chats como '@c.us' o con sufijo ':dispositivo',
+        así que comparar solo el JID canónico dejaría pasar esas filas. Los
+        JIDs distintos de Android y de los snapshots se recorren una vez; el
+        filtro sigue siendo un IN sobre la columna cruda y usa el índice.
+        
+        Args:
+            jids: JIDs normalizados del filtro
+        
+        Returns:
+            JIDs del filtro más sus variantes crudas presentes en las bases
+        """
+        if self._raw_chat_jids is None:
+            raw_jids = set()
+            sql = "SELECT DISTINCT key_remote_jid FROM messages WHERE key_remote_jid IS NOT NULL"
+            raw_jids.update(row[0] for row in self.android_conn.execute(sql))
+            for path in self.snapshots:
+                if not os.path.exists(path):
+                    continue
+                conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+                try:
+                    raw_jids.update(row[0] for row in conn.execute(sql))
+                except sqlite3.OperationalError:
+                    # Sin tabla messages: SnapshotMerger.open() lo reporta
+                    pass
+                finally:
+                    conn.close()
+            
+            self._raw_chat_jids = {}
+            for raw in raw_jids:
+                self._raw_chat_jids.setdefault(normalize_jid(raw), []).append(raw)
+        
+        values = set(jids)
+        for jid in jids:
+            values.update(self._raw_chat_jids.get(jid, ()))
+        return sorted(values)
+    
+    def _ensure_filter_index(self) -> None:
+        """
+        Crea un índice temporal (key_remote_jid, timestamp) si no existe uno equivalente.
+        
+        El índice se elimina en _drop_filter_index() al terminar. Si la DB
+        Android es de solo lectura se continúa sin índice.
+        """
+        for index in self.android_conn.execute("PRAGMA index_list(messages)").fetchall():
+            columns = [row[2] for row in self.android_conn.execute(f"PRAGMA index_info('{index[1]}')")]
+            if columns[:2] == ['key_remote_jid', 'timestamp']:
+                self.logger.debug(f"Using existing index for filters: {index[1]}")
+                return
+        
+        try:
+            self.logger.info("Creating temporary index on messages(key_remote_jid, timestamp)...")
+            self.android_conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {FILTER_INDEX_NAME} ON messages (key_remote_jid, timestamp)"
+            )
+            self.android_conn.commit()
+            self._filter_index_created = True
+        except sqlite3.Error as e:
+            self.logger.warning(f"Could not create filter index, continuing without it: {e}")
+    
+    def _drop_filter_index(self) -> None:
+        """Elimina el índice temporal de filtros si este migrador lo creó."""
+        if not self._filter_index_created or not self.android_conn:
+            return
+        try:
+            self.android_conn.execute(f"DROP INDEX IF EXISTS {FILTER_INDEX_NAME}")
+            self.android_conn.commit()
+            self._filter_index_created = False
+        except sqlite3.Error as e:
+            self.logger.warning(f"Could not drop filter index: {e}")
+    
+    def _modern_messages_query(self, rowid_range: Optional[Tuple[int, int]] = None,
+                               order_by: Optional[str] = 'timestamp',
+                               after_id: Optional[int] = None,
+                               limit: Optional[int] = None) -> Tuple[str, tuple]:
+        """
+        Construye la consulta de mensajes Android del esquema moderno.
+        
+        Args:
+            rowid_range: Rango (desde, hasta) inclusivo de _id a leer, None para todos
+            order_by: Clave de MESSAGE_ORDERS ('timestamp', 'chat' o 'rowid'), None sin orden
+            after_id: Solo filas con _id mayor a este valor (paginación por rowid)
+            limit: Máximo de filas a retornar
+        
+        Returns:
+            Tupla (sql, parámetros) con las columnas de MODERN_MESSAGE_COLUMNS
+        """
+        conditions, params = self._message_filters()
+        
+        if rowid_range is not None:
+            conditions.append("m._id BETWEEN ? AND ?")
+            params.extend(rowid_range)
+        if after_id is not None:
+            conditions.append("m._id > ?")
+            params.append(after_id)
+        
+        sql = f"""
+            SELECT {MODERN_MESSAGE_COLUMNS}
+            FROM messages m
+            WHERE {' AND '.join(conditions)}
+        """
+        if order_by is not None:
+            sql += f"ORDER BY {MESSAGE_ORDERS[order_by]}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return sql, tuple(params)
+    
+    def _iter_rowid_chunks(self, chunk_rows: int) -> Iterator[tuple]:
+        """
+        Recorre messages en orden de rowid por bloques acotados.
+        
+        Cada bloque es una consulta independiente paginada por _id, que
+        SQLite resuelve sobre la clave primaria sin B-tree temporal.
+        
+        Args:
+            chunk_rows: Filas por consulta
+        
+        Yields:
+            Filas con las columnas de MODERN_MESSAGE_COLUMNS
+        """
+        last_id = None
+        while True:
+            sql, params = self._modern_messages_query(order_by='rowid', after_id=last_id,
+                                                      limit=chunk_rows)
+            rows = self.android_conn.execute(sql, params).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1][0]
+            if len(rows) < chunk_rows:
+                return
+    
+    def _convert_modern_row(self, row: tuple, pk: int, sort: Optional[int] = None) -> tuple:
+        """
+        Convierte una fila Android (MODERN_MESSAGE_COLUMNS) a parámetros de INSERT_MESSAGE_SQL.
+        
+        Args:
+            row: Fila Android
+            pk: Z_PK asignado al mensaje iOS
+            sort: ZSORT asignado dentro del chat (None si no se intercala)
+        
+        Returns:
+            Tupla de parámetros para INSERT_MESSAGE_SQL
+        """
+        (android_id, remote_jid, from_me, key_id, text, timestamp, status,
+         media_type, starred, media_size) = row
+        
+        # JID normalizado y chat iOS, resueltos una vez por racha del mismo chat
+        _, _, remote_jid, chat_session = self._resolve_chat(remote_jid)
+        
+        # Convertir timestamp
+        ios_timestamp = self.convert_timestamp(timestamp)
+        
+        # Determinar JIDs según dirección
+        if from_me:
+            to_jid = remote_jid
+            from_jid = self.own_jid
+        else:
+            to_jid = None
+            from_jid = remote_jid
+        
+        # Tipo, estado y evento de grupo por tablas indexadas (message_types)
+        ios_message_type, ios_status, ios_group_event = translate_message(media_type, status, media_size)
+        
+        # Fechas de envío/recepción desde los recibos precargados
+        sent_date = received_date = ios_timestamp
+        receipt = None
+        if self._receipt_dates:
+            receipt = self._receipt_dates.get(self._message_key(row[1], from_me, key_id))
+        if receipt is not None:
+            sent_ms, received_ms, read_ms = receipt
+            if sent_ms:
+                sent_date = self.convert_timestamp(sent_ms)
+            if received_ms:
+                received_date = self.convert_timestamp(received_ms)
+            if read_ms and from_me and ios_status != IOS_STATUS_PLAYED:
+                ios_status = IOS_STATUS_READ
+        
+        return (
+            pk,
+            from_me,
+            ios_status,
+            ios_message_type,
+            ios_group_event,
+            starred,
+            text,
+            ios_timestamp,
+            sent_date,
+            received_date,
+            to_jid,
+            from_jid,
+            key_id,
+            chat_session,
+            sort
+        )
+    
+    def _message_key(self, jid: Optional[str], from_me: Any, key_id: str) -> MessageKey:
+        """
+        Construye la clave de identidad de un mensaje.
+        
+        Args:
+            jid: JID del chat (crudo o normalizado)
+            from_me: Dirección del mensaje (truthy si es enviado)
+            key_id: Stanza ID del mensaje
+        
+        Returns:
+            MessageKey con el JID internado
+        """
+        return self._resolve_chat(jid)[1], 1 if from_me else 0, key_id
+    
+    def _load_stanza_index(self) -> Dict[MessageKey, int]:
+        """
+        Carga una vez los ZSTANZAID existentes en la base de salida.
+        
+        El key_id de Android es el mismo stanza ID que iOS guarda en
+        ZSTANZAID, pero solo es único dentro de un chat y dirección, así
+        que el índice se construye sobre (chat, ZISFROMME, ZSTANZAID). El
+        chat sale de ZCHATSESSION o, si falta, de ZTOJID/ZFROMJID.
+        
+        Returns:
+            Diccionario MessageKey → Z_PK de los mensajes en ZWAMESSAGE
+        """
+        try:
+            cursor = self.output_conn.execute("""
+                SELECT s.ZCONTACTJID, m.ZTOJID, m.ZFROMJID, m.ZISFROMME, m.ZSTANZAID, m.Z_PK
+                FROM ZWAMESSAGE m
+                LEFT JOIN ZWACHATSESSION s ON s.Z_PK = m.ZCHATSESSION
+                WHERE m.ZSTANZAID IS NOT NULL
+            """)
+        except sqlite3.OperationalError:
+            cursor = self.output_conn.execute("""
+                SELECT NULL, ZTOJID, ZFROMJID, ZISFROMME, ZSTANZAID, Z_PK
+                FROM ZWAMESSAGE
+                WHERE ZSTANZAID IS NOT NULL
+            """)
+        
+        stanza_ids = {}
+        for contact_jid, to_jid, from_jid, from_me, stanza_id, pk in cursor:
+            chat_jid = contact_jid or (to_jid if from_me else from_jid)
+            stanza_ids[self._message_key(chat_jid, from_me, stanza_id)] = pk
+        self.logger.info(f"Loaded {len(stanza_ids):,} existing stanza IDs for merge")
+        return stanza_ids
+    
+    def _load_receipt_dates(self) -> Dict[MessageKey, Tuple[Optional[int], Optional[int], Optional[int]]]:
+        """
+        Precarga en un diccionario las fechas de recibo de los mensajes Android.
+        
+        Se hace un recorrido de messages (receipt_server_timestamp,
+        receipt_device_timestamp, received_timestamp) y uno de receipt_user
+        (agregado por mensaje), para que la inserción masiva resuelva las
+        fechas con un acceso al diccionario en lugar de una consulta por fila.
+        Ambos recorridos aplican los filtros de chat y fecha, así que solo se
+        cargan los recibos de mensajes que se van a migrar. Las filas que
+        solo existen en snapshots antiguos no tienen recibos.
+        
+        - Enviados: enviado = acuse del servidor; recibido = primer recibo
+          de dispositivo; leído = primera lectura
+        - Recibidos: recibido = received_timestamp del dispositivo
+        
+        Returns:
+            Diccionario MessageKey → (enviado_ms, recibido_ms, leído_ms);
+            vacío si la DB no tiene columnas de recibos
+        """
+        columns = {row[1] for row in self.android_conn.execute("PRAGMA table_info(messages)")}
+        
+        def column(name: str) -> str:
+            return f"m.{name}" if name in columns else "NULL"
+        
+        conditions, params = self._message_filters()
+        where = ' AND '.join(["m.key_id IS NOT NULL"] + conditions)
+        
+        receipts: Dict[MessageKey, Tuple[Optional[int], Optional[int], Optional[int]]] = {}
+        receipt_columns = ('receipt_server_timestamp', 'receipt_device_timestamp', 'received_timestamp')
+        
+        if columns.intersection(receipt_columns):
+            cursor = self.android_conn.execute(f"""
+                SELECT m.key_remote_jid, m.key_from_me, m.key_id,
+                       {column('receipt_server_timestamp')},
+                       {column('receipt_device_timestamp')},
+                       {column('received_timestamp')}
+                FROM messages m
+                WHERE {where}
+            """, params)
+            for jid, from_me, key_id, server_ms, device_ms, received_ms in cursor:
+                if from_me:
+                    if (server_ms and server_ms > 0) or (device_ms and device_ms > 0):
+                        receipts[self._message_key(jid, from_me, key_id)] = (
+                            server_ms if server_ms and server_ms > 0 else None,
+                            device_ms if device_ms and device_ms > 0 else None,
+                            None
+                        )
+                elif received_ms and received_ms > 0:
+                    receipts[self._message_key(jid, from_me, key_id)] = (None, received_ms, None)
+        
+        has_receipt_user = self.android_conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='receipt_user'"
+        ).fetchone()
+        if has_receipt_user:
+            cursor = self.android_conn.execute(f"""
+                SELECT m.key_remote_jid, m.key_id,
+                       MIN(NULLIF(r.receipt_timestamp, 0)),
+                       MIN(NULLIF(r.read_timestamp, 0))
+                FROM receipt_user r
+                JOIN messages m ON m._id = r.message_row_id
+                WHERE m.key_from_me = 1 AND {where}
+                GROUP BY r.message_row_id
+            """, params)
+            for jid, key_id, delivered_ms, read_ms in cursor:
+                key = self._message_key(jid, 1, key_id)
+                sent_ms, device_ms, _ = receipts.get(key, (None, None, None))
+                receipts[key] = (sent_ms, device_ms or delivered_ms, read_ms)
+        
+        self.logger.info(f"Preloaded receipt dates for {len(receipts):,} messages")
+        return receipts
+    
+    def _load_chat_sessions(self) -> Dict[int, int]:
+        """
+        Carga una vez los chats iOS existentes (ZCONTACTJID → Z_PK).
+        
+        Los JIDs se internan en jid_registry, así que un chat Android cuyo
+        JID difiere solo en la forma (ej: @c.us) se asocia al mismo chat iOS.
+        
+        Returns:
+            Diccionario ID de JID → Z_PK de ZWACHATSESSION (vacío si no existe la tabla)
+        """
+        try:
+            cursor = self.output_conn.execute(
+                "SELECT ZCONTACTJID, Z_PK FROM ZWACHATSESSION WHERE ZCONTACTJID IS NOT NULL"
+            )
+            return {self.jid_registry.intern(jid): pk for jid, pk in cursor}
+        except sqlite3.OperationalError:
+            self.logger.debug("ZWACHATSESSION not found, messages will not be linked to chats")
+            return {}
+    
+    def _iter_interleaved(self, android_cursor: sqlite3.Cursor) -> Iterator[tuple]:
+        """
+        Mezcla en una pasada lineal los mensajes iOS existentes y los de Android.
+        
+        Ambos lados llegan ordenados por (JID normalizado, fecha) desde
+        SQLite, así que heapq.merge produce el orden combinado como un
+        merge-join, sin re-ordenar tablas en Python. La clave es el mismo
+        JID normalizado con el que la inserción resuelve ZCHATSESSION, de
+        modo que '...@c.us' y '...@s.whatsapp.net' comparten numeración.
+        Los mensajes iOS se leen de la base original (mismos Z_PK que la
+        salida) para no leer y escribir la misma tabla en una conexión.
+        
+        Args:
+            android_cursor: Cursor Android ordenado por MESSAGE_ORDERS['normalized_chat']
+        
+        Yields:
+            Tuplas (jid, fecha, tipo, payload); tipo 'ios' con payload
+            (Z_PK, ZSORT actual) o 'android' con la fila Android
+        """
+        try:
+            ios_cursor = self.ios_conn.execute("""
+                SELECT normalize_jid(s.ZCONTACTJID) AS jid, m.ZMESSAGEDATE, m.Z_PK, m.ZSORT
+                FROM ZWAMESSAGE m
+                JOIN ZWACHATSESSION s ON s.Z_PK = m.ZCHATSESSION
+                WHERE s.ZCONTACTJID IS NOT NULL
+                ORDER BY jid ASC, m.ZMESSAGEDATE ASC
+            """)
+            ios_events = (
+                (jid, date or 0, 'ios', (pk, sort)) for jid, date, pk, sort in ios_cursor
+            )
+        except sqlite3.OperationalError:
+            ios_events = iter(())
+        
+        android_events = (
+            (self._normalized_jid(row[1]), (row[5] or 0) / 1000.0 - TIMESTAMP_OFFSET, 'android', row)
+            for row in android_cursor
+        )
+        
+        # Con empate, los mensajes iOS (primer iterable) quedan antes
+        return heapq.merge(ios_events, android_events, key=lambda event: (event[0], event[1]))
+    
     def _migrate_modern_schema(self) -> Tuple[int, int]:
         """
         Migra mensajes desde esquema moderno (WhatsApp 2.20.x+).
@@ -246,6 +937,8 @@ class WhatsAppMigrator:
         """
         migrated = 0
         duplicates = 0
+        merger = None
+        cache = None
         
         try:
             self.logger.info("Starting modern schema migration...")
@@ -254,99 +947,103 @@ class WhatsAppMigrator:
             cursor = self.output_conn.execute("SELECT IFNULL(MAX(Z_PK), 0) FROM ZWAMESSAGE")
             next_pk = cursor.fetchone()[0] + 1
             
-            # Leer mensajes de Android (solo campos base para compatibilidad)
-            android_cursor = self.android_conn.execute("""
-                SELECT 
-                    m._id,
-                    m.key_remote_jid,
-                    m.key_from_me,
-                    m.data,
-                    m.timestamp,
-                    m.status,
-                    COALESCE(m.media_wa_type, 0) as media_type,
-                    COALESCE(m.starred, 0) as starred
-                FROM messages m
-                WHERE m.data IS NOT NULL
-                ORDER BY m.timestamp ASC
-            """)
-            
-            total_messages = 0
-            for row in android_cursor:
-                total_messages += 1
+            order_by = 'normalized_chat' if self.interleave else 'timestamp'
+            if self.message_cache:
+                cache = self._open_message_cache()
+                total_messages = len(cache)
+                if order_by == 'normalized_chat':
+                    # La caché se agrupa por JID crudo: reordenar por JID normalizado
+                    sorter = ExternalSorter(MESSAGE_SORT_KEYS[order_by], self.sort_chunk_rows,
+                                            self.scratch_dir)
+                    android_cursor = sorter.sort(cache.iter_rows('chat'))
+                else:
+                    android_cursor = cache.iter_rows(order_by)
+            else:
+                total_messages, android_cursor, merger = self._open_message_source(order_by)
             
             self.logger.info(f"Found {total_messages} messages to migrate")
             
-            # Reiniciar cursor para migración
-            android_cursor = self.android_conn.execute("""
-                SELECT 
-                    m._id,
-                    m.key_remote_jid,
-                    m.key_from_me,
-                    m.data,
-                    m.timestamp,
-                    m.status,
-                    COALESCE(m.media_wa_type, 0) as media_type,
-                    COALESCE(m.starred, 0) as starred
-                FROM messages m
-                WHERE m.data IS NOT NULL
-                ORDER BY m.timestamp ASC
-            """)
+            # Índice de stanza IDs para el modo merge (una sola lectura)
+            stanza_ids = self._load_stanza_index() if self.merge else None
+            self._chat_sessions = self._load_chat_sessions()
+            self._chat_run = (None, NO_JID, None, None)
+            self._receipt_dates = self._load_receipt_dates()
             
-            for row in android_cursor:
-                android_id, remote_jid, from_me, text, timestamp, status, media_type, starred = row
-                
-                # Convertir timestamp
-                ios_timestamp = self.convert_timestamp(timestamp)
+            # Mapa MessageKey → iOS Z_PK para las tablas relacionadas
+            # (en modo merge incluye los mensajes iOS ya presentes)
+            if stanza_ids is not None:
+                message_ids = stanza_ids
+            else:
+                message_ids = {} if self._related_stages() else None
+            
+            if self.interleave:
+                events = self._iter_interleaved(android_cursor)
+            else:
+                events = ((None, None, 'android', row) for row in android_cursor)
+            
+            progress = self._create_progress_tracker(total_messages)
+            
+            current_jid = None
+            sort = None
+            sort_updates = []
+            reordered = 0
+            
+            for jid, _, kind, payload in events:
+                if self.interleave and jid != current_jid:
+                    current_jid = jid
+                    sort = 0
                 
-                # Determinar JIDs según dirección
-                if from_me:
-                    to_jid = remote_jid
-                    from_jid = self.phone_number
-                else:
-                    to_jid = None
-                    from_jid = remote_jid
+                if kind == 'ios':
+                    # Mensaje iOS existente: solo renumerar ZSORT si cambió
+                    pk, old_sort = payload
+                    sort += 1
+                    if old_sort != sort:
+                        sort_updates.append((sort, pk))
+                        if len(sort_updates) >= SORT_UPDATE_BATCH:
+                            self.output_conn.executemany(
+                                "UPDATE ZWAMESSAGE SET ZSORT = ? WHERE Z_PK = ?", sort_updates
+                            )
+                            reordered += len(sort_updates)
+                            sort_updates = []
+                    continue
                 
-                # Mapear tipo de mensaje (simplificado)
-                ios_message_type = 0 if media_type == 0 else media_type
+                row = payload
+                key = self._message_key(row[1], row[2], row[3]) if message_ids is not None else None
+                if stanza_ids is not None and key in stanza_ids:
+                    duplicates += 1
+                    progress.update(migrated + duplicates + self._snapshot_skipped(merger))
+                    continue
                 
-                # Mapear status (simplificado, iOS usa 0-5)
-                ios_status = min(status if status else 0, 5)
+                if sort is not None:
+                    sort += 1
                 
                 # Insertar en iOS
-                self.output_conn.execute("""
-                    INSERT INTO ZWAMESSAGE (
-                        Z_PK, Z_ENT, Z_OPT,
-                        ZISFROMME, ZMESSAGESTATUS, ZMESSAGETYPE, ZISSTARRED,
-                        ZTEXT, ZMESSAGEDATE, ZSENTDATE, ZRECEIVEDDATE,
-                        ZTOJID, ZFROMJID
-                    ) VALUES (?, 1, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    next_pk,
-                    from_me,
-                    ios_status,
-                    ios_message_type,
-                    starred,
-                    text,
-                    ios_timestamp,
-                    ios_timestamp,
-                    ios_timestamp,
-                    to_jid,
-                    from_jid
-                ))
+                self.output_conn.execute(INSERT_MESSAGE_SQL, self._convert_modern_row(row, next_pk, sort))
+                if key is not None and key[2] is not None:
+                    message_ids[key] = next_pk
                 
                 next_pk += 1
                 migrated += 1
-                
-                # Progress logging cada 1000 mensajes
-                if migrated % 1000 == 0:
-                    self.logger.info(f"Migrated {migrated}/{total_messages} messages...")
-                    print(f"\rProgress: {migrated}/{total_messages} messages migrated", end='', flush=True)
+                progress.update(migrated + duplicates + self._snapshot_skipped(merger))
+            
+            if sort_updates:
+                self.output_conn.executemany(
+                    "UPDATE ZWAMESSAGE SET ZSORT = ? WHERE Z_PK = ?", sort_updates
+                )
+                reordered += len(sort_updates)
             
-            if migrated > 0:
-                print()  # Newline después de progress
+            if self.interleave:
+                self.logger.info(f"Interleaved into existing chats: {reordered} iOS messages re-sorted")
             
+            self.snapshot_duplicates = self._snapshot_skipped(merger)
+            progress.finish(migrated + duplicates + self.snapshot_duplicates)
             self.output_conn.commit()
-            self.logger.info(f"Modern schema migration completed: {migrated} messages")
+            self._message_ids = message_ids
+            self._receipt_dates = {}
+            self.logger.info(
+                f"Modern schema migration completed: {migrated} messages, "
+                f"{duplicates} already present"
+            )
             
             return migrated, duplicates
             
@@ -354,6 +1051,486 @@ class WhatsAppMigrator:
             self.logger.error(f"Error in modern schema migration: {e}")
             self.output_conn.rollback()
             raise
+        
+        finally:
+            if merger is not None:
+                merger.close()
+            if cache is not None:
+                cache.close()
+    
+    def _open_message_source(self, order_by: str) -> Tuple[int, Iterator[tuple], Optional[SnapshotMerger]]:
+        """
+        Abre el flujo de mensajes Android según las opciones del migrador.
+        
+        Args:
+            order_by: Clave de MESSAGE_ORDERS ('timestamp', 'chat' o 'normalized_chat')
+        
+        Returns:
+            Tupla (total de filas, iterador de filas MODERN_MESSAGE_COLUMNS,
+            SnapshotMerger abierto o None) — el merger debe cerrarse al terminar
+        """
+        if self._has_filters():
+            self._ensure_filter_index()
+        
+        conditions, params = self._message_filters()
+        
+        if self.snapshots:
+            # Flujo unificado de todos los snapshots (ordenado por la clave de
+            # deduplicación), reordenado por order_by con runs en disco
+            merger = SnapshotMerger(
+                [self.android_db_path] + self.snapshots, MODERN_MESSAGE_COLUMNS,
+                conditions, params
+            )
+            merger.open()
+            sorter = ExternalSorter(MESSAGE_SORT_KEYS[order_by], self.sort_chunk_rows,
+                                    self.scratch_dir)
+            return merger.count(), sorter.sort(merger.iter_messages()), merger
+        
+        # Conteo para el reporte de progreso (sin recorrer el cursor completo)
+        total = self.android_conn.execute(
+            f"SELECT COUNT(*) FROM messages m WHERE {' AND '.join(conditions)}", params
+        ).fetchone()[0]
+        
+        # Leer mensajes de Android (solo campos base para compatibilidad)
+        if self.external_sort:
+            sorter = ExternalSorter(MESSAGE_SORT_KEYS[order_by], self.sort_chunk_rows,
+                                    self.scratch_dir)
+            return total, sorter.sort(self._iter_rowid_chunks(self.sort_chunk_rows)), None
+        
+        sql, params = self._modern_messages_query(order_by=order_by)
+        return total, self.android_conn.execute(sql, params), None
+    
+    def _message_source_signature(self) -> Dict[str, Any]:
+        """
+        Firma de la fuente de mensajes (DBs y filtros) para validar la caché.
+        
+        Returns:
+            Diccionario serializable a JSON
+        """
+        def file_signature(path: str) -> List[Any]:
+            stat = os.stat(path)
+            return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+        
+        return {
+            'android_db': file_signature(self.android_db_path),
+            'snapshots': [file_signature(path) for path in self.snapshots],
+            'chats': self.chats,
+            'exclude_chats': self.exclude_chats,
+            'since': self.since,
+            'until': self.until,
+        }
+    
+    def _open_message_cache(self) -> ColumnarMessageCache:
+        """
+        Abre la caché columnar y verifica que corresponda a la fuente actual.
+        
+        Returns:
+            Caché abierta (debe cerrarse al terminar)
+        
+        Raises:
+            ValueError: Si la caché se exportó desde otra DB, snapshots o filtros
+        """
+        cache = ColumnarMessageCache(self.message_cache)
+        if cache.signature != self._message_source_signature():
+            cache.close()
+            raise ValueError(
+                f"Message cache {self.message_cache} is stale or was exported with "
+                f"different databases/filters; export it again"
+            )
+        self.logger.info(f"Using message cache: {self.message_cache} ({len(cache):,} messages)")
+        return cache
+    
+    def export_message_cache(self, cache_path: str) -> int:
+        """
+        Exporta los mensajes Android normalizados a una caché columnar.
+        
+        Aplica los mismos filtros y snapshots que la migración; las
+        ejecuciones posteriores con message_cache=cache_path evitan
+        consultar y ordenar msgstore.db.
+        
+        Args:
+            cache_path: Ruta del archivo de caché a crear
+        
+        Returns:
+            Número de mensajes exportados
+        
+        Raises:
+            NotImplementedError: Si el esquema detectado no está soportado
+        """
+        merger = None
+        try:
+            self.connect_databases()
+            self.schema_version = self.detect_schema_version()
+            if self.schema_version != 'modern':
+                raise NotImplementedError(
+                    f"Message cache is not supported for {self.schema_version} schema"
+                )
+            
+            _, rows, merger = self._open_message_source('chat')
+            return write_message_cache(cache_path, rows, self._message_source_signature())
+        
+        finally:
+            if merger is not None:
+                merger.close()
+            if self.android_conn:
+                self._drop_filter_index()
+                self.android_conn.close()
+                self.android_conn = None
+            if self.ios_conn:
+                self.ios_conn.close()
+                self.ios_conn = None
+    
+    @staticmethod
+    def _snapshot_skipped(merger: Optional[SnapshotMerger]) -> int:
+        """Duplicados descartados entre snapshots (0 sin snapshots)."""
+        return merger.duplicates if merger is not None else 0
+    
+    def _related_stages(self) -> List[str]:
+        """
+        Detecta qué tablas relacionadas de Android pueden migrarse.
+        
+        Returns:
+            Nombres de etapas disponibles ('quoted', 'reactions', 'polls',
+            'ephemeral', 'view_once')
+        """
+        def columns(table: str) -> List[str]:
+            return [row[1] for row in self.android_conn.execute(f"PRAGMA table_info({table})")]
+        
+        stages = []
+        if 'key_id' in columns('message_quoted'):
+            stages.append('quoted')
+        if columns('message_add_on') and columns('message_add_on_reaction'):
+            stages.append('reactions')
+        if columns('message_poll'):
+            stages.append('polls')
+        if columns('message_ephemeral'):
+            stages.append('ephemeral')
+        if columns('message_view_once_media'):
+            stages.append('view_once')
+        return stages
+    
+    def _migrate_quoted_messages(self, message_ids: Dict[MessageKey, int]) -> int:
+        """
+        Enlaza respuestas con el mensaje citado (ZPARENTMESSAGE).
+        
+        Una sola consulta une message_quoted con messages para obtener la
+        clave de la respuesta y el key_id del citado; ambos se resuelven
+        contra el mapa en memoria y las actualizaciones se aplican por
+        lotes. El citado se busca en el chat de la respuesta y, si
+        message_quoted no guarda from_me, en ambas direcciones.
+        
+        Args:
+            message_ids: Mapa MessageKey → Z_PK iOS
+        
+        Returns:
+            Número de respuestas enlazadas
+        """
+        quoted_columns = {row[1] for row in self.android_conn.execute("PRAGMA table_info(message_quoted)")}
+        quoted_from_me = 'q.from_me' if 'from_me' in quoted_columns else 'NULL'
+        cursor = self.android_conn.execute(f"""
+            SELECT m.key_remote_jid, m.key_from_me, m.key_id, {quoted_from_me}, q.key_id
+            FROM message_quoted q
+            JOIN messages m ON m._id = q.message_row_id
+            WHERE q.key_id IS NOT NULL
+        """)
+        
+        linked = 0
+        batch = []
+        for chat_jid, from_me, reply_key, parent_from_me, quoted_key in cursor:
+            key = self._message_key(chat_jid, from_me, reply_key)
+            reply_pk = message_ids.get(key)
+            if reply_pk is None:
+                continue
+            chat_id = key[0]
+            if parent_from_me is None:
+                parent_pk = message_ids.get((chat_id, 0, quoted_key))
+                if parent_pk is None:
+                    parent_pk = message_ids.get((chat_id, 1, quoted_key))
+            else:
+                parent_pk = message_ids.get((chat_id, 1 if parent_from_me else 0, quoted_key))
+            if parent_pk is None:
+                continue
+            batch.append((parent_pk, reply_pk))
+            if len(batch) >= RELATED_UPDATE_BATCH:
+                self.output_conn.executemany(
+                    "UPDATE ZWAMESSAGE SET ZPARENTMESSAGE = ? WHERE Z_PK = ?", batch
+                )
+                linked += len(batch)
+                batch = []
+        
+        if batch:
+            self.output_conn.executemany(
+                "UPDATE ZWAMESSAGE SET ZPARENTMESSAGE = ? WHERE Z_PK = ?", batch
+            )
+            linked += len(batch)
+        
+        return linked
+    
+    def _count_related(self, sql: str, message_ids: Dict[MessageKey, int]) -> int:
+        """Cuenta filas relacionadas cuyo mensaje padre fue migrado (una sola consulta)."""
+        return sum(
+            1 for jid, from_me, key_id in self.android_conn.execute(sql)
+            if self._message_key(jid, from_me, key_id) in message_ids
+        )
+    
+    def migrate_related_messages(self) -> Dict[str, int]:
+        """
+        Migra las tablas relacionadas con los mensajes ya migrados.
+        
+        Usa el mapa MessageKey → Z_PK construido durante la migración de
+        mensajes, así que no hay una consulta por mensaje. Las reacciones
+        y encuestas no tienen columna equivalente en ZWAMESSAGE: solo se
+        cuentan y se informan como no migradas. Los mensajes temporales
+        (message_ephemeral) y de visualización única
+        (message_view_once_media) sí se migran, pero como mensajes
+        normales: se cuentan y se informan como sin marcar.
+        
+        Returns:
+            Diccionario con 'quoted', 'reactions_skipped', 'polls_skipped',
+            'ephemeral_unmarked' y 'view_once_unmarked'
+        """
+        counts = {
+            'quoted': 0,
+            'reactions_skipped': 0,
+            'polls_skipped': 0,
+            'ephemeral_unmarked': 0,
+            'view_once_unmarked': 0,
+        }
+        message_ids = self._message_ids
+        if not message_ids:
+            return counts
+        
+        try:
+            stages = self._related_stages()
+            
+            if 'quoted' in stages:
+                counts['quoted'] = self._migrate_quoted_messages(message_ids)
+                self.logger.info(f"Linked {counts['quoted']:,} quoted replies")
+            
+            if 'reactions' in stages:
+                counts['reactions_skipped'] = self._count_related("""
+                    SELECT m.key_remote_jid, m.key_from_me, m.key_id
+                    FROM message_add_on_reaction r
+                    JOIN message_add_on a ON a._id = r.message_add_on_row_id
+                    JOIN messages m ON m._id = a.parent_message_row_id
+                """, message_ids)
+            
+            if 'polls' in stages:
+                counts['polls_skipped'] = self._count_related("""
+                    SELECT m.key_remote_jid, m.key_from_me, m.key_id
+                    FROM message_poll p
+                    JOIN messages m ON m._id = p.message_row_id
+                """, message_ids)
+            
+            if counts['reactions_skipped'] or counts['polls_skipped']:
+                self.logger.warning(
+                    f"No ChatStorage target for {counts['reactions_skipped']:,} reactions and "
+                    f"{counts['polls_skipped']:,} polls; they were not migrated"
+                )
+            
+            if 'ephemeral' in stages:
+                counts['ephemeral_unmarked'] = self._count_related("""
+                    SELECT m.key_remote_jid, m.key_from_me, m.key_id
+                    FROM message_ephemeral e
+                    JOIN messages m ON m._id = e.message_row_id
+                """, message_ids)
+            
+            if 'view_once' in stages:
+                counts['view_once_unmarked'] = self._count_related("""
+                    SELECT m.key_remote_jid, m.key_from_me, m.key_id
+                    FROM message_view_once_media v
+                    JOIN messages m ON m._id = v.message_row_id
+                """, message_ids)
+            
+            if counts['ephemeral_unmarked'] or counts['view_once_unmarked']:
+                self.logger.warning(
+                    f"{counts['ephemeral_unmarked']:,} disappearing and "
+                    f"{counts['view_once_unmarked']:,} view-once messages were migrated as "
+                    f"regular messages (no expiry or view-once flag in ChatStorage)"
+                )
+            
+            self.output_conn.commit()
+            return counts
+        
+        except Exception as e:
+            self.logger.error(f"Error migrating related messages: {e}")
+            self.output_conn.rollback()
+            raise
+        
+        finally:
+            # El mapa puede ser grande: liberarlo al terminar
+            self._message_ids = None
+    
+    def _create_sample_target(self) -> sqlite3.Connection:
+        """
+        Crea una base en memoria con el esquema de ZWAMESSAGE de iOS.
+        
+        Se usa para medir inserciones sin copiar ChatStorage.sqlite.
+        
+        Returns:
+            Conexión a la base en memoria
+        """
+        page_size = self.ios_conn.execute("PRAGMA page_size").fetchone()[0]
+        target = sqlite3.connect(':memory:')
+        target.execute(f"PRAGMA page_size = {page_size}")
+        
+        cursor = self.ios_conn.execute(
+            "SELECT sql FROM sqlite_master "
+            "WHERE tbl_name = 'ZWAMESSAGE' AND sql IS NOT NULL "
+            "ORDER BY type DESC"  # 'table' antes que 'index'
+        )
+        for row in cursor.fetchall():
+            target.execute(row[0])
+        
+        return target
+    
+    def estimate_migration(self, sample_pages: int = 32, page_rows: int = 256) -> Dict[str, Any]:
+        """
+        Estima tiempo, crecimiento de la salida y memoria de la migración.
+        
+        Muestrea páginas de la tabla messages por rangos de rowid (sin
+        recorrido completo) y mide la conversión e inserción de la muestra
+        con el motor real en una base en memoria. Los resultados se
+        extrapolan al total estimado de mensajes.
+        
+        Args:
+            sample_pages: Número de rangos de rowid a muestrear
+            page_rows: Rowids por rango
+        
+        Returns:
+            Diccionario con la estimación
+        
+        Raises:
+            NotImplementedError: Si el esquema detectado no está soportado
+        """
+        from time import perf_counter
+        
+        started = perf_counter()
+        estimate = {
+            'schema': None,
+            'sampled_rows': 0,
+            'estimated_messages': 0,
+            'estimated_seconds': 0.0,
+            'estimated_copy_seconds': 0.0,
+            'estimated_migrate_seconds': 0.0,
+            'estimated_output_growth': 0,
+            'estimated_output_size': 0,
+            'estimated_peak_rss': None,
+            'estimate_time': 0.0
+        }
+        
+        try:
+            self.connect_databases()
+            self.schema_version = self.detect_schema_version()
+            estimate['schema'] = self.schema_version
+            
+            if self.schema_version != 'modern':
+                raise NotImplementedError(
+                    f"Estimation is only available for the modern schema (detected: {self.schema_version})"
+                )
+            
+            ios_size = os.path.getsize(self.ios_db_path)
+            
+            # Rendimiento de lectura secuencial para estimar la copia de ChatStorage
+            probe_bytes = 0
+            probe_start = perf_counter()
+            with open(self.ios_db_path, 'rb') as f:
+                while probe_bytes < 8 * 1024 * 1024:
+                    chunk = f.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    probe_bytes += len(chunk)
+            probe_seconds = perf_counter() - probe_start
+            if probe_bytes and probe_seconds > 0:
+                # Lectura + escritura
+                estimate['estimated_copy_seconds'] = 2 * ios_size * probe_seconds / probe_bytes
+            
+            min_id, max_id = self.android_conn.execute(
+                "SELECT MIN(_id), MAX(_id) FROM messages"
+            ).fetchone()
+            
+            if min_id is None:
+                estimate['estimated_output_size'] = ios_size
+                return estimate
+            
+            span = max_id - min_id + 1
+            pages = max(1, min(sample_pages, -(-span // page_rows)))
+            step = span / pages
+            
+            target = self._create_sample_target()
+            size_query = "SELECT page_count * page_size FROM pragma_page_count(), pragma_page_size()"
+            size_before = target.execute(size_query).fetchone()[0]
+            
+            covered = 0
+            sampled = 0
+            elapsed = 0.0
+            pk = 1
+            previous_high = min_id - 1
+            
+            for page in range(pages):
+                # Ventanas disjuntas: si step < page_rows, cada una empieza
+                # después de la anterior para no contar filas dos veces
+                low = max(min_id + int(page * step), previous_high + 1)
+                if low > max_id:
+                    break
+                high = min(low + page_rows - 1, max_id)
+                previous_high = high
+                covered += high - low + 1
+                
+                page_start = perf_counter()
+                sql, params = self._modern_messages_query(rowid_range=(low, high), order_by=None)
+                for row in self.android_conn.execute(sql, params):
+                    target.execute(INSERT_MESSAGE_SQL, self._convert_modern_row(row, pk))
+                    pk += 1
+                    sampled += 1
+                elapsed += perf_counter() - page_start
+            
+            commit_start = perf_counter()
+            target.commit()
+            elapsed += perf_counter() - commit_start
+            
+            growth_sample = target.execute(size_query).fetchone()[0] - size_before
+            target.close()
+            
+            estimated_messages = int(round(sampled * span / covered)) if covered else 0
+            ratio = estimated_messages / sampled if sampled else 0
+            
+            estimate['sampled_rows'] = sampled
+            estimate['estimated_messages'] = estimated_messages
+            estimate['estimated_migrate_seconds'] = elapsed * ratio
+            estimate['estimated_output_growth'] = int(growth_sample * ratio)
+            estimate['estimated_output_size'] = ios_size + estimate['estimated_output_growth']
+            estimate['estimated_seconds'] = (
+                estimate['estimated_copy_seconds'] + estimate['estimated_migrate_seconds']
+            )
+            
+            # El motor moderno procesa en streaming: la memoria no crece con el
+            # número de filas, así que el pico ≈ pico de RSS tras la muestra +
+            # caché de páginas de la conexión de salida
+            current_rss = get_peak_rss()
+            if current_rss is not None:
+                cache_size = self.ios_conn.execute("PRAGMA cache_size").fetchone()[0]
+                page_size = self.ios_conn.execute("PRAGMA page_size").fetchone()[0]
+                cache_bytes = -cache_size * 1024 if cache_size < 0 else cache_size * page_size
+                estimate['estimated_peak_rss'] = current_rss + cache_bytes
+            
+            self.logger.info(
+                f"Estimate: {estimated_messages:,} messages, "
+                f"{estimate['estimated_seconds']:.1f}s, "
+                f"+{estimate['estimated_output_growth'] / (1024 * 1024):.2f} MB "
+                f"(sampled {sampled:,} rows)"
+            )
+            
+            return estimate
+        
+        finally:
+            estimate['estimate_time'] = perf_counter() - started
+            if self.android_conn:
+                self.android_conn.close()
+                self.android_conn = None
+            if self.ios_conn:
+                self.ios_conn.close()
+                self.ios_conn = None
     
     def _migrate_legacy_schema(self) -> Tuple[int, int]:
         """
@@ -414,22 +1591,24 @@ class WhatsAppMigrator:
             
             self.logger.info(f"Starting Z_PK from: {next_pk}")
             
+            # Índice key_id ↔ ZSTANZAID cargado una sola vez
+            stanza_ids = self._load_stanza_index()
+            
+            progress = self._create_progress_tracker(total_messages)
+            
             # Insertar mensajes
             for idx, msg in enumerate(android_messages, 1):
                 try:
-                    # Convertir timestamp
-                    ios_timestamp = self.convert_timestamp(msg['timestamp'])
-                    
-                    # Verificar si el mensaje ya existe (duplicado)
-                    ios_cursor.execute("""
-                        SELECT COUNT(*) FROM ZWAMESSAGE 
-                        WHERE ZMESSAGEDATE = ? AND ZTEXT = ?
-                    """, (ios_timestamp, msg['data']))
-                    
-                    if ios_cursor.fetchone()[0] > 0:
+                    # Verificar si el mensaje ya existe (duplicado) por stanza ID
+                    key_id = msg['key_id']
+                    key = self._message_key(msg['key_remote_jid'], msg['key_from_me'], key_id)
+                    if key in stanza_ids:
                         duplicates += 1
                         continue
                     
+                    # Convertir timestamp
+                    ios_timestamp = self.convert_timestamp(msg['timestamp'])
+                    
                     # Insertar mensaje en formato iOS
                     # NOTA: Esta es una versión SIMPLIFICADA
                     # En producción se requieren más campos y validaciones
@@ -437,8 +1616,8 @@ class WhatsAppMigrator:
                         INSERT INTO ZWAMESSAGE (
                             Z_PK, Z_ENT, Z_OPT,
                             ZMESSAGEDATE, ZTEXT, ZISFROMME,
-                            ZGROUPEVENTTYPE, ZMESSAGETYPE
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                            ZGROUPEVENTTYPE, ZMESSAGETYPE, ZSTANZAID
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
                     """, (
                         next_pk,
                         2,  # Z_ENT para mensajes
@@ -447,20 +1626,23 @@ class WhatsAppMigrator:
                         msg['data'],
                         1 if msg['key_from_me'] else 0,
                         0,  # No es evento de grupo
-                        0   # Mensaje de texto
+                        0,  # Mensaje de texto
+                        key_id
                     ))
                     
+                    if key_id is not None:
+                        stanza_ids[key] = next_pk
                     migrated += 1
                     next_pk += 1
-                    
-                    # Log de progreso cada 100 mensajes
-                    if idx % 100 == 0:
-                        self.logger.info(f"Progress: {idx}/{total_messages} messages processed")
                 
                 except sqlite3.Error as e:
                     self.logger.warning(f"Failed to migrate message {msg['_id']}: {e}")
                     continue
+                
+                finally:
+                    progress.update(idx)
             
+            progress.finish(total_messages)
             self.output_conn.commit()
             self.logger.info(f"Migration complete: {migrated} migrated, {duplicates} duplicates skipped")
             
@@ -472,12 +1654,19 @@ class WhatsAppMigrator:
                 self.output_conn.rollback()
             raise
     
-    def run_migration(self, output_path: str) -> Dict[str, int]:
+    def run_migration(self, output_path: str, compact: bool = False,
+                      page_size: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
         """
         Ejecuta el proceso completo de migración.
         
+        Cada fase (connect, detect, analyze, count, copy, migrate, related, finalize)
+        se mide con PhaseProfiler; el perfil se devuelve en stats['phases'] y
+        se escribe como JSON junto a la base de datos de salida.
+        
         Args:
             output_path: Ruta de la base de datos de salida
+            compact: Si True, compacta la salida con VACUUM INTO al finalizar
+            page_size: Tamaño de página usado al compactar
         
         Returns:
             Diccionario con estadísticas de la migración
@@ -491,67 +1680,134 @@ class WhatsAppMigrator:
             'ios_messages_after': 0,
             'migrated': 0,
             'duplicates': 0,
+            'snapshot_duplicates': 0,
+            'quoted': 0,
+            'reactions_skipped': 0,
+            'polls_skipped': 0,
+            'ephemeral_unmarked': 0,
+            'view_once_unmarked': 0,
             'contacts': 0,
-            'groups': 0
+            'groups': 0,
+            'size_before': 0,
+            'size_after': 0,
+            'phases': {}
         }
+        profiler = PhaseProfiler()
         
         try:
             # Conectar a bases de datos
-            self.connect_databases()
+            with profiler.phase('connect'):
+                self.connect_databases()
             
             # Detectar versión de esquema
-            self.schema_version = self.detect_schema_version()
+            with profiler.phase('detect'):
+                self.schema_version = self.detect_schema_version()
             self.logger.info(f"Detected schema version: {self.schema_version}")
             print(f"\n[INFO] Database schema: {self.schema_version}")
             
             # Analizar esquemas
             self.logger.info("Analyzing database schemas...")
-            android_schema = self.analyze_android_schema()
-            ios_schema = self.analyze_ios_schema()
+            with profiler.phase('analyze'):
+                android_schema = self.analyze_android_schema()
+                ios_schema = self.analyze_ios_schema()
             
             # Conteo inicial
-            stats['android_messages'] = self.get_android_messages_count()
-            stats['ios_messages_before'] = self.get_ios_messages_count()
+            with profiler.phase('count') as phase:
+                stats['android_messages'] = self.get_android_messages_count()
+                stats['ios_messages_before'] = self.get_ios_messages_count()
+                phase['rows'] = stats['android_messages'] + stats['ios_messages_before']
             
             # Copiar esquema iOS a output
-            self.copy_ios_schema_to_output(output_path)
+            with profiler.phase('copy'):
+                self.copy_ios_schema_to_output(output_path)
             
             # Migrar mensajes según esquema
             print(f"\n[INFO] Starting migration with {self.schema_version} schema...")
-            if self.schema_version == 'modern':
-                migrated, duplicates = self._migrate_modern_schema()
-            else:
-                migrated, duplicates = self._migrate_legacy_schema()
+            with profiler.phase('migrate') as phase:
+                if self.schema_version == 'modern':
+                    migrated, duplicates = self._migrate_modern_schema()
+                else:
+                    migrated, duplicates = self._migrate_legacy_schema()
+                phase['rows'] = migrated + duplicates
             
             stats['migrated'] = migrated
             stats['duplicates'] = duplicates
+            stats['snapshot_duplicates'] = self.snapshot_duplicates
+            
+            # Respuestas, reacciones y encuestas (mapa MessageKey → Z_PK en memoria)
+            with profiler.phase('related') as phase:
+                stats.update(self.migrate_related_messages())
+                phase['rows'] = stats['quoted']
             
             # TODO: Migrar contactos y grupos (futuro)
             stats['contacts'] = 0
             stats['groups'] = 0
             
-            # Conteo final
-            cursor = self.output_conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM ZWAMESSAGE")
-            stats['ios_messages_after'] = cursor.fetchone()[0]
+            with profiler.phase('finalize') as phase:
+                # Conteo final
+                cursor = self.output_conn.cursor()
+                cursor.execute("SELECT COUNT(*) FROM ZWAMESSAGE")
+                stats['ios_messages_after'] = cursor.fetchone()[0]
+                
+                # Cerrar salida y compactar si se solicitó
+                self.output_conn.close()
+                self.output_conn = None
+                
+                if compact:
+                    compaction = self.compact_output(output_path, page_size)
+                    stats['size_before'] = compaction['size_before']
+                    stats['size_after'] = compaction['size_after']
+                else:
+                    stats['size_before'] = stats['size_after'] = os.path.getsize(output_path)
+                phase['rows'] = stats['ios_messages_after']
+            
+            stats['phases'] = profiler.to_dict()
+            
+            profile_path = self.get_profile_path(output_path)
+            counters = {key: value for key, value in stats.items() if key != 'phases'}
+            profiler.write_json(profile_path, extra=counters)
+            self.logger.info(f"Phase profile written: {profile_path}")
             
             self.logger.info("Migration summary:")
             self.logger.info(f"  Android messages: {stats['android_messages']}")
             self.logger.info(f"  iOS messages (before): {stats['ios_messages_before']}")
             self.logger.info(f"  Migrated: {stats['migrated']}")
             self.logger.info(f"  Duplicates skipped: {stats['duplicates']}")
+            if self.snapshots:
+                self.logger.info(f"  Snapshot duplicates skipped: {stats['snapshot_duplicates']}")
+            self.logger.info(f"  Quoted replies linked: {stats['quoted']}")
             self.logger.info(f"  iOS messages (after): {stats['ios_messages_after']}")
+            self.logger.info(f"  Output size: {stats['size_before']} → {stats['size_after']} bytes")
+            for name, record in stats['phases'].items():
+                self.logger.info(
+                    f"  Phase {name}: {record['wall_time']:.3f}s wall, "
+                    f"{record['cpu_time']:.3f}s CPU"
+                )
             
             return stats
             
         finally:
             # Cerrar conexiones
             if self.android_conn:
+                self._drop_filter_index()
                 self.android_conn.close()
             if self.ios_conn:
                 self.ios_conn.close()
             if self.output_conn:
                 self.output_conn.close()
+    
+    @staticmethod
+    def get_profile_path(output_path: str) -> str:
+        """
+        Ruta del perfil JSON de fases asociado a una base de salida.
+        
+        Args:
+            output_path: Ruta de la base de datos de salida (ej: out/out.db)
+        
+        Returns:
+            Ruta del JSON (ej: out/out.profile.json)
+        """
+        return f"{os.path.splitext(output_path)[0]}.profile.json"
 
 
 def main():
@@ -590,6 +1846,98 @@ Examples:
         help='Output database path (default: out/out.db)'
     )
     
+    parser.add_argument(
+        '--estimate',
+        action='store_true',
+        help='Estimate migration time, output growth and memory without migrating'
+    )
+    
+    parser.add_argument(
+        '--merge',
+        action='store_true',
+        help='Skip messages already present in the iOS DB (key_id = ZSTANZAID)'
+    )
+    
+    parser.add_argument(
+        '--interleave',
+        action='store_true',
+        help='Interleave Android history into existing iOS chats by date (assigns ZSORT)'
+    )
+    
+    parser.add_argument(
+        '--snapshots',
+        nargs='+',
+        metavar='DB',
+        help='Older decrypted msgstore.db snapshots to merge with --android-db'
+    )
+    
+    parser.add_argument(
+        '--external-sort',
+        action='store_true',
+        help='Sort messages with bounded memory using on-disk runs instead of SQLite ORDER BY'
+    )
+    
+    parser.add_argument(
+        '--sort-chunk-rows',
+        type=int,
+        default=DEFAULT_SORT_CHUNK_ROWS,
+        help=f'Rows per chunk/run for --external-sort (default: {DEFAULT_SORT_CHUNK_ROWS})'
+    )
+    
+    parser.add_argument(
+        '--scratch-dir',
+        help='Directory for --external-sort runs (default: system temp dir)'
+    )
+    
+    parser.add_argument(
+        '--export-cache',
+        metavar='PATH',
+        help='Export normalized Android messages to a columnar cache file and exit'
+    )
+    
+    parser.add_argument(
+        '--message-cache',
+        metavar='PATH',
+        help='Read Android messages from a cache created with --export-cache'
+    )
+    
+    parser.add_argument(
+        '--chats',
+        nargs='+',
+        metavar='CHAT',
+        help='Only migrate these chats (phone numbers or JIDs)'
+    )
+    
+    parser.add_argument(
+        '--exclude-chats',
+        nargs='+',
+        metavar='CHAT',
+        help='Do not migrate these chats (phone numbers or JIDs)'
+    )
+    
+    parser.add_argument(
+        '--since',
+        help='Only migrate messages from this date on (YYYY-MM-DD, UTC)'
+    )
+    
+    parser.add_argument(
+        '--until',
+        help='Only migrate messages up to this date, inclusive (YYYY-MM-DD, UTC)'
+    )
+    
+    parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='Compact output database with VACUUM INTO after migration'
+    )
+    
+    parser.add_argument(
+        '--page-size',
+        type=int,
+        default=DEFAULT_PAGE_SIZE,
+        help=f'Page size used when compacting (default: {DEFAULT_PAGE_SIZE})'
+    )
+    
     parser.add_argument(
         '-v', '--verbose',
         action='store_true',
@@ -616,10 +1964,83 @@ Examples:
         logger.error(f"iOS database not found: {args.ios_db}")
         sys.exit(1)
     
+    # Filtros de fecha: --until con solo fecha incluye el día completo
+    try:
+        since = to_android_timestamp(args.since)
+        until = to_android_timestamp(args.until)
+    except ValueError as e:
+        logger.error(f"Invalid date filter: {e}")
+        sys.exit(1)
+    if args.until and len(args.until) == 10:
+        until += 24 * 60 * 60 * 1000
+    
+    filters = {
+        'chats': args.chats,
+        'exclude_chats': args.exclude_chats,
+        'since': since,
+        'until': until,
+    }
+    
+    # Solo estimación (no toca la salida)
+    if args.estimate:
+        try:
+            migrator = WhatsAppMigrator(args.android_db, args.ios_db, args.uid, **filters)
+            estimate = migrator.estimate_migration()
+        except Exception as e:
+            logger.error(f"Estimation failed: {e}")
+            sys.exit(1)
+        
+        peak = estimate['estimated_peak_rss']
+        print("\n" + "="*80)
+        print("MIGRATION ESTIMATE")
+        print("="*80)
+        print(f"Sampled rows:            {estimate['sampled_rows']:,}")
+        print(f"Estimated messages:      {estimate['estimated_messages']:,}")
+        print(f"Estimated total time:    {estimate['estimated_seconds']:.1f}s "
+              f"(copy {estimate['estimated_copy_seconds']:.1f}s, "
+              f"migrate {estimate['estimated_migrate_seconds']:.1f}s)")
+        print(f"Estimated output growth: {estimate['estimated_output_growth'] / (1024 * 1024):.2f} MB")
+        print(f"Estimated output size:   {estimate['estimated_output_size'] / (1024 * 1024):.2f} MB")
+        print(f"Estimated peak memory:   "
+              f"{f'{peak / (1024 * 1024):.1f} MB' if peak else 'unknown'}")
+        print(f"Estimate computed in:    {estimate['estimate_time']:.2f}s")
+        print("="*80)
+        return
+    
+    # Solo exportar la caché columnar (no toca la salida)
+    if args.export_cache:
+        try:
+            migrator = WhatsAppMigrator(
+                args.android_db, args.ios_db, args.uid,
+                snapshots=args.snapshots,
+                external_sort=args.external_sort,
+                sort_chunk_rows=args.sort_chunk_rows,
+                scratch_dir=args.scratch_dir,
+                **filters
+            )
+            exported = migrator.export_message_cache(args.export_cache)
+        except Exception as e:
+            logger.error(f"Cache export failed: {e}")
+            sys.exit(1)
+        
+        print(f"\n[OK] Exported {exported:,} messages to {args.export_cache}")
+        return
+    
     # Crear migrador y ejecutar
     try:
-        migrator = WhatsAppMigrator(args.android_db, args.ios_db, args.uid)
-        stats = migrator.run_migration(args.output)
+        migrator = WhatsAppMigrator(
+            args.android_db, args.ios_db, args.uid,
+            progress_callback=console_progress_bar(),
+            merge=args.merge,
+            interleave=args.interleave,
+            snapshots=args.snapshots,
+            external_sort=args.external_sort,
+            sort_chunk_rows=args.sort_chunk_rows,
+            scratch_dir=args.scratch_dir,
+            message_cache=args.message_cache,
+            **filters
+        )
+        stats = migrator.run_migration(args.output, compact=args.compact, page_size=args.page_size)
         
         print("\n" + "="*80)
         print("MIGRATION SUCCESSFUL")
@@ -628,8 +2049,19 @@ Examples:
         print(f"iOS messages (before): {stats['ios_messages_before']}")
         print(f"Messages migrated: {stats['migrated']}")
         print(f"Duplicates skipped: {stats['duplicates']}")
+        if args.snapshots:
+            print(f"Snapshot duplicates skipped: {stats['snapshot_duplicates']}")
+        print(f"Quoted replies linked: {stats['quoted']}")
         print(f"iOS messages (after): {stats['ios_messages_after']}")
+        if args.compact:
+            print(f"Output size: {stats['size_before'] / (1024 * 1024):.2f} MB → "
+                  f"{stats['size_after'] / (1024 * 1024):.2f} MB")
+        print("\nPhase timings:")
+        for name, record in stats['phases'].items():
+            rate = f"{record['rows_per_sec']:,.0f} rows/s" if record['rows_per_sec'] else "-"
+            print(f"  {name:<10} {record['wall_time']:>9.3f}s wall {record['cpu_time']:>9.3f}s CPU  {rate}")
         print(f"\nOutput database: {args.output}")
+        print(f"Phase profile: {WhatsAppMigrator.get_profile_path(args.output)}")
         print("="*80)
         
     except Exception as e:
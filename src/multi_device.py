@@ -0,0 +1,334 @@
+"""
+WhatsApp Android to iOS Migration Tool
+
+Extracción concurrente de msgstore.db desde varios dispositivos Android.
+
+Cada dispositivo se atiende con su propio AndroidBackupManager dirigido por
+serial (`adb -s`) y con directorios tmp/out separados, de modo que las
+extracciones no comparten archivos. Un pool de hilos acotado limita cuántos
+dispositivos se transfieren a la vez: el trabajo es casi todo E/S (USB y
+disco), así que los hilos no compiten por el GIL.
+
+Usage:
+    python -m src.multi_device --workers 4
+    python -m src.multi_device --serial R58M123 --serial emulator-5554 --socket
+    python -m src.multi_device --watch 16 --timeout 600
+"""
+
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, NamedTuple, Optional, Sequence
+
+from .adb_client import AdbClient, parse_device_list
+from .android_backup import AndroidBackupManager
+from .device_watcher import DETACHED, DeviceWatcher
+from .utils import get_adb_command, run_adb_command
+
+DEFAULT_WORKERS = 4
+DEFAULT_BASE_DIR = os.path.join('out', 'devices')
+
+
+class DeviceExtraction(NamedTuple):
+    """Resultado de la extracción de un dispositivo."""
+    
+    serial: str
+    path: Optional[str]
+    size: int
+    seconds: float
+    error: Optional[str] = None
+    
+    @property
+    def ok(self) -> bool:
+        """True si se obtuvo android.db."""
+        return self.path is not None
+    
+    @property
+    def bytes_per_sec(self) -> float:
+        """Throughput del dispositivo (bytes de android.db por segundo)."""
+        return self.size / self.seconds if self.seconds > 0 else 0.0
+
+
+class MultiDeviceReport(NamedTuple):
+    """Resultados de todos los dispositivos y tiempo total de pared."""
+    
+    results: List[DeviceExtraction]
+    wall_time: float
+    
+    @property
+    def total_bytes(self) -> int:
+        """Bytes extraídos entre todos los dispositivos."""
+        return sum(result.size for result in self.results)
+    
+    @property
+    def bytes_per_sec(self) -> float:
+        """Throughput agregado (bytes totales sobre tiempo de pared)."""
+        return self.total_bytes / self.wall_time if self.wall_time > 0 else 0.0
+    
+    @property
+    def failed(self) -> List[DeviceExtraction]:
+        """Dispositivos cuya extracción falló."""
+        return [result for result in self.results if not result.ok]
+
+
+def device_directory_name(serial: str) -> str:
+    """
+    Nombre de directorio seguro para un serial.
+    
+    Los seriales de dispositivos por red ('192.168.1.5:5555') contienen
+    caracteres no válidos en rutas de Windows.
+    
+    Args:
+        serial: Serial ADB
+    
+    Returns:
+        Serial con los caracteres no alfanuméricos reemplazados por '_'
+    """
+    return re.sub(r'[^A-Za-z0-9._-]', '_', serial)
+
+
+def list_device_serials(adb_cmd: Optional[str] = None,
+                        client: Optional[AdbClient] = None) -> List[str]:
+    """
+    Enumera los dispositivos listos para extracción.
+    
+    Los dispositivos en otro estado ('unauthorized', 'offline') se omiten
+    con una advertencia.
+    
+    Args:
+        adb_cmd: Comando ADB (modo subproceso)
+        client: Cliente ADB por socket (tiene prioridad sobre adb_cmd)
+    
+    Returns:
+        Seriales en estado 'device'
+    """
+    logger = logging.getLogger('whatsapp_migration.multi_device')
+    
+    if client:
+        devices = client.devices()
+    else:
+        result = run_adb_command([adb_cmd or get_adb_command(), 'devices'])
+        devices = parse_device_list(result.stdout)
+    
+    serials = []
+    for device in devices:
+        if device.state == 'device':
+            serials.append(device.serial)
+        else:
+            logger.warning(f"Skipping {device.serial} (state: {device.state})")
+    return serials
+
+
+def extract_device(serial: str, whatsapp_type: str = 'standard',
+                   base_dir: str = DEFAULT_BASE_DIR, pipeline: bool = False,
+                   client: Optional[AdbClient] = None) -> DeviceExtraction:
+    """
+    Extrae msgstore.db de un dispositivo a <base_dir>/<serial>/out.
+    
+    Args:
+        serial: Serial ADB del dispositivo
+        whatsapp_type: 'standard' o 'business'
+        base_dir: Directorio raíz de los directorios por dispositivo
+        pipeline: Descifrado en pipeline para bases encriptadas
+        client: Cliente ADB por socket compartido (None = subprocesos adb)
+    
+    Returns:
+        DeviceExtraction con ruta, tamaño y duración (o el error)
+    """
+    logger = logging.getLogger('whatsapp_migration.multi_device')
+    device_dir = os.path.join(base_dir, device_directory_name(serial))
+    started = time.perf_counter()
+    
+    try:
+        manager = AndroidBackupManager(
+            whatsapp_type, pipeline=pipeline, client=client, serial=serial,
+            tmp_dir=os.path.join(device_dir, 'tmp'), out_dir=os.path.join(device_dir, 'out'),
+            show_progress=False,
+        )
+        path = manager.extract_database_directly()
+    except Exception as e:
+        logger.error(f"[{serial}] Extraction failed: {e}")
+        return DeviceExtraction(serial, None, 0, time.perf_counter() - started, str(e))
+    
+    seconds = time.perf_counter() - started
+    if not path:
+        return DeviceExtraction(serial, None, 0, seconds, 'database not extracted')
+    
+    result = DeviceExtraction(serial, path, os.path.getsize(path), seconds)
+    logger.info(
+        f"[{serial}] Extracted {result.size:,} bytes in {seconds:.2f}s "
+        f"({result.bytes_per_sec / (1024 * 1024):.2f} MB/s)"
+    )
+    return result
+
+
+def extract_all_devices(serials: Sequence[str], whatsapp_type: str = 'standard',
+                        base_dir: str = DEFAULT_BASE_DIR, max_workers: int = DEFAULT_WORKERS,
+                        pipeline: bool = False,
+                        client: Optional[AdbClient] = None) -> MultiDeviceReport:
+    """
+    Extrae msgstore.db de varios dispositivos en paralelo.
+    
+    Un fallo en un dispositivo no interrumpe a los demás.
+    
+    Args:
+        serials: Seriales a procesar
+        whatsapp_type: 'standard' o 'business'
+        base_dir: Directorio raíz de los directorios por dispositivo
+        max_workers: Máximo de dispositivos extraídos a la vez
+        pipeline: Descifrado en pipeline para bases encriptadas
+        client: Cliente ADB por socket compartido (None = subprocesos adb)
+    
+    Returns:
+        MultiDeviceReport con un resultado por serial, en el orden recibido
+    """
+    logger = logging.getLogger('whatsapp_migration.multi_device')
+    logger.info(f"Extracting from {len(serials)} devices with {max_workers} workers")
+    
+    started = time.perf_counter()
+    results = {}
+    
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='device') as pool:
+        futures = {
+            pool.submit(extract_device, serial, whatsapp_type, base_dir, pipeline, client): serial
+            for serial in serials
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            status = 'OK' if result.ok else f"FAILED ({result.error})"
+            print(f"[{len(results)}/{len(serials)}] {result.serial}: {status}")
+    
+    return MultiDeviceReport([results[serial] for serial in serials], time.perf_counter() - started)
+
+
+def extract_attached_devices(watcher: DeviceWatcher, expected: int,
+                             whatsapp_type: str = 'standard', base_dir: str = DEFAULT_BASE_DIR,
+                             max_workers: int = DEFAULT_WORKERS, pipeline: bool = False,
+                             client: Optional[AdbClient] = None,
+                             timeout: Optional[float] = None) -> MultiDeviceReport:
+    """
+    Extrae cada dispositivo en cuanto queda listo, hasta atender expected.
+    
+    Los dispositivos ya conectados al iniciar cuentan como conexiones; cada
+    serial se procesa una sola vez aunque se desconecte y vuelva.
+    
+    Args:
+        watcher: Observador de dispositivos
+        expected: Número de dispositivos a atender
+        whatsapp_type: 'standard' o 'business'
+        base_dir: Directorio raíz de los directorios por dispositivo
+        max_workers: Máximo de dispositivos extraídos a la vez
+        pipeline: Descifrado en pipeline para bases encriptadas
+        client: Cliente ADB por socket compartido (None = subprocesos adb)
+        timeout: Segundos máximos esperando conexiones (None = sin límite)
+    
+    Returns:
+        MultiDeviceReport con los dispositivos atendidos, en orden de conexión
+    """
+    logger = logging.getLogger('whatsapp_migration.multi_device')
+    started = time.perf_counter()
+    futures = {}
+    
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='device') as pool:
+        try:
+            for event in watcher.events(timeout):
+                if event.ready and event.serial not in futures:
+                    print(f"[{len(futures) + 1}/{expected}] {event.serial} ready, extracting...")
+                    futures[event.serial] = pool.submit(
+                        extract_device, event.serial, whatsapp_type, base_dir, pipeline, client
+                    )
+                    if len(futures) >= expected:
+                        break
+                elif event.state == 'unauthorized':
+                    print(f"[INFO] {event.serial} waiting for USB debugging authorization")
+                elif event.kind == DETACHED and event.serial in futures and not futures[event.serial].done():
+                    logger.warning(f"[{event.serial}] Disconnected during extraction")
+        except TimeoutError:
+            logger.warning(f"Stopped waiting for devices: {len(futures)}/{expected} attached")
+    
+    return MultiDeviceReport([future.result() for future in futures.values()],
+                             time.perf_counter() - started)
+
+
+def print_report(report: MultiDeviceReport) -> None:
+    """Imprime throughput por dispositivo y agregado."""
+    print("\n" + "="*80)
+    print("MULTI-DEVICE EXTRACTION SUMMARY")
+    print("="*80)
+    
+    for result in report.results:
+        if result.ok:
+            print(f"  {result.serial:<24} {result.size / (1024 * 1024):10.2f} MB "
+                  f"{result.seconds:8.2f}s {result.bytes_per_sec / (1024 * 1024):8.2f} MB/s  {result.path}")
+        else:
+            print(f"  {result.serial:<24} FAILED: {result.error}")
+    
+    succeeded = len(report.results) - len(report.failed)
+    print(f"\n  {succeeded}/{len(report.results)} devices, "
+          f"{report.total_bytes / (1024 * 1024):.2f} MB in {report.wall_time:.2f}s "
+          f"(aggregate {report.bytes_per_sec / (1024 * 1024):.2f} MB/s)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Función principal para ejecución desde CLI."""
+    parser = argparse.ArgumentParser(description='Extract WhatsApp databases from several Android devices')
+    parser.add_argument('--serial', action='append',
+                        help='Device serial (repeatable, default: all connected devices)')
+    parser.add_argument('--business', action='store_true', help='Extract WhatsApp Business')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Devices extracted concurrently (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--base-dir', default=DEFAULT_BASE_DIR,
+                        help=f'Per-device output root (default: {DEFAULT_BASE_DIR})')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Pipelined transfer and decryption of encrypted databases')
+    parser.add_argument('--socket', action='store_true',
+                        help='Talk to the ADB server over its socket instead of spawning adb')
+    parser.add_argument('--watch', type=int, metavar='N',
+                        help='Extract devices as they are plugged in until N have been handled')
+    parser.add_argument('--timeout', type=float,
+                        help='With --watch, seconds to wait for devices (default: no limit)')
+    
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(threadName)s %(message)s')
+    
+    client = AdbClient() if args.socket else None
+    try:
+        adb_cmd = get_adb_command()
+        if client:
+            client.ensure_server(adb_cmd)
+        else:
+            run_adb_command([adb_cmd, 'start-server'])
+        
+        whatsapp_type = 'business' if args.business else 'standard'
+        
+        if args.watch:
+            print(f"[INFO] Waiting for {args.watch} devices, plug them in...")
+            with DeviceWatcher(client, adb_cmd) as watcher:
+                report = extract_attached_devices(
+                    watcher, args.watch, whatsapp_type, args.base_dir,
+                    args.workers, args.pipeline, client, args.timeout,
+                )
+        else:
+            serials = args.serial or list_device_serials(adb_cmd, client)
+            if not serials:
+                print("[ERROR] No Android devices connected")
+                return 1
+            
+            report = extract_all_devices(
+                serials, whatsapp_type, args.base_dir, args.workers, args.pipeline, client,
+            )
+    finally:
+        if client:
+            client.close()
+    
+    print_report(report)
+    return 1 if report.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
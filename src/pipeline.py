@@ -0,0 +1,215 @@
+"""
+WhatsApp Android to iOS Migration Tool
+
+Módulo de pipeline de bytes por etapas en hilos con colas acotadas.
+
+Cada etapa corre en su propio hilo y se comunica con la siguiente por una
+queue.Queue de tamaño fijo, de modo que la transferencia, el descifrado y
+la descompresión se solapan y la memoria queda acotada a
+queue_size × tamaño de fragmento por etapa.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+DEFAULT_QUEUE_SIZE = 8
+
+# Tiempo máximo bloqueado en una cola antes de volver a revisar la cancelación
+_POLL_INTERVAL = 0.1
+
+_END = object()
+
+
+class PipelineStage(NamedTuple):
+    """Etapa de transformación: process por fragmento y finish al cerrar."""
+    
+    name: str
+    process: Callable[[bytes], bytes]
+    finish: Optional[Callable[[], bytes]] = None
+
+
+class _Aborted(Exception):
+    """Señal interna: otra etapa falló y el pipeline se está cancelando."""
+
+
+class _StageStats:
+    """Contadores de una etapa."""
+    
+    def __init__(self):
+        self.chunks = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.busy_time = 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'chunks': self.chunks,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'busy_time': round(self.busy_time, 6),
+        }
+
+
+class _Pipeline:
+    """Estado compartido entre los hilos de un pipeline."""
+    
+    def __init__(self):
+        self.abort = threading.Event()
+        self.errors: List[BaseException] = []
+        self.lock = threading.Lock()
+    
+    def fail(self, error: BaseException) -> None:
+        """Registra un error y cancela el resto de las etapas."""
+        with self.lock:
+            self.errors.append(error)
+        self.abort.set()
+    
+    def put(self, q: queue.Queue, item: Any) -> None:
+        """Encola respetando la cancelación."""
+        while True:
+            if self.abort.is_set():
+                raise _Aborted()
+            try:
+                q.put(item, timeout=_POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+    
+    def get(self, q: queue.Queue) -> Any:
+        """Desencola respetando la cancelación."""
+        while True:
+            if self.abort.is_set():
+                raise _Aborted()
+            try:
+                return q.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+
+def _run_source(state: _Pipeline, source: Iterable[bytes], out: queue.Queue,
+                stats: _StageStats) -> None:
+    """Hilo productor: itera la fuente y encola fragmentos."""
+    iterator = iter(source)
+    try:
+        while True:
+            started = time.perf_counter()
+            chunk = next(iterator, _END)
+            stats.busy_time += time.perf_counter() - started
+            if chunk is _END:
+                break
+            stats.chunks += 1
+            stats.bytes_out += len(chunk)
+            state.put(out, chunk)
+        state.put(out, _END)
+    except _Aborted:
+        pass
+    except BaseException as e:
+        state.fail(e)
+    finally:
+        # Cerrar generadores libera procesos o archivos de la fuente
+        close = getattr(iterator, 'close', None)
+        if close:
+            close()
+
+
+def _run_stage(state: _Pipeline, stage: PipelineStage, inbox: queue.Queue,
+               out: queue.Queue, stats: _StageStats) -> None:
+    """Hilo de etapa: transforma fragmentos de inbox hacia out."""
+    try:
+        while True:
+            chunk = state.get(inbox)
+            started = time.perf_counter()
+            if chunk is _END:
+                result = stage.finish() if stage.finish else b''
+            else:
+                stats.chunks += 1
+                stats.bytes_in += len(chunk)
+                result = stage.process(chunk)
+            stats.busy_time += time.perf_counter() - started
+            
+            if result:
+                stats.bytes_out += len(result)
+                state.put(out, result)
+            if chunk is _END:
+                state.put(out, _END)
+                return
+    except _Aborted:
+        pass
+    except BaseException as e:
+        state.fail(e)
+
+
+def run_pipeline(source: Iterable[bytes], stages: Sequence[PipelineStage],
+                 sink: Callable[[bytes], None],
+                 queue_size: int = DEFAULT_QUEUE_SIZE) -> Dict[str, Any]:
+    """
+    Ejecuta fuente → etapas → sumidero con un hilo por etapa.
+    
+    La fuente y cada etapa corren en hilos propios; el sumidero corre en
+    el hilo que llama. Si cualquier parte falla, las demás se cancelan y
+    se relanza el primer error.
+    
+    Args:
+        source: Iterable de fragmentos de entrada (ej: flujo de adb)
+        stages: Transformaciones en orden
+        sink: Función que consume los fragmentos finales (ej: escritura)
+        queue_size: Fragmentos máximos en vuelo entre dos etapas
+    
+    Returns:
+        Diccionario con 'wall_time' y 'stages' (contadores y tiempo
+        ocupado por 'source', cada etapa y 'sink')
+    
+    Raises:
+        ValueError: Si queue_size no es positivo
+        Exception: El primer error producido por cualquier etapa
+    """
+    if queue_size <= 0:
+        raise ValueError("queue_size must be positive")
+    
+    state = _Pipeline()
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    stats = {'source': _StageStats()}
+    stats.update((stage.name, _StageStats()) for stage in stages)
+    stats['sink'] = _StageStats()
+    started = time.perf_counter()
+    
+    threads = [threading.Thread(target=_run_source, name='pipeline-source',
+                                args=(state, source, queues[0], stats['source']), daemon=True)]
+    for i, stage in enumerate(stages):
+        threads.append(threading.Thread(
+            target=_run_stage, name=f'pipeline-{stage.name}',
+            args=(state, stage, queues[i], queues[i + 1], stats[stage.name]), daemon=True,
+        ))
+    for thread in threads:
+        thread.start()
+    
+    sink_stats = stats['sink']
+    try:
+        while True:
+            chunk = state.get(queues[-1])
+            if chunk is _END:
+                break
+            chunk_started = time.perf_counter()
+            sink(chunk)
+            sink_stats.busy_time += time.perf_counter() - chunk_started
+            sink_stats.chunks += 1
+            sink_stats.bytes_in += len(chunk)
+    except _Aborted:
+        pass
+    except BaseException as e:
+        state.fail(e)
+    finally:
+        if state.errors:
+            state.abort.set()
+        for thread in threads:
+            thread.join()
+    
+    if state.errors:
+        raise state.errors[0]
+    
+    return {
+        'wall_time': round(time.perf_counter() - started, 6),
+        'stages': {name: s.to_dict() for name, s in stats.items()},
+    }
@@ -0,0 +1,115 @@
+"""
+WhatsApp Android to iOS Migration Tool
+
+Módulo de medición de tiempos y recursos por fase de la migración.
+"""
+
+import json
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+
+def get_peak_rss() -> Optional[int]:
+    """
+    Obtiene el pico de memoria residente (RSS) del proceso actual.
+
+    Returns:
+        Pico de RSS en bytes, None si la plataforma no lo soporta
+    """
+    if sys.platform == 'win32':
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ('cb', wintypes.DWORD),
+                    ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t),
+                    ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t),
+                    ('PeakPagefileUsage', ctypes.c_size_t),
+                ]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return int(counters.PeakWorkingSetSize)
+        except (AttributeError, OSError):
+            pass
+        return None
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS reporta bytes
+    if sys.platform == 'darwin':
+        return int(peak)
+    return int(peak) * 1024
+
+
+class PhaseProfiler:
+    """Registra tiempo de pared, CPU, filas/seg y pico de RSS por fase."""
+
+    def __init__(self):
+        """Inicializa el profiler sin fases registradas."""
+        self.phases: Dict[str, Dict[str, Any]] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[Dict[str, Any]]:
+        """
+        Mide una fase del proceso.
+
+        El registro entregado admite la clave 'rows' para que la fase
+        informe cuántas filas procesó y así calcular filas/seg.
+
+        Args:
+            name: Nombre de la fase (ej: 'connect', 'migrate')
+
+        Yields:
+            Diccionario del registro de la fase
+        """
+        record: Dict[str, Any] = {'rows': None}
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+
+        try:
+            yield record
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            rows = record.get('rows')
+
+            record['wall_time'] = round(wall, 6)
+            record['cpu_time'] = round(cpu, 6)
+            record['rows_per_sec'] = round(rows / wall, 2) if rows and wall > 0 else None
+            record['peak_rss'] = get_peak_rss()
+            self.phases[name] = record
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Retorna una copia de los registros de todas las fases."""
+        return {name: dict(record) for name, record in self.phases.items()}
+
+    def write_json(self, path: str, extra: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Escribe el perfil de fases como JSON.
+
+        Args:
+            path: Ruta del archivo JSON
+            extra: Datos adicionales a incluir junto a las fases
+        """
+        data: Dict[str, Any] = dict(extra or {})
+        data['phases'] = self.to_dict()
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
@@ -0,0 +1,122 @@
+"""
+WhatsApp Android to iOS Migration Tool
+
+Módulo de reporte de progreso desacoplado de la consola.
+"""
+
+import sys
+import time
+from typing import Callable, NamedTuple, Optional, TextIO
+
+
+class ProgressInfo(NamedTuple):
+    """Estado del progreso entregado a los callbacks."""
+    
+    done: int
+    total: int
+    rate: float
+    eta: Optional[float]
+    finished: bool = False
+
+
+ProgressCallback = Callable[[ProgressInfo], None]
+
+
+class ProgressTracker:
+    """
+    Limita por tiempo las llamadas a un callback de progreso.
+    
+    update() puede invocarse en cada fila: el callback solo se ejecuta
+    cuando han pasado al menos min_interval segundos desde el último reporte.
+    """
+    
+    def __init__(self, callback: Optional[ProgressCallback], total: int,
+                 min_interval: float = 0.5):
+        """
+        Inicializa el tracker.
+        
+        Args:
+            callback: Función que recibe ProgressInfo (None desactiva reportes)
+            total: Total de elementos esperados
+            min_interval: Segundos mínimos entre reportes
+        """
+        self.callback = callback
+        self.total = total
+        self.min_interval = min_interval
+        self.start_time = time.monotonic()
+        self.last_report = self.start_time
+    
+    def _report(self, done: int, now: float, finished: bool = False) -> None:
+        """Construye ProgressInfo y lo entrega al callback."""
+        elapsed = now - self.start_time
+        rate = done / elapsed if elapsed > 0 else 0.0
+        remaining = max(self.total - done, 0)
+        eta = remaining / rate if rate > 0 else None
+        self.last_report = now
+        self.callback(ProgressInfo(done, self.total, rate, eta, finished))
+    
+    def update(self, done: int) -> None:
+        """
+        Informa el avance actual; reporta solo si venció el intervalo.
+        
+        Args:
+            done: Elementos procesados hasta ahora
+        """
+        if self.callback is None:
+            return
+        now = time.monotonic()
+        if now - self.last_report >= self.min_interval:
+            self._report(done, now)
+    
+    def finish(self, done: int) -> None:
+        """
+        Emite el reporte final incondicionalmente.
+        
+        Args:
+            done: Elementos procesados en total
+        """
+        if self.callback is None:
+            return
+        self._report(done, time.monotonic(), finished=True)
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """Formatea segundos como HH:MM:SS (o '--:--' si se desconoce)."""
+    if seconds is None:
+        return '--:--'
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours:d}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def console_progress_bar(width: int = 30, stream: TextIO = None,
+                         unit: str = 'messages') -> ProgressCallback:
+    """
+    Crea un callback que dibuja una barra de progreso en consola.
+    
+    Args:
+        width: Ancho de la barra en caracteres
+        stream: Salida (por defecto sys.stdout)
+        unit: Nombre de la unidad mostrada
+    
+    Returns:
+        Callback compatible con ProgressTracker
+    """
+    def callback(info: ProgressInfo) -> None:
+        out = stream or sys.stdout
+        fraction = info.done / info.total if info.total else 1.0
+        filled = int(width * min(fraction, 1.0))
+        bar = '#' * filled + '-' * (width - filled)
+        out.write(
+            f"\rProgress: [{bar}] {fraction * 100:5.1f}% "
+            f"{info.done:,}/{info.total:,} {unit} "
+            f"({info.rate:,.0f}/s, ETA {format_duration(info.eta)})"
+        )
+        if info.finished:
+            out.write('\n')
+        out.flush()
+    
+    return callback
@@ -0,0 +1,135 @@
+"""
+WhatsApp Android to iOS Migration Tool
+
+Módulo de mezcla de varios snapshots de msgstore.db.
+
+Los dispositivos guardan copias diarias (msgstore-YYYY-MM-DD.1.db.crypt14)
+y los snapshots antiguos pueden conservar mensajes que el actual ya perdió.
+SnapshotMerger recorre los snapshots descifrados como flujos ordenados por
+(key_remote_jid, key_from_me, key_id) y los mezcla en una sola pasada (k-way merge),
+descartando duplicados sin materializar una base combinada.
+"""
+
+import heapq
+import logging
+import os
+import sqlite3
+from typing import Any, Iterator, List, Optional, Sequence
+
+# Orden de los flujos de cada snapshot: clave de deduplicación
+SNAPSHOT_ORDER = "m.key_remote_jid ASC, m.key_from_me ASC, m.key_id ASC"
+
+
+class SnapshotMerger:
+    """Mezcla k-way de mensajes de varios snapshots Android con deduplicación."""
+    
+    def __init__(self, snapshot_paths: Sequence[str], columns: str,
+                 conditions: Optional[List[str]] = None, params: Sequence[Any] = ()):
+        """
+        Inicializa el merger.
+        
+        Args:
+            snapshot_paths: Rutas de los msgstore.db descifrados, por prioridad
+                (ante un duplicado se conserva la fila del primero)
+            columns: Columnas SELECT sobre 'messages m'; las posiciones 1 a 3
+                deben ser key_remote_jid, key_from_me y key_id (ej: MODERN_MESSAGE_COLUMNS)
+            conditions: Predicados WHERE aplicados en cada snapshot
+            params: Parámetros de las condiciones
+        """
+        self.snapshot_paths = list(snapshot_paths)
+        self.columns = columns
+        self.conditions = list(conditions or [])
+        self.params = tuple(params)
+        self.connections: List[sqlite3.Connection] = []
+        self.duplicates = 0
+        self.logger = logging.getLogger('whatsapp_migration.snapshots')
+    
+    def open(self) -> None:
+        """
+        Abre los snapshots en modo solo lectura.
+        
+        Raises:
+            FileNotFoundError: Si algún snapshot no existe
+            ValueError: Si algún snapshot no tiene la tabla messages
+        """
+        for path in self.snapshot_paths:
+            if not os.path.exists(path):
+                self.close()
+                raise FileNotFoundError(f"Snapshot not found: {path}")
+            
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            self.connections.append(conn)
+            
+            found = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='messages'"
+            ).fetchone()
+            if not found:
+                self.close()
+                raise ValueError(f"Snapshot has no modern 'messages' table: {path}")
+        
+        self.logger.info(f"Opened {len(self.connections)} Android snapshots for merge")
+    
+    def close(self) -> None:
+        """Cierra las conexiones abiertas."""
+        for conn in self.connections:
+            conn.close()
+        self.connections = []
+    
+    def __enter__(self) -> 'SnapshotMerger':
+        self.open()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+    
+    def _where(self) -> str:
+        """Cláusula WHERE común a todos los snapshots."""
+        if not self.conditions:
+            return ''
+        return f"WHERE {' AND '.join(self.conditions)}"
+    
+    def count(self) -> int:
+        """
+        Cuenta las filas de todos los snapshots (cota superior, con duplicados).
+        
+        Returns:
+            Suma de filas que cumplen las condiciones en cada snapshot
+        """
+        sql = f"SELECT COUNT(*) FROM messages m {self._where()}"
+        return sum(conn.execute(sql, self.params).fetchone()[0] for conn in self.connections)
+    
+    def _iter_snapshot(self, priority: int, conn: sqlite3.Connection) -> Iterator[tuple]:
+        """Flujo ordenado de un snapshot como (jid, from_me, key_id, prioridad, fila)."""
+        cursor = conn.execute(
+            f"SELECT {self.columns} FROM messages m {self._where()} ORDER BY {SNAPSHOT_ORDER}",
+            self.params
+        )
+        for row in cursor:
+            yield (row[1] or '', 1 if row[2] else 0, row[3] or '', priority, row)
+    
+    def iter_messages(self) -> Iterator[tuple]:
+        """
+        Recorre el flujo unificado y deduplicado.
+        
+        Cada snapshot llega ordenado por (key_remote_jid, key_from_me, key_id), así que
+        heapq.merge mantiene un solo candidato por snapshot y las copias de
+        un mismo mensaje quedan contiguas: basta comparar con la clave
+        anterior. Las filas sin key_id no se pueden identificar y se
+        conservan todas.
+        
+        Yields:
+            Filas con las columnas indicadas, ordenadas por (jid, from_me, key_id)
+        """
+        self.duplicates = 0
+        streams = [self._iter_snapshot(i, conn) for i, conn in enumerate(self.connections)]
+        previous = None
+        
+        for jid, from_me, key_id, _, row in heapq.merge(*streams):
+            key = (jid, from_me, key_id)
+            if key_id and key == previous:
+                self.duplicates += 1
+                continue
+            previous = key
+            yield row
+        
+        self.logger.info(f"Snapshot merge skipped {self.duplicates:,} duplicate messages")
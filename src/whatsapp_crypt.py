@@ -0,0 +1,620 @@
+"""
+WhatsApp Android to iOS Migration Tool
+
+Módulo de desencriptación nativa de bases de datos crypt12/crypt14/crypt15.
+
+El archivo se procesa como flujo: el encabezado se interpreta al vuelo,
+el ciphertext pasa por AES-GCM y zlib en bloques, y el footer (tag GCM y,
+en crypt14/15, MD5 del archivo) se retiene hasta el final. La memoria
+usada es constante respecto del tamaño de la base de datos.
+
+Backends de AES-GCM, en orden de preferencia: `cryptography`,
+`pycryptodome` y la implementación en Python puro de aes_gcm.py.
+"""
+
+import hashlib
+import hmac
+import logging
+import os
+import re
+import zlib
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .aes_gcm import BLOCK_SIZE, GCMDecryptor, gcm_first_keystream_block
+from .pipeline import DEFAULT_QUEUE_SIZE, PipelineStage, run_pipeline
+from .progress import ProgressCallback, ProgressTracker
+
+CRYPT_VERSIONS = (12, 14, 15)
+
+# Archivo `key` de crypt12/14: objeto Java serializado, clave AES al final
+KEY_FILE_SIZE = 158
+KEY_OFFSET = 126
+AES_KEY_SIZE = 32
+
+# crypt12: encabezado fijo con IV en [51:67]; footer = tag (16) + 4 bytes
+CRYPT12_HEADER_SIZE = 67
+CRYPT12_IV_OFFSET = 51
+CRYPT12_FOOTER_SIZE = 20
+
+# crypt14/15: footer = tag (16) + MD5 del archivo sin los últimos 16 bytes
+CRYPT14_FOOTER_SIZE = 32
+GCM_TAG_SIZE = 16
+
+# Encabezado crypt14 antiguo sin prefijo protobuf (IV y datos en offsets fijos)
+LEGACY_CRYPT14_IV_OFFSET = 67
+LEGACY_CRYPT14_DATA_OFFSETS = (191, 190)
+
+# Campos del protobuf BackupPrefix que contienen el IV
+PREFIX_C14_CIPHER_FIELD = 2
+PREFIX_C15_IV_FIELD = 3
+
+DECRYPT_CHUNK_SIZE = 1024 * 1024
+
+BACKENDS = ('cryptography', 'pycryptodome', 'python')
+
+# Throughput aproximado del backend AES-GCM en Python puro; a partir de
+# PYTHON_BACKEND_WARN_SIZE se advierte que conviene instalar 'cryptography'
+PYTHON_BACKEND_BYTES_PER_SEC = 512 * 1024
+PYTHON_BACKEND_WARN_SIZE = 16 * 1024 * 1024
+
+
+class DecryptResult(NamedTuple):
+    """Resultado de una desencriptación."""
+    
+    path: str
+    version: int
+    encrypted_size: int
+    size: int
+    backend: str
+    checksum_verified: Optional[bool]
+
+
+def detect_crypt_version(path: str) -> int:
+    """
+    Obtiene la versión de encriptación a partir del nombre del archivo.
+    
+    Args:
+        path: Ruta del archivo (ej: msgstore.db.crypt14)
+    
+    Returns:
+        Versión (12, 14 o 15)
+    
+    Raises:
+        ValueError: Si la extensión no corresponde a una versión soportada
+    """
+    match = re.search(r'\.crypt(\d+)$', path)
+    if not match or int(match.group(1)) not in CRYPT_VERSIONS:
+        raise ValueError(f"Unsupported encrypted database: {path}")
+    return int(match.group(1))
+
+
+def derive_crypt15_key(root_key: bytes) -> bytes:
+    """
+    Deriva la clave AES de crypt15 desde la clave raíz de 32 bytes.
+    
+    Equivale a HKDF-SHA256 con salt nulo e info "backup encryption".
+    
+    Args:
+        root_key: Clave raíz del backup encriptado de extremo a extremo
+    
+    Returns:
+        Clave AES-256
+    """
+    prk = hmac.new(b'\x00' * 32, root_key, hashlib.sha256).digest()
+    return hmac.new(prk, b'backup encryption\x01', hashlib.sha256).digest()
+
+
+def load_key(key_data: bytes, version: int) -> bytes:
+    """
+    Obtiene la clave AES desde el contenido del archivo de clave.
+    
+    Acepta el archivo `key` de 158 bytes (crypt12/14), la clave raíz de
+    crypt15 en hexadecimal (64 caracteres), cruda (32 bytes) o dentro de
+    `encrypted_backup.key` (objeto Java serializado).
+    
+    Args:
+        key_data: Contenido del archivo de clave
+        version: Versión de encriptación
+    
+    Returns:
+        Clave AES-256
+    
+    Raises:
+        ValueError: Si el formato de la clave no es reconocido
+    """
+    if version == 15:
+        text = key_data.strip()
+        if len(text) == 2 * AES_KEY_SIZE and re.fullmatch(rb'[0-9a-fA-F]+', text):
+            root_key = bytes.fromhex(text.decode('ascii'))
+        elif len(key_data) == AES_KEY_SIZE:
+            root_key = key_data
+        elif key_data.startswith(b'\xac\xed') and len(key_data) > AES_KEY_SIZE:
+            root_key = key_data[-AES_KEY_SIZE:]
+        else:
+            raise ValueError(f"Unrecognized crypt15 key format ({len(key_data)} bytes)")
+        return derive_crypt15_key(root_key)
+    
+    if len(key_data) == KEY_FILE_SIZE:
+        return key_data[KEY_OFFSET:KEY_OFFSET + AES_KEY_SIZE]
+    if len(key_data) == AES_KEY_SIZE:
+        return key_data
+    raise ValueError(f"Unexpected key size: {len(key_data)} bytes (expected {KEY_FILE_SIZE})")
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Lee un varint protobuf; retorna (valor, nueva posición)."""
+    value = shift = 0
+    while True:
+        if pos >= len(data) or shift > 63:
+            raise ValueError("Truncated protobuf varint")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _protobuf_fields(data: bytes) -> List[Tuple[int, int, object]]:
+    """
+    Decodifica los campos de primer nivel de un mensaje protobuf.
+    
+    Returns:
+        Lista de (número de campo, wire type, valor)
+    
+    Raises:
+        ValueError: Si el mensaje está mal formado
+    """
+    fields = []
+    pos = 0
+    while pos < len(data):
+        key, pos = _read_varint(data, pos)
+        field, wire_type = key >> 3, key & 0x07
+        if wire_type == 0:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire_type == 2:
+            length, pos = _read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        elif wire_type == 5:
+            value, pos = data[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+        if pos > len(data) or field == 0:
+            raise ValueError("Malformed protobuf message")
+        fields.append((field, wire_type, value))
+    return fields
+
+
+def prefix_iv_candidates(prefix: bytes) -> List[bytes]:
+    """
+    Extrae los IV candidatos del protobuf BackupPrefix de crypt14/15.
+    
+    crypt15 guarda el IV en el campo 3; crypt14 lo guarda como último
+    campo de 16 bytes del campo 2 (que también contiene un salt de 16
+    bytes), por lo que ese mensaje se recorre en orden inverso.
+    
+    Args:
+        prefix: Bytes del protobuf
+    
+    Returns:
+        IVs de 16 bytes en orden de preferencia
+    """
+    try:
+        fields = _protobuf_fields(prefix)
+    except ValueError:
+        return []
+    
+    candidates = []
+    for number in (PREFIX_C15_IV_FIELD, PREFIX_C14_CIPHER_FIELD):
+        for field, wire_type, value in fields:
+            if field != number or wire_type != 2:
+                continue
+            try:
+                nested = _protobuf_fields(value)
+            except ValueError:
+                continue
+            values = [v for _, wt, v in nested if wt == 2 and len(v) == BLOCK_SIZE]
+            if number == PREFIX_C14_CIPHER_FIELD:
+                values.reverse()
+            candidates.extend(values)
+    return candidates
+
+
+def looks_like_zlib(data: bytes) -> bool:
+    """Verifica si data comienza con un encabezado zlib (deflate) válido."""
+    if len(data) < 2:
+        return False
+    cmf, flg = data[0], data[1]
+    return (cmf & 0x0F) == 8 and (cmf >> 4) <= 7 and (cmf * 256 + flg) % 31 == 0
+
+
+def _new_gcm_decryptor(key: bytes, iv: bytes, backend: Optional[str] = None):
+    """
+    Crea un descifrador GCM incremental con el mejor backend disponible.
+    
+    El objeto retornado expone update(data) -> bytes y finalize(tag), que
+    lanza ValueError si el tag no coincide.
+    
+    Args:
+        key: Clave AES
+        iv: IV de GCM
+        backend: Forzar backend ('cryptography', 'pycryptodome' o 'python')
+    
+    Returns:
+        Tupla (descifrador, nombre del backend)
+    
+    Raises:
+        ValueError: Si el backend pedido no existe o no está instalado
+    """
+    if backend is not None and backend not in BACKENDS:
+        raise ValueError(f"Unknown AES-GCM backend: {backend}")
+    
+    if backend in (None, 'cryptography'):
+        try:
+            from cryptography.exceptions import InvalidTag
+            from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+        except ImportError:
+            if backend:
+                raise ValueError("Backend 'cryptography' is not installed")
+        else:
+            class _CryptographyGCM:
+                def __init__(self):
+                    self._ctx = Cipher(algorithms.AES(key), modes.GCM(iv)).decryptor()
+                
+                def update(self, data: bytes) -> bytes:
+                    return self._ctx.update(data)
+                
+                def finalize(self, tag: bytes) -> None:
+                    try:
+                        self._ctx.finalize_with_tag(tag)
+                    except InvalidTag:
+                        raise ValueError("GCM authentication tag mismatch")
+            
+            return _CryptographyGCM(), 'cryptography'
+    
+    if backend in (None, 'pycryptodome'):
+        try:
+            from Crypto.Cipher import AES as CryptoAES
+        except ImportError:
+            if backend:
+                raise ValueError("Backend 'pycryptodome' is not installed")
+        else:
+            class _PyCryptodomeGCM:
+                def __init__(self):
+                    self._cipher = CryptoAES.new(key, CryptoAES.MODE_GCM, nonce=iv)
+                
+                def update(self, data: bytes) -> bytes:
+                    return self._cipher.decrypt(data)
+                
+                def finalize(self, tag: bytes) -> None:
+                    self._cipher.verify(tag)
+            
+            return _PyCryptodomeGCM(), 'pycryptodome'
+    
+    return GCMDecryptor(key, iv), 'python'
+
+
+class CryptStreamDecryptor:
+    """
+    Desencripta y descomprime un archivo cryptNN recibido por fragmentos.
+    
+    feed() acepta bytes del archivo encriptado en cualquier partición y
+    devuelve el SQLite en claro disponible hasta el momento; finish()
+    verifica el tag GCM (y el MD5 en crypt14/15) y devuelve el resto.
+    Con inflate=False devuelve el flujo zlib descifrado sin descomprimir,
+    para descomprimirlo en otra etapa.
+    """
+    
+    def __init__(self, key: bytes, version: int, backend: Optional[str] = None,
+                 inflate: bool = True, expected_size: Optional[int] = None):
+        """
+        Inicializa el descifrador.
+        
+        Args:
+            key: Clave AES-256 (ver load_key)
+            version: Versión de encriptación (12, 14 o 15)
+            backend: Backend de AES-GCM a forzar (None = automático)
+            inflate: Si False, no descomprime la salida
+            expected_size: Tamaño del archivo encriptado, si se conoce (para
+                advertir si el backend elegido será lento)
+        
+        Raises:
+            ValueError: Si la versión no está soportada
+        """
+        if version not in CRYPT_VERSIONS:
+            raise ValueError(f"Unsupported crypt version: {version}")
+        self.key = key
+        self.version = version
+        self.requested_backend = backend
+        self.expected_size = expected_size
+        self.backend: Optional[str] = None
+        self.checksum_verified: Optional[bool] = None
+        self.encrypted_size = 0
+        self._footer_size = CRYPT12_FOOTER_SIZE if version == 12 else CRYPT14_FOOTER_SIZE
+        self._buffer = bytearray()
+        self._md5 = hashlib.md5()
+        self._decryptor = None
+        self._inflater = zlib.decompressobj() if inflate else None
+    
+    def _resolve_layout(self, eof: bool) -> Optional[Tuple[int, bytes]]:
+        """
+        Determina el offset de los datos y el IV a partir del buffer.
+        
+        Cada IV candidato se valida descifrando el primer bloque: debe
+        comenzar con un encabezado zlib.
+        
+        Returns:
+            (offset de datos, IV), o None si faltan bytes
+        
+        Raises:
+            ValueError: Si ningún candidato es válido
+        """
+        buffer = self._buffer
+        
+        if self.version == 12:
+            if len(buffer) < CRYPT12_HEADER_SIZE + BLOCK_SIZE and not eof:
+                return None
+            layouts = [(CRYPT12_HEADER_SIZE, bytes(buffer[CRYPT12_IV_OFFSET:CRYPT12_HEADER_SIZE]))]
+        else:
+            if len(buffer) < 2:
+                if eof:
+                    raise ValueError("Truncated encrypted database header")
+                return None
+            prefix_size = buffer[0]
+            prefix_start = 2 if buffer[1] == 1 else 1
+            data_offset = prefix_start + prefix_size
+            needed = data_offset + BLOCK_SIZE
+            if self.version == 14:
+                needed = max(needed, LEGACY_CRYPT14_DATA_OFFSETS[0] + BLOCK_SIZE)
+            if len(buffer) < needed + self._footer_size and not eof:
+                return None
+            
+            prefix = bytes(buffer[prefix_start:data_offset])
+            layouts = [(data_offset, iv) for iv in prefix_iv_candidates(prefix)]
+            if self.version == 14:
+                legacy_iv = bytes(buffer[LEGACY_CRYPT14_IV_OFFSET:LEGACY_CRYPT14_IV_OFFSET + BLOCK_SIZE])
+                layouts.extend((offset, legacy_iv) for offset in LEGACY_CRYPT14_DATA_OFFSETS)
+        
+        for offset, iv in layouts:
+            first = bytes(buffer[offset:offset + 2])
+            if len(iv) != BLOCK_SIZE or len(first) < 2:
+                continue
+            keystream = gcm_first_keystream_block(self.key, iv)
+            if looks_like_zlib(bytes(a ^ b for a, b in zip(first, keystream))):
+                return offset, iv
+        
+        raise ValueError("Could not decrypt database header: wrong key or unsupported format")
+    
+    def _start(self, eof: bool = False) -> bool:
+        """Inicia el descifrado si el encabezado ya está disponible."""
+        layout = self._resolve_layout(eof)
+        if layout is None:
+            return False
+        offset, iv = layout
+        self._md5.update(self._buffer[:offset])
+        del self._buffer[:offset]
+        self._decryptor, self.backend = _new_gcm_decryptor(self.key, iv, self.requested_backend)
+        if self.backend == 'python' and (self.expected_size or 0) >= PYTHON_BACKEND_WARN_SIZE:
+            minutes = self.expected_size / PYTHON_BACKEND_BYTES_PER_SEC / 60
+            logging.getLogger('whatsapp_migration.whatsapp_crypt').warning(
+                f"Decrypting {self.expected_size / (1024 * 1024):.0f} MB with the pure-Python "
+                f"AES-GCM backend (~0.5 MB/s, about {minutes:.0f} min); "
+                f"install 'cryptography' for native speed"
+            )
+        return True
+    
+    def _decrypt(self, ciphertext: bytes) -> bytes:
+        """Descifra (e infla, si corresponde) un fragmento de ciphertext."""
+        self._md5.update(ciphertext)
+        compressed = self._decryptor.update(ciphertext)
+        return self._inflater.decompress(compressed) if self._inflater else compressed
+    
+    def feed(self, data: bytes) -> bytes:
+        """
+        Procesa bytes del archivo encriptado.
+        
+        Args:
+            data: Siguiente fragmento del archivo
+        
+        Returns:
+            Bytes de SQLite en claro producidos (puede ser vacío)
+        
+        Raises:
+            ValueError: Si la clave o el formato no son válidos
+            zlib.error: Si el contenido descifrado no es un flujo zlib válido
+        """
+        self.encrypted_size += len(data)
+        self._buffer += data
+        if self._decryptor is None and not self._start():
+            return b''
+        
+        available = len(self._buffer) - self._footer_size
+        if available <= 0:
+            return b''
+        chunk = bytes(self._buffer[:available])
+        del self._buffer[:available]
+        return self._decrypt(chunk)
+    
+    def finish(self) -> bytes:
+        """
+        Verifica la autenticación y vacía los buffers.
+        
+        Returns:
+            Últimos bytes de SQLite en claro
+        
+        Raises:
+            ValueError: Si el archivo está truncado, el tag GCM no coincide
+                o el flujo zlib está incompleto
+        """
+        if self._decryptor is None:
+            self._start(eof=True)
+        if len(self._buffer) != self._footer_size:
+            raise ValueError("Truncated encrypted database")
+        
+        footer = bytes(self._buffer)
+        self._buffer.clear()
+        output = b''
+        
+        if self.version == 12:
+            tag = footer[:GCM_TAG_SIZE]
+        else:
+            md5 = self._md5.copy()
+            md5.update(footer[:GCM_TAG_SIZE])
+            if md5.digest() == footer[GCM_TAG_SIZE:]:
+                tag = footer[:GCM_TAG_SIZE]
+                self.checksum_verified = True
+            else:
+                # Sin MD5 final: los primeros 16 bytes retenidos eran ciphertext
+                output = self._decrypt(footer[:GCM_TAG_SIZE])
+                tag = footer[GCM_TAG_SIZE:]
+                self.checksum_verified = False
+        
+        self._decryptor.finalize(tag)
+        if self._inflater:
+            output += self._inflater.flush()
+            if not self._inflater.eof:
+                raise ValueError("Incomplete compressed database stream")
+        return output
+
+
+def decrypt_database(encrypted_path: str, key_path: str, output_path: str,
+                     version: Optional[int] = None, backend: Optional[str] = None,
+                     progress: Optional[ProgressCallback] = None,
+                     chunk_size: int = DECRYPT_CHUNK_SIZE) -> DecryptResult:
+    """
+    Desencripta un msgstore.db.cryptNN hacia un archivo SQLite.
+    
+    Lee y escribe en bloques de chunk_size; el resultado se escribe en
+    `<output_path>.part` y se renombra solo tras verificar el tag GCM.
+    
+    Args:
+        encrypted_path: Archivo .crypt12/.crypt14/.crypt15
+        key_path: Archivo de clave (`key` o clave crypt15)
+        output_path: Ruta del SQLite de salida
+        version: Versión de encriptación (None = detectar por extensión)
+        backend: Backend de AES-GCM a forzar (None = automático)
+        progress: Callback de progreso (bytes encriptados procesados)
+        chunk_size: Bytes leídos por iteración
+    
+    Returns:
+        DecryptResult con tamaños, backend y verificación de checksum
+    
+    Raises:
+        ValueError: Si la clave, el formato o la autenticación fallan
+        OSError: Si no se pueden leer o escribir los archivos
+    """
+    logger = logging.getLogger('whatsapp_migration.whatsapp_crypt')
+    if version is None:
+        version = detect_crypt_version(encrypted_path)
+    
+    with open(key_path, 'rb') as f:
+        key = load_key(f.read(), version)
+    
+    encrypted_size = os.path.getsize(encrypted_path)
+    decryptor = CryptStreamDecryptor(key, version, backend, expected_size=encrypted_size)
+    tracker = ProgressTracker(progress, encrypted_size)
+    partial_path = output_path + '.part'
+    size = 0
+    
+    try:
+        with open(encrypted_path, 'rb') as source, open(partial_path, 'wb') as out:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                plaintext = decryptor.feed(chunk)
+                out.write(plaintext)
+                size += len(plaintext)
+                tracker.update(decryptor.encrypted_size)
+            
+            plaintext = decryptor.finish()
+            out.write(plaintext)
+            size += len(plaintext)
+    except (ValueError, zlib.error) as e:
+        os.remove(partial_path)
+        raise ValueError(f"Decryption failed: {e}")
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    
+    os.replace(partial_path, output_path)
+    tracker.finish(decryptor.encrypted_size)
+    
+    logger.info(
+        f"Decrypted crypt{version} ({decryptor.backend}): {decryptor.encrypted_size:,} -> {size:,} bytes"
+    )
+    if decryptor.checksum_verified is False:
+        logger.warning("Encrypted file has no trailing MD5; integrity relies on the GCM tag only")
+    
+    return DecryptResult(output_path, version, decryptor.encrypted_size, size,
+                         decryptor.backend, decryptor.checksum_verified)
+
+
+def decrypt_chunks(chunks: Iterable[bytes], key: bytes, version: int, output_path: str,
+                   backend: Optional[str] = None,
+                   queue_size: int = DEFAULT_QUEUE_SIZE,
+                   expected_size: Optional[int] = None) -> Tuple[DecryptResult, Dict[str, Any]]:
+    """
+    Desencripta un flujo de fragmentos con etapas en paralelo.
+    
+    Cadena: fuente (ej: `adb exec-out`) → AES-GCM → zlib → escritura, cada
+    una en su hilo y unidas por colas acotadas, de modo que el descifrado
+    se solapa con la transferencia. La salida se escribe en
+    `<output_path>.part` y se renombra tras verificar el tag GCM.
+    
+    Args:
+        chunks: Fragmentos del archivo encriptado
+        key: Clave AES-256 (ver load_key)
+        version: Versión de encriptación
+        output_path: Ruta del SQLite de salida
+        backend: Backend de AES-GCM a forzar (None = automático)
+        queue_size: Fragmentos máximos en vuelo entre etapas
+        expected_size: Tamaño del archivo encriptado, si se conoce
+    
+    Returns:
+        Tupla (DecryptResult, estadísticas del pipeline)
+    
+    Raises:
+        ValueError: Si la clave, el formato o la autenticación fallan
+        RuntimeError: Si la fuente falla (ej: error de adb)
+    """
+    logger = logging.getLogger('whatsapp_migration.whatsapp_crypt')
+    decryptor = CryptStreamDecryptor(key, version, backend, inflate=False, expected_size=expected_size)
+    inflater = zlib.decompressobj()
+    
+    def finish_inflate() -> bytes:
+        tail = inflater.flush()
+        if not inflater.eof:
+            raise ValueError("Incomplete compressed database stream")
+        return tail
+    
+    stages = [
+        PipelineStage('decrypt', decryptor.feed, decryptor.finish),
+        PipelineStage('inflate', inflater.decompress, finish_inflate),
+    ]
+    partial_path = output_path + '.part'
+    
+    try:
+        with open(partial_path, 'wb') as out:
+            stats = run_pipeline(chunks, stages, out.write, queue_size)
+    except zlib.error as e:
+        os.remove(partial_path)
+        raise ValueError(f"Decryption failed: {e}")
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    
+    os.replace(partial_path, output_path)
+    size = stats['stages']['sink']['bytes_in']
+    logger.info(
+        f"Pipelined crypt{version} ({decryptor.backend}): {decryptor.encrypted_size:,} -> {size:,} bytes "
+        f"in {stats['wall_time']:.2f}s"
+    )
+    
+    result = DecryptResult(output_path, version, decryptor.encrypted_size, size,
+                           decryptor.backend, decryptor.checksum_verified)
+    return result, stats
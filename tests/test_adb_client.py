@@ -0,0 +1,316 @@
+"""
+Tests para adb_client.py
+
+Ejercita el protocolo host/sync contra un servidor ADB falso local.
+"""
+
+import io
+import os
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.adb_client import AdbClient, AdbDevice, AdbError, RemoteFileError
+from src.device_watcher import (
+    ATTACHED, DETACHED, STATE_CHANGED, DeviceEvent, DeviceWatcher, diff_devices, read_device_lists
+)
+from src.android_backup import AndroidBackupManager
+
+
+class FakeAdbServer:
+    """Servidor ADB mínimo en memoria (host:, shell:, exec:, sync:)."""
+    
+    def __init__(self, files: dict, devices: str = 'emulator-5554\tdevice\n'):
+        self.files = files
+        self.devices = devices
+        self.connections = 0
+        self.services = []
+        self.trackers = []
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(16)
+        self.port = self.sock.getsockname()[1]
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+    
+    def close(self):
+        self.sock.close()
+        for conn in self.trackers:
+            conn.close()
+    
+    def set_devices(self, devices: str):
+        """Cambia el listado y lo envía a las conexiones track-devices."""
+        self.devices = devices
+        for conn in list(self.trackers):
+            try:
+                conn.sendall(b'%04x' % len(devices.encode()) + devices.encode())
+            except OSError:
+                self.trackers.remove(conn)
+    
+    def drop_trackers(self):
+        """Cierra las conexiones track-devices (servidor caído)."""
+        for conn in self.trackers:
+            conn.shutdown(socket.SHUT_RDWR)
+            conn.close()
+        self.trackers = []
+    
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+    
+    @staticmethod
+    def _recv(conn, size):
+        data = b''
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError()
+            data += chunk
+        return data
+    
+    def _request(self, conn):
+        length = int(self._recv(conn, 4), 16)
+        return self._recv(conn, length).decode()
+    
+    @staticmethod
+    def _reply(conn, payload: bytes):
+        conn.sendall(b'OKAY' + b'%04x' % len(payload) + payload)
+    
+    def _handle(self, conn):
+        try:
+            with conn:
+                service = self._request(conn)
+                self.services.append(service)
+                if service == 'host:version':
+                    self._reply(conn, b'0029')
+                elif service == 'host:devices':
+                    self._reply(conn, self.devices.encode())
+                elif service == 'host:track-devices':
+                    self._reply(conn, self.devices.encode())
+                    self.trackers.append(conn)
+                    while conn.recv(1024):
+                        pass
+                elif service.startswith('host:transport'):
+                    conn.sendall(b'OKAY')
+                    service = self._request(conn)
+                    self.services.append(service)
+                    conn.sendall(b'OKAY')
+                    if service.startswith(('shell:', 'exec:')):
+                        command = service.split(':', 1)[1]
+                        conn.sendall(f"ran {command}".encode())
+                    elif service == 'sync:':
+                        self._sync(conn)
+                else:
+                    message = b'unknown host service'
+                    conn.sendall(b'FAIL' + b'%04x' % len(message) + message)
+        except (ConnectionError, OSError):
+            pass
+    
+    def _sync(self, conn):
+        while True:
+            command, length = struct.unpack('<4sI', self._recv(conn, 8))
+            if command == b'QUIT':
+                return
+            path = self._recv(conn, length).decode()
+            data = self.files.get(path)
+            if command == b'STAT':
+                if data is None:
+                    conn.sendall(b'STAT' + struct.pack('<III', 0, 0, 0))
+                else:
+                    conn.sendall(b'STAT' + struct.pack('<III', 0o100644, len(data), 1700000000))
+            elif command == b'RECV':
+                if data is None:
+                    # Como adbd: tras un FAIL el servicio sync se cierra
+                    message = b'No such file or directory'
+                    conn.sendall(b'FAIL' + struct.pack('<I', len(message)) + message)
+                    return
+                for offset in range(0, len(data), 65536):
+                    block = data[offset:offset + 65536]
+                    conn.sendall(b'DATA' + struct.pack('<I', len(block)) + block)
+                conn.sendall(b'DONE' + struct.pack('<I', 0))
+
+
+class TestAdbClient(unittest.TestCase):
+    """Tests del cliente ADB por socket."""
+    
+    def setUp(self):
+        """Levanta el servidor falso."""
+        self.payload = os.urandom(200000)
+        self.server = FakeAdbServer({'/sdcard/msgstore.db': self.payload, '/sdcard/key': b'K' * 158})
+        self.client = AdbClient(port=self.server.port, timeout=5)
+        self.tmpdir = tempfile.TemporaryDirectory()
+    
+    def tearDown(self):
+        """Cierra cliente, servidor y directorio temporal."""
+        self.client.close()
+        self.server.close()
+        self.tmpdir.cleanup()
+    
+    def test_version_and_devices(self):
+        """Test host:version y host:devices."""
+        self.assertEqual(self.client.version(), 0x29)
+        devices = self.client.devices()
+        self.assertEqual([(d.serial, d.state) for d in devices], [('emulator-5554', 'device')])
+    
+    def test_unknown_service_raises(self):
+        """Test que una respuesta FAIL se convierte en AdbError."""
+        with self.assertRaises(AdbError):
+            self.client._host_query('host:bogus')
+    
+    def test_shell_selects_transport(self):
+        """Test shell: con transporte por serial o cualquiera."""
+        self.assertEqual(self.client.shell('getprop ro.build.version.sdk', 'emulator-5554'),
+                         'ran getprop ro.build.version.sdk')
+        self.assertIn('host:transport:emulator-5554', self.server.services)
+        self.assertEqual(b''.join(self.client.iter_exec('cat /x')), b'ran cat /x')
+        self.assertIn('host:transport-any', self.server.services)
+    
+    def test_pulls_reuse_one_sync_connection(self):
+        """Test que varias transferencias y STAT comparten la sesión sync."""
+        output = os.path.join(self.tmpdir.name, 'android.db')
+        
+        stat = self.client.stat('/sdcard/msgstore.db')
+        self.assertEqual(stat.size, len(self.payload))
+        result = self.client.pull('/sdcard/msgstore.db', output, expected_size=stat.size)
+        key = b''.join(self.client.iter_pull('/sdcard/key'))
+        self.assertFalse(self.client.stat('/sdcard/missing').exists)
+        
+        with open(output, 'rb') as f:
+            self.assertEqual(f.read(), self.payload)
+        self.assertEqual(result.size, len(self.payload))
+        self.assertEqual(key, b'K' * 158)
+        self.assertEqual(self.server.services.count('sync:'), 1)
+        self.assertEqual(self.server.connections, 1)
+    
+    def test_pull_missing_file_reopens_session(self):
+        """Test que un FAIL de RECV descarta la sesión y la siguiente transferencia reconecta."""
+        with self.assertRaises(RemoteFileError):
+            b''.join(self.client.iter_pull('/sdcard/missing'))
+        self.assertEqual(b''.join(self.client.iter_pull('/sdcard/key')), b'K' * 158)
+        self.assertEqual(self.server.services.count('sync:'), 2)
+    
+    def test_abandoned_pull_reopens_session(self):
+        """Test que un RECV abandonado descarta la sesión y la siguiente reconecta."""
+        stream = self.client.iter_pull('/sdcard/msgstore.db')
+        next(stream)
+        stream.close()
+        self.assertEqual(b''.join(self.client.iter_pull('/sdcard/key')), b'K' * 158)
+        self.assertEqual(self.server.services.count('sync:'), 2)
+    
+    def test_manager_uses_socket_client(self):
+        """Test que AndroidBackupManager usa el cliente sin lanzar procesos adb."""
+        with mock.patch('src.android_backup.get_adb_command', return_value='adb'):
+            manager = AndroidBackupManager('standard', client=self.client)
+        
+        with mock.patch('src.android_backup.run_adb_command') as run_adb:
+            self.assertTrue(manager.start_adb_server())
+            self.assertTrue(manager.wait_for_device(timeout=1))
+            self.assertEqual(manager._shell('echo hi'), 'ran echo hi')
+            with manager._exec_stream('tar -cf - x') as stream:
+                self.assertEqual(stream.read(), b'ran tar -cf - x')
+        run_adb.assert_not_called()
+
+
+class TestDeviceWatcher(unittest.TestCase):
+    """Tests del seguimiento de dispositivos por eventos."""
+    
+    def setUp(self):
+        """Levanta el servidor falso sin dispositivos."""
+        self.server = FakeAdbServer({}, devices='')
+        self.client = AdbClient(port=self.server.port, timeout=5)
+    
+    def tearDown(self):
+        """Cierra cliente y servidor."""
+        self.client.close()
+        self.server.close()
+    
+    def test_diff_devices(self):
+        """Test que el diff emite conexión, cambio de estado y desconexión."""
+        events = diff_devices({'A': 'unauthorized', 'B': 'device'}, {'A': 'device', 'C': 'offline'})
+        self.assertEqual(events, [
+            DeviceEvent(STATE_CHANGED, 'A', 'device', 'unauthorized'),
+            DeviceEvent(ATTACHED, 'C', 'offline'),
+            DeviceEvent(DETACHED, 'B', None, 'device'),
+        ])
+    
+    def test_read_device_lists_from_adb_output(self):
+        """Test que se interpreta el formato de `adb track-devices`."""
+        stream = io.BytesIO(b'0000' + b'000fR58M123\tdevice\n')
+        self.assertEqual(list(read_device_lists(stream)), [[], [AdbDevice('R58M123', 'device')]])
+        
+        with self.assertRaises(AdbError):
+            list(read_device_lists(io.BytesIO(b'0020R58M')))
+    
+    def test_events_follow_authorization(self):
+        """Test que el watcher reporta conexión, autorización y desconexión."""
+        with DeviceWatcher(self.client) as watcher:
+            events = watcher.events(timeout=5)
+            self._wait_for_tracker()
+            
+            self.server.set_devices('R58M123\tunauthorized\n')
+            self.assertEqual(next(events), DeviceEvent(ATTACHED, 'R58M123', 'unauthorized'))
+            
+            self.server.set_devices('R58M123\tdevice\n')
+            event = next(events)
+            self.assertEqual(event, DeviceEvent(STATE_CHANGED, 'R58M123', 'device', 'unauthorized'))
+            self.assertTrue(event.ready)
+            
+            self.server.set_devices('')
+            self.assertEqual(next(events), DeviceEvent(DETACHED, 'R58M123', None, 'device'))
+    
+    def test_wait_for_device_reacts_to_attach(self):
+        """Test que wait_for_device retorna al conectarse el serial pedido."""
+        seen = []
+        with DeviceWatcher(self.client) as watcher:
+            threading.Timer(0.05, lambda: self.server.set_devices('other\tdevice\n')).start()
+            threading.Timer(0.10, lambda: self.server.set_devices('other\tdevice\nwanted\tdevice\n')).start()
+            device = watcher.wait_for_device('wanted', timeout=5, on_event=seen.append)
+        
+        self.assertEqual(device, AdbDevice('wanted', 'device'))
+        self.assertEqual([e.serial for e in seen], ['other', 'wanted'])
+    
+    def test_wait_for_device_times_out(self):
+        """Test que sin dispositivos se lanza TimeoutError al vencer el plazo."""
+        with DeviceWatcher(self.client) as watcher:
+            with self.assertRaises(TimeoutError):
+                watcher.wait_for_device(timeout=0.2)
+    
+    def test_server_disconnect_raises(self):
+        """Test que si el servidor corta el seguimiento se informa el error."""
+        with DeviceWatcher(self.client) as watcher:
+            events = watcher.events(timeout=5)
+            self._wait_for_tracker()
+            self.server.drop_trackers()
+            with self.assertRaises(AdbError):
+                next(events)
+    
+    def test_stop_ends_iteration(self):
+        """Test que stop() termina events() sin error."""
+        watcher = DeviceWatcher(self.client).start()
+        threading.Timer(0.05, watcher.stop).start()
+        self.assertEqual(list(watcher.events(timeout=5)), [])
+    
+    def _wait_for_tracker(self):
+        """Espera a que el servidor falso registre la conexión track-devices."""
+        for _ in range(100):
+            if self.server.trackers:
+                return
+            time.sleep(0.01)
+        self.fail('track-devices connection not registered')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -7,14 +7,29 @@ Suite de tests unitarios para AndroidBackupManager.
 import unittest
 import sqlite3
 import tempfile
+import hashlib
+import io
 import os
 from pathlib import Path
 import sys
+from subprocess import CompletedProcess
+from unittest import mock
 
 # Agregar src al path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from src.android_backup import AndroidBackupManager
+from src.ab_stream import extract_tar_members, open_ab_payload, read_ab_header
+from src.adb_transfer import (
+    TransferResult, drain_stderr, exec_out_pull, iter_exec_out, quote_remote_path, stream_to_file
+)
+from src.aes_gcm import aes_gcm_encrypt
+from src.android_backup import (
+    AndroidBackupManager,
+    RemoteFile,
+    build_stat_command,
+    parse_stat_listing,
+    select_database_file,
+)
 
 
 class TestAndroidBackupManager(unittest.TestCase):
@@ -211,6 +226,423 @@ class TestSchemaDetection(unittest.TestCase):
                 os.unlink(db_path)
 
 
+class TestRemoteDatabaseLookup(unittest.TestCase):
+    """Tests para la localización de la base de datos con un único listado remoto."""
+    
+    DB_DIR = '/sdcard/Android/media/com.whatsapp/WhatsApp/Databases'
+    ALT_DIR = '/sdcard/WhatsApp/Databases'
+    
+    def setUp(self):
+        """Crea un manager sin depender de adb instalado."""
+        with mock.patch('src.android_backup.get_adb_command', return_value='adb'):
+            self.manager = AndroidBackupManager('standard')
+    
+    def test_stat_command_quotes_directories(self):
+        """Test que el comando lista todos los directorios y respeta espacios."""
+        command = build_stat_command(['/sdcard/WhatsApp Business/Databases', self.ALT_DIR])
+        self.assertIn("'/sdcard/WhatsApp Business/Databases'/msgstore.db*", command)
+        self.assertIn(f"'{self.ALT_DIR}'/msgstore.db*", command)
+        self.assertTrue(command.startswith("stat -c '%Y %s %n'"))
+        
+        command = build_stat_command(["/sdcard/it's/Databases"])
+        self.assertIn("'/sdcard/it'\\''s/Databases'/msgstore.db*", command)
+    
+    def test_parse_stat_listing(self):
+        """Test que se interpretan líneas válidas e ignoran errores."""
+        output = (
+            "1700000000 2048 /sdcard/WhatsApp Business/Databases/msgstore.db.crypt14\n"
+            "stat: '/sdcard/WhatsApp/Databases/msgstore.db*': No such file or directory\n"
+            "1700000500 0 /sdcard/WhatsApp/Databases/msgstore.db\r\n"
+        )
+        files = parse_stat_listing(output)
+        self.assertEqual(files, [
+            RemoteFile('/sdcard/WhatsApp Business/Databases/msgstore.db.crypt14', 2048, 1700000000),
+            RemoteFile('/sdcard/WhatsApp/Databases/msgstore.db', 0, 1700000500),
+        ])
+        self.assertEqual(files[0].name, 'msgstore.db.crypt14')
+    
+    def test_select_newest_non_empty(self):
+        """Test que se elige el archivo válido más reciente."""
+        files = [
+            RemoteFile(f'{self.DB_DIR}/msgstore.db.crypt14', 4096, 1700000000),
+            RemoteFile(f'{self.DB_DIR}/msgstore.db.crypt15', 4096, 1700000900),
+            RemoteFile(f'{self.ALT_DIR}/msgstore.db', 0, 1700009999),
+            RemoteFile(f'{self.DB_DIR}/msgstore-2023-11-14.1.db.crypt15', 4096, 1700099999),
+        ]
+        selected = select_database_file(files)
+        self.assertEqual(selected.path, f'{self.DB_DIR}/msgstore.db.crypt15')
+        self.assertIsNone(select_database_file(files[2:]))
+    
+    def test_single_listing_and_single_transfer(self):
+        """Test que la extracción hace un listado y exactamente una transferencia."""
+        listing = (
+            f"1700000000 4096 {self.DB_DIR}/msgstore.db.crypt14\n"
+            f"1700000900 8192 {self.ALT_DIR}/msgstore.db\n"
+        )
+        calls = []
+        transfers = []
+        
+        def fake_adb(command, check=True, timeout=30):
+            calls.append(command)
+            return CompletedProcess(command, 0, stdout=listing, stderr='')
+        
+        def fake_transfer(adb_cmd, remote_path, output_path, expected_size=None, progress=None,
+                          serial=None):
+            transfers.append((remote_path, output_path, expected_size))
+            return TransferResult(output_path, expected_size, '0' * 64, 1.0)
+        
+        with tempfile.TemporaryDirectory() as workdir:
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            try:
+                with mock.patch('src.android_backup.run_adb_command', side_effect=fake_adb), \
+                        mock.patch('src.android_backup.exec_out_pull', side_effect=fake_transfer):
+                    result = self.manager.extract_database_directly()
+            finally:
+                os.chdir(cwd)
+        
+        self.assertEqual(result, 'out/android.db')
+        self.assertEqual([c[1] for c in calls], ['shell'])
+        # La DB plana se transfiere directo a su destino final
+        self.assertEqual(transfers, [(f'{self.ALT_DIR}/msgstore.db', 'out/android.db', 8192)])
+    
+    def test_pipeline_mode_streams_encrypted_database(self):
+        """Test que en modo pipeline el .crypt14 se descifra sin pasar por tmp/."""
+        import zlib
+        with mock.patch('src.android_backup.get_adb_command', return_value='adb'):
+            manager = AndroidBackupManager('standard', pipeline=True)
+        
+        key, iv = os.urandom(32), os.urandom(16)
+        plaintext = b'SQLite format 3\x00' + os.urandom(5000)
+        ciphertext, tag = aes_gcm_encrypt(key, iv, zlib.compress(plaintext))
+        data = b'\x00' * 51 + iv + ciphertext + tag + b'\x00' * 4
+        listing = f"1700000000 {len(data)} {self.DB_DIR}/msgstore.db.crypt12\n"
+        
+        def fake_adb(command, check=True, timeout=30):
+            return CompletedProcess(command, 0, stdout=listing, stderr='')
+        
+        def fake_stream(adb_cmd, remote_path, expected_size=None, progress=None, serial=None):
+            self.assertEqual(expected_size, len(data))
+            return (data[i:i + 1000] for i in range(0, len(data), 1000))
+        
+        with tempfile.TemporaryDirectory() as workdir:
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            try:
+                os.makedirs('tmp')
+                with open('tmp/key', 'wb') as f:
+                    f.write(os.urandom(126) + key)
+                with mock.patch('src.android_backup.run_adb_command', side_effect=fake_adb), \
+                        mock.patch('src.android_backup.iter_exec_out', side_effect=fake_stream), \
+                        mock.patch('src.android_backup.exec_out_pull') as pull, \
+                        mock.patch.object(manager, '_extract_key', return_value='tmp/key'):
+                    result = manager.extract_database_directly()
+                
+                self.assertEqual(result, 'out/android.db')
+                pull.assert_not_called()
+                self.assertFalse(os.path.exists('tmp/msgstore.db.crypt12'))
+                with open(result, 'rb') as f:
+                    self.assertEqual(f.read(), plaintext)
+            finally:
+                os.chdir(cwd)
+    
+    def test_no_database_skips_pull(self):
+        """Test que sin archivos válidos no se ejecuta ningún pull."""
+        calls = []
+        
+        def fake_adb(command, check=True, timeout=30):
+            calls.append(command)
+            return CompletedProcess(command, 1, stdout='', stderr='')
+        
+        with tempfile.TemporaryDirectory() as workdir:
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            try:
+                with mock.patch('src.android_backup.run_adb_command', side_effect=fake_adb), \
+                        mock.patch.object(self.manager, '_print_manual_extraction_help'):
+                    result = self.manager.extract_database_directly()
+            finally:
+                os.chdir(cwd)
+        
+        self.assertIsNone(result)
+        self.assertEqual(len(calls), 1)
+
+
+class _FakeExecOut:
+    """Proceso falso de `adb exec-out` con stdout/stderr en memoria."""
+    
+    def __init__(self, payload: bytes, returncode: int = 0, stderr: bytes = b''):
+        self.stdout = io.BytesIO(payload)
+        self.stderr = io.BytesIO(stderr)
+        self.returncode = returncode
+        self.killed = False
+    
+    def poll(self):
+        return self.returncode
+    
+    def wait(self):
+        return self.returncode
+    
+    def kill(self):
+        self.killed = True
+
+
+class TestExecOutTransfer(unittest.TestCase):
+    """Tests para la transferencia en streaming con hash en vuelo."""
+    
+    def setUp(self):
+        """Crea un directorio temporal de destino."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmpdir.name, 'android.db')
+        self.payload = os.urandom(300000)
+    
+    def tearDown(self):
+        """Elimina el directorio temporal."""
+        self.tmpdir.cleanup()
+    
+    def test_stream_to_file_hashes_and_reports_progress(self):
+        """Test que se escribe, cuenta y hashea en una pasada con reporte final."""
+        reports = []
+        result = stream_to_file(io.BytesIO(self.payload), self.output, len(self.payload),
+                                progress=reports.append, chunk_size=4096)
+        
+        self.assertEqual(result.size, len(self.payload))
+        self.assertEqual(result.sha256, hashlib.sha256(self.payload).hexdigest())
+        with open(self.output, 'rb') as f:
+            self.assertEqual(f.read(), self.payload)
+        self.assertTrue(reports[-1].finished)
+        self.assertEqual(reports[-1].done, len(self.payload))
+    
+    def test_stream_to_file_size_mismatch_removes_output(self):
+        """Test que una transferencia truncada no deja archivo."""
+        with self.assertRaises(RuntimeError):
+            stream_to_file(io.BytesIO(self.payload), self.output, len(self.payload) + 1)
+        self.assertFalse(os.path.exists(self.output))
+    
+    def test_exec_out_pull_command_and_rename(self):
+        """Test que se usa exec-out cat con la ruta citada y se renombra al final."""
+        remote = "/sdcard/WhatsApp Business/Databases/msgstore.db"
+        fake = _FakeExecOut(self.payload)
+        
+        with mock.patch('src.adb_transfer.subprocess.Popen', return_value=fake) as popen:
+            result = exec_out_pull('adb', remote, self.output, expected_size=len(self.payload))
+        
+        self.assertEqual(popen.call_args[0][0], ['adb', 'exec-out', f"cat {quote_remote_path(remote)}"])
+        self.assertEqual(result.path, self.output)
+        self.assertEqual(result.sha256, hashlib.sha256(self.payload).hexdigest())
+        self.assertFalse(os.path.exists(self.output + '.part'))
+        self.assertEqual(os.path.getsize(self.output), len(self.payload))
+    
+    def test_exec_out_pull_failure_leaves_no_output(self):
+        """Test que un error de adb no deja destino ni archivo parcial."""
+        fake = _FakeExecOut(b'', returncode=1, stderr=b'cat: No such file or directory')
+        
+        with mock.patch('src.adb_transfer.subprocess.Popen', return_value=fake):
+            with self.assertRaises(RuntimeError):
+                exec_out_pull('adb', '/sdcard/missing', self.output)
+        
+        self.assertFalse(os.path.exists(self.output))
+        self.assertFalse(os.path.exists(self.output + '.part'))
+    
+    def test_empty_output_with_stderr_is_failure(self):
+        """Test que sin datos y con error en stderr se falla aunque adb salga con 0."""
+        fake = _FakeExecOut(b'', stderr=b'cat: /sdcard/missing: No such file or directory')
+        with mock.patch('src.adb_transfer.subprocess.Popen', return_value=fake):
+            with self.assertRaises(RuntimeError):
+                exec_out_pull('adb', '/sdcard/missing', self.output)
+        self.assertFalse(os.path.exists(self.output))
+        self.assertFalse(os.path.exists(self.output + '.part'))
+        
+        fake = _FakeExecOut(b'', stderr=b'cat: /sdcard/missing: No such file or directory')
+        with mock.patch('src.adb_transfer.subprocess.Popen', return_value=fake):
+            with self.assertRaises(RuntimeError):
+                list(iter_exec_out('adb', '/sdcard/missing'))
+    
+    def test_drain_stderr_avoids_pipe_deadlock(self):
+        """Test que stderr grande no bloquea la lectura de stdout."""
+        import subprocess
+        script = "import sys; sys.stderr.write('e' * 1000000); sys.stderr.flush(); sys.stdout.write('ok')"
+        process = subprocess.Popen([sys.executable, '-c', script],
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        read_stderr = drain_stderr(process)
+        self.assertEqual(process.stdout.read(), b'ok')
+        process.stdout.close()
+        process.wait()
+        self.assertEqual(len(read_stderr()), 1000000)
+    
+    def test_iter_exec_out_yields_chunks(self):
+        """Test que iter_exec_out entrega fragmentos y valida el tamaño final."""
+        fake = _FakeExecOut(self.payload)
+        with mock.patch('src.adb_transfer.subprocess.Popen', return_value=fake):
+            chunks = list(iter_exec_out('adb', '/sdcard/db', len(self.payload), chunk_size=65536))
+        self.assertEqual(b''.join(chunks), self.payload)
+        self.assertTrue(all(len(c) <= 65536 for c in chunks))
+        
+        fake = _FakeExecOut(self.payload)
+        with mock.patch('src.adb_transfer.subprocess.Popen', return_value=fake):
+            with self.assertRaises(RuntimeError):
+                list(iter_exec_out('adb', '/sdcard/db', len(self.payload) + 1))
+    
+    def test_iter_exec_out_close_kills_process(self):
+        """Test que cerrar el generador antes de tiempo termina adb."""
+        fake = _FakeExecOut(self.payload)
+        with mock.patch('src.adb_transfer.subprocess.Popen', return_value=fake):
+            stream = iter_exec_out('adb', '/sdcard/db', chunk_size=1024)
+            next(stream)
+            stream.close()
+        self.assertTrue(fake.killed)
+    
+    def test_quote_remote_path(self):
+        """Test del citado de rutas con comillas simples."""
+        self.assertEqual(quote_remote_path("/sdcard/it's"), "'/sdcard/it'\\''s'")
+
+
+def build_ab(members: dict, compressed: bool = True, encryption: str = 'none') -> bytes:
+    """Construye un backup .ab con los miembros dados (nombre → contenido)."""
+    import tarfile
+    import zlib
+    tar_buffer = io.BytesIO()
+    with tarfile.open(fileobj=tar_buffer, mode='w') as tar:
+        for name, content in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+    body = tar_buffer.getvalue()
+    header = f"ANDROID BACKUP\n5\n{1 if compressed else 0}\n{encryption}\n".encode()
+    return header + (zlib.compress(body) if compressed else body)
+
+
+class TestAbStreaming(unittest.TestCase):
+    """Tests para la extracción en streaming de backups .ab."""
+    
+    def setUp(self):
+        """Crea un backup sintético y un directorio temporal."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.msgstore = b'SQLite format 3\x00' + os.urandom(200000)
+        self.wa_db = b'SQLite format 3\x00' + os.urandom(1000)
+        self.key = os.urandom(158)
+        self.members = {
+            'apps/com.whatsapp/_manifest': b'manifest',
+            'apps/com.whatsapp/f/key': self.key,
+            'apps/com.whatsapp/db/msgstore.db': self.msgstore,
+            'apps/com.whatsapp/db/wa.db': self.wa_db,
+            'apps/com.whatsapp/r/app_webview/huge.bin': os.urandom(50000),
+        }
+        with mock.patch('src.android_backup.get_adb_command', return_value='adb'):
+            self.manager = AndroidBackupManager('standard')
+    
+    def tearDown(self):
+        """Elimina el directorio temporal."""
+        self.tmpdir.cleanup()
+    
+    def test_read_header(self):
+        """Test lectura del encabezado y rechazo de backups cifrados."""
+        header = read_ab_header(io.BytesIO(build_ab({})))
+        self.assertEqual((header.version, header.compressed), (5, True))
+        with self.assertRaises(ValueError):
+            read_ab_header(io.BytesIO(build_ab({}, encryption='AES-256')))
+        with self.assertRaises(ValueError):
+            read_ab_header(io.BytesIO(b'PK\x03\x04 not a backup'))
+    
+    def test_payload_reader_compressed_and_plain(self):
+        """Test que el tar interno se obtiene igual con y sin compresión."""
+        for compressed in (True, False):
+            payload = open_ab_payload(io.BytesIO(build_ab(self.members, compressed)), chunk_size=1024)
+            import tarfile
+            with tarfile.open(fileobj=payload, mode='r|') as tar:
+                names = [m.name for m in tar]
+            self.assertEqual(names, list(self.members))
+    
+    def test_extract_only_requested_members(self):
+        """Test que solo se escriben los miembros pedidos y se detiene al encontrarlos."""
+        data = build_ab(self.members)
+        source = io.BytesIO(data)
+        target = os.path.join(self.tmpdir.name, 'android.db')
+        
+        extracted = extract_tar_members(open_ab_payload(source, chunk_size=4096),
+                                        {'apps/com.whatsapp/db/msgstore.db': target}, chunk_size=4096)
+        
+        self.assertEqual(extracted, {'apps/com.whatsapp/db/msgstore.db': len(self.msgstore)})
+        self.assertEqual(os.listdir(self.tmpdir.name), ['android.db'])
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), self.msgstore)
+        # El resto del backup (huge.bin) no se llegó a leer
+        self.assertLess(source.tell(), len(data))
+    
+    def test_manager_extract_from_ab_with_optional_members(self):
+        """Test extract_from_ab con wa.db y clave."""
+        ab_path = os.path.join(self.tmpdir.name, 'whatsapp.ab')
+        with open(ab_path, 'wb') as f:
+            f.write(build_ab(self.members))
+        out_dir = os.path.join(self.tmpdir.name, 'out')
+        
+        result = self.manager.extract_from_ab(ab_path, out_dir, include_wa_db=True, include_key=True)
+        
+        self.assertEqual(result, f"{out_dir}/android.db")
+        self.assertEqual(sorted(os.listdir(out_dir)), ['android.db', 'key', 'wa.db'])
+        with open(f"{out_dir}/key", 'rb') as f:
+            self.assertEqual(f.read(), self.key)
+    
+    def test_manager_extract_from_ab_missing_database(self):
+        """Test que un backup sin msgstore.db retorna None."""
+        data = build_ab({'apps/com.whatsapp/f/key': self.key})
+        out_dir = os.path.join(self.tmpdir.name, 'out')
+        self.assertIsNone(self.manager.extract_from_ab(io.BytesIO(data), out_dir))
+        self.assertEqual(os.listdir(out_dir), [])
+    
+    def test_stream_backup_uses_exec_out_without_artifacts(self):
+        """Test que el backup se transmite por exec-out sin escribir .ab ni .tar."""
+        fake = _FakeExecOut(build_ab(self.members))
+        sdk = CompletedProcess([], 0, stdout='30\n', stderr='')
+        
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        try:
+            with mock.patch('src.android_backup.run_adb_command', return_value=sdk), \
+                    mock.patch('src.adb_transfer.subprocess.Popen', return_value=fake) as popen, \
+                    mock.patch.object(self.manager, 'create_backup') as create_backup:
+                result = self.manager.stream_backup()
+            listing = sorted(os.listdir('.'))
+        finally:
+            os.chdir(cwd)
+        
+        self.assertEqual(result, 'out/android.db')
+        self.assertEqual(popen.call_args[0][0], ['adb', 'exec-out', "bu backup 'com.whatsapp'"])
+        create_backup.assert_not_called()
+        self.assertEqual(listing, ['out'])
+        self.assertEqual(os.listdir(os.path.join(self.tmpdir.name, 'out')), ['android.db'])
+    
+    def test_stream_backup_falls_back_on_old_devices(self):
+        """Test que sin exec-out se usa adb backup -f y se borra el .ab temporal."""
+        data = build_ab(self.members)
+        sdk = CompletedProcess([], 0, stdout='19\n', stderr='')
+        
+        def fake_create_backup(output_file='tmp/whatsapp.ab'):
+            os.makedirs('tmp', exist_ok=True)
+            with open(output_file, 'wb') as f:
+                f.write(data)
+            return True
+        
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        try:
+            with mock.patch('src.android_backup.run_adb_command', return_value=sdk), \
+                    mock.patch.object(self.manager, 'create_backup', side_effect=fake_create_backup):
+                result = self.manager.stream_backup()
+            self.assertEqual(result, 'out/android.db')
+            self.assertEqual(os.listdir('tmp'), [])
+        finally:
+            os.chdir(cwd)
+    
+    def test_manager_extract_from_truncated_ab(self):
+        """Test que un backup truncado falla sin dejar archivos parciales."""
+        data = build_ab(self.members)
+        data = data[:len(data) // 3]  # Corta dentro de msgstore.db
+        out_dir = os.path.join(self.tmpdir.name, 'out')
+        self.assertIsNone(self.manager.extract_from_ab(io.BytesIO(data), out_dir))
+        self.assertEqual(os.listdir(out_dir), [])
+
+
 if __name__ == '__main__':
     # Ejecutar tests con verbosidad
     unittest.main(verbosity=2)
@@ -0,0 +1,110 @@
+"""
+Tests para benchmarks/
+
+Suite de tests unitarios para los generadores sintéticos y el runner de benchmarks.
+"""
+
+import unittest
+import sqlite3
+import tempfile
+import os
+import sys
+import shutil
+
+# Agregar raíz del proyecto al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.synthetic import generate_android_db, generate_ios_db, parse_scale
+from benchmarks.run_benchmarks import compare_to_baseline, run_case
+
+
+class TestSyntheticGenerators(unittest.TestCase):
+    """Tests para los generadores de bases de datos sintéticas."""
+    
+    def setUp(self):
+        """Crea directorio temporal."""
+        self.tmpdir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Cleanup."""
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+    
+    def test_parse_scale(self):
+        """Test escalas predefinidas y numéricas."""
+        self.assertEqual(parse_scale('10k'), 10_000)
+        self.assertEqual(parse_scale('1M'), 1_000_000)
+        self.assertEqual(parse_scale('10m'), 10_000_000)
+        self.assertEqual(parse_scale('2500'), 2500)
+        with self.assertRaises(ValueError):
+            parse_scale('huge')
+    
+    def test_android_modern_layout(self):
+        """Test msgstore moderno con chats y ratio de media configurables."""
+        path = os.path.join(self.tmpdir, 'android.db')
+        generate_android_db(path, 2000, chats=7, media_ratio=0.5, text_size=40)
+        
+        conn = sqlite3.connect(path)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        self.assertIn('message_quoted', tables)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0], 2000)
+        self.assertLessEqual(conn.execute("SELECT COUNT(DISTINCT key_remote_jid) FROM messages").fetchone()[0], 7)
+        media = conn.execute("SELECT COUNT(*) FROM messages WHERE media_wa_type != 0").fetchone()[0]
+        self.assertTrue(800 < media < 1200)
+        conn.close()
+    
+    def test_android_legacy_layout(self):
+        """Test msgstore legacy sin tablas modernas."""
+        path = os.path.join(self.tmpdir, 'android.db')
+        generate_android_db(path, 100, layout='legacy')
+        
+        conn = sqlite3.connect(path)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        self.assertNotIn('message_quoted', tables)
+        self.assertIn('chat_list', tables)
+        conn.close()
+    
+    def test_ios_with_history(self):
+        """Test ChatStorage con historial previo."""
+        path = os.path.join(self.tmpdir, 'ios.db')
+        generate_ios_db(path, 300, chats=5)
+        
+        conn = sqlite3.connect(path)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM ZWAMESSAGE").fetchone()[0], 300)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM ZWACHATSESSION").fetchone()[0], 5)
+        conn.close()
+
+
+class TestBenchmarkRunner(unittest.TestCase):
+    """Tests para el runner de benchmarks."""
+    
+    def test_run_case_modern(self):
+        """Test que un caso moderno produce métricas."""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            android_db = generate_android_db(os.path.join(tmpdir, 'android.db'), 500, media_ratio=0.0)
+            ios_db = generate_ios_db(os.path.join(tmpdir, 'ios.db'))
+            
+            result = run_case('modern', android_db, ios_db, os.path.join(tmpdir, 'out.db'))
+            
+            self.assertEqual(result['status'], 'ok')
+            self.assertEqual(result['messages'], 500)
+            self.assertGreater(result['output_size'], 0)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+    
+    def test_compare_to_baseline_detects_regressions(self):
+        """Test detección de regresiones por umbral."""
+        baseline = {'modern/10k': {'status': 'ok', 'messages_per_sec': 1000, 'peak_rss': 100, 'output_size': 50}}
+        
+        ok = {'modern/10k': {'status': 'ok', 'messages_per_sec': 900, 'peak_rss': 110, 'output_size': 50}}
+        self.assertEqual(compare_to_baseline(ok, baseline, 0.2), [])
+        
+        slow = {'modern/10k': {'status': 'ok', 'messages_per_sec': 500, 'peak_rss': 200, 'output_size': 50}}
+        regressions = compare_to_baseline(slow, baseline, 0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertIn('messages_per_sec', regressions[0])
+
+
+if __name__ == '__main__':
+    # Ejecutar tests con verbosidad
+    unittest.main(verbosity=2)
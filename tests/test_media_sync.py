@@ -0,0 +1,260 @@
+"""
+Tests para media_sync.py
+
+Simula el dispositivo con un árbol en memoria: el listado responde al
+comando de manifiesto y cada lote devuelve un tar real de los archivos pedidos.
+"""
+
+import io
+import os
+import shlex
+import sys
+import tarfile
+import tempfile
+import threading
+import unittest
+from contextlib import contextmanager
+from subprocess import CompletedProcess
+from unittest import mock
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.ab_stream import tar_member_name
+from src.android_backup import AndroidBackupManager
+from src.media_sync import (
+    MEDIA_MANIFEST, MediaFile, build_tar_command, diff_manifest, load_manifest,
+    parse_manifest_listing, plan_batches, sync_media
+)
+
+ROOT = '/sdcard/Android/media/com.whatsapp/WhatsApp/Media'
+
+
+class FakeDevice:
+    """Árbol Media remoto en memoria que atiende listados y tar por lotes."""
+    
+    def __init__(self, files: dict):
+        self.files = files
+        self.commands = []
+        self.lock = threading.Lock()
+    
+    def shell(self, command: str) -> str:
+        lines = [f"#{ROOT}"]
+        for path, (data, mtime) in self.files.items():
+            lines.append(f"{mtime} {len(data)} ./{path}")
+        return '\n'.join(lines) + '\n'
+    
+    @contextmanager
+    def open_stream(self, command: str):
+        with self.lock:
+            self.commands.append(command)
+        args = shlex.split(command)
+        self_root, paths = args[1], args[6:]
+        assert self_root == ROOT and args[3:6] == ['tar', '-cf', '-']
+        
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w') as tar:
+            for path in paths:
+                data, mtime = self.files[path[2:]]
+                info = tarfile.TarInfo(path)
+                info.size = len(data)
+                info.mtime = mtime
+                tar.addfile(info, io.BytesIO(data))
+        buffer.seek(0)
+        yield buffer
+
+
+class TestMediaManifest(unittest.TestCase):
+    """Tests de listado, diff y planificación de lotes."""
+    
+    def test_parse_listing(self):
+        """Test que se leen raíz, tamaños, mtimes y rutas con espacios."""
+        output = (f"#{ROOT}\n"
+                  "1700000000 1234 ./WhatsApp Images/IMG-1.jpg\n"
+                  "1700000100 99 ./.Statuses/a b.mp4\r\n"
+                  "1700000200 5 ./../escape\n"
+                  "stat: permission denied\n")
+        root, files = parse_manifest_listing(output)
+        
+        self.assertEqual(root, ROOT)
+        self.assertEqual(files, {
+            'WhatsApp Images/IMG-1.jpg': MediaFile('WhatsApp Images/IMG-1.jpg', 1234, 1700000000),
+            '.Statuses/a b.mp4': MediaFile('.Statuses/a b.mp4', 99, 1700000100),
+        })
+        self.assertEqual(parse_manifest_listing(''), (None, {}))
+    
+    def test_diff_detects_new_changed_and_missing(self):
+        """Test que se piden archivos nuevos, modificados o ausentes en disco."""
+        with tempfile.TemporaryDirectory() as local_dir:
+            for name, size in (('same', 3), ('changed', 3)):
+                with open(os.path.join(local_dir, name), 'wb') as f:
+                    f.write(b'x' * size)
+            
+            remote = {
+                'same': MediaFile('same', 3, 10),
+                'changed': MediaFile('changed', 3, 20),
+                'deleted-locally': MediaFile('deleted-locally', 7, 10),
+                'new': MediaFile('new', 100, 10),
+            }
+            local = {
+                'same': MediaFile('same', 3, 10),
+                'changed': MediaFile('changed', 3, 10),
+                'deleted-locally': MediaFile('deleted-locally', 7, 10),
+            }
+            changed = diff_manifest(remote, local, local_dir)
+        
+        self.assertEqual([entry.path for entry in changed], ['new', 'deleted-locally', 'changed'])
+    
+    def test_batches_respect_byte_and_command_limits(self):
+        """Test que los lotes respetan los topes de bytes y de longitud de comando."""
+        files = [MediaFile(f'Media/file-{i:03d}.jpg', 100, 0) for i in range(50)]
+        
+        batches = plan_batches(ROOT, files, max_bytes=1000, max_command=10 ** 6)
+        self.assertEqual([len(batch) for batch in batches], [10] * 5)
+        
+        batches = plan_batches(ROOT, files, max_bytes=10 ** 9, max_command=400)
+        self.assertTrue(all(len(build_tar_command(ROOT, batch)) <= 400 for batch in batches))
+        self.assertEqual(sum(len(batch) for batch in batches), 50)
+        
+        huge = [MediaFile('big.mp4', 5000, 0)]
+        self.assertEqual(plan_batches(ROOT, huge, max_bytes=1000), [huge])
+    
+    def test_tar_command_quotes_paths(self):
+        """Test que las rutas con comillas y espacios se citan para el shell."""
+        command = build_tar_command(ROOT, [MediaFile("WhatsApp Audio/it's.opus", 1, 0)])
+        self.assertEqual(shlex.split(command)[-1], "./WhatsApp Audio/it's.opus")
+    
+    def test_tar_member_name_keeps_leading_dots(self):
+        """Test que solo se quita el prefijo './' literal, no los puntos del nombre."""
+        self.assertEqual(tar_member_name('./.nomedia'), '.nomedia')
+        self.assertEqual(tar_member_name('././..foo'), '..foo')
+        self.assertEqual(tar_member_name('.Statuses/a.mp4'), '.Statuses/a.mp4')
+        self.assertEqual(tar_member_name('/x'), '/x')
+
+
+class TestMediaSync(unittest.TestCase):
+    """Tests de la sincronización incremental."""
+    
+    def setUp(self):
+        """Crea un dispositivo falso y un directorio local temporal."""
+        self.device = FakeDevice({
+            f'WhatsApp Images/IMG-{i}.jpg': (os.urandom(1000 + i), 1700000000 + i) for i in range(20)
+        })
+        self.device.files['.Statuses/status.mp4'] = (os.urandom(4000), 1700000500)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.local_dir = os.path.join(self.tmpdir.name, 'media')
+    
+    def tearDown(self):
+        """Elimina el directorio temporal."""
+        self.tmpdir.cleanup()
+    
+    def _sync(self, **kwargs):
+        return sync_media(self.device.shell, self.device.open_stream, [ROOT], self.local_dir, **kwargs)
+    
+    def test_initial_sync_then_incremental(self):
+        """Test que la primera pasada copia todo y las siguientes solo lo nuevo."""
+        result = self._sync(streams=3, batch_bytes=5000)
+        
+        self.assertEqual(result.remote_files, 21)
+        self.assertEqual(result.transferred_files, 21)
+        self.assertGreater(len(self.device.commands), 1)
+        for path, (data, mtime) in self.device.files.items():
+            local_path = os.path.join(self.local_dir, path)
+            with open(local_path, 'rb') as f:
+                self.assertEqual(f.read(), data)
+            self.assertEqual(int(os.path.getmtime(local_path)), mtime)
+        self.assertEqual(len(load_manifest(os.path.join(self.local_dir, MEDIA_MANIFEST))), 21)
+        
+        # Sin cambios: ninguna transferencia
+        self.device.commands.clear()
+        result = self._sync()
+        self.assertEqual((result.changed_files, result.transferred_files), (0, 0))
+        self.assertEqual(self.device.commands, [])
+        
+        # Un archivo nuevo y uno modificado
+        self.device.files['WhatsApp Video/VID-1.mp4'] = (b'new video', 1700001000)
+        self.device.files['WhatsApp Images/IMG-3.jpg'] = (b'edited', 1700002000)
+        result = self._sync()
+        self.assertEqual(result.transferred_files, 2)
+        self.assertEqual(result.transferred_bytes, len(b'new video') + len(b'edited'))
+        with open(os.path.join(self.local_dir, 'WhatsApp Images/IMG-3.jpg'), 'rb') as f:
+            self.assertEqual(f.read(), b'edited')
+    
+    def test_failed_batch_is_retried_next_sync(self):
+        """Test que un lote fallido no entra al manifiesto y se reintenta."""
+        original = self.device.open_stream
+        
+        @contextmanager
+        def flaky(command):
+            if '.Statuses' in command:
+                raise RuntimeError('adb exec-out failed')
+            with original(command) as stream:
+                yield stream
+        
+        result = sync_media(self.device.shell, flaky, [ROOT], self.local_dir, batch_bytes=3000)
+        self.assertEqual(result.failed_batches, 1)
+        self.assertEqual(result.transferred_files, 20)
+        
+        result = self._sync()
+        self.assertEqual(result.transferred_files, 1)
+        self.assertTrue(os.path.exists(os.path.join(self.local_dir, '.Statuses/status.mp4')))
+    
+    def test_dot_files_do_not_collide(self):
+        """Test que '.nomedia' y 'nomedia' se extraen como archivos distintos."""
+        self.device.files['WhatsApp Images/.nomedia'] = (b'', 1700000600)
+        self.device.files['WhatsApp Images/nomedia'] = (b'not empty', 1700000700)
+        
+        result = self._sync()
+        
+        self.assertEqual(result.transferred_files, 23)
+        with open(os.path.join(self.local_dir, 'WhatsApp Images/nomedia'), 'rb') as f:
+            self.assertEqual(f.read(), b'not empty')
+        self.assertEqual(os.path.getsize(os.path.join(self.local_dir, 'WhatsApp Images/.nomedia')), 0)
+    
+    def test_deleted_remote_files_leave_manifest(self):
+        """Test que los archivos borrados en el dispositivo salen del manifiesto."""
+        self._sync()
+        del self.device.files['WhatsApp Images/IMG-0.jpg']
+        
+        result = self._sync()
+        
+        self.assertEqual(result.changed_files, 0)
+        manifest = load_manifest(os.path.join(self.local_dir, MEDIA_MANIFEST))
+        self.assertEqual(len(manifest), 20)
+        self.assertNotIn('WhatsApp Images/IMG-0.jpg', manifest)
+        # La copia local se conserva
+        self.assertTrue(os.path.exists(os.path.join(self.local_dir, 'WhatsApp Images/IMG-0.jpg')))
+    
+    def test_missing_media_directory(self):
+        """Test que sin directorio Media se lanza FileNotFoundError."""
+        with self.assertRaises(FileNotFoundError):
+            sync_media(lambda command: '', self.device.open_stream, [ROOT], self.local_dir)
+    
+    def test_manager_sync_over_exec_out(self):
+        """Test de AndroidBackupManager.sync_media con procesos exec-out simulados."""
+        with mock.patch('src.android_backup.get_adb_command', return_value='adb'):
+            manager = AndroidBackupManager('standard', serial='R58M123', out_dir=self.tmpdir.name,
+                                           show_progress=False)
+        
+        launched = []
+        
+        def fake_exec(adb_cmd, command, serial=None):
+            launched.append(serial)
+            with self.device.open_stream(command) as stream:
+                data = stream.read()
+            process = mock.Mock(stdout=io.BytesIO(data), stderr=io.BytesIO(b''))
+            process.poll.return_value = 0
+            return process
+        
+        with mock.patch('src.android_backup.run_adb_command',
+                        side_effect=lambda cmd, **kw: CompletedProcess(cmd, 0, self.device.shell(''), '')), \
+                mock.patch('src.android_backup.open_exec_command', side_effect=fake_exec):
+            result = manager.sync_media(streams=2)
+        
+        self.assertEqual(result.transferred_files, 21)
+        self.assertEqual(set(launched), {'R58M123'})
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir.name, 'media', 'WhatsApp Images/IMG-0.jpg')))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -14,7 +14,69 @@ from pathlib import Path
 # Agregar src al path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from src.migrate import WhatsAppMigrator, TIMESTAMP_OFFSET
+from src.migrate import WhatsAppMigrator, TIMESTAMP_OFFSET, MODERN_MESSAGE_COLUMNS, FILTER_INDEX_NAME, to_android_timestamp
+from src.progress import ProgressTracker, console_progress_bar
+from src.snapshots import SnapshotMerger
+from src.external_sort import ExternalSorter
+from src.columnar_cache import ColumnarMessageCache
+from src.jid_registry import JIDRegistry, NO_JID, normalize_jid
+from src import message_types
+from src.message_types import translate_message
+
+
+def create_android_db(path, messages):
+    """Crea msgstore.db moderno mínimo con los mensajes indicados.
+    
+    Cada mensaje es una tupla (key_remote_jid, key_from_me, key_id, data, timestamp).
+    """
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE messages (
+            _id INTEGER PRIMARY KEY AUTOINCREMENT,
+            key_remote_jid TEXT, key_from_me INTEGER, key_id TEXT,
+            status INTEGER, data TEXT, timestamp INTEGER,
+            media_url TEXT, media_mime_type TEXT, media_wa_type INTEGER,
+            media_size INTEGER, starred INTEGER
+        )
+    """)
+    conn.execute("CREATE TABLE chat (_id INTEGER PRIMARY KEY, jid TEXT)")
+    conn.execute("CREATE TABLE message_quoted (message_row_id INTEGER PRIMARY KEY)")
+    conn.executemany(
+        "INSERT INTO messages (key_remote_jid, key_from_me, key_id, status, data, timestamp, media_wa_type, starred) "
+        "VALUES (?, ?, ?, 0, ?, ?, 0, 0)",
+        messages
+    )
+    conn.commit()
+    conn.close()
+
+
+def create_ios_db(path, messages=(), sessions=()):
+    """Crea ChatStorage.sqlite mínimo con los mensajes y chats iOS indicados.
+    
+    Cada mensaje es una tupla (Z_PK, ZCHATSESSION, ZISFROMME, ZSTANZAID, ZTEXT, ZMESSAGEDATE)
+    y cada chat una tupla (Z_PK, ZCONTACTJID).
+    """
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE ZWAMESSAGE (
+            Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER,
+            ZISFROMME INTEGER, ZMESSAGESTATUS INTEGER, ZMESSAGETYPE INTEGER,
+            ZISSTARRED INTEGER, ZGROUPEVENTTYPE INTEGER, ZSORT INTEGER,
+            ZCHATSESSION INTEGER, ZPARENTMESSAGE INTEGER,
+            ZTEXT VARCHAR, ZSTANZAID VARCHAR,
+            ZMESSAGEDATE TIMESTAMP, ZSENTDATE TIMESTAMP, ZRECEIVEDDATE TIMESTAMP,
+            ZTOJID VARCHAR, ZFROMJID VARCHAR
+        )
+    """)
+    conn.execute("CREATE TABLE ZWACHATSESSION (Z_PK INTEGER PRIMARY KEY, ZCONTACTJID VARCHAR)")
+    conn.executemany(
+        "INSERT INTO ZWAMESSAGE (Z_PK, ZCHATSESSION, ZISFROMME, ZSTANZAID, ZTEXT, ZMESSAGEDATE) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        messages
+    )
+    conn.executemany("INSERT INTO ZWACHATSESSION (Z_PK, ZCONTACTJID) VALUES (?, ?)", sessions)
+    conn.commit()
+    conn.close()
 
 
 class TestTimestampConversion(unittest.TestCase):
@@ -128,6 +190,7 @@ class TestWhatsAppMigrator(unittest.TestCase):
         self.assertEqual(str(migrator.android_db_path), android_db)
         self.assertEqual(str(migrator.ios_db_path), ios_db)
         self.assertEqual(migrator.phone_number, phone)
+        self.assertEqual(migrator.own_jid, '573001234567@s.whatsapp.net')
         self.assertIsNone(migrator.schema_version)
     
     def test_detect_schema_version_modern(self):
@@ -289,6 +352,1048 @@ class TestTimestampEdgeCases(unittest.TestCase):
         self.assertIsInstance(result, float)
 
 
+class TestOutputCompaction(unittest.TestCase):
+    """Tests para la compactación de la base de datos de salida."""
+    
+    def setUp(self):
+        """Crea DBs Android/iOS con suficientes mensajes para fragmentar."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.android_db = os.path.join(self.tmpdir, 'android.db')
+        self.ios_db = os.path.join(self.tmpdir, 'ios.db')
+        self.output_db = os.path.join(self.tmpdir, 'out.db')
+        
+        create_android_db(self.android_db, [
+            ('573001111111@s.whatsapp.net', i % 2, f'KEY{i}', 'x' * 200, 1700000000000 + i)
+            for i in range(2000)
+        ])
+        create_ios_db(self.ios_db)
+    
+    def tearDown(self):
+        """Cleanup."""
+        import shutil
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+    
+    def test_run_migration_compact_reports_sizes(self):
+        """Test que la compactación reporta tamaños y conserva los datos."""
+        migrator = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890')
+        stats = migrator.run_migration(self.output_db, compact=True, page_size=8192)
+        
+        self.assertGreater(stats['size_before'], 0)
+        self.assertEqual(stats['size_after'], os.path.getsize(self.output_db))
+        self.assertFalse(os.path.exists(self.output_db + '.compact'))
+        
+        conn = sqlite3.connect(self.output_db)
+        self.assertEqual(conn.execute("PRAGMA page_size").fetchone()[0], 8192)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM ZWAMESSAGE").fetchone()[0], 2000)
+        conn.close()
+    
+    def test_compact_output_removes_free_pages(self):
+        """Test que VACUUM INTO elimina páginas libres tras borrados."""
+        migrator = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890')
+        migrator.run_migration(self.output_db)
+        
+        conn = sqlite3.connect(self.output_db)
+        conn.execute("DELETE FROM ZWAMESSAGE WHERE Z_PK % 2 = 0")
+        conn.commit()
+        conn.close()
+        
+        result = migrator.compact_output(self.output_db)
+        self.assertLess(result['size_after'], result['size_before'])
+        
+        conn = sqlite3.connect(self.output_db)
+        self.assertEqual(conn.execute("PRAGMA freelist_count").fetchone()[0], 0)
+        conn.close()
+    
+    def test_compact_output_invalid_page_size(self):
+        """Test que un page_size inválido se rechaza."""
+        migrator = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890')
+        with self.assertRaises(ValueError):
+            migrator.compact_output(self.output_db, page_size=3000)
+
+
+
+class TestPhaseProfile(unittest.TestCase):
+    """Tests para el perfil de tiempos por fase de run_migration."""
+    
+    def setUp(self):
+        """Crea DBs Android/iOS de prueba."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.android_db = os.path.join(self.tmpdir, 'android.db')
+        self.ios_db = os.path.join(self.tmpdir, 'ios.db')
+        self.output_db = os.path.join(self.tmpdir, 'out.db')
+        
+        create_android_db(self.android_db, [
+            ('573001111111@s.whatsapp.net', 0, f'KEY{i}', f'msg {i}', 1700000000000 + i)
+            for i in range(50)
+        ])
+        create_ios_db(self.ios_db)
+    
+    def tearDown(self):
+        """Cleanup."""
+        import shutil
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+    
+    def test_phases_recorded_and_written(self):
+        """Test que cada fase se mide y el perfil se escribe como JSON."""
+        import json
+        
+        migrator = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890')
+        stats = migrator.run_migration(self.output_db)
+        
+        expected = ['connect', 'detect', 'analyze', 'count', 'copy', 'migrate', 'related', 'finalize']
+        self.assertEqual(list(stats['phases'].keys()), expected)
+        
+        migrate_phase = stats['phases']['migrate']
+        self.assertEqual(migrate_phase['rows'], 50)
+        self.assertGreaterEqual(migrate_phase['wall_time'], 0)
+        self.assertGreaterEqual(migrate_phase['cpu_time'], 0)
+        self.assertIn('peak_rss', migrate_phase)
+        
+        profile_path = os.path.join(self.tmpdir, 'out.profile.json')
+        self.assertEqual(WhatsAppMigrator.get_profile_path(self.output_db), profile_path)
+        with open(profile_path, encoding='utf-8') as f:
+            profile = json.load(f)
+        self.assertEqual(profile['migrated'], 50)
+        self.assertEqual(list(profile['phases'].keys()), expected)
+
+
+
+class TestProgressCallback(unittest.TestCase):
+    """Tests para la API de callbacks de progreso."""
+    
+    def test_tracker_rate_limited_by_time(self):
+        """Test que update() no reporta antes de vencer el intervalo."""
+        events = []
+        tracker = ProgressTracker(events.append, total=1000, min_interval=3600)
+        for done in range(1, 1001):
+            tracker.update(done)
+        self.assertEqual(events, [])
+        
+        tracker.finish(1000)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].done, 1000)
+        self.assertEqual(events[0].total, 1000)
+        self.assertTrue(events[0].finished)
+        self.assertEqual(events[0].eta, 0)
+    
+    def test_tracker_reports_when_interval_elapsed(self):
+        """Test que con intervalo cero cada update() reporta."""
+        events = []
+        tracker = ProgressTracker(events.append, total=10, min_interval=0)
+        tracker.update(5)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].done, 5)
+        self.assertFalse(events[0].finished)
+    
+    def test_console_progress_bar_output(self):
+        """Test que la barra de consola se dibuja sobre el callback."""
+        import io
+        from src.progress import ProgressInfo
+        
+        stream = io.StringIO()
+        callback = console_progress_bar(width=10, stream=stream)
+        callback(ProgressInfo(5, 10, 100.0, 0.05))
+        callback(ProgressInfo(10, 10, 100.0, 0.0, True))
+        
+        output = stream.getvalue()
+        self.assertIn('[#####-----]', output)
+        self.assertIn('[##########]', output)
+        self.assertTrue(output.endswith('\n'))
+    
+    def test_migration_reports_through_callback(self):
+        """Test que la migración reporta por callback sin imprimir en el loop."""
+        import io
+        import shutil
+        from contextlib import redirect_stdout
+        
+        tmpdir = tempfile.mkdtemp()
+        try:
+            android_db = os.path.join(tmpdir, 'android.db')
+            ios_db = os.path.join(tmpdir, 'ios.db')
+            create_android_db(android_db, [
+                ('573001111111@s.whatsapp.net', 0, f'KEY{i}', f'msg {i}', 1700000000000 + i)
+                for i in range(1500)
+            ])
+            create_ios_db(ios_db)
+            
+            events = []
+            migrator = WhatsAppMigrator(android_db, ios_db, '1234567890')
+            migrator.set_progress_callback(events.append, interval=3600)
+            
+            stdout = io.StringIO()
+            with redirect_stdout(stdout):
+                stats = migrator.run_migration(os.path.join(tmpdir, 'out.db'))
+            
+            self.assertEqual(stats['migrated'], 1500)
+            self.assertNotIn('Progress:', stdout.getvalue())
+            self.assertEqual(len(events), 1)
+            self.assertEqual((events[0].done, events[0].total), (1500, 1500))
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+
+class TestMigrationEstimate(unittest.TestCase):
+    """Tests para el estimador por muestreo."""
+    
+    def setUp(self):
+        """Crea DBs Android/iOS de prueba."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.android_db = os.path.join(self.tmpdir, 'android.db')
+        self.ios_db = os.path.join(self.tmpdir, 'ios.db')
+        
+        create_android_db(self.android_db, [
+            ('573001111111@s.whatsapp.net', 0, f'KEY{i}', f'msg {i}' if i % 4 else None, 1700000000000 + i)
+            for i in range(20000)
+        ])
+        create_ios_db(self.ios_db)
+    
+    def tearDown(self):
+        """Cleanup."""
+        import shutil
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+    
+    def test_estimate_extrapolates_from_sample(self):
+        """Test que la estimación extrapola sin copiar ni migrar."""
+        migrator = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890')
+        estimate = migrator.estimate_migration(sample_pages=8, page_rows=200)
+        
+        self.assertEqual(estimate['schema'], 'modern')
+        self.assertLessEqual(estimate['sampled_rows'], 8 * 200)
+        # 3 de cada 4 mensajes tienen texto
+        self.assertAlmostEqual(estimate['estimated_messages'], 15000, delta=300)
+        self.assertGreater(estimate['estimated_output_growth'], 0)
+        self.assertGreater(estimate['estimated_seconds'], 0)
+        
+        # No se creó ni modificó ninguna salida
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ['android.db', 'ios.db'])
+        conn = sqlite3.connect(self.ios_db)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM ZWAMESSAGE").fetchone()[0], 0)
+        conn.close()
+    
+    def test_dense_sampling_does_not_double_count(self):
+        """Test que con más páginas que el span admite, las ventanas no se solapan."""
+        migrator = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890')
+        estimate = migrator.estimate_migration(sample_pages=100, page_rows=256)
+        
+        # 100 ventanas de 256 cubrirían 25 600 rowids: el span es de 20 000
+        self.assertEqual(estimate['sampled_rows'], 15000)
+        self.assertEqual(estimate['estimated_messages'], 15000)
+
+
+
+class TestStanzaMerge(unittest.TestCase):
+    """Tests para el modo merge por key_id ↔ ZSTANZAID."""
+    
+    def setUp(self):
+        """Crea iOS con historial parcial y Android con solapamiento."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.android_db = os.path.join(self.tmpdir, 'android.db')
+        self.ios_db = os.path.join(self.tmpdir, 'ios.db')
+        self.output_db = os.path.join(self.tmpdir, 'out.db')
+        
+        jid = '573001111111@s.whatsapp.net'
+        create_android_db(self.android_db, [
+            (jid, 0, 'KEY1', 'hola', 1700000000000),
+            (jid, 1, 'KEY2', '', 1700000001000),        # Texto vacío
+            (jid, 0, 'KEY3', 'nuevo', 1700000002000),
+            (jid, 1, 'KEY4', 'hola', 1700000000000),    # Misma fecha/texto que KEY1
+        ])
+        create_ios_db(self.ios_db, [
+            (1, 1, 0, 'KEY1', 'hola', 1700000000 - TIMESTAMP_OFFSET),
+            (2, 1, 1, 'KEY2', None, 1700000001 - TIMESTAMP_OFFSET),
+        ], sessions=[(1, jid)])
+    
+    def tearDown(self):
+        """Cleanup."""
+        import shutil
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+    
+    def test_merge_skips_existing_stanza_ids(self):
+        """Test que solo se omiten mensajes con stanza ID existente."""
+        migrator = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890', merge=True)
+        stats = migrator.run_migration(self.output_db)
+        
+        self.assertEqual(stats['migrated'], 2)
+        self.assertEqual(stats['duplicates'], 2)
+        
+        conn = sqlite3.connect(self.output_db)
+        stanzas = [row[0] for row in conn.execute("SELECT ZSTANZAID FROM ZWAMESSAGE")]
+        conn.close()
+        self.assertEqual(sorted(stanzas), ['KEY1', 'KEY2', 'KEY3', 'KEY4'])
+    
+    def test_without_merge_all_rows_inserted(self):
+        """Test que sin merge se insertan todos los mensajes."""
+        migrator = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890')
+        stats = migrator.run_migration(self.output_db)
+        
+        self.assertEqual(stats['migrated'], 4)
+        self.assertEqual(stats['duplicates'], 0)
+    
+    def test_merge_key_includes_chat_and_direction(self):
+        """Test que un key_id repetido en otro chat o dirección no se omite."""
+        android_db = os.path.join(self.tmpdir, 'android_repeated.db')
+        create_android_db(android_db, [
+            ('573002222222@s.whatsapp.net', 0, 'KEY1', 'otro chat', 1700000003000),
+            ('573001111111@c.us', 1, 'KEY1', 'otra dirección', 1700000004000),
+            ('573001111111@c.us', 0, 'KEY1', 'mismo mensaje', 1700000000000),
+        ])
+        
+        migrator = WhatsAppMigrator(android_db, self.ios_db, '1234567890', merge=True)
+        stats = migrator.run_migration(self.output_db)
+        
+        self.assertEqual(stats['migrated'], 2)
+        self.assertEqual(stats['duplicates'], 1)
+    
+    def test_merge_uses_jids_without_chat_session(self):
+        """Test que sin ZCHATSESSION el chat se deduce de ZTOJID/ZFROMJID."""
+        conn = sqlite3.connect(self.ios_db)
+        conn.execute("UPDATE ZWAMESSAGE SET ZCHATSESSION = NULL")
+        conn.execute("UPDATE ZWAMESSAGE SET ZFROMJID = '573001111111@s.whatsapp.net' WHERE ZISFROMME = 0")
+        conn.execute("UPDATE ZWAMESSAGE SET ZTOJID = '573001111111@s.whatsapp.net' WHERE ZISFROMME = 1")
+        conn.commit()
+        conn.close()
+        
+        migrator = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890', merge=True)
+        stats = migrator.run_migration(self.output_db)
+        
+        self.assertEqual(stats['duplicates'], 2)
+    
+    def test_legacy_migrate_messages_skips_existing(self):
+        """Test que migrate_messages omite los mensajes ya presentes en iOS."""
+        migrator = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890')
+        migrator.connect_databases()
+        migrator.copy_ios_schema_to_output(self.output_db)
+        try:
+            migrated, duplicates = migrator.migrate_messages()
+        finally:
+            for conn in (migrator.android_conn, migrator.ios_conn, migrator.output_conn):
+                conn.close()
+        
+        self.assertEqual((migrated, duplicates), (2, 2))
+
+
+
+class TestInterleavedMerge(unittest.TestCase):
+    """Tests para el intercalado ordenado en chats iOS existentes."""
+    
+    def setUp(self):
+        """Crea un chat iOS existente y mensajes Android intercalados."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.android_db = os.path.join(self.tmpdir, 'android.db')
+        self.ios_db = os.path.join(self.tmpdir, 'ios.db')
+        self.output_db = os.path.join(self.tmpdir, 'out.db')
+        
+        chat_a = '573001111111@s.whatsapp.net'
+        chat_b = '573002222222@s.whatsapp.net'
+        base = 1700000000
+        
+        create_android_db(self.android_db, [
+            (chat_a, 0, 'A20', 'android 20', (base + 20) * 1000),
+            (chat_a, 1, 'A40', 'android 40', (base + 40) * 1000),
+            (chat_b, 0, 'B05', 'android b', (base + 5) * 1000),
+        ])
+        create_ios_db(self.ios_db, [
+            (1, 1, 0, 'I10', 'ios 10', base + 10 - TIMESTAMP_OFFSET),
+            (2, 1, 1, 'I30', 'ios 30', base + 30 - TIMESTAMP_OFFSET),
+        ])
+        conn = sqlite3.connect(self.ios_db)
+        conn.execute("INSERT INTO ZWACHATSESSION (Z_PK, ZCONTACTJID) VALUES (1, ?)", (chat_a,))
+        conn.execute("UPDATE ZWAMESSAGE SET ZSORT = Z_PK")
+        conn.commit()
+        conn.close()
+    
+    def tearDown(self):
+        """Cleanup."""
+        import shutil
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+    
+    def test_interleave_assigns_sort_by_chat_and_date(self):
+        """Test que ZSORT sigue el orden (chat, fecha) en ambos lados."""
+        migrator = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890', interleave=True)
+        stats = migrator.run_migration(self.output_db)
+        self.assertEqual(stats['migrated'], 3)
+        
+        conn = sqlite3.connect(self.output_db)
+        chat_a = conn.execute(
+            "SELECT ZSTANZAID, ZSORT FROM ZWAMESSAGE WHERE ZCHATSESSION = 1 ORDER BY ZSORT"
+        ).fetchall()
+        chat_b = conn.execute(
+            "SELECT ZSTANZAID, ZSORT, ZCHATSESSION FROM ZWAMESSAGE WHERE ZSTANZAID = 'B05'"
+        ).fetchone()
+        conn.close()
+        
+        self.assertEqual(chat_a, [('I10', 1), ('A20', 2), ('I30', 3), ('A40', 4)])
+        self.assertEqual(chat_b, ('B05', 1, None))
+    
+    def test_interleave_merges_jid_variants(self):
+        """Test que variantes del JID (@c.us, sufijo de dispositivo) comparten numeración."""
+        android_db = os.path.join(self.tmpdir, 'android_variants.db')
+        base = 1700000000
+        create_android_db(android_db, [
+            ('573001111111@c.us', 0, 'A20', 'android 20', (base + 20) * 1000),
+            ('573001111111:3@s.whatsapp.net', 1, 'A40', 'android 40', (base + 40) * 1000),
+            ('573001111111@s.whatsapp.net', 0, 'A35', 'android 35', (base + 35) * 1000),
+        ])
+        
+        migrator = WhatsAppMigrator(android_db, self.ios_db, '1234567890', interleave=True)
+        migrator.run_migration(self.output_db)
+        
+        conn = sqlite3.connect(self.output_db)
+        chat_a = conn.execute(
+            "SELECT ZSTANZAID, ZSORT FROM ZWAMESSAGE WHERE ZCHATSESSION = 1 ORDER BY ZSORT"
+        ).fetchall()
+        conn.close()
+        
+        self.assertEqual(chat_a, [('I10', 1), ('A20', 2), ('I30', 3), ('A35', 4), ('A40', 5)])
+
+
+class TestMessageFilters(unittest.TestCase):
+    """Tests para los filtros de chat y fecha empujados a SQL."""
+    
+    def setUp(self):
+        """Crea una DB Android con dos chats en fechas distintas."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.android_db = os.path.join(self.tmpdir, 'android.db')
+        self.ios_db = os.path.join(self.tmpdir, 'ios.db')
+        self.output_db = os.path.join(self.tmpdir, 'out.db')
+        
+        chat_a = '573001111111@s.whatsapp.net'
+        chat_b = '573002222222@s.whatsapp.net'
+        day = 24 * 60 * 60 * 1000
+        base = to_android_timestamp('2024-01-01')
+        
+        create_android_db(self.android_db, [
+            (chat_a, 0, 'A1', 'a dia 1', base),
+            (chat_a, 1, 'A2', 'a dia 2', base + day),
+            (chat_b, 0, 'B1', 'b dia 1', base + 1000),
+            (chat_b, 0, 'B3', 'b dia 3', base + 2 * day),
+        ])
+        create_ios_db(self.ios_db)
+    
+    def tearDown(self):
+        """Cleanup."""
+        import shutil
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+    
+    def _migrated_ids(self, **filters):
+        """Ejecuta la migración con filtros y retorna los ZSTANZAID migrados."""
+        migrator = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890', **filters)
+        migrator.run_migration(self.output_db)
+        conn = sqlite3.connect(self.output_db)
+        ids = sorted(row[0] for row in conn.execute("SELECT ZSTANZAID FROM ZWAMESSAGE"))
+        conn.close()
+        return ids
+    
+    def test_to_android_timestamp(self):
+        """Test de conversión de fechas a milisegundos UTC."""
+        self.assertIsNone(to_android_timestamp(None))
+        self.assertEqual(to_android_timestamp(1234), 1234)
+        self.assertEqual(to_android_timestamp('1970-01-02'), 24 * 60 * 60 * 1000)
+    
+    def test_chats_filter_accepts_phone_numbers(self):
+        """Test que --chats acepta números y solo migra esos chats."""
+        self.assertEqual(self._migrated_ids(chats=['+573001111111']), ['A1', 'A2'])
+    
+    def test_exclude_chats_filter(self):
+        """Test que --exclude-chats omite los chats indicados."""
+        self.assertEqual(
+            self._migrated_ids(exclude_chats=['573001111111@s.whatsapp.net']), ['B1', 'B3']
+        )
+    
+    def test_chat_filters_match_raw_jid_variants(self):
+        """Test que los filtros de chat cubren filas guardadas como '@c.us' o con ':dispositivo'."""
+        conn = sqlite3.connect(self.android_db)
+        conn.execute("UPDATE messages SET key_remote_jid = '573001111111@c.us' WHERE key_id = 'A1'")
+        conn.execute("UPDATE messages SET key_remote_jid = '573001111111:7@s.whatsapp.net' WHERE key_id = 'A2'")
+        conn.commit()
+        conn.close()
+        
+        self.assertEqual(self._migrated_ids(chats=['573001111111']), ['A1', 'A2'])
+        self.assertEqual(self._migrated_ids(exclude_chats=['573001111111']), ['B1', 'B3'])
+    
+    def test_date_range_filter(self):
+        """Test que since es inclusivo y until exclusivo."""
+        self.assertEqual(
+            self._migrated_ids(since='2024-01-02', until='2024-01-03'), ['A2']
+        )
+    
+    def test_temporary_index_is_dropped(self):
+        """Test que el índice temporal se crea para filtrar y se elimina al final."""
+        migrator = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890',
+                                    chats=['573001111111'])
+        migrator.run_migration(self.output_db)
+        
+        conn = sqlite3.connect(self.android_db)
+        indexes = [row[1] for row in conn.execute("PRAGMA index_list(messages)")]
+        conn.close()
+        self.assertNotIn(FILTER_INDEX_NAME, indexes)
+    
+    def test_filters_use_index(self):
+        """Test que la consulta filtrada se resuelve con el índice (jid, timestamp)."""
+        migrator = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890',
+                                    chats=['573001111111'], since='2024-01-02')
+        migrator.android_conn = sqlite3.connect(self.android_db)
+        try:
+            migrator._ensure_filter_index()
+            sql, params = migrator._modern_messages_query()
+            plan = ' '.join(
+                str(row[-1]) for row in migrator.android_conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            )
+            self.assertIn(FILTER_INDEX_NAME, plan)
+        finally:
+            migrator._drop_filter_index()
+            migrator.android_conn.close()
+
+
+class TestSnapshotMerge(unittest.TestCase):
+    """Tests para la mezcla k-way de varios snapshots Android."""
+    
+    def setUp(self):
+        """Crea dos snapshots que se solapan parcialmente."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.current_db = os.path.join(self.tmpdir, 'msgstore.db')
+        self.old_db = os.path.join(self.tmpdir, 'msgstore-2024-01-01.1.db')
+        self.ios_db = os.path.join(self.tmpdir, 'ios.db')
+        self.output_db = os.path.join(self.tmpdir, 'out.db')
+        
+        chat_a = '573001111111@s.whatsapp.net'
+        chat_b = '573002222222@s.whatsapp.net'
+        base = 1700000000000
+        
+        # El snapshot actual perdió A1; el antiguo no tiene A3 ni B2
+        create_android_db(self.current_db, [
+            (chat_a, 0, 'A2', 'a2', base + 2000),
+            (chat_a, 1, 'A3', 'a3', base + 3000),
+            (chat_b, 0, 'B1', 'b1 actual', base + 1500),
+            (chat_b, 0, 'B2', 'b2', base + 500),
+        ])
+        create_android_db(self.old_db, [
+            (chat_a, 0, 'A1', 'a1', base + 1000),
+            (chat_a, 0, 'A2', 'a2', base + 2000),
+            (chat_b, 0, 'B1', 'b1 antiguo', base + 1500),
+        ])
+        create_ios_db(self.ios_db)
+    
+    def tearDown(self):
+        """Cleanup."""
+        import shutil
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+    
+    def test_merger_dedups_and_prefers_first_snapshot(self):
+        """Test que el merger deduplica por (jid, from_me, key_id) y conserva la fila prioritaria."""
+        with SnapshotMerger([self.current_db, self.old_db], MODERN_MESSAGE_COLUMNS) as merger:
+            self.assertEqual(merger.count(), 7)
+            rows = list(merger.iter_messages())
+            self.assertEqual(merger.duplicates, 2)
+        
+        self.assertEqual([row[3] for row in rows], ['A1', 'A2', 'A3', 'B1', 'B2'])
+        self.assertEqual(rows[3][4], 'b1 actual')
+    
+    def test_merger_keeps_both_directions_of_a_key_id(self):
+        """Test que un mismo key_id enviado y recibido en un chat no se deduplica."""
+        chat = '573003333333@s.whatsapp.net'
+        first = os.path.join(self.tmpdir, 'both-1.db')
+        second = os.path.join(self.tmpdir, 'both-2.db')
+        create_android_db(first, [(chat, 0, 'K1', 'recibido', 1700000000000)])
+        create_android_db(second, [
+            (chat, 1, 'K1', 'enviado', 1700000001000),
+            (chat, 0, 'K1', 'recibido', 1700000000000),
+        ])
+        
+        with SnapshotMerger([first, second], MODERN_MESSAGE_COLUMNS) as merger:
+            rows = list(merger.iter_messages())
+            self.assertEqual(merger.duplicates, 1)
+        
+        self.assertEqual([(row[2], row[4]) for row in rows], [(0, 'recibido'), (1, 'enviado')])
+    
+    def test_snapshot_source_honours_order(self):
+        """Test que el flujo de snapshots sigue el orden pedido (fecha o chat)."""
+        migrator = WhatsAppMigrator(self.current_db, self.ios_db, '1234567890',
+                                    snapshots=[self.old_db], sort_chunk_rows=2,
+                                    scratch_dir=self.tmpdir)
+        migrator.connect_databases()
+        try:
+            for order_by, expected in (('timestamp', ['B2', 'A1', 'B1', 'A2', 'A3']),
+                                       ('chat', ['A1', 'A2', 'A3', 'B2', 'B1'])):
+                _, rows, merger = migrator._open_message_source(order_by)
+                try:
+                    self.assertEqual([row[3] for row in rows], expected)
+                finally:
+                    merger.close()
+        finally:
+            migrator.android_conn.close()
+            migrator.ios_conn.close()
+    
+    def test_migration_with_snapshots(self):
+        """Test que la migración recupera mensajes que solo existen en snapshots antiguos."""
+        migrator = WhatsAppMigrator(self.current_db, self.ios_db, '1234567890',
+                                    snapshots=[self.old_db])
+        stats = migrator.run_migration(self.output_db)
+        
+        self.assertEqual(stats['migrated'], 5)
+        self.assertEqual(stats['snapshot_duplicates'], 2)
+        
+        conn = sqlite3.connect(self.output_db)
+        ids = sorted(row[0] for row in conn.execute("SELECT ZSTANZAID FROM ZWAMESSAGE"))
+        conn.close()
+        self.assertEqual(ids, ['A1', 'A2', 'A3', 'B1', 'B2'])
+    
+    def test_missing_snapshot_raises(self):
+        """Test que un snapshot inexistente se reporta."""
+        merger = SnapshotMerger([self.current_db, os.path.join(self.tmpdir, 'nope.db')],
+                                MODERN_MESSAGE_COLUMNS)
+        with self.assertRaises(FileNotFoundError):
+            merger.open()
+        self.assertEqual(merger.connections, [])
+
+
+class TestExternalSort(unittest.TestCase):
+    """Tests para el ordenamiento externo con runs en disco."""
+    
+    def setUp(self):
+        """Crea un directorio de trabajo."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.scratch_dir = os.path.join(self.tmpdir, 'scratch')
+    
+    def tearDown(self):
+        """Cleanup."""
+        import shutil
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+    
+    def test_sort_spills_runs_and_cleans_up(self):
+        """Test que varios runs se mezclan en orden estable y se eliminan."""
+        rows = [(i, (i * 7) % 10) for i in range(25)]
+        sorter = ExternalSorter(lambda row: row[1], chunk_rows=4, scratch_dir=self.scratch_dir)
+        
+        result = list(sorter.sort(rows))
+        
+        self.assertEqual(result, sorted(rows, key=lambda row: row[1]))
+        self.assertEqual(sorter.runs, 7)
+        self.assertGreater(sorter.spilled_bytes, 0)
+        self.assertEqual(os.listdir(self.scratch_dir), [])
+    
+    def test_small_input_stays_in_memory(self):
+        """Test que una entrada menor a un bloque no toca el disco."""
+        sorter = ExternalSorter(lambda row: row[0], chunk_rows=10, scratch_dir=self.scratch_dir)
+        self.assertEqual(list(sorter.sort([(3,), (1,), (2,)])), [(1,), (2,), (3,)])
+        self.assertFalse(os.path.exists(self.scratch_dir))
+    
+    def test_invalid_chunk_rows(self):
+        """Test que chunk_rows no positivo se rechaza."""
+        with self.assertRaises(ValueError):
+            ExternalSorter(lambda row: row, chunk_rows=0)
+    
+    def test_migration_with_external_sort(self):
+        """Test que la migración con ordenamiento externo respeta el orden por timestamp."""
+        android_db = os.path.join(self.tmpdir, 'android.db')
+        ios_db = os.path.join(self.tmpdir, 'ios.db')
+        output_db = os.path.join(self.tmpdir, 'out.db')
+        
+        # Insertados en orden de rowid inverso al de timestamp
+        create_android_db(android_db, [
+            ('573001111111@s.whatsapp.net', 0, f'K{i:02d}', f'msg {i}', 1700000000000 - i * 1000)
+            for i in range(10)
+        ])
+        create_ios_db(ios_db)
+        
+        migrator = WhatsAppMigrator(android_db, ios_db, '1234567890', external_sort=True,
+                                    sort_chunk_rows=3, scratch_dir=self.scratch_dir)
+        stats = migrator.run_migration(output_db)
+        self.assertEqual(stats['migrated'], 10)
+        
+        conn = sqlite3.connect(output_db)
+        ids = [row[0] for row in conn.execute("SELECT ZSTANZAID FROM ZWAMESSAGE ORDER BY Z_PK")]
+        conn.close()
+        self.assertEqual(ids, [f'K{i:02d}' for i in reversed(range(10))])
+        self.assertEqual(os.listdir(self.scratch_dir), [])
+
+
+class TestColumnarMessageCache(unittest.TestCase):
+    """Tests para la caché columnar de mensajes Android."""
+    
+    def setUp(self):
+        """Crea una DB Android con varios chats y una DB iOS vacía."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.android_db = os.path.join(self.tmpdir, 'android.db')
+        self.ios_db = os.path.join(self.tmpdir, 'ios.db')
+        self.cache_path = os.path.join(self.tmpdir, 'android.wamc')
+        
+        base = 1700000000000
+        self.messages = [
+            (f'57300{i % 3}@s.whatsapp.net', i % 2, f'K{i:03d}', f'texto ñ {i}', base + i * 1000)
+            for i in range(600)
+        ]
+        create_android_db(self.android_db, self.messages)
+        create_ios_db(self.ios_db)
+    
+    def tearDown(self):
+        """Cleanup."""
+        import shutil
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+    
+    def _stanza_order(self, output_db):
+        """Retorna los ZSTANZAID de la salida en orden de Z_PK."""
+        conn = sqlite3.connect(output_db)
+        ids = [row[0] for row in conn.execute("SELECT ZSTANZAID FROM ZWAMESSAGE ORDER BY Z_PK")]
+        conn.close()
+        return ids
+    
+    def test_cache_round_trip(self):
+        """Test que la caché reproduce las filas en ambos órdenes."""
+        migrator = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890')
+        self.assertEqual(migrator.export_message_cache(self.cache_path), 600)
+        
+        with ColumnarMessageCache(self.cache_path) as cache:
+            self.assertEqual(len(cache), 600)
+            self.assertEqual(len(cache.jids), 3)
+            by_time = list(cache.iter_rows('timestamp'))
+            by_chat = list(cache.iter_rows('chat'))
+        
+        self.assertEqual([row[3] for row in by_time], [m[2] for m in self.messages])
+        self.assertEqual(by_time[5][1:6], ('573002@s.whatsapp.net', 1, 'K005', 'texto ñ 5',
+                                           1700000005000))
+        self.assertEqual([row[1] for row in by_chat], sorted(m[0] for m in self.messages))
+    
+    def test_migration_from_cache_matches_sqlite(self):
+        """Test que migrar desde la caché produce la misma salida que desde SQLite."""
+        WhatsAppMigrator(self.android_db, self.ios_db, '1234567890').export_message_cache(self.cache_path)
+        
+        direct_db = os.path.join(self.tmpdir, 'direct.db')
+        cached_db = os.path.join(self.tmpdir, 'cached.db')
+        WhatsAppMigrator(self.android_db, self.ios_db, '1234567890').run_migration(direct_db)
+        stats = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890',
+                                 message_cache=self.cache_path).run_migration(cached_db)
+        
+        self.assertEqual(stats['migrated'], 600)
+        self.assertEqual(self._stanza_order(cached_db), self._stanza_order(direct_db))
+    
+    def test_stale_cache_is_rejected(self):
+        """Test que una caché exportada con otros filtros no se reutiliza."""
+        WhatsAppMigrator(self.android_db, self.ios_db, '1234567890').export_message_cache(self.cache_path)
+        
+        migrator = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890',
+                                    chats=['5730001'], message_cache=self.cache_path)
+        with self.assertRaises(ValueError):
+            migrator.run_migration(os.path.join(self.tmpdir, 'out.db'))
+    
+    def test_invalid_file_is_rejected(self):
+        """Test que un archivo que no es caché se rechaza."""
+        with open(self.cache_path, 'wb') as f:
+            f.write(b'not a cache at all')
+        with self.assertRaises(ValueError):
+            ColumnarMessageCache(self.cache_path)
+
+
+class TestJIDRegistry(unittest.TestCase):
+    """Tests para el internado y normalización de JIDs."""
+    
+    def test_normalize_forms(self):
+        """Test de las formas de número y JID soportadas."""
+        self.assertEqual(normalize_jid('+57 300 123-4567'), '573001234567@s.whatsapp.net')
+        self.assertEqual(normalize_jid('573001234567@c.us'), '573001234567@s.whatsapp.net')
+        self.assertEqual(normalize_jid('573001234567:12@S.WhatsApp.net'),
+                         '573001234567@s.whatsapp.net')
+        self.assertEqual(normalize_jid('120363000000000000@g.us'), '120363000000000000@g.us')
+        self.assertEqual(normalize_jid('status@broadcast'), 'status@broadcast')
+    
+    def test_intern_shares_ids_between_forms(self):
+        """Test que formas equivalentes reciben el mismo ID y una sola cadena."""
+        registry = JIDRegistry()
+        first = registry.intern('573001234567@s.whatsapp.net')
+        self.assertEqual(registry.intern('573001234567@c.us'), first)
+        self.assertEqual(registry.intern('573001234567'), first)
+        self.assertNotEqual(registry.intern('120363000000000000@g.us'), first)
+        
+        self.assertEqual(len(registry), 2)
+        self.assertIs(registry.jid(registry.intern('573001234567@c.us')), registry.jid(first))
+        self.assertEqual(registry.intern(None), NO_JID)
+        self.assertIsNone(registry.jid(NO_JID))
+    
+    def test_conversion_links_equivalent_jid_to_chat(self):
+        """Test que un JID @c.us de Android se asocia al chat iOS @s.whatsapp.net."""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            android_db = os.path.join(tmpdir, 'android.db')
+            ios_db = os.path.join(tmpdir, 'ios.db')
+            output_db = os.path.join(tmpdir, 'out.db')
+            
+            create_android_db(android_db, [('573001111111@c.us', 0, 'K1', 'hola', 1700000000000)])
+            create_ios_db(ios_db)
+            conn = sqlite3.connect(ios_db)
+            conn.execute("INSERT INTO ZWACHATSESSION (Z_PK, ZCONTACTJID) "
+                         "VALUES (7, '573001111111@s.whatsapp.net')")
+            conn.commit()
+            conn.close()
+            
+            WhatsAppMigrator(android_db, ios_db, '1234567890').run_migration(output_db)
+            
+            conn = sqlite3.connect(output_db)
+            row = conn.execute("SELECT ZFROMJID, ZCHATSESSION FROM ZWAMESSAGE").fetchone()
+            conn.close()
+            self.assertEqual(row, ('573001111111@s.whatsapp.net', 7))
+        finally:
+            import shutil
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+class TestMessageTypeTranslation(unittest.TestCase):
+    """Tests para las tablas de traducción de tipo y estado de mensaje."""
+    
+    def test_lookup_tables(self):
+        """Test de traducción por fila, incluyendo códigos desconocidos."""
+        self.assertEqual(translate_message(2, 13), (message_types.IOS_TYPE_AUDIO,
+                                                    message_types.IOS_STATUS_READ,
+                                                    message_types.IOS_EVENT_NONE))
+        self.assertEqual(translate_message(3, 5)[:2], (message_types.IOS_TYPE_VIDEO,
+                                                       message_types.IOS_STATUS_SENT))
+        self.assertEqual(translate_message(999, None)[:2], (message_types.MEDIA_TYPE_DEFAULT,
+                                                            message_types.STATUS_DEFAULT))
+        self.assertEqual(translate_message(-1, -1)[:2], (message_types.MEDIA_TYPE_DEFAULT,
+                                                         message_types.STATUS_DEFAULT))
+    
+    def test_control_messages_are_group_events(self):
+        """Test que status 6 se traduce a evento de grupo según media_size."""
+        self.assertEqual(
+            translate_message(0, message_types.ANDROID_STATUS_CONTROL,
+                              message_types.ANDROID_ACTION_SUBJECT_CHANGED),
+            (message_types.IOS_TYPE_GROUP_EVENT, message_types.IOS_STATUS_RECEIVED,
+             message_types.IOS_EVENT_SUBJECT_CHANGED)
+        )
+    
+    def test_sql_case_matches_lookup(self):
+        """Test que las expresiones SQL CASE coinciden con las tablas en todos los códigos."""
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE TABLE messages (media_wa_type TEXT, status INTEGER, media_size INTEGER)")
+        codes = list(range(-1, 50)) + [None]
+        conn.executemany(
+            "INSERT INTO messages VALUES (?, ?, ?)",
+            [(str(code) if code is not None else None, code, code) for code in codes]
+        )
+        rows = conn.execute(f"""
+            SELECT CAST(m.media_wa_type AS INTEGER), m.status, m.media_size,
+                   {message_types.message_type_sql()},
+                   {message_types.message_status_sql()},
+                   {message_types.group_event_sql()}
+            FROM messages m
+        """).fetchall()
+        conn.close()
+        
+        for media_type, status, media_size, *translated in rows:
+            self.assertEqual(tuple(translated), translate_message(media_type, status, media_size))
+    
+    def test_migration_writes_translated_columns(self):
+        """Test que la migración escribe tipo, estado y evento traducidos."""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            android_db = os.path.join(tmpdir, 'android.db')
+            ios_db = os.path.join(tmpdir, 'ios.db')
+            output_db = os.path.join(tmpdir, 'out.db')
+            
+            create_android_db(android_db, [])
+            conn = sqlite3.connect(android_db)
+            conn.execute(
+                "INSERT INTO messages (key_remote_jid, key_from_me, key_id, status, data, timestamp, "
+                "media_wa_type, media_size) VALUES ('1@g.us', 1, 'K1', 13, 'foto', 1700000000000, '1', 2048)"
+            )
+            conn.commit()
+            conn.close()
+            create_ios_db(ios_db)
+            
+            WhatsAppMigrator(android_db, ios_db, '1234567890').run_migration(output_db)
+            
+            conn = sqlite3.connect(output_db)
+            row = conn.execute(
+                "SELECT ZMESSAGETYPE, ZMESSAGESTATUS, ZGROUPEVENTTYPE FROM ZWAMESSAGE"
+            ).fetchone()
+            conn.close()
+            self.assertEqual(row, (message_types.IOS_TYPE_IMAGE, message_types.IOS_STATUS_READ,
+                                   message_types.IOS_EVENT_NONE))
+        finally:
+            import shutil
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+class TestRelatedMessages(unittest.TestCase):
+    """Tests para la migración de respuestas citadas, reacciones y encuestas."""
+    
+    def setUp(self):
+        """Crea una DB Android con respuestas, reacciones y una encuesta."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.android_db = os.path.join(self.tmpdir, 'android.db')
+        self.ios_db = os.path.join(self.tmpdir, 'ios.db')
+        self.output_db = os.path.join(self.tmpdir, 'out.db')
+        
+        chat = '573001111111@s.whatsapp.net'
+        base = 1700000000000
+        create_android_db(self.android_db, [
+            (chat, 0, 'P1', 'pregunta', base),
+            (chat, 1, 'R1', 'respuesta', base + 1000),
+            (chat, 1, 'R2', 'respuesta a iOS', base + 2000),
+        ])
+        
+        conn = sqlite3.connect(self.android_db)
+        conn.execute("DROP TABLE message_quoted")
+        conn.execute("CREATE TABLE message_quoted (message_row_id INTEGER PRIMARY KEY, key_id TEXT)")
+        conn.executemany("INSERT INTO message_quoted VALUES (?, ?)", [(2, 'P1'), (3, 'I1')])
+        conn.execute("CREATE TABLE message_add_on (_id INTEGER PRIMARY KEY, parent_message_row_id INTEGER)")
+        conn.execute("CREATE TABLE message_add_on_reaction (message_add_on_row_id INTEGER, reaction TEXT)")
+        conn.execute("INSERT INTO message_add_on VALUES (1, 1)")
+        conn.execute("INSERT INTO message_add_on_reaction VALUES (1, 'x')")
+        conn.execute("CREATE TABLE message_poll (message_row_id INTEGER PRIMARY KEY)")
+        conn.execute("INSERT INTO message_poll VALUES (2)")
+        conn.execute("CREATE TABLE message_ephemeral (message_row_id INTEGER PRIMARY KEY, duration INTEGER)")
+        conn.executemany("INSERT INTO message_ephemeral VALUES (?, 604800)", [(1,), (3,)])
+        conn.execute("CREATE TABLE message_view_once_media (message_row_id INTEGER PRIMARY KEY, state INTEGER)")
+        conn.execute("INSERT INTO message_view_once_media VALUES (2, 0)")
+        conn.commit()
+        conn.close()
+        
+        create_ios_db(self.ios_db, [(1, 1, 0, 'I1', 'mensaje iOS', 700000000)], sessions=[(1, chat)])
+    
+    def tearDown(self):
+        """Cleanup."""
+        import shutil
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+    
+    def _parents(self):
+        """Retorna ZSTANZAID → ZPARENTMESSAGE de la salida."""
+        conn = sqlite3.connect(self.output_db)
+        parents = dict(conn.execute("SELECT ZSTANZAID, ZPARENTMESSAGE FROM ZWAMESSAGE"))
+        pks = dict(conn.execute("SELECT ZSTANZAID, Z_PK FROM ZWAMESSAGE"))
+        conn.close()
+        return parents, pks
+    
+    def test_quoted_replies_are_linked(self):
+        """Test que la respuesta apunta al Z_PK del mensaje citado."""
+        stats = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890').run_migration(self.output_db)
+        parents, pks = self._parents()
+        
+        self.assertEqual(stats['quoted'], 1)
+        self.assertEqual(parents['R1'], pks['P1'])
+        self.assertIsNone(parents['R2'])
+        self.assertEqual(stats['reactions_skipped'], 1)
+        self.assertEqual(stats['polls_skipped'], 1)
+        self.assertEqual(stats['ephemeral_unmarked'], 2)
+        self.assertEqual(stats['view_once_unmarked'], 1)
+    
+    def test_merge_links_replies_to_existing_ios_messages(self):
+        """Test que en modo merge una respuesta puede citar un mensaje iOS existente."""
+        stats = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890',
+                                 merge=True).run_migration(self.output_db)
+        parents, pks = self._parents()
+        
+        self.assertEqual(stats['quoted'], 2)
+        self.assertEqual(parents['R2'], pks['I1'])
+
+
+class TestReceiptDates(unittest.TestCase):
+    """Tests para las fechas de envío/recepción derivadas de recibos."""
+    
+    def setUp(self):
+        """Crea una DB Android con columnas de recibos y tabla receipt_user."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.android_db = os.path.join(self.tmpdir, 'android.db')
+        self.ios_db = os.path.join(self.tmpdir, 'ios.db')
+        self.output_db = os.path.join(self.tmpdir, 'out.db')
+        
+        chat = '573001111111@s.whatsapp.net'
+        self.base = 1700000000000
+        create_android_db(self.android_db, [
+            (chat, 1, 'OUT', 'enviado', self.base),
+            (chat, 0, 'IN', 'recibido', self.base + 10000),
+            (chat, 1, 'PLAIN', 'sin recibos', self.base + 20000),
+        ])
+        
+        conn = sqlite3.connect(self.android_db)
+        for name in ('received_timestamp', 'receipt_server_timestamp', 'receipt_device_timestamp'):
+            conn.execute(f"ALTER TABLE messages ADD COLUMN {name} INTEGER")
+        conn.execute("UPDATE messages SET receipt_server_timestamp = ? WHERE key_id = 'OUT'",
+                     (self.base + 1000,))
+        conn.execute("UPDATE messages SET received_timestamp = ? WHERE key_id = 'IN'",
+                     (self.base + 12000,))
+        conn.execute("""
+            CREATE TABLE receipt_user (
+                _id INTEGER PRIMARY KEY, message_row_id INTEGER, receipt_user_jid_row_id INTEGER,
+                receipt_timestamp INTEGER, read_timestamp INTEGER, played_timestamp INTEGER
+            )
+        """)
+        conn.execute("INSERT INTO receipt_user (message_row_id, receipt_timestamp, read_timestamp) "
+                     "VALUES (1, ?, ?)", (self.base + 3000, self.base + 5000))
+        conn.commit()
+        conn.close()
+        create_ios_db(self.ios_db)
+    
+    def tearDown(self):
+        """Cleanup."""
+        import shutil
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+    
+    def _ios(self, ms):
+        """Convierte ms Android a segundos Apple."""
+        return ms / 1000.0 - TIMESTAMP_OFFSET
+    
+    def test_receipt_dates_are_preloaded(self):
+        """Test que los recibos se precargan por key_id en un diccionario."""
+        migrator = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890')
+        migrator.android_conn = sqlite3.connect(self.android_db)
+        try:
+            receipts = migrator._load_receipt_dates()
+        finally:
+            migrator.android_conn.close()
+        
+        chat = '573001111111@s.whatsapp.net'
+        self.assertEqual(receipts[migrator._message_key(chat, 1, 'OUT')],
+                         (self.base + 1000, self.base + 3000, self.base + 5000))
+        self.assertEqual(receipts[migrator._message_key(chat, 0, 'IN')], (None, self.base + 12000, None))
+        self.assertNotIn(migrator._message_key(chat, 1, 'PLAIN'), receipts)
+    
+    def test_receipts_are_keyed_by_chat_and_filtered(self):
+        """Test que un key_id repetido en otro chat no comparte recibos y que los filtros se aplican."""
+        other = '573002222222@s.whatsapp.net'
+        conn = sqlite3.connect(self.android_db)
+        conn.execute(
+            "INSERT INTO messages (key_remote_jid, key_from_me, key_id, data, timestamp, received_timestamp) "
+            "VALUES (?, 0, 'OUT', 'otro chat', ?, ?)", (other, self.base + 30000, self.base + 31000)
+        )
+        conn.commit()
+        conn.close()
+        
+        migrator = WhatsAppMigrator(self.android_db, self.ios_db, '1234567890')
+        migrator.android_conn = sqlite3.connect(self.android_db)
+        try:
+            receipts = migrator._load_receipt_dates()
+            self.assertEqual(receipts[migrator._message_key(other, 0, 'OUT')],
+                             (None, self.base + 31000, None))
+            self.assertEqual(len(receipts), 3)
+            
+            migrator.exclude_chats = [other]
+            receipts = migrator._load_receipt_dates()
+            self.assertNotIn(migrator._message_key(other, 0, 'OUT'), receipts)
+            self.assertEqual(len(receipts), 2)
+        finally:
+            migrator.android_conn.close()
+    
+    def test_migration_writes_sent_received_dates(self):
+        """Test que la migración escribe fechas de envío/recepción y estado leído."""
+        WhatsAppMigrator(self.android_db, self.ios_db, '1234567890').run_migration(self.output_db)
+        
+        conn = sqlite3.connect(self.output_db)
+        rows = {
+            row[0]: row[1:] for row in conn.execute(
+                "SELECT ZSTANZAID, ZMESSAGEDATE, ZSENTDATE, ZRECEIVEDDATE, ZMESSAGESTATUS FROM ZWAMESSAGE"
+            )
+        }
+        conn.close()
+        
+        self.assertEqual(rows['OUT'][:3], (self._ios(self.base), self._ios(self.base + 1000),
+                                           self._ios(self.base + 3000)))
+        self.assertEqual(rows['OUT'][3], message_types.IOS_STATUS_READ)
+        self.assertEqual(rows['IN'][2], self._ios(self.base + 12000))
+        self.assertEqual(rows['PLAIN'][0], rows['PLAIN'][1])
+        self.assertEqual(rows['PLAIN'][0], rows['PLAIN'][2])
+
+
 if __name__ == '__main__':
     # Ejecutar tests con verbosidad
     unittest.main(verbosity=2)
@@ -0,0 +1,172 @@
+"""
+Tests para multi_device.py
+
+Verifica la enumeración de seriales, el aislamiento de directorios por
+dispositivo y el límite de concurrencia del pool.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from subprocess import CompletedProcess
+from unittest import mock
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.adb_client import AdbDevice, parse_device_list
+from src.android_backup import AndroidBackupManager
+from src.device_watcher import ATTACHED, DETACHED, STATE_CHANGED, DeviceEvent
+from src.multi_device import (
+    device_directory_name, extract_all_devices, extract_attached_devices, list_device_serials
+)
+
+
+class FakeManager:
+    """Sustituto de AndroidBackupManager que escribe un android.db falso."""
+    
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+    created = []
+    
+    def __init__(self, whatsapp_type, pipeline=False, client=None, serial=None,
+                 tmp_dir='tmp', out_dir='out', show_progress=True):
+        self.serial = serial
+        self.out_dir = out_dir
+        FakeManager.created.append((serial, tmp_dir, out_dir, show_progress))
+    
+    def extract_database_directly(self):
+        with FakeManager.lock:
+            FakeManager.active += 1
+            FakeManager.peak = max(FakeManager.peak, FakeManager.active)
+        try:
+            time.sleep(0.05)
+            if self.serial == 'broken':
+                raise RuntimeError('device disconnected')
+            os.makedirs(self.out_dir, exist_ok=True)
+            path = os.path.join(self.out_dir, 'android.db')
+            with open(path, 'wb') as f:
+                f.write(self.serial.encode() * 100)
+            return path
+        finally:
+            with FakeManager.lock:
+                FakeManager.active -= 1
+
+
+class TestDeviceListing(unittest.TestCase):
+    """Tests de enumeración de dispositivos."""
+    
+    def test_parse_adb_devices_output(self):
+        """Test que la salida de `adb devices` se interpreta sin la cabecera."""
+        output = "List of devices attached\nR58M123\tdevice\nemulator-5554\tunauthorized\n\n"
+        self.assertEqual(parse_device_list(output), [
+            AdbDevice('R58M123', 'device'), AdbDevice('emulator-5554', 'unauthorized'),
+        ])
+    
+    def test_only_ready_devices_listed(self):
+        """Test que solo se devuelven dispositivos en estado 'device'."""
+        output = "List of devices attached\nA\tdevice\nB\toffline\n192.168.1.5:5555\tdevice\n"
+        with mock.patch('src.multi_device.run_adb_command',
+                        return_value=CompletedProcess([], 0, stdout=output, stderr='')):
+            self.assertEqual(list_device_serials('adb'), ['A', '192.168.1.5:5555'])
+    
+    def test_directory_name_is_path_safe(self):
+        """Test que seriales de red generan nombres de directorio válidos."""
+        self.assertEqual(device_directory_name('192.168.1.5:5555'), '192.168.1.5_5555')
+    
+    def test_manager_targets_serial(self):
+        """Test que los comandos adb del gestor llevan -s <serial>."""
+        with mock.patch('src.android_backup.get_adb_command', return_value='adb'):
+            manager = AndroidBackupManager('standard', serial='R58M123')
+        self.assertEqual(manager._adb('shell', 'id'), ['adb', '-s', 'R58M123', 'shell', 'id'])
+        
+        with mock.patch('src.android_backup.run_adb_command',
+                        return_value=CompletedProcess([], 0, stdout='30\n', stderr='')) as run_adb:
+            self.assertEqual(manager.device_sdk_version(), 30)
+        self.assertEqual(run_adb.call_args[0][0][:3], ['adb', '-s', 'R58M123'])
+
+
+class TestConcurrentExtraction(unittest.TestCase):
+    """Tests de la extracción en paralelo."""
+    
+    def setUp(self):
+        """Reinicia los contadores del gestor falso."""
+        FakeManager.active = 0
+        FakeManager.peak = 0
+        FakeManager.created = []
+    
+    def test_per_device_directories_and_bounded_pool(self):
+        """Test que cada dispositivo usa sus directorios y se respeta max_workers."""
+        serials = [f'dev{i}' for i in range(6)] + ['10.0.0.2:5555']
+        
+        with tempfile.TemporaryDirectory() as base_dir:
+            with mock.patch('src.multi_device.AndroidBackupManager', FakeManager):
+                report = extract_all_devices(serials, base_dir=base_dir, max_workers=3)
+            
+            self.assertEqual([r.serial for r in report.results], serials)
+            self.assertTrue(all(r.ok for r in report.results))
+            self.assertLessEqual(FakeManager.peak, 3)
+            self.assertGreater(FakeManager.peak, 1)
+            
+            for serial, tmp_dir, out_dir, show_progress in FakeManager.created:
+                device_dir = os.path.join(base_dir, device_directory_name(serial))
+                self.assertEqual(tmp_dir, os.path.join(device_dir, 'tmp'))
+                self.assertEqual(out_dir, os.path.join(device_dir, 'out'))
+                self.assertFalse(show_progress)
+            
+            last = report.results[-1]
+            with open(last.path, 'rb') as f:
+                self.assertEqual(f.read(), b'10.0.0.2:5555' * 100)
+        
+        self.assertEqual(report.total_bytes, sum(len(s) * 100 for s in serials))
+        self.assertGreater(report.bytes_per_sec, 0)
+    
+    def test_failed_device_does_not_stop_others(self):
+        """Test que un dispositivo con error queda reportado sin afectar al resto."""
+        with tempfile.TemporaryDirectory() as base_dir:
+            with mock.patch('src.multi_device.AndroidBackupManager', FakeManager):
+                report = extract_all_devices(['good', 'broken'], base_dir=base_dir, max_workers=2)
+        
+        self.assertEqual([r.serial for r in report.failed], ['broken'])
+        self.assertIn('disconnected', report.failed[0].error)
+        self.assertTrue(report.results[0].ok)
+    
+    
+    def test_extracts_devices_as_they_attach(self):
+        """Test que cada dispositivo se extrae una vez al quedar listo."""
+        class FakeWatcher:
+            def events(self, timeout=None):
+                yield DeviceEvent(ATTACHED, 'A', 'device')
+                yield DeviceEvent(ATTACHED, 'B', 'unauthorized')
+                yield DeviceEvent(DETACHED, 'A', None, 'device')
+                yield DeviceEvent(ATTACHED, 'A', 'device')
+                yield DeviceEvent(STATE_CHANGED, 'B', 'device', 'unauthorized')
+                raise AssertionError('events consumed past the expected devices')
+        
+        with tempfile.TemporaryDirectory() as base_dir:
+            with mock.patch('src.multi_device.AndroidBackupManager', FakeManager):
+                report = extract_attached_devices(FakeWatcher(), 2, base_dir=base_dir)
+        
+        self.assertEqual([r.serial for r in report.results], ['A', 'B'])
+        self.assertTrue(all(r.ok for r in report.results))
+    
+    def test_watch_timeout_returns_partial_report(self):
+        """Test que al vencer la espera se reportan los dispositivos atendidos."""
+        class FakeWatcher:
+            def events(self, timeout=None):
+                yield DeviceEvent(ATTACHED, 'A', 'device')
+                raise TimeoutError('no more devices')
+        
+        with tempfile.TemporaryDirectory() as base_dir:
+            with mock.patch('src.multi_device.AndroidBackupManager', FakeManager):
+                report = extract_attached_devices(FakeWatcher(), 3, base_dir=base_dir, timeout=1)
+        
+        self.assertEqual([r.serial for r in report.results], ['A'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,378 @@
+"""
+Tests para whatsapp_crypt.py y aes_gcm.py
+
+Verifica AES-GCM contra vectores conocidos y la desencriptación en
+streaming de archivos crypt12/crypt14/crypt15 sintéticos.
+"""
+
+import hashlib
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import zlib
+from unittest import mock
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.aes_gcm import AES, aes_gcm_decrypt, aes_gcm_encrypt
+from src.pipeline import PipelineStage, run_pipeline
+from src.whatsapp_crypt import (
+    CryptStreamDecryptor,
+    decrypt_chunks,
+    decrypt_database,
+    derive_crypt15_key,
+    detect_crypt_version,
+    load_key,
+    prefix_iv_candidates,
+)
+
+# Vectores de la especificación de GCM (McGrew & Viega), casos AES-256
+GCM_K = bytes.fromhex('feffe9928665731c6d6a8f9467308308' * 2)
+GCM_P = bytes.fromhex(
+    'd9313225f88406e5a55909c5aff5269a86a7a9531534f7da2e4c303d8a318a72'
+    '1c3c0c95956809532fcf0e2449a6b525b16aedf5aa0de657ba637b391aafd255'
+)
+GCM_A = bytes.fromhex('feedfacedeadbeeffeedfacedeadbeefabaddad2')
+
+
+def _protobuf_bytes(field: int, value: bytes) -> bytes:
+    """Codifica un campo protobuf length-delimited (longitudes < 128)."""
+    return bytes([(field << 3) | 2, len(value)]) + value
+
+
+def build_crypt_file(version: int, key: bytes, plaintext: bytes, iv: bytes,
+                     with_md5: bool = True) -> bytes:
+    """Construye un archivo cryptNN con el formato del dispositivo."""
+    ciphertext, tag = aes_gcm_encrypt(key, iv, zlib.compress(plaintext))
+    
+    if version == 12:
+        header = b'\x00\x01\x02' + os.urandom(48) + iv
+        return header + ciphertext + tag + b'\x00\x00\x00\x00'
+    
+    if version == 15:
+        prefix = b'\x08\x01' + _protobuf_bytes(3, _protobuf_bytes(1, iv))
+    else:
+        cipher = (_protobuf_bytes(2, b'\x02') + _protobuf_bytes(3, os.urandom(32))
+                  + _protobuf_bytes(4, os.urandom(16)) + _protobuf_bytes(5, iv))
+        prefix = b'\x08\x00' + _protobuf_bytes(2, cipher)
+    prefix += _protobuf_bytes(4, b'\x0a\x0a2.23.25.76')
+    
+    body = bytes([len(prefix), 1]) + prefix + ciphertext + tag
+    if with_md5:
+        body += hashlib.md5(body).digest()
+    return body
+
+
+class TestAESGCM(unittest.TestCase):
+    """Tests de AES y AES-GCM en Python puro contra vectores conocidos."""
+    
+    def test_aes256_fips197(self):
+        """Test vector de FIPS-197 (AES-256)."""
+        aes = AES(bytes(range(32)))
+        block = aes.encrypt_block(bytes.fromhex('00112233445566778899aabbccddeeff'))
+        self.assertEqual(block.hex(), '8ea2b7ca516745bfeafc49904b496089')
+    
+    def test_gcm_zero_vectors(self):
+        """Test casos 13 y 14 (clave nula)."""
+        _, tag = aes_gcm_encrypt(bytes(32), bytes(12), b'')
+        self.assertEqual(tag.hex(), '530f8afbc74536b9a963b4f1c4cb738b')
+        ciphertext, tag = aes_gcm_encrypt(bytes(32), bytes(12), bytes(16))
+        self.assertEqual(ciphertext.hex(), 'cea7403d4d606b6e074ec5d3baf39d18')
+        self.assertEqual(tag.hex(), 'd0d1c8a799996bf0265b98b5d48ab919')
+    
+    def test_gcm_96_bit_iv(self):
+        """Test caso 15 (IV de 96 bits)."""
+        ciphertext, tag = aes_gcm_encrypt(GCM_K, bytes.fromhex('cafebabefacedbaddecaf888'), GCM_P)
+        self.assertEqual(ciphertext.hex()[:32], '522dc1f099567d07f47f37a32a84427d')
+        self.assertEqual(tag.hex(), 'b094dac5d93471bdec1a502270e3cc6c')
+    
+    def test_gcm_long_iv_with_aad(self):
+        """Test caso 18 (IV de 60 bytes, como el IV de 16 bytes de WhatsApp, vía GHASH)."""
+        iv = bytes.fromhex(
+            '9313225df88406e555909c5aff5269aa6a7a9538534f7da1e4c303d2a318a728'
+            'c3c0c95156809539fcf0e2429a6b525416aedbf5a0de6a57a637b39b'
+        )
+        ciphertext, tag = aes_gcm_encrypt(GCM_K, iv, GCM_P[:60], GCM_A)
+        self.assertEqual(ciphertext.hex()[:32], '5a8def2f0c9e53f1f75d7853659e2a20')
+        self.assertEqual(tag.hex(), 'a44a8266ee1c8eb0c8b5d4cf5ae9f19a')
+        self.assertEqual(aes_gcm_decrypt(GCM_K, iv, ciphertext, tag, GCM_A), GCM_P[:60])
+    
+    def test_gcm_rejects_bad_tag(self):
+        """Test que un tag alterado es rechazado."""
+        iv = os.urandom(16)
+        ciphertext, tag = aes_gcm_encrypt(GCM_K, iv, b'payload')
+        with self.assertRaises(ValueError):
+            aes_gcm_decrypt(GCM_K, iv, ciphertext, bytes([tag[0] ^ 1]) + tag[1:])
+
+
+class TestCryptKeys(unittest.TestCase):
+    """Tests de formatos de clave y encabezados."""
+    
+    def test_detect_version(self):
+        """Test detección de versión por extensión."""
+        self.assertEqual(detect_crypt_version('tmp/msgstore.db.crypt15'), 15)
+        self.assertEqual(detect_crypt_version('msgstore-2024-01-01.1.db.crypt12'), 12)
+        with self.assertRaises(ValueError):
+            detect_crypt_version('msgstore.db.crypt8')
+    
+    def test_load_key_formats(self):
+        """Test carga de clave crypt14 (158 bytes) y crypt15 (hex/serializada)."""
+        key_file = os.urandom(126) + b'K' * 32
+        self.assertEqual(load_key(key_file, 14), b'K' * 32)
+        
+        root = os.urandom(32)
+        expected = derive_crypt15_key(root)
+        self.assertEqual(load_key(root.hex().encode() + b'\n', 15), expected)
+        self.assertEqual(load_key(b'\xac\xed\x00\x05' + os.urandom(95) + root, 15), expected)
+        with self.assertRaises(ValueError):
+            load_key(b'short', 14)
+    
+    def test_crypt15_key_derivation_is_hkdf(self):
+        """Test que la derivación equivale a HKDF-SHA256 (salt nulo, info 'backup encryption')."""
+        import hmac
+        root = bytes(range(32))
+        prk = hmac.new(bytes(32), root, hashlib.sha256).digest()
+        okm = hmac.new(prk, b'backup encryption' + b'\x01', hashlib.sha256).digest()
+        self.assertEqual(derive_crypt15_key(root), okm)
+    
+    def test_prefix_iv_candidates_prefers_last_c14_field(self):
+        """Test que en crypt14 el IV (último campo de 16 bytes) se prueba primero."""
+        salt, iv = b'S' * 16, b'I' * 16
+        cipher = _protobuf_bytes(4, salt) + _protobuf_bytes(5, iv)
+        self.assertEqual(prefix_iv_candidates(_protobuf_bytes(2, cipher)), [iv, salt])
+        self.assertEqual(prefix_iv_candidates(_protobuf_bytes(3, _protobuf_bytes(1, iv))), [iv])
+
+
+class TestCryptDecryption(unittest.TestCase):
+    """Tests de desencriptación en streaming."""
+    
+    def setUp(self):
+        """Crea una base SQLite de prueba y un directorio temporal."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.tmpdir.name, 'plain.db')
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE messages (_id INTEGER PRIMARY KEY, data TEXT)")
+        conn.executemany("INSERT INTO messages (data) VALUES (?)",
+                         [(f"message {i}",) for i in range(200)])
+        conn.commit()
+        conn.close()
+        with open(db_path, 'rb') as f:
+            self.plaintext = f.read()
+        self.output = os.path.join(self.tmpdir.name, 'android.db')
+    
+    def tearDown(self):
+        """Elimina el directorio temporal."""
+        self.tmpdir.cleanup()
+    
+    def _write(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+    
+    def _decrypt(self, version: int, key_file: bytes, data: bytes, **kwargs):
+        encrypted = self._write(f'msgstore.db.crypt{version}', data)
+        key_path = self._write('key', key_file)
+        return decrypt_database(encrypted, key_path, self.output, backend='python',
+                                chunk_size=1000, **kwargs)
+    
+    def _assert_output(self):
+        with open(self.output, 'rb') as f:
+            self.assertEqual(f.read(), self.plaintext)
+        conn = sqlite3.connect(self.output)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0], 200)
+        conn.close()
+    
+    def test_crypt15(self):
+        """Test crypt15 con clave raíz hexadecimal y MD5 final."""
+        root = os.urandom(32)
+        data = build_crypt_file(15, derive_crypt15_key(root), self.plaintext, os.urandom(16))
+        reports = []
+        result = self._decrypt(15, root.hex().encode(), data, progress=reports.append)
+        
+        self._assert_output()
+        self.assertEqual(result.size, len(self.plaintext))
+        self.assertEqual(result.encrypted_size, len(data))
+        self.assertTrue(result.checksum_verified)
+        self.assertTrue(reports[-1].finished)
+    
+    def test_crypt14(self):
+        """Test crypt14 con archivo key de 158 bytes."""
+        key = os.urandom(32)
+        data = build_crypt_file(14, key, self.plaintext, os.urandom(16))
+        result = self._decrypt(14, os.urandom(126) + key, data)
+        self._assert_output()
+        self.assertEqual(result.version, 14)
+        self.assertEqual(result.backend, 'python')
+    
+    def test_python_backend_warns_on_large_input(self):
+        """Test que el backend en Python puro advierte su lentitud con archivos grandes."""
+        key = os.urandom(32)
+        data = build_crypt_file(14, key, self.plaintext, os.urandom(16))
+        with mock.patch('src.whatsapp_crypt.PYTHON_BACKEND_WARN_SIZE', len(data)):
+            with self.assertLogs('whatsapp_migration.whatsapp_crypt', level='WARNING') as logs:
+                self._decrypt(14, os.urandom(126) + key, data)
+        self.assertTrue(any('pure-Python' in line for line in logs.output))
+    
+    def test_crypt14_without_md5(self):
+        """Test crypt14 sin MD5 final (el tag ocupa los últimos 16 bytes)."""
+        key = os.urandom(32)
+        data = build_crypt_file(14, key, self.plaintext, os.urandom(16), with_md5=False)
+        result = self._decrypt(14, os.urandom(126) + key, data)
+        self._assert_output()
+        self.assertFalse(result.checksum_verified)
+    
+    def test_crypt12(self):
+        """Test crypt12 con encabezado fijo."""
+        key = os.urandom(32)
+        data = build_crypt_file(12, key, self.plaintext, os.urandom(16))
+        self._decrypt(12, os.urandom(126) + key, data)
+        self._assert_output()
+    
+    def test_wrong_key_fails_without_output(self):
+        """Test que una clave incorrecta falla y no deja archivo de salida."""
+        data = build_crypt_file(14, os.urandom(32), self.plaintext, os.urandom(16))
+        with self.assertRaises(ValueError):
+            self._decrypt(14, os.urandom(158), data)
+        self.assertFalse(os.path.exists(self.output))
+        self.assertFalse(os.path.exists(self.output + '.part'))
+    
+    def test_tampered_ciphertext_fails(self):
+        """Test que un ciphertext alterado es rechazado por el tag GCM."""
+        key = os.urandom(32)
+        data = bytearray(build_crypt_file(12, key, self.plaintext, os.urandom(16)))
+        data[-100] ^= 0x01
+        with self.assertRaises(ValueError):
+            self._decrypt(12, os.urandom(126) + key, bytes(data))
+        self.assertFalse(os.path.exists(self.output))
+    
+    def test_feed_in_arbitrary_fragments(self):
+        """Test que el resultado no depende de cómo se fragmenta el flujo."""
+        key = os.urandom(32)
+        data = build_crypt_file(15, key, self.plaintext, os.urandom(16))
+        decryptor = CryptStreamDecryptor(key, 15, backend='python')
+        
+        output = b''.join(decryptor.feed(data[i:i + 7]) for i in range(0, len(data), 7))
+        output += decryptor.finish()
+        self.assertEqual(output, self.plaintext)
+
+
+class TestPipeline(unittest.TestCase):
+    """Tests del pipeline de etapas en hilos."""
+    
+    def test_stages_in_order_with_finish(self):
+        """Test que las etapas transforman en orden y finish emite al cierre."""
+        chunks = [bytes([i]) * 10 for i in range(50)]
+        output = []
+        stats = run_pipeline(
+            iter(chunks),
+            [PipelineStage('upper', lambda c: c + b'!'), PipelineStage('tail', lambda c: c, lambda: b'END')],
+            output.append, queue_size=2,
+        )
+        
+        self.assertEqual(b''.join(output), b''.join(c + b'!' for c in chunks) + b'END')
+        self.assertEqual(stats['stages']['source']['chunks'], 50)
+        self.assertEqual(stats['stages']['sink']['bytes_in'], 50 * 11 + 3)
+    
+    def test_bounded_in_flight_chunks(self):
+        """Test que con un sumidero lento la fuente no se adelanta más que las colas."""
+        queue_size = 2
+        produced = []
+        consumed = []
+        max_ahead = []
+        
+        def source():
+            for i in range(40):
+                produced.append(i)
+                yield b'x'
+        
+        def slow_sink(chunk):
+            consumed.append(chunk)
+            max_ahead.append(len(produced) - len(consumed))
+            time.sleep(0.002)
+        
+        run_pipeline(source(), [PipelineStage('copy', lambda c: c)], slow_sink, queue_size)
+        # Dos colas + un fragmento en manos de cada hilo
+        self.assertLessEqual(max(max_ahead), 2 * queue_size + 2)
+    
+    def test_error_propagates_and_stops_threads(self):
+        """Test que un error de una etapa se relanza y cancela la fuente."""
+        closed = []
+        
+        def source():
+            try:
+                while True:
+                    yield b'data'
+            finally:
+                closed.append(True)
+        
+        def failing(chunk):
+            raise ValueError("boom")
+        
+        threads_before = threading.active_count()
+        with self.assertRaises(ValueError):
+            run_pipeline(source(), [PipelineStage('fail', failing)], lambda c: None)
+        
+        self.assertEqual(closed, [True])
+        self.assertEqual(threading.active_count(), threads_before)
+
+
+class TestPipelinedDecryption(unittest.TestCase):
+    """Tests de la cadena fuente → AES-GCM → zlib → escritura."""
+    
+    def setUp(self):
+        """Prepara datos comprimibles y un directorio temporal."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmpdir.name, 'android.db')
+        self.plaintext = b''.join(f"row {i} ".encode() * 3 for i in range(3000))
+        self.key = os.urandom(32)
+    
+    def tearDown(self):
+        """Elimina el directorio temporal."""
+        self.tmpdir.cleanup()
+    
+    def _chunks(self, data: bytes, size: int = 997):
+        return (data[i:i + size] for i in range(0, len(data), size))
+    
+    def test_pipeline_matches_plaintext(self):
+        """Test que el pipeline produce el mismo SQLite que el proceso secuencial."""
+        data = build_crypt_file(15, self.key, self.plaintext, os.urandom(16))
+        result, stats = decrypt_chunks(self._chunks(data), self.key, 15, self.output,
+                                       backend='python', queue_size=2)
+        
+        with open(self.output, 'rb') as f:
+            self.assertEqual(f.read(), self.plaintext)
+        self.assertEqual(result.encrypted_size, len(data))
+        self.assertEqual(result.size, len(self.plaintext))
+        self.assertTrue(result.checksum_verified)
+        self.assertEqual(set(stats['stages']), {'source', 'decrypt', 'inflate', 'sink'})
+    
+    def test_pipeline_tampered_data_leaves_no_output(self):
+        """Test que un tag inválido aborta el pipeline sin dejar archivos."""
+        data = bytearray(build_crypt_file(14, self.key, self.plaintext, os.urandom(16)))
+        data[-40] ^= 0x01
+        with self.assertRaises(ValueError):
+            decrypt_chunks(self._chunks(bytes(data)), self.key, 14, self.output, backend='python')
+        self.assertFalse(os.path.exists(self.output))
+        self.assertFalse(os.path.exists(self.output + '.part'))
+    
+    def test_pipeline_source_error_propagates(self):
+        """Test que un error de la fuente (ej: adb) se relanza."""
+        data = build_crypt_file(15, self.key, self.plaintext, os.urandom(16))
+        
+        def broken_source():
+            yield data[:500]
+            raise RuntimeError("adb exec-out failed")
+        
+        with self.assertRaises(RuntimeError):
+            decrypt_chunks(broken_source(), self.key, 15, self.output, backend='python')
+        self.assertFalse(os.path.exists(self.output + '.part'))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)